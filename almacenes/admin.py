@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Almacen
+from .models import Almacen, StockAlmacen
 
 @admin.register(Almacen)
 class AlmacenAdmin(admin.ModelAdmin):
@@ -8,3 +8,15 @@ class AlmacenAdmin(admin.ModelAdmin):
     search_fields = ('nombre', 'direccion')
     list_editable = ('activo',)
     readonly_fields = ('fecha_creacion',)
+
+@admin.register(StockAlmacen)
+class StockAlmacenAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'almacen', 'cantidad')
+    list_filter = ('almacen',)
+    search_fields = ('producto__nombre',)
+    list_select_related = ('producto', 'almacen')
+    # El stock cambia con ventas y transferencias, que mantienen el total del producto
+    readonly_fields = ('producto', 'almacen', 'cantidad')
+
+    def has_add_permission(self, request):
+        return False
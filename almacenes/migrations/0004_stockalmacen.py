@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almacenes', '0003_remove_almacen_estado'),
+        ('productos', '0006_kardex_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlmacen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('almacen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='almacenes.almacen')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_almacenes', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Stock por almacén',
+                'verbose_name_plural': 'Stock por almacén',
+                'constraints': [models.UniqueConstraint(fields=('almacen', 'producto'), name='stock_almacen_producto_unico')],
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from productos.models import Producto
+
 # Create your models here.
 
 class Almacen(models.Model):
@@ -19,3 +21,28 @@ class Almacen(models.Model):
         verbose_name = 'Almacén'
         verbose_name_plural = 'Almacenes'
         ordering = ['-fecha_creacion']
+
+
+class StockAlmacen(models.Model):
+    """
+    Unidades de un producto en un almacén
+
+    Producto.stock_actual es la suma de estas filas más el stock sin
+    asignar a ningún almacén; se mantiene en las mismas transacciones que
+    las modifican (ver almacenes/stock.py).
+    """
+    almacen = models.ForeignKey(Almacen, on_delete=models.CASCADE, related_name='stock')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='stock_almacenes')
+    cantidad = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.producto_id} en {self.almacen_id}: {self.cantidad}"
+
+    class Meta:
+        verbose_name = 'Stock por almacén'
+        verbose_name_plural = 'Stock por almacén'
+        constraints = [
+            # Una fila por producto y almacén; también es el índice de las
+            # consultas de disponibilidad del POS (almacén + productos)
+            models.UniqueConstraint(fields=['almacen', 'producto'], name='stock_almacen_producto_unico'),
+        ]
@@ -0,0 +1,281 @@
+"""
+Stock por almacén para TradeInventory
+
+Cada fila de StockAlmacen guarda las unidades de un producto en un almacén
+y Producto.stock_actual sigue siendo el total del catálogo. El total se
+mantiene en las mismas transacciones que cambian el stock de un almacén,
+así que nunca se calcula sumando al leer:
+
+- Venta desde un almacén (ventas/checkout.py): se bloquean y descuentan
+  solo las filas (almacén, producto), y el total se resta con
+  sumar_al_total() al final de la transacción. Las cajas de almacenes
+  distintos compiten por filas distintas y la fila del producto queda
+  bloqueada solo durante el final de la venta.
+- Venta sin almacén: se valida y se descuenta contra el stock sin asignar
+  (expresion_sin_asignar()), nunca contra unidades que están en un almacén.
+- Entrada de mercancía a un almacén: inventario.mover_stock(almacen_id=...)
+- Transferencias: transferir_stock() mueve un lote de productos con un
+  número fijo de consultas; el total del producto no cambia.
+
+Las unidades del total que no están en ningún almacén son el stock "sin
+asignar" (productos creados o editados desde el formulario y bases
+anteriores a los almacenes). Se reparten con transferir_stock(None, destino).
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, PositiveIntegerField, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from productos.models import MovimientoStock, Producto
+from .models import Almacen, StockAlmacen
+
+
+class TransferenciaInvalida(Exception):
+    """
+    Error al transferir stock entre almacenes
+    Incluye la lista de fallos por producto (producto_id, solicitado,
+    disponible y error), con el mismo formato que ventas.checkout.VentaInvalida.
+    """
+
+    def __init__(self, mensaje, fallos=None):
+        super().__init__(mensaje)
+        self.fallos = fallos or []
+
+
+def stock_en_almacen(almacen_id, producto_ids=None, bloquear=False):
+    """
+    Unidades de los productos en un almacén con una consulta por el índice
+    único (almacen, producto)
+
+    Args:
+        almacen_id: ID del almacén
+        producto_ids: IDs a consultar (por defecto todo el almacén)
+        bloquear: Bloquear las filas (select_for_update) hasta el final de la transacción
+
+    Returns:
+        dict: {producto_id: cantidad}; los productos sin fila no aparecen
+    """
+    filas = StockAlmacen.objects.filter(almacen_id=almacen_id)
+    if producto_ids is not None:
+        filas = filas.filter(producto_id__in=list(producto_ids))
+    if bloquear:
+        filas = filas.select_for_update()
+    return dict(filas.order_by('producto_id').values_list('producto_id', 'cantidad'))
+
+
+def expresion_sin_asignar():
+    """
+    Expresión de las unidades de un producto que no están en ningún almacén
+
+    Para annotate() y filter() sobre Producto, incluido el WHERE de un
+    UPDATE condicional: stock_actual menos la suma de sus filas StockAlmacen.
+    """
+    asignado = StockAlmacen.objects.filter(producto=OuterRef('pk')).order_by().values('producto').annotate(
+        total=Sum('cantidad'),
+    ).values('total')
+    return F('stock_actual') - Coalesce(Subquery(asignado), Value(0))
+
+
+def stock_sin_asignar(producto_ids):
+    """
+    Unidades de cada producto que no están en ningún almacén
+
+    Args:
+        producto_ids: IDs de los productos
+
+    Returns:
+        dict: {producto_id: stock_actual - unidades en almacenes}
+    """
+    producto_ids = list(producto_ids)
+    asignado = dict(
+        StockAlmacen.objects.filter(producto_id__in=producto_ids)
+        .values_list('producto_id').annotate(total=Sum('cantidad')).order_by()
+    )
+    return {
+        producto_id: stock - (asignado.get(producto_id) or 0)
+        for producto_id, stock in Producto.objects.filter(id__in=producto_ids).values_list('id', 'stock_actual')
+    }
+
+
+def descontar_de_almacen(almacen_id, cantidades):
+    """
+    Descuenta el stock de un almacén con un único UPDATE condicional
+
+    Returns:
+        bool: True si alcanzó el stock de todos los productos
+    """
+    condicion = Q()
+    casos = []
+    for producto_id, cantidad in cantidades.items():
+        condicion |= Q(producto_id=producto_id, cantidad__gte=cantidad)
+        casos.append(When(producto_id=producto_id, then=F('cantidad') - cantidad))
+
+    actualizados = StockAlmacen.objects.filter(condicion, almacen_id=almacen_id).update(
+        cantidad=Case(*casos, default=F('cantidad'), output_field=PositiveIntegerField()),
+    )
+    return actualizados == len(cantidades)
+
+
+def descontar_de_almacen_en_orden(almacen_id, cantidades):
+    """
+    Descuenta el stock de un almacén producto por producto, en orden de id
+
+    Como descontar_stock_en_orden() del checkout, pero sobre las filas
+    (almacén, producto): cada UPDATE bloquea solo su fila.
+
+    Returns:
+        int: ID del primer producto sin stock suficiente, o None
+    """
+    for producto_id in sorted(cantidades):
+        cantidad = cantidades[producto_id]
+        actualizados = StockAlmacen.objects.filter(
+            almacen_id=almacen_id, producto_id=producto_id, cantidad__gte=cantidad,
+        ).update(cantidad=F('cantidad') - cantidad)
+        if not actualizados:
+            return producto_id
+    return None
+
+
+def crear_filas(almacen_id, producto_ids):
+    """Crea con un solo INSERT las filas (almacén, producto) que falten, con 0 unidades"""
+    StockAlmacen.objects.bulk_create(
+        [StockAlmacen(almacen_id=almacen_id, producto_id=producto_id) for producto_id in sorted(producto_ids)],
+        ignore_conflicts=True,
+    )
+
+
+def sumar_a_almacen(almacen_id, cantidades, crear=True):
+    """
+    Suma unidades al stock de un almacén, creando las filas que falten
+
+    Usa dos consultas para cualquier cantidad de productos: un INSERT que
+    ignora las filas existentes y un UPDATE con CASE.
+
+    Args:
+        almacen_id: ID del almacén
+        cantidades: Diccionario {producto_id: unidades con signo}
+        crear: False si las filas ya existen (crear_filas)
+    """
+    if crear:
+        crear_filas(almacen_id, cantidades)
+    StockAlmacen.objects.filter(almacen_id=almacen_id, producto_id__in=list(cantidades)).update(
+        cantidad=Case(
+            *[When(producto_id=producto_id, then=F('cantidad') + cantidad) for producto_id, cantidad in cantidades.items()],
+            default=F('cantidad'),
+            output_field=PositiveIntegerField(),
+        ),
+    )
+
+
+def sumar_al_total(cantidades):
+    """
+    Suma unidades con signo a Producto.stock_actual con un único UPDATE
+
+    Args:
+        cantidades: Diccionario {producto_id: unidades con signo}
+    """
+    Producto.objects.filter(id__in=list(cantidades)).update(
+        stock_actual=Case(
+            *[When(id=producto_id, then=F('stock_actual') + cantidad) for producto_id, cantidad in cantidades.items()],
+            default=F('stock_actual'),
+        ),
+        fecha_actualizacion=timezone.now(),
+    )
+
+
+def _agrupar(lineas):
+    """Suma las cantidades por producto y rechaza ids o cantidades inválidos"""
+    cantidades = {}
+    for producto_id, cantidad in lineas:
+        try:
+            producto_id = int(producto_id)
+            cantidad = int(cantidad)
+        except (TypeError, ValueError):
+            raise TransferenciaInvalida('Producto o cantidad inválidos')
+        if cantidad <= 0:
+            raise TransferenciaInvalida('La cantidad debe ser mayor a 0')
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+    if not cantidades:
+        raise TransferenciaInvalida('No hay productos en la transferencia')
+    return dict(sorted(cantidades.items()))
+
+
+def transferir_stock(origen_id, destino_id, lineas, referencia=''):
+    """
+    Mueve un lote de productos de un almacén a otro en una transacción
+
+    Bloquea las filas de ambos almacenes en una consulta, ordenadas por
+    almacén y producto (dos transferencias opuestas no se interbloquean), y
+    actualiza cada almacén con un solo UPDATE. El total de los productos no
+    cambia, así que sus filas no se tocan.
+
+    Args:
+        origen_id: ID del almacén de origen, o None para el stock sin asignar
+        destino_id: ID del almacén de destino, o None para dejarlo sin asignar
+        lineas: Iterable de pares (producto_id, cantidad)
+        referencia: Motivo o documento de la transferencia (opcional)
+
+    Returns:
+        int: Unidades transferidas
+
+    Raises:
+        TransferenciaInvalida: Si las líneas son inválidas o el origen no
+            tiene stock suficiente. No se transfiere nada.
+    """
+    try:
+        origen_id, destino_id = [int(almacen_id) if almacen_id is not None else None for almacen_id in (origen_id, destino_id)]
+    except (TypeError, ValueError):
+        raise TransferenciaInvalida('Almacén inválido')
+    if origen_id == destino_id:
+        raise TransferenciaInvalida('El almacén de origen y el de destino son el mismo')
+    cantidades = _agrupar(lineas)
+    almacenes = [almacen_id for almacen_id in (origen_id, destino_id) if almacen_id is not None]
+    if Almacen.objects.filter(pk__in=almacenes, activo=True).count() != len(almacenes):
+        raise TransferenciaInvalida('El almacén no existe o está inactivo')
+
+    with transaction.atomic():
+        if destino_id is not None:
+            crear_filas(destino_id, cantidades)
+        bloqueadas = StockAlmacen.objects.select_for_update().filter(
+            almacen_id__in=almacenes, producto_id__in=list(cantidades),
+        ).order_by('almacen_id', 'producto_id')
+        disponibles = {
+            producto_id: cantidad
+            for almacen_id, producto_id, cantidad in bloqueadas.values_list('almacen_id', 'producto_id', 'cantidad')
+            if almacen_id == origen_id
+        }
+        if origen_id is None:
+            # El stock sin asignar depende del total: bloquear los productos
+            list(Producto.objects.select_for_update().filter(id__in=list(cantidades)).order_by('id').values_list('id'))
+            disponibles = stock_sin_asignar(cantidades)
+
+        fallos = [
+            {
+                'producto_id': producto_id,
+                'solicitado': cantidad,
+                'disponible': disponibles.get(producto_id, 0),
+                'error': 'Stock insuficiente en el origen',
+            }
+            for producto_id, cantidad in cantidades.items()
+            if disponibles.get(producto_id, 0) < cantidad
+        ]
+        if fallos:
+            nombres = dict(Producto.objects.filter(id__in=[f['producto_id'] for f in fallos]).values_list('id', 'nombre'))
+            for fallo in fallos:
+                fallo['nombre'] = nombres.get(fallo['producto_id'])
+            raise TransferenciaInvalida('Stock insuficiente', fallos)
+
+        if origen_id is not None:
+            descontar_de_almacen(origen_id, cantidades)
+        if destino_id is not None:
+            sumar_a_almacen(destino_id, cantidades, crear=False)
+
+        ahora = timezone.now()
+        MovimientoStock.registrar(
+            {producto_id: -cantidad for producto_id, cantidad in cantidades.items()},
+            'transferencia', referencia, fecha=ahora, almacen_id=origen_id,
+        )
+        MovimientoStock.registrar(cantidades, 'transferencia', referencia, fecha=ahora, almacen_id=destino_id)
+
+    return sum(cantidades.values())
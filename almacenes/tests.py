@@ -1,3 +1,134 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from categorias.models import Categoria
+from productos.models import MovimientoStock, Producto
+from ventas.checkout import MODOS_STOCK, VentaInvalida, registrar_venta
+from .models import Almacen, StockAlmacen
+from .stock import TransferenciaInvalida, stock_en_almacen, stock_sin_asignar, transferir_stock
+
+
+class StockAlmacenTests(TestCase):
+    """Stock por almacén, ventas desde el almacén de la caja y transferencias"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cajero', 'cajero@example.com', 'clave')
+        categoria = Categoria.objects.create(nombre='Bebidas')
+        cls.centro = Almacen.objects.create(nombre='Centro', direccion='Calle 1')
+        cls.norte = Almacen.objects.create(nombre='Norte', direccion='Calle 2')
+        cls.agua, cls.jugo = [
+            Producto.objects.create(
+                nombre=nombre, precio=Decimal('10.00'), stock_inicial=20, stock_actual=20, categoria=categoria,
+            )
+            for nombre in ('Agua', 'Jugo')
+        ]
+
+    def setUp(self):
+        # Centro: 8 agua y 5 jugo; el resto queda sin asignar
+        transferir_stock(None, self.centro.id, [(self.agua.id, 8), (self.jugo.id, 5)])
+
+    def stock(self, almacen):
+        return stock_en_almacen(almacen.id, [self.agua.id, self.jugo.id])
+
+    def test_venta_descuenta_del_almacen_y_del_total(self):
+        for modo in MODOS_STOCK:
+            with self.subTest(modo=modo):
+                venta = registrar_venta([(self.agua.id, 2)], modo=modo, almacen_id=self.centro.id)
+                self.assertEqual(venta.almacen_id, self.centro.id)
+                self.assertEqual(
+                    venta.detalles.get().producto.movimientos_stock.filter(tipo='venta').last().almacen_id,
+                    self.centro.id,
+                )
+        self.agua.refresh_from_db()
+        self.assertEqual(self.agua.stock_actual, 16)
+        self.assertEqual(self.stock(self.centro)[self.agua.id], 4)
+        self.assertEqual(stock_sin_asignar([self.agua.id]), {self.agua.id: 12})
+
+    def test_venta_valida_contra_el_almacen(self):
+        # Hay 20 en total pero solo 5 de jugo en Centro y ninguno en Norte
+        for modo in MODOS_STOCK:
+            for almacen, disponible in ((self.centro, 5), (self.norte, 0)):
+                with self.subTest(modo=modo, almacen=almacen.nombre):
+                    with self.assertRaises(VentaInvalida) as error:
+                        registrar_venta([(self.jugo.id, 6)], modo=modo, almacen_id=almacen.id)
+                    self.assertEqual(error.exception.fallos[0]['disponible'], disponible)
+        self.norte.activo = False
+        self.norte.save()
+        with self.assertRaises(VentaInvalida):
+            registrar_venta([(self.jugo.id, 1)], almacen_id=self.norte.id)
+        self.jugo.refresh_from_db()
+        self.assertEqual(self.jugo.stock_actual, 20)
+
+    def test_venta_sin_almacen_no_vende_stock_de_almacenes(self):
+        # Todo el stock está en Centro: una venta sin almacén no puede
+        # venderlo y dejar a Centro con unidades que ya no existen
+        for modo in MODOS_STOCK:
+            with self.subTest(modo=modo):
+                refresco = Producto.objects.create(
+                    nombre=f'Refresco {modo}', precio=Decimal('10.00'), stock_inicial=10, stock_actual=10,
+                    categoria=self.agua.categoria,
+                )
+                transferir_stock(None, self.centro.id, [(refresco.id, 10)])
+                with self.assertRaises(VentaInvalida) as error:
+                    registrar_venta([(refresco.id, 10)], modo=modo)
+                self.assertEqual(error.exception.fallos[0]['disponible'], 0)
+                registrar_venta([(refresco.id, 10)], modo=modo, almacen_id=self.centro.id)
+                refresco.refresh_from_db()
+                self.assertEqual(refresco.stock_actual, 0)
+                self.assertEqual(stock_en_almacen(self.centro.id, [refresco.id]), {refresco.id: 0})
+
+    def test_venta_sin_almacen_usa_el_stock_sin_asignar(self):
+        # 12 de agua sin asignar: se venden, la siguiente ya no alcanza
+        for modo in MODOS_STOCK:
+            with self.subTest(modo=modo):
+                registrar_venta([(self.agua.id, 6)], modo=modo)
+        with self.assertRaises(VentaInvalida):
+            registrar_venta([(self.agua.id, 1)])
+        self.assertEqual(stock_sin_asignar([self.agua.id]), {self.agua.id: 0})
+        self.assertEqual(self.stock(self.centro)[self.agua.id], 8)
+
+    def test_transferencia_en_lote(self):
+        # Almacenes, savepoint, filas nuevas, bloqueo de ambos almacenes, un
+        # UPDATE por almacén y dos inserciones en el kardex, sin importar
+        # cuántos productos se transfieran
+        with self.assertNumQueries(9):
+            unidades = transferir_stock(self.centro.id, self.norte.id, [(self.agua.id, 3), (self.jugo.id, 5)])
+        self.assertEqual(unidades, 8)
+        self.assertEqual(self.stock(self.centro), {self.agua.id: 5, self.jugo.id: 0})
+        self.assertEqual(self.stock(self.norte), {self.agua.id: 3, self.jugo.id: 5})
+        # El total no cambia y los movimientos de la transferencia se compensan
+        self.assertEqual(Producto.objects.get(pk=self.agua.pk).stock_actual, 20)
+        transferencias = MovimientoStock.objects.filter(tipo='transferencia', producto=self.agua)
+        self.assertEqual(sum(transferencias.values_list('cantidad', flat=True)), 0)
+
+    def test_transferencia_sin_stock_no_mueve_nada(self):
+        with self.assertRaises(TransferenciaInvalida) as error:
+            transferir_stock(self.centro.id, self.norte.id, [(self.agua.id, 1), (self.jugo.id, 6)])
+        self.assertEqual([f['producto_id'] for f in error.exception.fallos], [self.jugo.id])
+        self.assertEqual(self.stock(self.centro), {self.agua.id: 8, self.jugo.id: 5})
+        with self.assertRaises(TransferenciaInvalida):
+            transferir_stock(None, self.norte.id, [(self.agua.id, 13)])
+        self.assertEqual(self.stock(self.norte), {})
+
+    def test_stock_del_almacen_para_el_pos(self):
+        self.client.force_login(self.usuario)
+        # Sesión, usuario y una consulta al stock del almacén
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(reverse('ventas:stock_almacen_pos', args=[self.centro.id]))
+        self.assertEqual(dict(respuesta.json()['stock']), {self.agua.id: 8, self.jugo.id: 5})
 
-# Create your tests here.
+    def test_pagina_de_transferencias(self):
+        self.client.force_login(self.usuario)
+        url = reverse('almacenes:stock_almacen', args=[self.centro.id])
+        self.assertContains(self.client.get(url), 'Agua')
+        respuesta = self.client.post(url, {
+            'origen': self.centro.id, 'destino': self.norte.id,
+            'producto': [self.agua.id, self.jugo.id, ''], 'cantidad': [2, 1, ''],
+        }, follow=True)
+        self.assertContains(respuesta, 'Se transfirieron 3 unidades')
+        self.assertEqual(self.stock(self.norte), {self.agua.id: 2, self.jugo.id: 1})
+        self.assertEqual(StockAlmacen.objects.get(almacen=self.centro, producto=self.agua).cantidad, 6)
@@ -8,4 +8,5 @@ urlpatterns = [
     path('crear/', views.crear_almacen, name='crear_almacen'),
     path('editar/<int:pk>/', views.editar_almacen, name='editar_almacen'),
     path('cambiar-estado/<int:pk>/', views.cambiar_estado_almacen, name='cambiar_estado_almacen'),
+    path('stock/<int:pk>/', views.stock_almacen, name='stock_almacen'),
 ] 
\ No newline at end of file
@@ -2,7 +2,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
+from productos.models import Producto
 from .models import Almacen
+from .stock import TransferenciaInvalida, transferir_stock
 
 @login_required
 def lista_almacenes(request):
@@ -77,3 +79,48 @@ def cambiar_estado_almacen(request, pk):
     estado = "activado" if almacen.activo else "desactivado"
     messages.success(request, f'Almacén {estado} exitosamente.')
     return redirect('almacenes:lista_almacenes')
+
+@login_required
+def stock_almacen(request, pk):
+    """
+    Stock de un almacén y transferencias de varios productos a la vez
+
+    Args:
+        request: Objeto HttpRequest. En POST:
+            - origen, destino: IDs de almacén ('' para el stock sin asignar)
+            - producto, cantidad: listas paralelas con las líneas a transferir
+
+    Returns:
+        HttpResponse: Página del stock del almacén
+    """
+    almacen = get_object_or_404(Almacen, pk=pk)
+
+    if request.method == 'POST':
+        lineas = [
+            (producto_id, cantidad)
+            for producto_id, cantidad in zip(request.POST.getlist('producto'), request.POST.getlist('cantidad'))
+            if producto_id and cantidad
+        ]
+        try:
+            unidades = transferir_stock(
+                request.POST.get('origen') or None,
+                request.POST.get('destino') or None,
+                lineas,
+                referencia=f'Transferencia ({request.user})',
+            )
+            messages.success(request, f'Se transfirieron {unidades} unidades.')
+        except TransferenciaInvalida as e:
+            detalle = '; '.join(
+                f"{fallo.get('nombre') or fallo['producto_id']}: {fallo['error']} (disponible: {fallo['disponible']})"
+                for fallo in e.fallos
+            )
+            messages.error(request, f'{e}. {detalle}' if detalle else str(e))
+        return redirect('almacenes:stock_almacen', pk=pk)
+
+    context = {
+        'almacen': almacen,
+        'filas': almacen.stock.select_related('producto').filter(cantidad__gt=0).order_by('producto__nombre'),
+        'almacenes': Almacen.objects.filter(activo=True).order_by('nombre'),
+        'productos': Producto.objects.filter(activo=True).order_by('nombre').values('id', 'nombre'),
+    }
+    return render(request, 'almacenes/stock_almacen.html', context)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Cliente, Fiado
+from .models import Cliente, Fiado, SaldoCliente
+from .saldos import SaldoClienteAdminMixin
 
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
@@ -10,8 +11,14 @@ class ClienteAdmin(admin.ModelAdmin):
     readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
 
 @admin.register(Fiado)
-class FiadoAdmin(admin.ModelAdmin):
+class FiadoAdmin(SaldoClienteAdminMixin, admin.ModelAdmin):
     list_display = ('cliente', 'fecha', 'monto', 'pagado', 'fecha_pago')
     list_filter = ('pagado', 'fecha')
     search_fields = ('cliente__nombre',)
     readonly_fields = ('fecha', 'fecha_pago')
+
+@admin.register(SaldoCliente)
+class SaldoClienteAdmin(admin.ModelAdmin):
+    list_display = ('cliente', 'saldo_pendiente', 'fecha_ultimo_pago', 'tipo_ultimo_pago')
+    search_fields = ('cliente__nombre',)
+    readonly_fields = ('cliente', 'saldo_pendiente', 'fecha_ultimo_pago', 'tipo_ultimo_pago', 'fecha_actualizacion')
@@ -8,7 +8,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
+from tradeinventory.api import CamposDispersosMixin
 from .models import Cliente, Fiado, DetalleFiado
+from .saldos import SaldoClienteViewSetMixin, actualizar_saldo_cliente
 from .serializers import (
     ClienteSerializer, 
     ClienteListSerializer, 
@@ -17,12 +19,15 @@ from .serializers import (
     DetalleFiadoSerializer
 )
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(CamposDispersosMixin, viewsets.ModelViewSet):
     """
     ViewSet para el modelo Cliente
     Proporciona operaciones CRUD completas
+    Los listados se paginan por cursor (id, que no cambia: el nombre se
+    edita y movería filas entre páginas) y aceptan ?fields=
     """
     queryset = Cliente.objects.all()
+    orden_cursor = ('id',)
     # permission_classes = [IsAuthenticated]  # Comentado temporalmente para pruebas
     
     def get_serializer_class(self):
@@ -42,7 +47,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
         if q:
             queryset = queryset.filter(
                 Q(nombre__icontains=q) | 
-                Q(apellido__icontains=q) | 
+                Q(documento__icontains=q) | 
                 Q(email__icontains=q)
             )
         
@@ -53,15 +58,16 @@ class ClienteViewSet(viewsets.ModelViewSet):
         elif estado == 'inactivo':
             queryset = queryset.filter(activo=False)
         
-        return queryset.order_by('nombre', 'apellido')
+        return queryset.order_by('id')
     
     @action(detail=True, methods=['get'])
     def fiados(self, request, pk=None):
         """Endpoint para obtener fiados de un cliente"""
         cliente = self.get_object()
-        fiados = Fiado.objects.filter(cliente=cliente)
-        serializer = FiadoSerializer(fiados, many=True)
-        return Response(serializer.data)
+        fiados = Fiado.objects.filter(cliente=cliente).select_related('cliente').prefetch_related('detalles')
+        pagina = self.paginate_queryset(fiados)
+        serializer = FiadoSerializer(pagina, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def cambiar_estado(self, request, pk=None):
@@ -72,30 +78,39 @@ class ClienteViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(cliente)
         return Response(serializer.data)
 
-class FiadoViewSet(viewsets.ModelViewSet):
+class FiadoViewSet(SaldoClienteViewSetMixin, CamposDispersosMixin, viewsets.ModelViewSet):
     """
     ViewSet para el modelo Fiado
-    Proporciona operaciones CRUD completas
+    Proporciona operaciones CRUD completas; cada escritura recalcula el
+    saldo del cliente (SaldoClienteViewSetMixin)
+    Los listados se paginan por cursor (fecha) y aceptan ?fields=
     """
     queryset = Fiado.objects.all()
     serializer_class = FiadoSerializer
     permission_classes = [IsAuthenticated]
+    orden_cursor = ('-fecha', '-id')
     
     def get_queryset(self):
         """Filtra el queryset según parámetros de consulta"""
         queryset = Fiado.objects.all()
+        if self.campo_solicitado('cliente_nombre'):
+            queryset = queryset.select_related('cliente')
+        if self.campo_solicitado('detalles'):
+            queryset = queryset.prefetch_related('detalles')
         
         # Filtro por cliente
         cliente_id = self.request.query_params.get('cliente', None)
         if cliente_id:
             queryset = queryset.filter(cliente_id=cliente_id)
         
-        # Filtro por estado
+        # Filtro por estado (pagado o pendiente)
         estado = self.request.query_params.get('estado', None)
-        if estado:
-            queryset = queryset.filter(estado=estado)
+        if estado == 'pagado':
+            queryset = queryset.filter(pagado=True)
+        elif estado == 'pendiente':
+            queryset = queryset.filter(pagado=False)
         
-        return queryset.order_by('-fecha')
+        return queryset.order_by('-fecha', '-id')
     
     @action(detail=True, methods=['post'])
     def abonar(self, request, pk=None):
@@ -113,6 +128,7 @@ class FiadoViewSet(viewsets.ModelViewSet):
             monto = float(monto)
             fiado.monto_abonado += monto
             fiado.save()
+            actualizar_saldo_cliente(fiado.cliente_id)
             serializer = self.get_serializer(fiado)
             return Response(serializer.data)
         except ValueError:
@@ -0,0 +1,18 @@
+"""
+Comando para reconstruir la tabla de saldos de clientes (SaldoCliente)
+
+Uso:
+    python manage.py recalcular_saldos_clientes
+"""
+
+from django.core.management.base import BaseCommand
+
+from clientes.saldos import reconstruir_saldos
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero el saldo pendiente y el último pago de todos los clientes'
+
+    def handle(self, *args, **options):
+        total = reconstruir_saldos()
+        self.stdout.write(self.style.SUCCESS(f'Saldos recalculados para {total} clientes'))
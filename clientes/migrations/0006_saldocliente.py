@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0005_fiado_monto_abonado_alter_fiado_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo', serialize=False, to='clientes.cliente')),
+                ('saldo_pendiente', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('fecha_ultimo_pago', models.DateTimeField(blank=True, null=True)),
+                ('tipo_ultimo_pago', models.CharField(blank=True, max_length=30)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo de Cliente',
+                'verbose_name_plural': 'Saldos de Clientes',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_saldocliente'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detallefiado',
+            index=models.Index(fields=['fiado', 'fecha_pago'], name='detallefiado_fiado_pago_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fiado',
+            index=models.Index(fields=['cliente', 'pagado'], name='fiado_cliente_pagado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fiado',
+            index=models.Index(condition=models.Q(('pagado', False)), fields=['fecha'], name='fiado_pendiente_fecha_idx'),
+        ),
+    ]
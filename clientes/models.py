@@ -1,8 +1,6 @@
 from django.db import models
-from django.db.models import Sum, F
 from productos.models import Producto
 from django.utils import timezone
-from decimal import Decimal
 
 # Create your models here.
 
@@ -26,99 +24,18 @@ class Cliente(models.Model):
         1. Fiados directos pendientes.
         2. Saldos pendientes de ventas marcadas como fiado.
         """
-        # 1. Total de fiados directos (considerando abonos)
-        total_fiados_directos = self.fiados.filter(pagado=False).aggregate(
-            total=Sum(F('monto') - F('monto_abonado'))
-        )['total'] or Decimal(0)
-
-        # 2. Total de saldos pendientes en ventas a crédito
         # Usar importación diferida para evitar importación circular
-        from ventas.models import Venta
-        total_ventas_fiadas = self.venta_set.filter(es_fiado=True).aggregate(
-            total=Sum(F('total') - F('monto_abonado'))
-        )['total'] or Decimal(0)
-        
-        return total_fiados_directos + total_ventas_fiadas
+        from .saldos import calcular_saldo_cliente
+        return calcular_saldo_cliente(self.id)['saldo_pendiente']
 
     @property
     def ultimo_pago(self):
         """Obtiene la fecha del último pago realizado con información del tipo de pago"""
-        # Buscar el último fiado pagado completamente
-        ultimo_fiado_pagado = self.fiados.filter(pagado=True).order_by('-fecha_pago').first()
-        
-        # Buscar el último detalle de fiado con fecha de pago (abonos, pagos, cancelaciones)
-        ultimo_detalle_pagado = self.fiados.filter(
-            detalles__fecha_pago__isnull=False
-        ).order_by('-detalles__fecha_pago').first()
-        
-        # Buscar la última venta con abono, cancelación o que ya no es fiado
-        from ventas.models import Venta
-        ultima_venta_con_abono = self.venta_set.filter(
-            fecha_ultimo_abono__isnull=False
-        ).order_by('-fecha_ultimo_abono').first()
-        
-        ultima_venta_cancelada = self.venta_set.filter(
-            fecha_cancelacion__isnull=False
-        ).order_by('-fecha_cancelacion').first()
-        
-        ultima_venta_pagada = self.venta_set.filter(
-            es_fiado=False,
-            fecha_cancelacion__isnull=True
-        ).order_by('-fecha').first()
-        
-        # Determinar cuál es el más reciente
-        fechas_pagos = []
-        
-        if ultimo_fiado_pagado and ultimo_fiado_pagado.fecha_pago:
-            fechas_pagos.append({
-                'fecha': ultimo_fiado_pagado.fecha_pago,
-                'tipo': 'Fiado pagado'
-            })
-        
-        if ultimo_detalle_pagado:
-            ultimo_detalle = ultimo_detalle_pagado.detalles.filter(
-                fecha_pago__isnull=False
-            ).order_by('-fecha_pago').first()
-            if ultimo_detalle:
-                if ultimo_detalle.estado == 'cancelado':
-                    fechas_pagos.append({
-                        'fecha': ultimo_detalle.fecha_pago,
-                        'tipo': 'Producto cancelado'
-                    })
-                elif ultimo_detalle.estado == 'pagado':
-                    fechas_pagos.append({
-                        'fecha': ultimo_detalle.fecha_pago,
-                        'tipo': 'Producto pagado'
-                    })
-                elif ultimo_detalle.estado == 'abonado':
-                    fechas_pagos.append({
-                        'fecha': ultimo_detalle.fecha_pago,
-                        'tipo': 'Abono'
-                    })
-        
-        if ultima_venta_con_abono and ultima_venta_con_abono.fecha_ultimo_abono:
-            fechas_pagos.append({
-                'fecha': ultima_venta_con_abono.fecha_ultimo_abono,
-                'tipo': 'Abono'
-            })
-        
-        if ultima_venta_cancelada and ultima_venta_cancelada.fecha_cancelacion:
-            fechas_pagos.append({
-                'fecha': ultima_venta_cancelada.fecha_cancelacion,
-                'tipo': 'Venta cancelada'
-            })
-        
-        if ultima_venta_pagada and ultima_venta_pagada.fecha:
-            fechas_pagos.append({
-                'fecha': ultima_venta_pagada.fecha,
-                'tipo': 'Venta pagada'
-            })
-        
-        if fechas_pagos:
-            # Obtener el más reciente
-            ultimo_pago = max(fechas_pagos, key=lambda x: x['fecha'])
-            fecha_str = ultimo_pago['fecha'].strftime("%d/%m/%Y")
-            return f"{fecha_str} - {ultimo_pago['tipo']}"
+        from .saldos import calcular_saldo_cliente
+        saldo = calcular_saldo_cliente(self.id)
+        if saldo['fecha_ultimo_pago']:
+            fecha_str = saldo['fecha_ultimo_pago'].strftime("%d/%m/%Y")
+            return f"{fecha_str} - {saldo['tipo_ultimo_pago']}"
         
         return "Sin pagos"
 
@@ -146,6 +63,16 @@ class Fiado(models.Model):
         verbose_name = 'Fiado'
         verbose_name_plural = 'Fiados'
         ordering = ['-fecha']
+        indexes = [
+            # Fiados de un cliente filtrados por estado de pago
+            models.Index(fields=['cliente', 'pagado'], name='fiado_cliente_pagado_idx'),
+            # Reporte de fiados: solo los pendientes, ordenados por antigüedad
+            models.Index(
+                fields=['fecha'],
+                name='fiado_pendiente_fecha_idx',
+                condition=models.Q(pagado=False),
+            ),
+        ]
 
 class DetalleFiado(models.Model):
     fiado = models.ForeignKey(Fiado, on_delete=models.CASCADE, related_name='detalles')
@@ -177,3 +104,27 @@ class DetalleFiado(models.Model):
     class Meta:
         verbose_name = 'Detalle de Fiado'
         verbose_name_plural = 'Detalles de Fiados'
+        indexes = [
+            # Último pago de los detalles de un fiado
+            models.Index(fields=['fiado', 'fecha_pago'], name='detallefiado_fiado_pago_idx'),
+        ]
+
+class SaldoCliente(models.Model):
+    """
+    Resumen desnormalizado de la deuda de un cliente
+    Se mantiene desde las rutas de escritura de ventas, fiados y abonos
+    (ver clientes/saldos.py) y se puede reconstruir con el comando
+    recalcular_saldos_clientes.
+    """
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='saldo')
+    saldo_pendiente = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    fecha_ultimo_pago = models.DateTimeField(null=True, blank=True)
+    tipo_ultimo_pago = models.CharField(max_length=30, blank=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Saldo de {self.cliente} - {self.saldo_pendiente}"
+
+    class Meta:
+        verbose_name = 'Saldo de Cliente'
+        verbose_name_plural = 'Saldos de Clientes'
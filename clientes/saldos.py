@@ -0,0 +1,232 @@
+"""
+Mantenimiento del saldo desnormalizado de clientes (SaldoCliente)
+
+Evita que la lista de clientes calcule la deuda y el último pago fila por
+fila. Cada ruta de escritura que afecta la deuda de un cliente (ventas,
+fiados, abonos, cancelaciones) llama a actualizar_saldo_cliente() dentro
+de su transacción, con un número fijo de consultas por cliente. También
+invalida la caché de reportes (reportes/cache.py) al confirmar.
+
+Las ediciones genéricas de ventas y fiados (ModelViewSet de la API y el
+admin) lo hacen con SaldoClienteViewSetMixin y SaldoClienteAdminMixin: al
+cambiar el cliente de una venta o fiado se recalculan el anterior y el nuevo.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, OuterRef, Q, Subquery, Sum
+
+from .models import Cliente, Fiado, DetalleFiado, SaldoCliente
+
+# Tipo de pago que se muestra según el estado del último detalle de fiado
+TIPOS_PAGO_DETALLE = {
+    'cancelado': 'Producto cancelado',
+    'pagado': 'Producto pagado',
+    'abonado': 'Abono',
+}
+
+SALDO_FIADO = ExpressionWrapper(F('monto') - F('monto_abonado'), output_field=DecimalField())
+SALDO_VENTA = ExpressionWrapper(F('total') - F('monto_abonado'), output_field=DecimalField())
+
+
+def _agregados_fiados():
+    """Agregados de fiados directos por cliente"""
+    return {
+        'saldo_fiados': Sum(SALDO_FIADO, filter=Q(pagado=False)),
+        'ultimo_fiado_pagado': Max('fecha_pago', filter=Q(pagado=True)),
+    }
+
+
+def _agregados_ventas():
+    """Agregados de ventas por cliente"""
+    return {
+        'saldo_ventas': Sum(SALDO_VENTA, filter=Q(es_fiado=True)),
+        'ultimo_abono': Max('fecha_ultimo_abono'),
+        'ultima_cancelacion': Max('fecha_cancelacion'),
+        'ultima_venta_pagada': Max('fecha', filter=Q(es_fiado=False, fecha_cancelacion__isnull=True)),
+    }
+
+
+def _ultimo_pago(fiados, ventas, detalle):
+    """
+    Determina el pago más reciente entre todas las fuentes
+
+    Args:
+        fiados: Agregados de fiados del cliente
+        ventas: Agregados de ventas del cliente
+        detalle: Tupla (fecha_pago, estado) del último detalle de fiado pagado
+
+    Returns:
+        tuple: (fecha, tipo) o (None, '') si el cliente no tiene pagos
+    """
+    # El orden define la prioridad en caso de empate, igual que Cliente.ultimo_pago
+    candidatos = [(fiados.get('ultimo_fiado_pagado'), 'Fiado pagado')]
+    if detalle and detalle[1] in TIPOS_PAGO_DETALLE:
+        candidatos.append((detalle[0], TIPOS_PAGO_DETALLE[detalle[1]]))
+    candidatos += [
+        (ventas.get('ultimo_abono'), 'Abono'),
+        (ventas.get('ultima_cancelacion'), 'Venta cancelada'),
+        (ventas.get('ultima_venta_pagada'), 'Venta pagada'),
+    ]
+    candidatos = [c for c in candidatos if c[0]]
+    if not candidatos:
+        return None, ''
+    return max(candidatos, key=lambda c: c[0])
+
+
+def calcular_saldo_cliente(cliente_id):
+    """
+    Calcula deuda pendiente y último pago de un cliente
+
+    Args:
+        cliente_id: ID del cliente
+
+    Returns:
+        dict: saldo_pendiente, fecha_ultimo_pago, tipo_ultimo_pago
+    """
+    from ventas.models import Venta
+
+    fiados = Fiado.objects.filter(cliente_id=cliente_id).aggregate(**_agregados_fiados())
+    ventas = Venta.objects.filter(cliente_id=cliente_id).aggregate(**_agregados_ventas())
+    detalle = DetalleFiado.objects.filter(
+        fiado__cliente_id=cliente_id,
+        fecha_pago__isnull=False
+    ).order_by('-fecha_pago').values_list('fecha_pago', 'estado').first()
+
+    fecha, tipo = _ultimo_pago(fiados, ventas, detalle)
+    return {
+        'saldo_pendiente': (fiados['saldo_fiados'] or Decimal(0)) + (ventas['saldo_ventas'] or Decimal(0)),
+        'fecha_ultimo_pago': fecha,
+        'tipo_ultimo_pago': tipo,
+    }
+
+
+def actualizar_saldo_cliente(cliente_id):
+    """
+    Recalcula y guarda el SaldoCliente de un cliente
+
+    Args:
+        cliente_id: ID del cliente (se ignora si es None)
+    """
+    if not cliente_id:
+        return
+    SaldoCliente.objects.update_or_create(
+        cliente_id=cliente_id,
+        defaults=calcular_saldo_cliente(cliente_id),
+    )
+
+    # Cambió una deuda: los reportes de fiados y clientes se calculan de nuevo
+    from reportes.cache import invalidar_reportes
+    invalidar_reportes()
+
+
+def actualizar_saldos_clientes(cliente_ids):
+    """
+    Recalcula el SaldoCliente de varios clientes (sin repetir y omitiendo None)
+
+    Args:
+        cliente_ids: Iterable de IDs de clientes
+    """
+    for cliente_id in sorted(set(cliente_ids) - {None}):
+        actualizar_saldo_cliente(cliente_id)
+
+
+def _cliente_guardado(instancia):
+    """Cliente de una venta o fiado según la base (el formulario ya cambió la instancia)"""
+    return type(instancia).objects.filter(pk=instancia.pk).values_list('cliente_id', flat=True).first()
+
+
+class SaldoClienteViewSetMixin:
+    """
+    Para los ModelViewSet de modelos con cliente (Venta, Fiado): crear,
+    editar y eliminar recalculan el saldo del cliente en la misma transacción
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            actualizar_saldo_cliente(serializer.instance.cliente_id)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # La instancia todavía tiene el cliente leído de la base
+            anterior = serializer.instance.cliente_id
+            super().perform_update(serializer)
+            actualizar_saldos_clientes([anterior, serializer.instance.cliente_id])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            cliente_id = instance.cliente_id
+            super().perform_destroy(instance)
+            actualizar_saldo_cliente(cliente_id)
+
+
+class SaldoClienteAdminMixin:
+    """
+    Para los ModelAdmin de modelos con cliente (Venta, Fiado): guardar y
+    eliminar (también en lote) recalculan el saldo de los clientes afectados
+    """
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            anterior = _cliente_guardado(obj) if change else None
+            super().save_model(request, obj, form, change)
+            actualizar_saldos_clientes([anterior, obj.cliente_id])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            cliente_id = obj.cliente_id
+            super().delete_model(request, obj)
+            actualizar_saldo_cliente(cliente_id)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            cliente_ids = list(queryset.values_list('cliente_id', flat=True).distinct())
+            super().delete_queryset(request, queryset)
+            actualizar_saldos_clientes(cliente_ids)
+
+
+def reconstruir_saldos():
+    """
+    Reconstruye desde cero la tabla SaldoCliente para todos los clientes
+    Usa consultas agrupadas, sin recorrer las deudas cliente por cliente.
+
+    Returns:
+        int: Cantidad de saldos generados
+    """
+    from ventas.models import Venta
+
+    fiados = {
+        fila.pop('cliente_id'): fila
+        for fila in Fiado.objects.values('cliente_id').annotate(**_agregados_fiados()).order_by()
+    }
+    ventas = {
+        fila.pop('cliente_id'): fila
+        for fila in Venta.objects.filter(cliente__isnull=False).values('cliente_id').annotate(**_agregados_ventas()).order_by()
+    }
+    ultimo_detalle = DetalleFiado.objects.filter(
+        fiado__cliente_id=OuterRef('pk'),
+        fecha_pago__isnull=False
+    ).order_by('-fecha_pago')
+    clientes = Cliente.objects.annotate(
+        detalle_fecha=Subquery(ultimo_detalle.values('fecha_pago')[:1]),
+        detalle_estado=Subquery(ultimo_detalle.values('estado')[:1]),
+    ).values_list('id', 'detalle_fecha', 'detalle_estado')
+
+    saldos = []
+    for cliente_id, detalle_fecha, detalle_estado in clientes.iterator():
+        datos_fiados = fiados.get(cliente_id, {})
+        datos_ventas = ventas.get(cliente_id, {})
+        fecha, tipo = _ultimo_pago(datos_fiados, datos_ventas, (detalle_fecha, detalle_estado))
+        saldos.append(SaldoCliente(
+            cliente_id=cliente_id,
+            saldo_pendiente=(datos_fiados.get('saldo_fiados') or Decimal(0)) + (datos_ventas.get('saldo_ventas') or Decimal(0)),
+            fecha_ultimo_pago=fecha,
+            tipo_ultimo_pago=tipo,
+        ))
+
+    with transaction.atomic():
+        SaldoCliente.objects.all().delete()
+        SaldoCliente.objects.bulk_create(saldos, batch_size=1000)
+    return len(saldos)
@@ -11,22 +11,22 @@ class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cliente
         fields = [
-            'id', 'nombre', 'apellido', 'telefono', 'email', 
-            'direccion', 'documento', 'activo', 'fecha_registro'
+            'id', 'nombre', 'telefono', 'email', 
+            'direccion', 'documento', 'activo', 'fecha_creacion'
         ]
-        read_only_fields = ['id', 'fecha_registro']
+        read_only_fields = ['id', 'fecha_creacion']
 
 class ClienteListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listar clientes"""
     class Meta:
         model = Cliente
-        fields = ['id', 'nombre', 'apellido', 'telefono', 'email', 'activo']
+        fields = ['id', 'nombre', 'documento', 'telefono', 'email', 'activo']
 
 class ClienteCreateSerializer(serializers.ModelSerializer):
     """Serializer para crear clientes"""
     class Meta:
         model = Cliente
-        fields = ['nombre', 'apellido', 'telefono', 'email', 'direccion', 'documento']
+        fields = ['nombre', 'telefono', 'email', 'direccion', 'documento']
 
 class DetalleFiadoSerializer(serializers.ModelSerializer):
     """Serializer para el modelo DetalleFiado"""
@@ -42,11 +42,12 @@ class FiadoSerializer(serializers.ModelSerializer):
     """Serializer para el modelo Fiado"""
     detalles = DetalleFiadoSerializer(many=True, read_only=True)
     cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
+    saldo_pendiente = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
     class Meta:
         model = Fiado
         fields = [
-            'id', 'cliente', 'cliente_nombre', 'fecha', 'total', 
-            'monto_abonado', 'estado', 'detalles'
+            'id', 'cliente', 'cliente_nombre', 'fecha', 'monto', 
+            'monto_abonado', 'saldo_pendiente', 'pagado', 'fecha_pago', 'detalles'
         ]
-        read_only_fields = ['id', 'total'] 
\ No newline at end of file
+        read_only_fields = ['id', 'saldo_pendiente'] 
\ No newline at end of file
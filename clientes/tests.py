@@ -1,3 +1,171 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from categorias.models import Categoria
+from productos.models import Producto
+from ventas.models import Venta
+from .models import Cliente, DetalleFiado, Fiado, SaldoCliente
+from .saldos import calcular_saldo_cliente, reconstruir_saldos
+
+
+class ClienteApiTests(TestCase):
+    """Listados de la API de clientes y fiados: paginación, campos y consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('admin', 'admin@example.com', 'clave', is_staff=True)
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.producto = Producto.objects.create(
+            nombre='Arroz 1kg', precio=Decimal('25.00'), stock_inicial=100, stock_actual=100, categoria=categoria,
+        )
+        cls.crear_fiados(range(30))
+
+    @classmethod
+    def crear_fiados(cls, numeros):
+        for numero in numeros:
+            cliente = Cliente.objects.create(nombre=f'Cliente {numero:03d}', telefono='555', documento=f'D{numero}')
+            fiado = Fiado.objects.create(cliente=cliente, monto=Decimal('50.00'), pagado=numero % 3 == 0)
+            DetalleFiado.objects.create(fiado=fiado, producto=cls.producto, cantidad=2, precio_unitario=Decimal('25.00'))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_clientes_consultas_constantes(self):
+        url = reverse('api-cliente-list')
+        with self.assertNumQueries(3):
+            datos = self.client.get(url, {'tamano': 10}).json()
+        self.crear_fiados(range(30, 60))
+        with self.assertNumQueries(3):
+            self.client.get(url, {'tamano': 10})
+
+        self.assertEqual(len(datos['results']), 10)
+        self.assertEqual(datos['results'][0]['documento'], 'D0')
+        self.assertEqual(self.client.get(url, {'q': 'D17'}).json()['results'][0]['nombre'], 'Cliente 017')
+
+    def test_lista_clientes_consultas_constantes(self):
+        reconstruir_saldos()
+        url = reverse('clientes:lista_clientes')
+        # Sesión, usuario, clientes con su saldo (JOIN) y las estadísticas (6)
+        with self.assertNumQueries(9):
+            respuesta = self.client.get(url)
+        self.crear_fiados(range(30, 60))
+        reconstruir_saldos()
+        with self.assertNumQueries(9):
+            self.client.get(url)
+        self.assertEqual(respuesta.context['total_fiado'], Decimal('1000.00'))
+
+    def test_fiados_consultas_constantes(self):
+        url = reverse('api-fiado-list')
+        # Sesión, usuario, fiados con su cliente y los detalles de la página
+        with self.assertNumQueries(4):
+            datos = self.client.get(url).json()
+        self.crear_fiados(range(30, 60))
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+        fiado = datos['results'][0]
+        self.assertEqual((fiado['saldo_pendiente'], len(fiado['detalles'])), ('50.00', 1))
+        self.assertEqual(len(self.client.get(url, {'estado': 'pagado'}).json()['results']), 20)
+
+        # Sin detalles ni nombre del cliente: una sola consulta de fiados
+        with self.assertNumQueries(3):
+            datos = self.client.get(url, {'fields': 'id,monto,pagado'}).json()
+        self.assertEqual(set(datos['results'][0]), {'id', 'monto', 'pagado'})
+
+
+class SaldoEscriturasTests(TestCase):
+    """El saldo de los clientes se recalcula en las escrituras de la API y del admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        cls.ana = Cliente.objects.create(nombre='Ana', telefono='555')
+        cls.luis = Cliente.objects.create(nombre='Luis', telefono='556')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def saldos(self):
+        return [
+            SaldoCliente.objects.filter(cliente=cliente).values_list('saldo_pendiente', flat=True).first() or 0
+            for cliente in (self.ana, self.luis)
+        ]
+
+    def test_api_de_fiados(self):
+        respuesta = self.client.post(reverse('api-fiado-list'), {'cliente': self.ana.id, 'monto': '80.00', 'monto_abonado': '0.00'})
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(self.saldos(), [Decimal('80.00'), 0])
+
+        # Reasignar el fiado recalcula al cliente anterior y al nuevo
+        url = reverse('api-fiado-detail', args=[respuesta.json()['id']])
+        self.client.patch(url, {'cliente': self.luis.id}, content_type='application/json')
+        self.assertEqual(self.saldos(), [0, Decimal('80.00')])
+
+        self.client.delete(url)
+        self.assertEqual(self.saldos(), [0, 0])
+
+    def test_api_de_ventas(self):
+        venta = Venta.objects.create(cliente=self.ana, total=Decimal('40.00'), es_fiado=True)
+        url = reverse('api-venta-detail', args=[venta.id])
+        self.client.patch(url, {'monto_abonado': '10.00'}, content_type='application/json')
+        self.assertEqual(self.saldos(), [Decimal('30.00'), 0])
+
+        self.client.patch(url, {'cliente_id': self.luis.id}, content_type='application/json')
+        self.assertEqual(self.saldos(), [0, Decimal('30.00')])
+
+    def test_admin(self):
+        fiado = Fiado.objects.create(cliente=self.ana, monto=Decimal('25.00'))
+        admin_fiados = admin.site._registry[Fiado]
+        solicitud = RequestFactory().post('/')
+        solicitud.user = self.usuario
+
+        fiado.cliente = self.luis
+        admin_fiados.save_model(solicitud, fiado, None, True)
+        self.assertEqual(self.saldos(), [0, Decimal('25.00')])
+
+        admin_fiados.delete_queryset(solicitud, Fiado.objects.filter(pk=fiado.pk))
+        self.assertEqual(self.saldos(), [0, 0])
+
+    def test_vista_de_abono_en_una_transaccion(self):
+        fiado = Fiado.objects.create(cliente=self.ana, monto=Decimal('60.00'), monto_abonado=Decimal('0.00'))
+        url = reverse('clientes:productos_deuda', args=['fiado', fiado.id])
+        # Si falla el saldo, el abono tampoco queda guardado
+        with patch('clientes.views.actualizar_saldo_cliente', side_effect=RuntimeError('sin saldo')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(url, {'accion': 'abonar', 'monto_abonado': '60.00'})
+        fiado.refresh_from_db()
+        self.assertEqual((fiado.monto_abonado, fiado.pagado), (0, False))
+
+        self.client.post(url, {'accion': 'abonar', 'monto_abonado': '60.00'})
+        fiado.refresh_from_db()
+        self.assertEqual((fiado.monto_abonado, fiado.pagado), (Decimal('60.00'), True))
+        self.assertEqual(self.saldos(), [0, 0])
+
+    def test_reconstruir_saldos(self):
+        Fiado.objects.create(cliente=self.ana, monto=Decimal('30.00'), monto_abonado=Decimal('5.00'))
+        Fiado.objects.create(cliente=self.ana, monto=Decimal('20.00'), pagado=True, fecha_pago=timezone.now())
+        Venta.objects.create(
+            cliente=self.luis, total=Decimal('40.00'), es_fiado=True, monto_abonado=Decimal('15.00'),
+            fecha_ultimo_abono=timezone.now(),
+        )
+        SaldoCliente.objects.filter(cliente=self.ana).update(saldo_pendiente=Decimal('999.00'))
+
+        self.assertEqual(reconstruir_saldos(), 2)
+        self.assertEqual(self.saldos(), [Decimal('25.00'), Decimal('25.00')])
+        for cliente in (self.ana, self.luis):
+            saldo = SaldoCliente.objects.get(cliente=cliente)
+            self.assertEqual(
+                calcular_saldo_cliente(cliente.id),
+                {
+                    'saldo_pendiente': saldo.saldo_pendiente,
+                    'fecha_ultimo_pago': saldo.fecha_ultimo_pago,
+                    'tipo_ultimo_pago': saldo.tipo_ultimo_pago,
+                },
+            )
+        self.assertEqual(SaldoCliente.objects.get(cliente=self.luis).tipo_ultimo_pago, 'Abono')
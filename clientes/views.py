@@ -22,11 +22,15 @@ Características:
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum
+from django.db import transaction
+from django.db.models import Q, Sum, F, Value, DecimalField
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from .models import Cliente, Fiado, DetalleFiado, Producto
 from ventas.models import Venta, DetalleVenta
 from .forms import ClienteForm, FiadoForm, DetalleFiadoFormSet
+from reportes.resumen import editando_ventas
+from .saldos import actualizar_saldo_cliente
 from django.utils import timezone
 from decimal import Decimal
 
@@ -55,20 +59,15 @@ def lista_clientes(request):
     estado = request.GET.get('estado', 'activo')
     busqueda = request.GET.get('q', '')
     
-    # Debug: imprimir parámetros para desarrollo
-    print(f"DEBUG - Estado: {estado}, Búsqueda: {busqueda}")
-    
     # Obtener todos los clientes y aplicar filtros
+    # (las consultas por petición se miden con MetricasPeticionesMiddleware)
     clientes = Cliente.objects.all()
-    print(f"DEBUG - Total clientes antes de filtros: {clientes.count()}")
     
     # Filtro 1: Por estado del cliente
     if estado == 'activo':
         clientes = clientes.filter(activo=True)
-        print(f"DEBUG - Clientes activos: {clientes.count()}")
     elif estado == 'inactivo':
         clientes = clientes.filter(activo=False)
-        print(f"DEBUG - Clientes inactivos: {clientes.count()}")
     # Si es 'todos', no se aplica filtro de estado
     
     # Filtro 2: Búsqueda por texto en múltiples campos
@@ -79,7 +78,17 @@ def lista_clientes(request):
             Q(email__icontains=busqueda) |       # Buscar en email
             Q(documento__icontains=busqueda)     # Buscar en documento
         )
-        print(f"DEBUG - Clientes después de búsqueda: {clientes.count()}")
+    
+    # Deuda y último pago desde la tabla de saldos (un solo JOIN, sin N+1)
+    clientes = clientes.annotate(
+        deuda_pendiente=Coalesce(
+            F('saldo__saldo_pendiente'),
+            Value(Decimal(0)),
+            output_field=DecimalField()
+        ),
+        fecha_ultimo_pago=F('saldo__fecha_ultimo_pago'),
+        tipo_ultimo_pago=F('saldo__tipo_ultimo_pago'),
+    )
     
     # Calcular estadísticas generales (sin filtros aplicados)
     total_clientes = Cliente.objects.count()
@@ -239,8 +248,10 @@ def crear_fiado(request):
         # Procesar formulario de fiado
         form = FiadoForm(request.POST)
         if form.is_valid():
-            # Guardar el fiado en la base de datos
-            form.save()
+            # Guardar el fiado y el saldo del cliente en la misma transacción
+            with transaction.atomic():
+                fiado = form.save()
+                actualizar_saldo_cliente(fiado.cliente_id)
             messages.success(request, 'Fiado registrado exitosamente.')
             return redirect('clientes:lista_clientes')
         # Si el formulario no es válido, se mostrará con errores
@@ -343,13 +354,17 @@ def cambiar_estado_fiado_cliente(request, fiado_id):
             # Marcar como pagado
             fiado.pagado = True
             fiado.fecha_pago = timezone.now()
-            fiado.save()
+            with transaction.atomic():
+                fiado.save()
+                actualizar_saldo_cliente(fiado.cliente_id)
             messages.success(request, f'Fiado de {fiado.cliente.nombre} marcado como PAGADO')
         elif accion == 'cancelar':
             # Marcar como cancelado (también se marca como pagado)
             fiado.pagado = True
             fiado.fecha_pago = timezone.now()
-            fiado.save()
+            with transaction.atomic():
+                fiado.save()
+                actualizar_saldo_cliente(fiado.cliente_id)
             messages.success(request, f'Fiado de {fiado.cliente.nombre} marcado como CANCELADO')
         else:
             messages.error(request, 'Acción no válida')
@@ -439,7 +454,9 @@ def cambiar_estado_detalle_fiado(request, detalle_id):
             detalle.pagado = True
             detalle.estado = 'pagado'
             detalle.fecha_pago = timezone.now()
-            detalle.save()
+            with transaction.atomic():
+                detalle.save()
+                actualizar_saldo_cliente(detalle.fiado.cliente_id)
             messages.success(request, f'Producto "{detalle.producto.nombre}" marcado como PAGADO')
         elif accion == 'abonar':
             monto_abonado = request.POST.get('monto_abonado')
@@ -450,7 +467,9 @@ def cambiar_estado_detalle_fiado(request, detalle_id):
                     detalle.pagado = False
                     detalle.estado = 'abonado'
                     detalle.fecha_pago = timezone.now()
-                    detalle.save()
+                    with transaction.atomic():
+                        detalle.save()
+                        actualizar_saldo_cliente(detalle.fiado.cliente_id)
                     messages.success(request, f'Producto "{detalle.producto.nombre}" abonado con ${monto_abonado:.2f}')
                 except ValueError:
                     messages.error(request, 'Monto de abono inválido')
@@ -460,7 +479,9 @@ def cambiar_estado_detalle_fiado(request, detalle_id):
             detalle.pagado = True
             detalle.estado = 'cancelado'
             detalle.fecha_pago = timezone.now()
-            detalle.save()
+            with transaction.atomic():
+                detalle.save()
+                actualizar_saldo_cliente(detalle.fiado.cliente_id)
             messages.success(request, f'Producto "{detalle.producto.nombre}" marcado como CANCELADO')
         else:
             messages.error(request, 'Acción no válida')
@@ -591,21 +612,25 @@ def abonar_deuda_simple(request, detalle_id):
                     # Aplicar el abono a toda la cuenta
                     if monto_abono >= total_fiado:
                         # Si paga el total, marcar todo como pagado
-                        for det in todos_detalles:
-                            det.estado = 'pagado'
-                            det.pagado = True
-                            det.fecha_pago = timezone.now()
-                            det.save()
-                        fiado.pagado = True
-                        fiado.save()
+                        with transaction.atomic():
+                            for det in todos_detalles:
+                                det.estado = 'pagado'
+                                det.pagado = True
+                                det.fecha_pago = timezone.now()
+                                det.save()
+                            fiado.pagado = True
+                            fiado.save()
+                            actualizar_saldo_cliente(cliente.id)
                         messages.success(request, f'Fiado pagado completamente')
                     else:
                         # Si abona parcialmente, marcar como abonado
-                        for det in todos_detalles:
-                            det.estado = 'abonado'
-                            det.pagado = False
-                            det.fecha_pago = None
-                            det.save()
+                        with transaction.atomic():
+                            for det in todos_detalles:
+                                det.estado = 'abonado'
+                                det.pagado = False
+                                det.fecha_pago = None
+                                det.save()
+                            actualizar_saldo_cliente(cliente.id)
                         messages.success(request, f'Abono de ${monto_abono:.2f} registrado para toda la cuenta')
                     
                     return redirect('clientes:deudas_simples', cliente_id=cliente.id)
@@ -644,17 +669,20 @@ def abonar_venta_simple(request, detalle_id):
                     # Registrar la fecha del abono
                     venta.fecha_ultimo_abono = timezone.now()
                     
-                    # Aplicar el abono a toda la cuenta
-                    if monto_abono >= total_venta:
-                        # Si paga el total, cambiar a venta normal
-                        venta.es_fiado = False
-                        venta.fecha_cancelacion = timezone.now()
-                        venta.save()
-                        messages.success(request, f'Venta pagada completamente')
-                    else:
-                        # Si abona parcialmente, mantener como fiada
-                        venta.save()
-                        messages.success(request, f'Abono de ${monto_abono:.2f} registrado para toda la cuenta')
+                    # Aplicar el abono a toda la cuenta (pagarla pasa la venta
+                    # de fiado a contado en el resumen diario)
+                    with transaction.atomic(), editando_ventas([venta.id] if monto_abono >= total_venta else []):
+                        if monto_abono >= total_venta:
+                            # Si paga el total, cambiar a venta normal
+                            venta.es_fiado = False
+                            venta.fecha_cancelacion = timezone.now()
+                            venta.save()
+                            messages.success(request, f'Venta pagada completamente')
+                        else:
+                            # Si abona parcialmente, mantener como fiada
+                            venta.save()
+                            messages.success(request, f'Abono de ${monto_abono:.2f} registrado para toda la cuenta')
+                        actualizar_saldo_cliente(venta.cliente_id)
                     
                     return redirect('clientes:deudas_simples', cliente_id=cliente.id)
                 else:
@@ -706,17 +734,21 @@ def productos_deuda(request, tipo, id):
                     if tipo == 'venta':
                         deuda.fecha_ultimo_abono = timezone.now()
                     
-                    deuda.save()
-                    messages.success(request, f'Abono de ${monto_abono} registrado correctamente.')
-                    
-                    # Si el saldo queda en cero o menos, marcar como pagado
-                    if deuda.saldo_pendiente <= 0:
-                        if tipo == 'fiado':
-                            deuda.pagado = True
-                            deuda.fecha_pago = timezone.now()
-                        elif tipo == 'venta':
-                            deuda.es_fiado = False
+                    with transaction.atomic(), editando_ventas([deuda.id] if es_venta else []):
                         deuda.save()
+                        
+                        # Si el saldo queda en cero o menos, marcar como pagado
+                        saldada = deuda.saldo_pendiente <= 0
+                        if saldada:
+                            if tipo == 'fiado':
+                                deuda.pagado = True
+                                deuda.fecha_pago = timezone.now()
+                            elif tipo == 'venta':
+                                deuda.es_fiado = False
+                            deuda.save()
+                        actualizar_saldo_cliente(deuda.cliente_id)
+                    messages.success(request, f'Abono de ${monto_abono} registrado correctamente.')
+                    if saldada:
                         messages.info(request, 'La deuda ha sido saldada por completo.')
                         return redirect('clientes:deudas_simples', cliente_id=cliente.id)
                 else:
@@ -731,7 +763,9 @@ def productos_deuda(request, tipo, id):
             elif tipo == 'venta':
                 deuda.es_fiado = False
                 deuda.fecha_cancelacion = timezone.now()
-            deuda.save()
+            with transaction.atomic(), editando_ventas([deuda.id] if es_venta else []):
+                deuda.save()
+                actualizar_saldo_cliente(deuda.cliente_id)
             messages.success(request, 'La deuda ha sido cancelada exitosamente.')
             return redirect('clientes:deudas_simples', cliente_id=cliente.id)
 
@@ -771,7 +805,9 @@ def cambiar_estado_detalle_venta(request, detalle_id):
                     if venta.saldo_pendiente <= 0:
                         venta.es_fiado = False
                         venta.fecha_cancelacion = timezone.now()
-                        venta.save()
+                        with transaction.atomic(), editando_ventas([venta.id]):
+                            venta.save()
+                            actualizar_saldo_cliente(venta.cliente_id)
                         messages.success(request, f'Venta pagada completamente. Producto "{detalle.producto.nombre}" incluido.')
                     else:
                         messages.success(request, f'Abono de ${monto_abonado:.2f} registrado. Producto "{detalle.producto.nombre}" incluido.')
@@ -784,7 +820,9 @@ def cambiar_estado_detalle_venta(request, detalle_id):
             # Cancelar la venta completa
             venta = detalle.venta
             venta.es_fiado = False
-            venta.save()
+            with transaction.atomic(), editando_ventas([venta.id]):
+                venta.save()
+                actualizar_saldo_cliente(venta.cliente_id)
             messages.success(request, f'Venta cancelada. Producto "{detalle.producto.nombre}" incluido.')
         else:
             messages.error(request, 'Acción no válida')
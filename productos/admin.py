@@ -1,10 +1,26 @@
 from django.contrib import admin
-from .models import Producto
+from .models import MovimientoStock, Producto
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'categoria', 'precio', 'stock_actual', 'activo')
+    list_display = ('nombre', 'codigo_barras', 'categoria', 'precio', 'stock_actual', 'activo')
     list_filter = ('activo', 'categoria')
-    search_fields = ('nombre', 'descripcion')
+    search_fields = ('nombre', 'descripcion', 'codigo_barras')
     list_editable = ('precio', 'stock_actual', 'activo')
+    # costo_promedio es editable para capturar el costo inicial de las existencias
     readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'tipo', 'cantidad', 'almacen', 'fecha', 'referencia')
+    list_filter = ('tipo', 'almacen', 'fecha')
+    search_fields = ('producto__nombre', 'referencia')
+    list_select_related = ('producto', 'almacen')
+    # El kardex es de solo inserción: los movimientos se crean desde el código
+    readonly_fields = ('producto', 'tipo', 'cantidad', 'almacen', 'fecha', 'referencia')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
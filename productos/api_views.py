@@ -8,19 +8,26 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
+from tradeinventory.api import CamposDispersosMixin, ListaRapidaMixin
 from .models import Producto
+from .inventario import ajustar_stock
+from .busqueda import filtrar_por_busqueda
 from .serializers import (
     ProductoSerializer, 
     ProductoListSerializer, 
     ProductoCreateSerializer
 )
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(ListaRapidaMixin, CamposDispersosMixin, viewsets.ModelViewSet):
     """
     ViewSet para el modelo Producto
     Proporciona operaciones CRUD completas
+    Los listados se paginan por cursor (id, que no cambia: el nombre se
+    edita y movería filas entre páginas), aceptan ?fields= y se arman
+    desde values() (ListaRapidaMixin)
     """
     queryset = Producto.objects.all()
+    orden_cursor = ('id',)
     # permission_classes = [IsAuthenticated]  # Comentado temporalmente para pruebas
     
     def get_serializer_class(self):
@@ -34,13 +41,19 @@ class ProductoViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filtra el queryset según parámetros de consulta"""
         queryset = Producto.objects.all()
+
+        # Categoría y proveedor en la misma consulta (los usan ambos serializers)
+        relaciones = [
+            relacion for relacion in ('categoria', 'proveedor')
+            if self.campo_solicitado(relacion) or self.campo_solicitado(f'{relacion}_nombre')
+        ]
+        if relaciones:
+            queryset = queryset.select_related(*relaciones)
         
         # Filtro por búsqueda
         q = self.request.query_params.get('q', None)
         if q:
-            queryset = queryset.filter(
-                Q(nombre__icontains=q) | Q(descripcion__icontains=q)
-            )
+            queryset = filtrar_por_busqueda(queryset, q)
         
         # Filtro por categoría
         categoria = self.request.query_params.get('categoria', None)
@@ -61,14 +74,15 @@ class ProductoViewSet(viewsets.ModelViewSet):
         elif estado == 'inactivo':
             queryset = queryset.filter(activo=False)
         
-        return queryset.order_by('nombre')
+        return queryset.order_by('id')
     
     @action(detail=False, methods=['get'])
     def stock_bajo(self, request):
         """Endpoint para obtener productos con stock bajo"""
         productos = self.get_queryset().filter(stock_actual__lte=5)
-        serializer = self.get_serializer(productos, many=True)
-        return Response(serializer.data)
+        pagina = self.paginate_queryset(productos)
+        serializer = self.get_serializer(pagina, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def cambiar_estado(self, request, pk=None):
@@ -81,7 +95,10 @@ class ProductoViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def actualizar_stock(self, request, pk=None):
-        """Endpoint para actualizar el stock de un producto"""
+        """
+        Endpoint para fijar el stock de un producto (conteo físico)
+        La diferencia con el stock del sistema se registra en el kardex como ajuste.
+        """
         producto = self.get_object()
         nueva_cantidad = request.data.get('cantidad')
         
@@ -93,12 +110,18 @@ class ProductoViewSet(viewsets.ModelViewSet):
         
         try:
             nueva_cantidad = int(nueva_cantidad)
-            producto.stock_actual = nueva_cantidad
-            producto.save()
-            serializer = self.get_serializer(producto)
-            return Response(serializer.data)
-        except ValueError:
+        except (TypeError, ValueError):
             return Response(
                 {'error': 'La cantidad debe ser un número entero'}, 
                 status=status.HTTP_400_BAD_REQUEST
-            ) 
\ No newline at end of file
+            )
+        if nueva_cantidad < 0:
+            return Response(
+                {'error': 'La cantidad no puede ser negativa'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ajustar_stock(producto.id, nueva_cantidad, referencia=f'API ({request.user.get_username()})')
+        producto.refresh_from_db()
+        serializer = self.get_serializer(producto)
+        return Response(serializer.data)
@@ -0,0 +1,467 @@
+"""
+Búsqueda de productos en memoria para TradeInventory
+Índice por prefijo y por trigramas sobre el nombre (y la descripción) de
+los productos, para responder la búsqueda del POS mientras se escribe sin
+recorrer la tabla con icontains.
+
+Funcionamiento:
+- Cada palabra del nombre, de la descripción y del código de barras se
+  normaliza (minúsculas,
+  sin acentos) y se guarda en un diccionario palabra -> conjuntos de ids,
+  más una lista ordenada de palabras para buscar prefijos con bisect.
+- Todas las palabras de la búsqueda se tratan como prefijos y deben
+  coincidir (AND). Los resultados se ordenan por relevancia: nombre que
+  empieza con la búsqueda, palabra del nombre exacta, prefijo de una
+  palabra del nombre y, al final, palabras de la descripción. A igual
+  relevancia van primero los nombres más cortos.
+- Si ninguna palabra coincide por prefijo, se buscan nombres parecidos
+  por trigramas (tolera errores de tecleo).
+
+Actualización:
+- El índice se arma la primera vez que se usa y después solo lee los
+  productos con fecha_actualizacion posterior al último cambio que ya
+  tiene, así que toma en cuenta los productos guardados en cualquier
+  proceso (incluido el descuento de stock del cobro).
+- Los productos eliminados se descartan al leer los resultados de la base
+  de datos y en ese momento se quitan del índice.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Max
+
+from .models import Producto
+
+# Largo mínimo de la búsqueda (una sola letra coincidiría con casi todo)
+LARGO_MINIMO = 2
+
+# Resultados máximos cuando la búsqueda filtra un listado
+LIMITE_LISTADO = 1000
+
+# Fracción mínima de los trigramas de la búsqueda que debe tener un nombre
+# para contar como coincidencia aproximada
+SIMILITUD_MINIMA = 0.3
+
+# Candidatos que se evalúan en la búsqueda aproximada
+CANDIDATOS_APROXIMADOS = 500
+
+# Cambios que se vuelven a leer por si una transacción confirmó después
+# de la última sincronización
+MARGEN_CAMBIOS = timedelta(seconds=5)
+
+# Pesos de relevancia por palabra de la búsqueda
+PESO_EXACTA = 3
+PESO_PREFIJO = 2
+PESO_DESCRIPCION = 1
+PESO_INICIO_NOMBRE = 2
+
+_separador = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Café Molido' -> 'cafe molido'"""
+    texto = unicodedata.normalize('NFKD', texto or '').lower()
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def palabras(texto):
+    """Palabras normalizadas de un texto"""
+    return [palabra for palabra in _separador.split(normalizar(texto)) if palabra]
+
+
+def trigramas(texto):
+    """Trigramas de un texto normalizado, con espacios de relleno en los extremos"""
+    relleno = f'  {texto} '
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def _firma(producto):
+    """Valores indexados de un producto; si no cambian no hace falta reindexarlo"""
+    return (producto['nombre'], producto['descripcion'], producto['codigo_barras'], producto['activo'])
+
+
+class IndiceProductos:
+    """
+    Índice de búsqueda de productos de un proceso, seguro entre hilos
+    Se usa a través de la instancia indice_productos.
+    """
+
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self._listo = False
+        self._limpiar()
+
+    def _limpiar(self):
+        self._nombres = {}          # id -> nombre normalizado
+        self._orden = {}            # id -> (largo, nombre) para desempatar
+        self._orden_global = []     # ids ordenados por _orden
+        self._firmas = {}           # id -> (nombre, descripción, código, activo) indexados
+        self._inactivos = set()     # ids de productos desactivados
+        self._palabras = {}         # palabra -> (ids con la palabra en el nombre, ids solo en la descripción)
+        self._ordenadas = []        # palabras ordenadas para buscar prefijos
+        self._primeras = {}         # primera palabra del nombre -> set de ids
+        self._trigramas = {}        # trigrama del nombre -> set de ids
+        self._por_producto = {}     # id -> ({palabra: 0 nombre / 1 descripción}, primera palabra, trigramas)
+        self._ultimo_cambio = None
+
+    # Mantenimiento
+
+    def _quitar(self, producto_id, masivo=False):
+        indexado = self._por_producto.pop(producto_id, None)
+        if indexado is None:
+            return
+        ubicaciones, primera, lista_trigramas = indexado
+        for palabra in ubicaciones:
+            en_nombre, en_descripcion = self._palabras[palabra]
+            en_nombre.discard(producto_id)
+            en_descripcion.discard(producto_id)
+            if not en_nombre and not en_descripcion:
+                del self._palabras[palabra]
+                posicion = bisect.bisect_left(self._ordenadas, palabra)
+                if posicion < len(self._ordenadas) and self._ordenadas[posicion] == palabra:
+                    del self._ordenadas[posicion]
+        for trigrama in lista_trigramas:
+            ids = self._trigramas[trigrama]
+            ids.discard(producto_id)
+            if not ids:
+                del self._trigramas[trigrama]
+        if primera is not None:
+            self._primeras[primera].discard(producto_id)
+            if not self._primeras[primera]:
+                del self._primeras[primera]
+        if not masivo:
+            posicion = bisect.bisect_left(self._orden_global, self._orden[producto_id], key=self._orden.__getitem__)
+            while self._orden_global[posicion] != producto_id:
+                posicion += 1
+            del self._orden_global[posicion]
+        del self._nombres[producto_id]
+        del self._orden[producto_id]
+        del self._firmas[producto_id]
+        self._inactivos.discard(producto_id)
+
+    def _agregar(self, producto, nuevas, masivo=False):
+        """Indexa un producto; las palabras nuevas se agregan a 'nuevas'"""
+        producto_id = producto['id']
+        palabras_nombre = palabras(producto['nombre'])
+        # El código de barras se busca como una palabra más de la descripción
+        ubicaciones = dict.fromkeys(palabras(producto['descripcion']), 1)
+        ubicaciones.update(dict.fromkeys(palabras(producto['codigo_barras'] or ''), 1))
+        ubicaciones.update(dict.fromkeys(palabras_nombre, 0))
+        for palabra, ubicacion in ubicaciones.items():
+            conjuntos = self._palabras.get(palabra)
+            if conjuntos is None:
+                conjuntos = self._palabras[palabra] = (set(), set())
+                nuevas.append(palabra)
+            conjuntos[ubicacion].add(producto_id)
+
+        trigramas_nombre = trigramas(' '.join(palabras_nombre))
+        for trigrama in trigramas_nombre:
+            ids = self._trigramas.get(trigrama)
+            if ids is None:
+                ids = self._trigramas[trigrama] = set()
+            ids.add(producto_id)
+
+        primera = palabras_nombre[0] if palabras_nombre else None
+        if primera is not None:
+            self._primeras.setdefault(primera, set()).add(producto_id)
+
+        nombre = normalizar(producto['nombre'])
+        self._nombres[producto_id] = nombre
+        self._orden[producto_id] = (len(nombre), nombre)
+        if not masivo:
+            bisect.insort(self._orden_global, producto_id, key=self._orden.__getitem__)
+        self._firmas[producto_id] = _firma(producto)
+        if not producto['activo']:
+            self._inactivos.add(producto_id)
+        self._por_producto[producto_id] = (ubicaciones, primera, list(trigramas_nombre))
+
+    def _indexar(self, productos, completo=False):
+        """
+        Agrega o reemplaza productos en el índice
+
+        Args:
+            productos: Diccionarios con id, nombre, descripcion, codigo_barras,
+                activo y fecha_actualizacion
+            completo: True al armar el índice desde cero
+        """
+        if not completo:
+            productos = list(productos)
+        masivo = completo or len(productos) > 1000
+        nuevas = []
+        for producto in productos:
+            if self._ultimo_cambio is None or producto['fecha_actualizacion'] > self._ultimo_cambio:
+                self._ultimo_cambio = producto['fecha_actualizacion']
+            if self._firmas.get(producto['id']) == _firma(producto):
+                continue  # Cambió el stock o el precio, no lo que se indexa
+            self._quitar(producto['id'], masivo)
+            self._agregar(producto, nuevas, masivo)
+
+        if masivo:
+            self._orden_global = sorted(self._nombres, key=self._orden.__getitem__)
+        if len(nuevas) > 100:
+            self._ordenadas = sorted(self._palabras)
+        else:
+            for palabra in nuevas:
+                bisect.insort(self._ordenadas, palabra)
+
+    def _sincronizar(self):
+        """Arma el índice o agrega los productos cambiados desde el último cambio visto"""
+        campos = ('id', 'nombre', 'descripcion', 'codigo_barras', 'activo', 'fecha_actualizacion')
+        if not self._listo:
+            self._limpiar()
+            self._indexar(Producto.objects.order_by().values(*campos).iterator(chunk_size=5000), completo=True)
+            self._listo = True
+            return
+
+        ultimo = Producto.objects.aggregate(ultimo=Max('fecha_actualizacion'))['ultimo']
+        if ultimo is None or (self._ultimo_cambio is not None and ultimo <= self._ultimo_cambio):
+            return
+        cambiados = Producto.objects.order_by().values(*campos)
+        if self._ultimo_cambio is not None:
+            cambiados = cambiados.filter(fecha_actualizacion__gte=self._ultimo_cambio - MARGEN_CAMBIOS)
+        self._indexar(cambiados)
+
+    def reconstruir(self):
+        """Fuerza la reconstrucción completa en la siguiente búsqueda"""
+        with self._bloqueo:
+            self._listo = False
+
+    def quitar(self, ids):
+        """Quita del índice productos que ya no existen"""
+        with self._bloqueo:
+            for producto_id in ids:
+                self._quitar(producto_id)
+
+    # Búsqueda
+
+    def _rango(self, prefijo):
+        """Palabras del índice que empiezan con el prefijo (búsqueda binaria)"""
+        inicio = bisect.bisect_left(self._ordenadas, prefijo)
+        # Las palabras solo tienen [0-9a-z], así que '~' es mayor que cualquier continuación
+        fin = bisect.bisect_left(self._ordenadas, prefijo + '~', inicio)
+        return self._ordenadas[inicio:fin]
+
+    def _coincidencias(self, prefijo):
+        """
+        Productos con alguna palabra que empieza con el prefijo
+
+        Returns:
+            tuple: (ids con la palabra exacta en el nombre, ids con el prefijo
+                en el nombre, ids con el prefijo solo en la descripción)
+        """
+        exactos = set()
+        en_nombre = []
+        en_descripcion = []
+        for palabra in self._rango(prefijo):
+            conjuntos = self._palabras[palabra]
+            if palabra == prefijo:
+                exactos = conjuntos[0]
+            en_nombre.append(conjuntos[0])
+            en_descripcion.append(conjuntos[1])
+        en_nombre = set().union(*en_nombre)
+        return exactos, en_nombre, set().union(*en_descripcion) - en_nombre
+
+    def _nivel(self, producto_id, prefijo):
+        """
+        Nivel de coincidencia de un producto con una sola palabra
+
+        Returns:
+            int: 1 primera palabra del nombre igual, 2 primera palabra que
+                empieza con el prefijo, 3 otra palabra del nombre igual,
+                4 otra palabra del nombre que empieza con el prefijo,
+                5 solo en la descripción, 0 sin coincidencia
+        """
+        ubicaciones, primera, _ = self._por_producto[producto_id]
+        if primera is not None and primera.startswith(prefijo):
+            return 1 if primera == prefijo else 2
+        if ubicaciones.get(prefijo) == 0:
+            return 3
+        en_descripcion = False
+        for palabra, ubicacion in ubicaciones.items():
+            if palabra.startswith(prefijo):
+                if ubicacion == 0:
+                    return 4
+                en_descripcion = True
+        return 5 if en_descripcion else 0
+
+    def _buscar_una_palabra(self, prefijo, limite, solo_activos):
+        """
+        Mejores productos para una búsqueda de una sola palabra
+
+        Es el caso de cada tecla mientras se escribe la primera palabra y
+        puede abarcar buena parte del catálogo. Los niveles de _nivel() se
+        llenan en orden; un nivel con pocos productos se arma con conjuntos y
+        se ordena, y uno denso (más de 1 de cada 20 productos) se recorre en
+        _orden_global hasta juntar los que faltan, que llegan enseguida.
+        """
+        rango = self._rango(prefijo)
+        conjuntos = [self._palabras[palabra] for palabra in rango]
+        primeras = [self._primeras[palabra] for palabra in rango if palabra in self._primeras]
+        primeras_exactas = self._primeras.get(prefijo, set())
+        exactos = self._palabras[prefijo][0] if prefijo in self._palabras else set()
+        en_primera = sum(map(len, primeras))
+
+        # (nivel, tamaño aproximado, función que arma un conjunto que lo contiene)
+        niveles = [
+            (1, len(primeras_exactas), lambda: primeras_exactas),
+            (2, en_primera - len(primeras_exactas), lambda: set().union(*primeras)),
+            (3, len(exactos), lambda: exactos),
+            (4, sum(len(nombre) for nombre, _ in conjuntos) - en_primera,
+             lambda: set().union(*(nombre for nombre, _ in conjuntos))),
+            (5, sum(len(descripcion) for _, descripcion in conjuntos),
+             lambda: set().union(*(descripcion for _, descripcion in conjuntos))),
+        ]
+        denso = max(len(self._nombres) // 20, 1)
+        excluidos = self._inactivos if solo_activos else set()
+        resultados = []
+        for nivel, tamano, conjunto in niveles:
+            faltan = limite - len(resultados)
+            if faltan <= 0:
+                break
+            if tamano <= 0:
+                continue
+            if tamano > denso:
+                for producto_id in self._orden_global:
+                    if producto_id not in excluidos and self._nivel(producto_id, prefijo) == nivel:
+                        resultados.append(producto_id)
+                        faltan -= 1
+                        if not faltan:
+                            break
+            else:
+                ids = [
+                    producto_id for producto_id in conjunto()
+                    if producto_id not in excluidos and self._nivel(producto_id, prefijo) == nivel
+                ]
+                resultados += heapq.nsmallest(faltan, ids, key=self._orden.__getitem__)
+        return resultados
+
+    def _aproximados(self, texto, solo_activos, limite):
+        """
+        Productos con nombre parecido por trigramas, de mayor a menor similitud
+
+        Los candidatos salen de los trigramas poco frecuentes de la búsqueda
+        (los muy comunes, como ' la', aparecen en gran parte del catálogo y no
+        distinguen); a los mejores candidatos se les cuentan todos.
+        """
+        buscados = trigramas(texto)
+        frecuente = max(len(self._nombres) // 20, 50)
+        raros = []
+        comunes = []
+        for trigrama in buscados:
+            ids = self._trigramas.get(trigrama)
+            if ids:
+                (raros if len(ids) <= frecuente else comunes).append(ids)
+        if not raros:
+            return []
+
+        cuenta = Counter()
+        for ids in raros:
+            cuenta.update(ids)
+        similitudes = []
+        for producto_id, cantidad in cuenta.most_common(CANDIDATOS_APROXIMADOS):
+            if solo_activos and producto_id in self._inactivos:
+                continue
+            cantidad += sum(1 for ids in comunes if producto_id in ids)
+            similitud = cantidad / len(buscados)
+            if similitud >= SIMILITUD_MINIMA:
+                similitudes.append((-similitud, self._orden[producto_id], producto_id))
+        return [producto_id for _, _, producto_id in heapq.nsmallest(limite, similitudes)]
+
+    def _buscar_varias_palabras(self, buscadas, texto, limite, solo_activos):
+        """Todas las palabras deben coincidir; se puntúa cada candidato de la intersección"""
+        coincidencias = [self._coincidencias(prefijo) for prefijo in buscadas]
+        candidatos = None
+        for _, en_nombre, en_descripcion in sorted(coincidencias, key=lambda c: len(c[1]) + len(c[2])):
+            if candidatos is None:
+                candidatos = en_nombre | en_descripcion
+            else:
+                candidatos = (candidatos & en_nombre) | (candidatos & en_descripcion)
+            if not candidatos:
+                return []
+        if solo_activos:
+            candidatos -= self._inactivos
+
+        puntajes = {}
+        for producto_id in candidatos:
+            puntaje = PESO_INICIO_NOMBRE if self._nombres[producto_id].startswith(texto) else 0
+            for exactos, en_nombre, _ in coincidencias:
+                if producto_id in exactos:
+                    puntaje += PESO_EXACTA
+                elif producto_id in en_nombre:
+                    puntaje += PESO_PREFIJO
+                else:
+                    puntaje += PESO_DESCRIPCION
+            # Más puntaje primero; a igual puntaje, nombres más cortos y en orden alfabético
+            puntajes[producto_id] = (-puntaje, self._orden[producto_id])
+        if limite is None:
+            return sorted(puntajes, key=puntajes.__getitem__)
+        return heapq.nsmallest(limite, puntajes, key=puntajes.__getitem__)
+
+    def buscar(self, consulta, limite=10, solo_activos=True):
+        """
+        Busca productos por nombre o descripción
+
+        Args:
+            consulta: Texto escrito por el usuario
+            limite: Cantidad máxima de resultados (None para todos)
+            solo_activos: Excluir los productos desactivados
+
+        Returns:
+            list: IDs de productos ordenados por relevancia
+        """
+        buscadas = list(dict.fromkeys(palabras(consulta)))
+        texto = ' '.join(buscadas)
+        if len(texto) < LARGO_MINIMO:
+            return []
+
+        with self._bloqueo:
+            self._sincronizar()
+            if len(buscadas) == 1 and limite is not None:
+                resultados = self._buscar_una_palabra(buscadas[0], limite, solo_activos)
+            else:
+                resultados = self._buscar_varias_palabras(buscadas, texto, limite, solo_activos)
+            if not resultados and len(texto) >= 3:
+                # Sin coincidencias por prefijo: probar por parecido (errores de tecleo)
+                resultados = self._aproximados(texto, solo_activos, limite or LIMITE_LISTADO)
+            return resultados
+
+
+# Índice del proceso actual
+indice_productos = IndiceProductos()
+
+
+def buscar_productos(consulta, limite=10):
+    """
+    Productos activos que coinciden con la búsqueda, en orden de relevancia
+
+    Args:
+        consulta: Texto escrito por el usuario
+        limite: Cantidad máxima de resultados
+
+    Returns:
+        list: Instancias de Producto (con su categoría) ordenadas por relevancia
+    """
+    ids = indice_productos.buscar(consulta, limite)
+    productos = Producto.objects.filter(id__in=ids).select_related('categoria').in_bulk()
+    eliminados = [producto_id for producto_id in ids if producto_id not in productos]
+    if eliminados:
+        indice_productos.quitar(eliminados)
+    return [productos[producto_id] for producto_id in ids if producto_id in productos and productos[producto_id].activo]
+
+
+def filtrar_por_busqueda(queryset, consulta):
+    """
+    Restringe un queryset de productos a los que coinciden con la búsqueda
+
+    Reemplaza el icontains sobre nombre y descripción de los listados.
+    Incluye productos desactivados (el listado filtra por estado aparte)
+    y se limita a LIMITE_LISTADO coincidencias.
+    """
+    ids = indice_productos.buscar(consulta, LIMITE_LISTADO, solo_activos=False)
+    return queryset.filter(id__in=ids)
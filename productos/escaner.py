@@ -0,0 +1,139 @@
+"""
+Búsqueda por código de barras para el escáner del punto de venta (POS)
+
+Cada lectura del escáner resuelve un código a una línea del carrito con una
+consulta por el índice único de codigo_barras. Los códigos leídos se guardan
+en una caché LRU pequeña del proceso:
+
+- Producto.save() y Producto.delete() quitan el producto de la caché, y el
+  cobro (ventas/checkout.py) la limpia para los productos vendidos, porque
+  descuenta el stock con un UPDATE que no pasa por save().
+- Cada entrada vence a los DURACION_ENTRADA segundos, así que los cambios
+  hechos en otro proceso del servidor se ven a más tardar en ese tiempo.
+- Los códigos inexistentes también se guardan (como None) para que un
+  código desconocido leído varias veces no consulte la base cada vez.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .models import Producto
+
+# Cantidad máxima de códigos en la caché de cada proceso
+TAMANO_CACHE = 2048
+
+# Segundos que una entrada sigue siendo válida
+DURACION_ENTRADA = 30
+
+
+def normalizar_codigo(codigo):
+    """Quita espacios y saltos de línea que agregan algunos escáneres"""
+    return (codigo or '').strip()
+
+
+class CacheCodigos:
+    """
+    Caché LRU con vencimiento de código de barras -> línea del carrito
+
+    Args:
+        tamano: Cantidad máxima de entradas
+        duracion: Segundos de validez de cada entrada
+    """
+
+    def __init__(self, tamano=TAMANO_CACHE, duracion=DURACION_ENTRADA):
+        self.tamano = tamano
+        self.duracion = duracion
+        self._bloqueo = threading.Lock()
+        self._entradas = OrderedDict()  # código -> (vence, línea o None)
+        self._codigos = {}              # producto_id -> código en caché
+
+    def obtener(self, codigo):
+        """
+        Returns:
+            tuple: (encontrado, línea); encontrado es False si el código no
+                está en la caché o ya venció
+        """
+        with self._bloqueo:
+            entrada = self._entradas.get(codigo)
+            if entrada is None:
+                return False, None
+            vence, linea = entrada
+            if vence < time.monotonic():
+                self._quitar(codigo)
+                return False, None
+            self._entradas.move_to_end(codigo)
+            return True, linea
+
+    def guardar(self, codigo, linea):
+        with self._bloqueo:
+            self._quitar(codigo)
+            self._entradas[codigo] = (time.monotonic() + self.duracion, linea)
+            if linea is not None:
+                self._codigos[linea['id']] = codigo
+            while len(self._entradas) > self.tamano:
+                self._quitar(next(iter(self._entradas)))
+
+    def _quitar(self, codigo):
+        entrada = self._entradas.pop(codigo, None)
+        if entrada is not None and entrada[1] is not None:
+            self._codigos.pop(entrada[1]['id'], None)
+
+    def invalidar_productos(self, ids):
+        """Quita de la caché los códigos de los productos indicados"""
+        with self._bloqueo:
+            for producto_id in ids:
+                codigo = self._codigos.get(producto_id)
+                if codigo is not None:
+                    self._quitar(codigo)
+            # Un código nuevo pudo estar guardado como inexistente
+            for codigo in [c for c, (_, linea) in self._entradas.items() if linea is None]:
+                del self._entradas[codigo]
+
+    def limpiar(self):
+        with self._bloqueo:
+            self._entradas.clear()
+            self._codigos.clear()
+
+
+# Caché del proceso actual
+cache_codigos = CacheCodigos()
+
+
+def linea_por_codigo(codigo):
+    """
+    Resuelve un código de barras a los datos de una línea del carrito
+
+    Args:
+        codigo: Código leído por el escáner
+
+    Returns:
+        dict: id, nombre, precio (str), stock, categoria_id, categoria,
+            imagen y codigo; o None si no hay un producto activo con ese código
+    """
+    codigo = normalizar_codigo(codigo)
+    if not codigo:
+        return None
+
+    encontrado, linea = cache_codigos.obtener(codigo)
+    if encontrado:
+        return linea
+
+    producto = (
+        Producto.objects.select_related('categoria')
+        .filter(codigo_barras=codigo, activo=True)
+        .first()
+    )
+    if producto is not None:
+        linea = {
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'precio': str(producto.precio),
+            'stock': producto.stock_actual,
+            'categoria_id': producto.categoria_id,
+            'categoria': producto.categoria.nombre,
+            'imagen': producto.imagen.url if producto.imagen else None,
+            'codigo': producto.codigo_barras,
+        }
+    cache_codigos.guardar(codigo, linea)
+    return linea
@@ -26,6 +26,7 @@ class ProductoForm(forms.ModelForm):
     Campos incluidos:
         - nombre: Campo de texto para el nombre del producto
         - descripcion: Área de texto para la descripción
+        - codigo_barras: Código de barras o SKU (se puede capturar con el escáner)
         - precio: Campo numérico con validación de precio
         - stock_inicial: Cantidad inicial en inventario
         - stock_actual: Cantidad actual disponible
@@ -46,6 +47,7 @@ class ProductoForm(forms.ModelForm):
         fields = [
             'nombre', 
             'descripcion', 
+            'codigo_barras', 
             'precio', 
             'stock_inicial', 
             'stock_actual', 
@@ -71,6 +73,13 @@ class ProductoForm(forms.ModelForm):
                 'placeholder': 'Descripción del producto'
             }),
             
+            # Código de barras; el escáner escribe el código y envía Enter
+            'codigo_barras': forms.TextInput(attrs={
+                'class': 'form-control', 
+                'placeholder': 'Escanee o escriba el código',
+                'autocomplete': 'off'
+            }),
+            
             # Campo numérico para precio con validación de decimales
             'precio': forms.NumberInput(attrs={
                 'class': 'form-control', 
@@ -124,6 +133,7 @@ class ProductoForm(forms.ModelForm):
         labels = {
             'nombre': 'Nombre del Producto',
             'descripcion': 'Descripción',
+            'codigo_barras': 'Código de Barras / SKU',
             'precio': 'Precio',
             'stock_inicial': 'Stock Inicial',
             'stock_actual': 'Stock Actual',
@@ -132,4 +142,108 @@ class ProductoForm(forms.ModelForm):
             'proveedor': 'Proveedor',
             'imagen': 'Imagen del Producto',
             'activo': 'Estado',
-        } 
\ No newline at end of file
+        } 
+
+# Textos aceptados en la columna 'activo' de una importación
+VALORES_ACTIVO = {
+    '1': True, 'true': True, 'si': True, 'sí': True, 'activo': True, 'verdadero': True,
+    '0': False, 'false': False, 'no': False, 'inactivo': False, 'falso': False,
+}
+
+
+class ProductoImportacionForm(ProductoForm):
+    """
+    Formulario para validar una fila de una importación masiva (productos/importacion.py)
+
+    Aplica las reglas de ProductoForm, pero la categoría y el proveedor
+    llegan por nombre y se resuelven con los diccionarios de la importación,
+    sin consultar la base por cada fila. La unicidad del código de barras la
+    comprueba la importación para todo el archivo, así que aquí se omite.
+
+    Args:
+        categorias: Diccionario {nombre normalizado: id de la categoría}
+        proveedores: Diccionario {nombre normalizado: id del proveedor}
+    """
+
+    categoria = forms.CharField(max_length=100)
+    proveedor = forms.CharField(max_length=200, required=False)
+    activo = forms.CharField(required=False)
+
+    class Meta(ProductoForm.Meta):
+        fields = [
+            'nombre',
+            'descripcion',
+            'codigo_barras',
+            'precio',
+            'costo_promedio',
+            'stock_inicial',
+            'stock_actual',
+            'stock_minimo',
+            'activo'
+        ]
+
+    def __init__(self, *args, categorias=None, proveedores=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categorias = categorias or {}
+        self.proveedores = proveedores or {}
+
+    def cargar_fila(self, datos, instance=None):
+        """
+        Vuelve a usar el formulario para validar otra fila
+
+        Crear un formulario copia todos sus campos y widgets, que es la
+        mayor parte del costo de validar una fila; una importación crea un
+        solo formulario y lo recarga con cada fila.
+
+        Args:
+            datos: Diccionario con los valores de la fila
+            instance: Producto existente que se actualiza (None si es nuevo)
+        """
+        self.data = datos
+        self.is_bound = True
+        self.instance = instance if instance is not None else self._meta.model()
+        self._errors = None
+        self._bound_fields_cache = {}
+        if hasattr(self, 'cleaned_data'):
+            del self.cleaned_data
+        return self
+
+    def clean_codigo_barras(self):
+        # Como en Producto.save(): bulk_create y bulk_update no pasan por save(),
+        # y un código vacío debe quedar en NULL por la restricción única
+        return (self.cleaned_data['codigo_barras'] or '').strip() or None
+
+    def clean_categoria(self):
+        nombre = self.cleaned_data['categoria']
+        categoria_id = self.categorias.get(nombre.strip().lower())
+        if categoria_id is None:
+            raise forms.ValidationError(f'La categoría "{nombre}" no existe')
+        return categoria_id
+
+    def clean_proveedor(self):
+        nombre = self.cleaned_data['proveedor']
+        if not nombre:
+            return None
+        proveedor_id = self.proveedores.get(nombre.strip().lower())
+        if proveedor_id is None:
+            raise forms.ValidationError(f'El proveedor "{nombre}" no existe')
+        return proveedor_id
+
+    def clean_activo(self):
+        valor = self.cleaned_data['activo'].strip().lower()
+        if not valor:
+            # Sin valor: se conserva el estado actual (activo si es nuevo)
+            return self.instance.activo if self.instance.pk else True
+        if valor not in VALORES_ACTIVO:
+            raise forms.ValidationError('Use Activo/Inactivo, Sí/No o 1/0')
+        return VALORES_ACTIVO[valor]
+
+    def validate_unique(self):
+        pass
+
+    def save(self, commit=False):
+        """Devuelve el producto con los datos de la fila, sin guardarlo"""
+        producto = super().save(commit=False)
+        producto.categoria_id = self.cleaned_data['categoria']
+        producto.proveedor_id = self.cleaned_data['proveedor']
+        return producto
@@ -0,0 +1,429 @@
+"""
+Importación y exportación masiva de productos (CSV y XLSX)
+
+- leer_filas(): recorre un CSV o XLSX fila por fila sin cargarlo completo
+  en memoria (XLSX con openpyxl en modo de solo lectura; openpyxl es una
+  dependencia opcional que solo se importa al leer un XLSX)
+- importar_productos(): valida cada fila con las reglas de ProductoForm
+  (ProductoImportacionForm) y guarda por lotes de TAMANO_LOTE filas, cada
+  lote en su propia transacción: un bulk_create para los productos nuevos
+  y un bulk_update para los existentes, que se reconocen por id (columna
+  de la exportación) o por codigo_barras. Las filas que no cambian nada
+  del producto no se escriben. Categorías y proveedores se resuelven por
+  nombre con diccionarios que se cargan una sola vez.
+- Las filas con errores no se guardan: se escriben en un reporte CSV con el
+  número de fila, los errores y los datos originales, listo para corregir
+  y volver a importar.
+- filas_exportacion(), escribir_csv() y escribir_xlsx() exportan el
+  catálogo con las mismas columnas, así que un archivo exportado se puede
+  importar sin cambios.
+
+Los cambios de stock se registran en el kardex como stock inicial
+(productos nuevos) o ajuste (productos existentes) y quedan sin asignar a
+ningún almacén.
+"""
+
+import csv
+import io
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from categorias.models import Categoria
+from proveedores.models import Proveedor
+from .escaner import cache_codigos
+from .forms import ProductoImportacionForm
+from .models import MovimientoStock, Producto
+
+# Columnas de la importación y la exportación, en orden
+COLUMNAS = [
+    'id', 'codigo_barras', 'nombre', 'descripcion', 'categoria', 'proveedor', 'precio',
+    'costo_promedio', 'stock_inicial', 'stock_actual', 'stock_minimo', 'activo',
+]
+
+# Columnas que debe tener el archivo; las demás toman el valor actual del
+# producto (o el predeterminado si es nuevo)
+COLUMNAS_REQUERIDAS = ('nombre', 'precio', 'categoria')
+
+# Formatos de archivo aceptados
+FORMATOS = ('csv', 'xlsx')
+
+# Filas por lote: cada lote se valida y se guarda en una transacción
+TAMANO_LOTE = 1000
+
+# Productos por sentencia de bulk_update() (arma un CASE por campo y producto)
+LOTE_ACTUALIZACION = 250
+
+# Campos que se actualizan en los productos existentes
+CAMPOS_ACTUALIZADOS = [
+    'nombre', 'descripcion', 'codigo_barras', 'precio', 'costo_promedio', 'stock_inicial',
+    'stock_actual', 'stock_minimo', 'categoria', 'proveedor', 'activo', 'fecha_actualizacion',
+]
+
+# Campos que se comparan para saber si una fila cambia el producto
+CAMPOS_COMPARADOS = CAMPOS_ACTUALIZADOS[:-1]
+
+
+class ImportacionInvalida(Exception):
+    """El archivo no se puede leer (formato desconocido, sin encabezado, faltan columnas)"""
+
+
+class ResultadoImportacion:
+    """
+    Resumen de una importación
+
+    Atributos:
+        - filas: Filas leídas del archivo
+        - creados: Productos nuevos
+        - actualizados: Productos existentes modificados
+        - sin_cambios: Productos existentes que ya tenían los datos de la fila
+        - errores: Filas rechazadas (escritas en el reporte)
+    """
+
+    def __init__(self):
+        self.filas = 0
+        self.creados = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        self.errores = 0
+
+    def __str__(self):
+        return (
+            f'{self.filas} filas: {self.creados} creados, {self.actualizados} actualizados, '
+            f'{self.sin_cambios} sin cambios, {self.errores} con errores'
+        )
+
+
+def formato_de(nombre_archivo):
+    """
+    Returns:
+        str: 'csv' o 'xlsx' según la extensión del archivo
+
+    Raises:
+        ImportacionInvalida: Si la extensión no es de un formato aceptado
+    """
+    formato = nombre_archivo.rsplit('.', 1)[-1].lower() if '.' in nombre_archivo else ''
+    if formato not in FORMATOS:
+        raise ImportacionInvalida(f'Formato no soportado: use {" o ".join(FORMATOS).upper()}')
+    return formato
+
+
+def _texto(valor):
+    """Convierte una celda a texto (Excel guarda los códigos numéricos como float)"""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _encabezado(columnas):
+    encabezado = [_texto(columna).lower() for columna in columnas]
+    faltantes = [columna for columna in COLUMNAS_REQUERIDAS if columna not in encabezado]
+    if faltantes:
+        raise ImportacionInvalida(f'Faltan columnas en el archivo: {", ".join(faltantes)}')
+    return encabezado
+
+
+def leer_filas(archivo, formato):
+    """
+    Recorre las filas de un CSV o XLSX sin cargar el archivo completo
+
+    Args:
+        archivo: Archivo binario abierto (el XLSX debe permitir seek)
+        formato: 'csv' o 'xlsx'
+
+    Yields:
+        tuple: (número de fila en el archivo, {columna: texto}); las
+            columnas que no están en el archivo no aparecen
+
+    Raises:
+        ImportacionInvalida: Si el archivo no tiene las columnas requeridas
+            o no se puede leer
+    """
+    if formato == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportacionInvalida('Para importar archivos XLSX instale openpyxl (pip install openpyxl)')
+        try:
+            libro = load_workbook(archivo, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportacionInvalida(f'No se pudo leer el archivo XLSX: {e}')
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezado = _encabezado(next(filas, None) or [])
+            for numero, fila in enumerate(filas, start=2):
+                if any(valor is not None for valor in fila):
+                    yield numero, {
+                        columna: _texto(valor) for columna, valor in zip(encabezado, fila) if columna in COLUMNAS
+                    }
+        finally:
+            libro.close()
+        return
+
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    try:
+        lector = csv.reader(texto)
+        encabezado = _encabezado(next(lector, None) or [])
+        for numero, fila in enumerate(lector, start=2):
+            if any(valor.strip() for valor in fila):
+                yield numero, {
+                    columna: valor.strip() for columna, valor in zip(encabezado, fila) if columna in COLUMNAS
+                }
+    except UnicodeDecodeError:
+        raise ImportacionInvalida('El CSV debe estar codificado en UTF-8')
+    finally:
+        # No cerrar el archivo del llamador junto con el envoltorio de texto
+        texto.detach()
+
+
+def _por_nombre(modelo):
+    """Diccionario {nombre normalizado: id}; con nombres repetidos gana el primero"""
+    nombres = {}
+    for pk, nombre in modelo.objects.order_by('-id').values_list('id', 'nombre'):
+        nombres[nombre.strip().lower()] = pk
+    return nombres
+
+
+def _datos_formulario(datos, producto):
+    """
+    Completa la fila con los valores actuales del producto (o los
+    predeterminados si es nuevo) para las columnas que no trae el archivo
+    """
+    completos = dict(datos)
+    if producto is not None:
+        actuales = {
+            'nombre': producto.nombre,
+            'descripcion': producto.descripcion,
+            'codigo_barras': producto.codigo_barras or '',
+            'precio': producto.precio,
+            'costo_promedio': producto.costo_promedio,
+            'stock_inicial': producto.stock_inicial,
+            'stock_actual': producto.stock_actual,
+            'stock_minimo': producto.stock_minimo,
+            'categoria': producto.categoria.nombre,
+            'proveedor': producto.proveedor.nombre if producto.proveedor_id else '',
+            'activo': '',
+        }
+    else:
+        stock = datos.get('stock_actual') or '0'
+        actuales = {
+            'costo_promedio': 0, 'stock_actual': stock, 'stock_inicial': datos.get('stock_inicial') or stock,
+            'stock_minimo': 5,
+        }
+    for columna, valor in actuales.items():
+        # Un stock o costo vacío también toma el valor actual o el predeterminado
+        if columna not in datos or (not datos[columna] and columna.startswith(('stock_', 'costo_'))):
+            completos[columna] = valor
+    return completos
+
+
+def _errores_texto(form):
+    return '; '.join(
+        f'{campo}: {" ".join(mensajes)}' if campo != '__all__' else ' '.join(mensajes)
+        for campo, mensajes in form.errors.items()
+    )
+
+
+def _reportar(reporte, resultado, numero, errores, datos):
+    resultado.errores += 1
+    if reporte is not None:
+        reporte.writerow([numero, errores] + [datos.get(columna, '') for columna in COLUMNAS])
+
+
+def _valores(producto):
+    return tuple(getattr(producto, campo.attname) for campo in map(Producto._meta.get_field, CAMPOS_COMPARADOS))
+
+
+def _guardar_lote(lote, categorias, proveedores, reporte, resultado, solo_validar):
+    """
+    Valida y guarda un lote de filas en una transacción
+
+    Los productos existentes del lote se leen (y bloquean) con una sola
+    consulta, y se guardan con un bulk_create y un bulk_update. Una fila con
+    id actualiza ese producto; sin id, el producto con su código de barras.
+    """
+    ids = [int(datos['id']) for _, datos in lote if datos.get('id')]
+    codigos = [datos['codigo_barras'] for _, datos in lote if datos.get('codigo_barras')]
+    with transaction.atomic():
+        existentes = Producto.objects.select_related('categoria', 'proveedor').filter(
+            Q(id__in=ids) | Q(codigo_barras__in=codigos)
+        )
+        if not solo_validar:
+            existentes = existentes.select_for_update(of=('self',))
+        por_id = {producto.pk: producto for producto in existentes}
+        por_codigo = {producto.codigo_barras: producto for producto in por_id.values() if producto.codigo_barras}
+
+        nuevos = []
+        actualizados = []
+        stock_anterior = {}
+        form = ProductoImportacionForm(categorias=categorias, proveedores=proveedores)
+        for numero, datos in lote:
+            codigo = datos.get('codigo_barras')
+            if datos.get('id'):
+                producto = por_id.get(int(datos['id']))
+                if producto is None:
+                    _reportar(reporte, resultado, numero, f'id: no existe el producto #{datos["id"]}', datos)
+                    continue
+                otro = por_codigo.get(codigo)
+                if otro is not None and otro.pk != producto.pk:
+                    _reportar(reporte, resultado, numero, f'codigo_barras: ya lo usa el producto #{otro.pk}', datos)
+                    continue
+            else:
+                producto = por_codigo.get(codigo)
+
+            anterior = None
+            if producto is not None:
+                anterior = _valores(producto)
+                stock_anterior[producto.pk] = producto.stock_actual
+            form.cargar_fila(_datos_formulario(datos, producto), producto)
+            if not form.is_valid():
+                _reportar(reporte, resultado, numero, _errores_texto(form), datos)
+                continue
+            producto = form.save()
+            if not producto.pk:
+                nuevos.append(producto)
+            elif _valores(producto) != anterior:
+                actualizados.append(producto)
+            else:
+                resultado.sin_cambios += 1
+
+        resultado.creados += len(nuevos)
+        resultado.actualizados += len(actualizados)
+        if solo_validar:
+            return
+
+        ahora = timezone.now()
+        if connection.features.can_return_rows_from_bulk_insert:
+            Producto.objects.bulk_create(nuevos)
+            MovimientoStock.registrar(
+                {producto.pk: producto.stock_actual for producto in nuevos}, 'inicial', 'Importación', fecha=ahora,
+            )
+        else:
+            # Sin ids devueltos por el INSERT masivo (MySQL): save() registra el stock inicial
+            for producto in nuevos:
+                producto.save()
+
+        for producto in actualizados:
+            producto.fecha_actualizacion = ahora
+        Producto.objects.bulk_update(actualizados, CAMPOS_ACTUALIZADOS, batch_size=LOTE_ACTUALIZACION)
+        MovimientoStock.registrar(
+            {producto.pk: producto.stock_actual - stock_anterior[producto.pk] for producto in actualizados},
+            'ajuste', 'Importación', fecha=ahora,
+        )
+    cache_codigos.invalidar_productos([producto.pk for producto in actualizados])
+
+
+def importar_productos(filas, reporte_errores=None, solo_validar=False, tamano_lote=TAMANO_LOTE):
+    """
+    Importa productos por lotes desde las filas de leer_filas()
+
+    Las filas con errores se saltan y se escriben en el reporte; las demás
+    se guardan aunque otras fallen. Un id o código de barras repetido dentro
+    del archivo es un error en sus apariciones posteriores a la primera.
+
+    Args:
+        filas: Iterable de (número de fila, {columna: texto})
+        reporte_errores: Archivo de texto donde escribir el reporte CSV de
+            errores (opcional)
+        solo_validar: Validar sin guardar nada
+        tamano_lote: Filas por transacción
+
+    Returns:
+        ResultadoImportacion: Conteo de filas, creados, actualizados, sin
+            cambios y errores
+    """
+    resultado = ResultadoImportacion()
+    reporte = None
+    if reporte_errores is not None:
+        reporte = csv.writer(reporte_errores)
+        reporte.writerow(['fila', 'errores'] + COLUMNAS)
+
+    categorias = _por_nombre(Categoria)
+    proveedores = _por_nombre(Proveedor)
+    vistos = {'id': {}, 'codigo_barras': {}}
+    lote = []
+    for numero, datos in filas:
+        resultado.filas += 1
+        if datos.get('id') and not datos['id'].isdigit():
+            _reportar(reporte, resultado, numero, 'id: debe ser un número entero', datos)
+            continue
+        repetida = next((columna for columna in vistos if datos.get(columna) in vistos[columna]), None)
+        if repetida:
+            error = f'{repetida}: repetido en el archivo (fila {vistos[repetida][datos[repetida]]})'
+            _reportar(reporte, resultado, numero, error, datos)
+            continue
+        for columna in vistos:
+            if datos.get(columna):
+                vistos[columna][datos[columna]] = numero
+        lote.append((numero, datos))
+        if len(lote) == tamano_lote:
+            _guardar_lote(lote, categorias, proveedores, reporte, resultado, solo_validar)
+            lote = []
+    if lote:
+        _guardar_lote(lote, categorias, proveedores, reporte, resultado, solo_validar)
+    return resultado
+
+
+def filas_exportacion(productos=None):
+    """
+    Recorre el catálogo con las columnas de COLUMNAS, por partes
+
+    Args:
+        productos: QuerySet de productos a exportar (por defecto todos)
+
+    Yields:
+        list: Valores de cada producto como texto, en el orden de COLUMNAS
+    """
+    productos = Producto.objects.all() if productos is None else productos
+    filas = productos.order_by('id').values_list(
+        'id', 'codigo_barras', 'nombre', 'descripcion', 'categoria__nombre', 'proveedor__nombre', 'precio',
+        'costo_promedio', 'stock_inicial', 'stock_actual', 'stock_minimo', 'activo',
+    )
+    for (
+        pk, codigo, nombre, descripcion, categoria, proveedor, precio, costo, inicial, actual, minimo, activo,
+    ) in filas.iterator(chunk_size=2000):
+        yield [
+            pk, codigo or '', nombre, descripcion, categoria, proveedor or '', str(precio),
+            str(costo), inicial, actual, minimo, 'Activo' if activo else 'Inactivo',
+        ]
+
+
+def escribir_csv(destino, productos=None):
+    """
+    Exporta el catálogo a un archivo de texto CSV
+
+    Args:
+        destino: Archivo de texto abierto con newline=''
+        productos: QuerySet de productos a exportar (por defecto todos)
+    """
+    escritor = csv.writer(destino)
+    escritor.writerow(COLUMNAS)
+    for fila in filas_exportacion(productos):
+        escritor.writerow(fila)
+
+
+def escribir_xlsx(destino, productos=None):
+    """
+    Exporta el catálogo a un XLSX en modo de memoria constante
+
+    Args:
+        destino: Ruta o archivo binario abierto
+        productos: QuerySet de productos a exportar (por defecto todos)
+    """
+    import xlsxwriter
+
+    libro = xlsxwriter.Workbook(destino, {'constant_memory': True})
+    hoja = libro.add_worksheet('Productos')
+    texto = libro.add_format({'num_format': '@'})
+    hoja.write_row(0, 0, COLUMNAS)
+    for numero, fila in enumerate(filas_exportacion(productos), start=1):
+        # El código de barras como texto, para que Excel no lo convierta en número
+        hoja.write_number(numero, 0, fila[0])
+        hoja.write_string(numero, 1, fila[1], texto)
+        hoja.write_row(numero, 2, fila[2:6])
+        hoja.write_number(numero, 6, float(fila[6]))
+        hoja.write_row(numero, 7, fila[7:])
+    libro.close()
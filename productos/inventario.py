@@ -0,0 +1,246 @@
+"""
+Kardex de inventario para TradeInventory
+Consultas y escrituras sobre MovimientoStock y SnapshotStock.
+
+- Cada cambio de stock inserta un MovimientoStock: las ventas (checkout),
+  el stock inicial y los ajustes al guardar un producto (Producto.save),
+  los ajustes de la API (ajustar_stock), las entradas o devoluciones
+  (mover_stock) y las transferencias entre almacenes (almacenes/stock.py).
+- Los SnapshotStock guardan el stock de cada producto en un corte
+  (tomar_snapshots, normalmente una vez al día), así que el stock en una
+  fecha es el último snapshot anterior más los movimientos desde ese corte,
+  en lugar de la suma de toda la historia.
+- inventario_promedio() usa esos puntos para las métricas de rotación de
+  los reportes.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, F, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MovimientoStock, Producto, SnapshotStock
+
+# Anterior a cualquier movimiento: base para los productos sin snapshot
+INICIO_KARDEX = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+# Filas por lote al reconstruir el kardex
+TAMANO_LOTE = 5000
+
+
+def _productos(producto_ids=None):
+    productos = Producto.objects.order_by()
+    if producto_ids is not None:
+        productos = productos.filter(id__in=producto_ids)
+    return productos
+
+
+def stock_en_fecha(momento, producto_ids=None):
+    """
+    Stock de los productos en un momento: último snapshot + movimientos posteriores
+
+    Args:
+        momento: datetime hasta el que se cuentan los movimientos (incluido)
+        producto_ids: IDs o queryset de ids a consultar (por defecto todos)
+
+    Returns:
+        dict: {producto_id: stock}
+    """
+    ultimo = SnapshotStock.objects.filter(producto=OuterRef('pk'), corte__lte=momento).order_by('-corte')
+    productos = _productos(producto_ids).annotate(
+        corte_base=Subquery(ultimo.values('corte')[:1]),
+        stock_base=Subquery(ultimo.values('stock')[:1]),
+    )
+    movimientos = MovimientoStock.objects.filter(
+        producto=OuterRef('pk'),
+        fecha__lte=momento,
+        fecha__gt=Coalesce(OuterRef('corte_base'), Value(INICIO_KARDEX, output_field=DateTimeField())),
+    ).order_by().values('producto').annotate(total=Sum('cantidad')).values('total')
+    productos = productos.annotate(delta=Subquery(movimientos))
+    return {
+        producto_id: (base or 0) + (delta or 0)
+        for producto_id, base, delta in productos.values_list('id', 'stock_base', 'delta')
+    }
+
+
+def inventario_promedio(inicio, fin, producto_ids=None):
+    """
+    Inventario promedio de un período
+
+    Promedia el stock al inicio, en cada snapshot dentro del período y al
+    final. Con snapshots diarios es el promedio del stock de cada día.
+
+    Args:
+        inicio: datetime de inicio del período
+        fin: datetime de fin del período
+        producto_ids: IDs o queryset de ids a consultar (por defecto todos)
+
+    Returns:
+        dict: {producto_id: inventario promedio (float)}
+    """
+    al_inicio = stock_en_fecha(inicio, producto_ids)
+    al_final = stock_en_fecha(fin, producto_ids)
+    snapshots = SnapshotStock.objects.filter(corte__gt=inicio, corte__lt=fin)
+    if producto_ids is not None:
+        snapshots = snapshots.filter(producto_id__in=producto_ids)
+    intermedios = {
+        fila['producto_id']: fila
+        for fila in snapshots.values('producto_id').annotate(suma=Sum('stock'), cantidad=Count('id')).order_by()
+    }
+
+    promedios = {}
+    for producto_id, stock_inicio in al_inicio.items():
+        fila = intermedios.get(producto_id, {'suma': 0, 'cantidad': 0})
+        total = stock_inicio + al_final.get(producto_id, 0) + fila['suma']
+        promedios[producto_id] = total / (fila['cantidad'] + 2)
+    return promedios
+
+
+def tomar_snapshots(corte=None):
+    """
+    Guarda el stock de todos los productos en un corte
+
+    El stock se calcula desde el kardex (no desde stock_actual), así que un
+    snapshot siempre coincide con los movimientos hasta el corte. Si ya
+    existen snapshots para ese corte se conservan.
+
+    Args:
+        corte: datetime del corte (por defecto ahora)
+
+    Returns:
+        int: Cantidad de snapshots guardados
+    """
+    corte = corte or timezone.now()
+    snapshots = [
+        SnapshotStock(producto_id=producto_id, corte=corte, stock=stock)
+        for producto_id, stock in stock_en_fecha(corte).items()
+    ]
+    SnapshotStock.objects.bulk_create(snapshots, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+    return len(snapshots)
+
+
+def ajustar_stock(producto_id, nuevo_stock, referencia=''):
+    """
+    Fija el stock de un producto (por ejemplo, tras un conteo físico) y
+    registra la diferencia como ajuste
+
+    Args:
+        producto_id: ID del producto
+        nuevo_stock: Stock contado
+        referencia: Motivo o documento del ajuste (opcional)
+
+    Returns:
+        int: Diferencia registrada (positiva si faltaba stock en el sistema)
+
+    Raises:
+        Producto.DoesNotExist: Si el producto no existe
+    """
+    with transaction.atomic():
+        anterior = Producto.objects.select_for_update().values_list('stock_actual', flat=True).get(pk=producto_id)
+        diferencia = nuevo_stock - anterior
+        if diferencia:
+            Producto.objects.filter(pk=producto_id).update(stock_actual=nuevo_stock, fecha_actualizacion=timezone.now())
+            MovimientoStock.registrar({producto_id: diferencia}, 'ajuste', referencia)
+    return diferencia
+
+
+def mover_stock(cantidades, tipo, referencia='', almacen_id=None):
+    """
+    Suma o resta unidades al stock de varios productos y las registra en el kardex
+
+    Args:
+        cantidades: Diccionario {producto_id: unidades con signo}
+        tipo: Tipo de movimiento ('entrada', 'devolucion', 'ajuste', ...)
+        referencia: Documento que originó el movimiento (opcional)
+        almacen_id: Almacén que recibe o entrega las unidades (por defecto
+            el stock sin asignar)
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        if almacen_id is not None:
+            from almacenes.stock import sumar_a_almacen
+            sumar_a_almacen(almacen_id, cantidades)
+        for producto_id in sorted(cantidades):
+            Producto.objects.filter(pk=producto_id).update(
+                stock_actual=F('stock_actual') + cantidades[producto_id],
+                fecha_actualizacion=ahora,
+            )
+        MovimientoStock.registrar(cantidades, tipo, referencia, fecha=ahora, almacen_id=almacen_id)
+
+
+def reconstruir_kardex(reemplazar=False):
+    """
+    Carga el kardex desde las ventas registradas
+
+    Por producto crea un movimiento 'inicial' (stock actual + unidades
+    vendidas, en la fecha de su primera venta o de su creación) y un
+    movimiento 'venta' por línea de venta. Sirve para cargar la historia de
+    una base anterior al kardex o de datos insertados sin movimientos.
+
+    Solo se cargan los productos que no tienen ningún movimiento: los demás
+    ya tienen un kardex que cuadra con su stock y no se tocan. Con
+    reemplazar=True se borran antes todos los movimientos y snapshots y se
+    reconstruyen todos los productos (los ajustes manuales anteriores
+    quedan incluidos en el stock inicial).
+
+    Args:
+        reemplazar: Borrar el kardex existente y reconstruirlo completo
+
+    Returns:
+        int: Cantidad de movimientos creados
+    """
+    from ventas.models import DetalleVenta
+
+    with transaction.atomic():
+        if reemplazar:
+            SnapshotStock.objects.all().delete()
+            MovimientoStock.objects.all().delete()
+        # Bloquear los productos a cargar: una venta no les agrega movimientos a la vez
+        productos = Producto.objects.order_by().exclude(id__in=MovimientoStock.objects.values('producto_id'))
+        if not list(productos.select_for_update().values_list('id', flat=True)):
+            return 0
+        # Los movimientos que se insertan abajo no cambian qué productos se cargan
+        ultimo = MovimientoStock.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        productos = Producto.objects.order_by().exclude(
+            id__in=MovimientoStock.objects.filter(id__lte=ultimo).values('producto_id')
+        )
+        detalles = DetalleVenta.objects.filter(producto__in=productos).order_by()
+
+        vendidos = defaultdict(int)
+        primera_venta = {}
+        for fila in detalles.values('producto_id').annotate(
+            unidades=Sum('cantidad'), primera=Min('venta__fecha')
+        ).order_by():
+            vendidos[fila['producto_id']] = fila['unidades']
+            primera_venta[fila['producto_id']] = fila['primera']
+
+        iniciales = []
+        for producto_id, stock, creacion in productos.values_list('id', 'stock_actual', 'fecha_creacion'):
+            fecha = min(creacion, primera_venta.get(producto_id, creacion))
+            iniciales.append(MovimientoStock(
+                producto_id=producto_id, tipo='inicial', cantidad=stock + vendidos[producto_id], fecha=fecha,
+            ))
+        MovimientoStock.objects.bulk_create(iniciales, batch_size=TAMANO_LOTE)
+        creados = len(iniciales)
+
+        lote = []
+        for producto_id, cantidad, venta_id, fecha in detalles.values_list(
+            'producto_id', 'cantidad', 'venta_id', 'venta__fecha'
+        ).iterator(chunk_size=TAMANO_LOTE):
+            lote.append(MovimientoStock(
+                producto_id=producto_id, tipo='venta', cantidad=-cantidad, fecha=fecha, referencia=f'Venta #{venta_id}',
+            ))
+            if len(lote) == TAMANO_LOTE:
+                MovimientoStock.objects.bulk_create(lote)
+                creados += len(lote)
+                lote = []
+        MovimientoStock.objects.bulk_create(lote)
+        creados += len(lote)
+
+        # El stock de los reportes ya no es el mismo
+        from reportes.cache import invalidar_reportes
+        invalidar_reportes()
+    return creados
@@ -0,0 +1,34 @@
+"""
+Comando para exportar el catálogo de productos a CSV o XLSX
+
+El archivo tiene las columnas de la importación, así que se puede editar y
+volver a cargar con importar_productos.
+
+Uso:
+    python manage.py exportar_productos catalogo.csv
+    python manage.py exportar_productos catalogo.xlsx
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.importacion import ImportacionInvalida, escribir_csv, escribir_xlsx, formato_de
+from productos.models import Producto
+
+
+class Command(BaseCommand):
+    help = 'Exporta todos los productos a un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo de destino (.csv o .xlsx)')
+
+    def handle(self, *args, **options):
+        try:
+            formato = formato_de(options['archivo'])
+        except ImportacionInvalida as e:
+            raise CommandError(str(e))
+        if formato == 'xlsx':
+            escribir_xlsx(options['archivo'])
+        else:
+            with open(options['archivo'], 'w', encoding='utf-8-sig', newline='') as destino:
+                escribir_csv(destino)
+        self.stdout.write(self.style.SUCCESS(f'{Producto.objects.count()} productos exportados a {options["archivo"]}'))
@@ -0,0 +1,50 @@
+"""
+Comando para importar productos en lote desde un CSV o XLSX
+
+Valida cada fila con las reglas de ProductoForm y guarda por lotes (ver
+productos/importacion.py). Las filas rechazadas se escriben en un reporte CSV.
+
+Uso:
+    python manage.py importar_productos catalogo.csv
+    python manage.py importar_productos catalogo.xlsx --errores errores.csv --solo-validar
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.importacion import (
+    TAMANO_LOTE, ImportacionInvalida, formato_de, importar_productos, leer_filas,
+)
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza productos desde un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV o XLSX')
+        parser.add_argument('--errores', help='Ruta del reporte CSV de errores (por defecto <archivo>.errores.csv)')
+        parser.add_argument('--solo-validar', action='store_true', help='Valida el archivo sin guardar cambios')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por transacción')
+
+    def handle(self, *args, **options):
+        ruta_errores = options['errores'] or f'{options["archivo"]}.errores.csv'
+        inicio = time.perf_counter()
+        try:
+            formato = formato_de(options['archivo'])
+            with open(options['archivo'], 'rb') as archivo, \
+                    open(ruta_errores, 'w', encoding='utf-8-sig', newline='') as reporte:
+                resultado = importar_productos(
+                    leer_filas(archivo, formato), reporte,
+                    solo_validar=options['solo_validar'], tamano_lote=options['lote'],
+                )
+        except (ImportacionInvalida, OSError) as e:
+            raise CommandError(str(e))
+        duracion = time.perf_counter() - inicio
+
+        accion = 'Validación' if options['solo_validar'] else 'Importación'
+        self.stdout.write(f'{accion}: {resultado} en {duracion:.1f} s')
+        if resultado.errores:
+            self.stdout.write(self.style.WARNING(f'Reporte de errores: {ruta_errores}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin errores'))
@@ -0,0 +1,99 @@
+"""
+Comando para medir la búsqueda de productos en memoria (productos/busqueda.py)
+
+Arma el índice con los productos de la base de datos o, con --sinteticos,
+con nombres generados en memoria (sin tocar la base), y mide la mediana y
+el máximo de búsquedas típicas del POS mientras se escribe.
+
+Uso:
+    python manage.py medir_busqueda
+    python manage.py medir_busqueda --sinteticos 100000
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from productos.busqueda import IndiceProductos, palabras
+from productos.models import Producto
+
+TIPOS = ['Leche', 'Pan', 'Refresco', 'Papas', 'Galletas', 'Jugo', 'Yogurt', 'Café', 'Arroz', 'Frijol',
+         'Aceite', 'Jabón', 'Detergente', 'Salsa', 'Atún', 'Cereal', 'Chocolate', 'Agua', 'Queso', 'Harina']
+MARCAS = ['Lala', 'Bimbo', 'Jumex', 'Gamesa', 'Herdez', 'Maseca', 'Knorr', 'Zote', 'Alpura', 'Sabritas']
+VARIANTES = ['Entera', 'Light', 'Natural', 'Picante', 'Original', 'Fresa', 'Vainilla', 'Limón', 'Mango', 'Integral']
+TAMANOS = ['250ml', '500ml', '1L', '2L', '100g', '200g', '1kg', '600ml']
+
+
+def productos_sinteticos(cantidad, semilla=1):
+    """Filas con la forma de values() para indexar sin base de datos"""
+    azar = random.Random(semilla)
+    ahora = timezone.now()
+    # Más tipos y marcas que las listas fijas para que haya palabras poco frecuentes
+    tipos = TIPOS + [f'Tipo{i}' for i in range(cantidad // 200)]
+    marcas = MARCAS + [f'Marca{i}' for i in range(cantidad // 300)]
+    return [
+        {
+            'id': numero,
+            'nombre': ' '.join([azar.choice(tipos), azar.choice(marcas), azar.choice(VARIANTES), azar.choice(TAMANOS)]),
+            'descripcion': '',
+            'codigo_barras': f'750{numero:010d}',
+            'activo': azar.random() > 0.05,
+            'fecha_actualizacion': ahora,
+        }
+        for numero in range(1, cantidad + 1)
+    ]
+
+
+def consultas_medidas(nombres):
+    """Prefijos de nombres reales, como los va escribiendo el cajero, más algunos casos difíciles"""
+    consultas = []
+    for nombre in nombres:
+        texto = ' '.join(palabras(nombre))
+        consultas += [texto[:2], texto[:4], texto.split(' ')[0], ' '.join(texto.split(' ')[:2])[:-1], texto]
+    return consultas + ['ma', '1', 'leche 1', 'lehce', 'xyzq']
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de la búsqueda de productos en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sinteticos', type=int, help='Indexar N productos generados en lugar de la base')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por búsqueda')
+        parser.add_argument('--limite', type=int, default=10, help='Resultados por búsqueda')
+
+    def handle(self, *args, **options):
+        indice = IndiceProductos()
+        inicio = time.perf_counter()
+        if options['sinteticos']:
+            filas = productos_sinteticos(options['sinteticos'])
+            with indice._bloqueo:
+                indice._indexar(filas)
+                indice._listo = True
+            indice._sincronizar = lambda: None  # Sin base de datos
+            muestra = [fila['nombre'] for fila in random.Random(2).sample(filas, 20)]
+        else:
+            indice.buscar('indice')  # La primera búsqueda arma el índice
+            muestra = list(Producto.objects.order_by('?').values_list('nombre', flat=True)[:20])
+        self.stdout.write(f'Índice de {len(indice._nombres)} productos armado en {time.perf_counter() - inicio:.2f} s')
+
+        tiempos = []
+        peores = []
+        for consulta in consultas_medidas(muestra):
+            medidas = []
+            for _ in range(options['repeticiones']):
+                comienzo = time.perf_counter()
+                indice.buscar(consulta, options['limite'])
+                medidas.append((time.perf_counter() - comienzo) * 1000)
+            tiempos += medidas
+            peores.append((max(medidas), consulta))
+
+        tiempos.sort()
+        self.stdout.write(
+            f'{len(tiempos)} búsquedas: mediana {tiempos[len(tiempos) // 2]:.2f} ms, '
+            f'p95 {tiempos[int(len(tiempos) * 0.95)]:.2f} ms, máximo {tiempos[-1]:.2f} ms'
+        )
+        self.stdout.write('Búsquedas más lentas:')
+        for duracion, consulta in sorted(peores, reverse=True)[:5]:
+            self.stdout.write(f'  {consulta!r:<40}{duracion:>8.2f} ms')
@@ -0,0 +1,33 @@
+"""
+Comando para cargar el kardex de inventario (MovimientoStock) desde las ventas
+
+Solo carga los productos que no tienen movimientos. Para borrar el kardex
+existente (movimientos y snapshots) y reconstruirlo completo hay que
+pedirlo con --reemplazar.
+
+Uso:
+    python manage.py reconstruir_kardex
+    python manage.py reconstruir_kardex --reemplazar
+"""
+
+from django.core.management.base import BaseCommand
+
+from productos.inventario import reconstruir_kardex
+from productos.models import MovimientoStock
+
+
+class Command(BaseCommand):
+    help = 'Carga el stock inicial y las ventas registradas en el kardex de los productos sin movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reemplazar', action='store_true',
+            help='Borrar todos los movimientos y snapshots y reconstruir el kardex completo',
+        )
+
+    def handle(self, *args, **options):
+        if options['reemplazar']:
+            existentes = MovimientoStock.objects.count()
+            self.stdout.write(self.style.WARNING(f'Se borrarán {existentes} movimientos existentes'))
+        total = reconstruir_kardex(reemplazar=options['reemplazar'])
+        self.stdout.write(self.style.SUCCESS(f'Kardex reconstruido con {total} movimientos'))
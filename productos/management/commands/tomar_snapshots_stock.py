@@ -0,0 +1,50 @@
+"""
+Comando para guardar el stock de todos los productos en un corte (SnapshotStock)
+
+Pensado para ejecutarse una vez al día (cron o tarea programada) poco
+después de la medianoche: por defecto el corte es el inicio del día local,
+es decir, el stock al cierre del día anterior.
+
+Uso:
+    python manage.py tomar_snapshots_stock
+    python manage.py tomar_snapshots_stock --fecha 2025-01-31
+    python manage.py tomar_snapshots_stock --desde 2025-01-01    # un corte por día hasta hoy
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from productos.inventario import tomar_snapshots
+
+
+def inicio_del_dia(fecha):
+    """Inicio del día local indicado (datetime con zona horaria)"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class Command(BaseCommand):
+    help = 'Guarda el stock de cada producto al cierre de un día'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Día cuyo cierre se guarda (YYYY-MM-DD, por defecto ayer)')
+        parser.add_argument('--desde', help='Guardar el cierre de cada día desde esta fecha hasta ayer')
+
+    def handle(self, *args, **options):
+        try:
+            fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date() if options['fecha'] else None
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else None
+        except ValueError:
+            raise CommandError('Las fechas deben tener el formato YYYY-MM-DD')
+
+        ayer = timezone.localdate() - timedelta(days=1)
+        dias = [fecha or ayer]
+        if desde:
+            dias = [desde + timedelta(days=numero) for numero in range((ayer - desde).days + 1)]
+
+        for dia in dias:
+            # El cierre de un día es el inicio del siguiente
+            total = tomar_snapshots(inicio_del_dia(dia + timedelta(days=1)))
+            self.stdout.write(f'{dia}: {total} productos')
+        self.stdout.write(self.style.SUCCESS(f'Snapshots guardados para {len(dias)} día(s)'))
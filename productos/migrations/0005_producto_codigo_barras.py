@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_indice_actualizacion_producto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='codigo_barras',
+            field=models.CharField(blank=True, help_text='Código de barras o SKU (opcional, único; índice para el escáner del POS)', max_length=50, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def stock_inicial_kardex(apps, schema_editor):
+    """
+    Un movimiento 'inicial' por producto con su stock actual, para que el
+    kardex cuadre con stock_actual desde el primer día. La historia anterior
+    se puede cargar desde las ventas con el comando reconstruir_kardex.
+    """
+    Producto = apps.get_model('productos', 'Producto')
+    MovimientoStock = apps.get_model('productos', 'MovimientoStock')
+    ahora = django.utils.timezone.now()
+    lote = []
+    for producto_id, stock in Producto.objects.order_by().values_list('id', 'stock_actual').iterator(chunk_size=5000):
+        if stock:
+            lote.append(MovimientoStock(producto_id=producto_id, tipo='inicial', cantidad=stock, fecha=ahora))
+        if len(lote) == 5000:
+            MovimientoStock.objects.bulk_create(lote)
+            lote = []
+    MovimientoStock.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_producto_codigo_barras'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('inicial', 'Stock inicial'), ('venta', 'Venta'), ('devolucion', 'Devolución'), ('entrada', 'Entrada de mercancía'), ('ajuste', 'Ajuste manual')], help_text='Origen del movimiento', max_length=20)),
+                ('cantidad', models.IntegerField(help_text='Unidades que entran (positivo) o salen (negativo)')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, help_text='Fecha y hora del movimiento')),
+                ('referencia', models.CharField(blank=True, help_text='Documento que originó el movimiento (opcional)', max_length=100)),
+                ('producto', models.ForeignKey(help_text='Producto cuyo stock cambió', on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de stock',
+                'verbose_name_plural': 'Movimientos de stock',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corte', models.DateTimeField(help_text='Momento del corte')),
+                ('stock', models.IntegerField(help_text='Stock del producto al momento del corte')),
+                ('producto', models.ForeignKey(help_text='Producto', on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_stock', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de stock',
+                'verbose_name_plural': 'Snapshots de stock',
+                'ordering': ['-corte'],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'corte'), name='snapshot_producto_corte_unico')],
+            },
+        ),
+        migrations.RunPython(stock_inicial_kardex, migrations.RunPython.noop),
+    ]
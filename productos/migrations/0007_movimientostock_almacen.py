@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almacenes', '0003_remove_almacen_estado'),
+        ('productos', '0006_kardex_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimientostock',
+            name='almacen',
+            field=models.ForeignKey(blank=True, help_text='Almacén del movimiento (vacío para el stock sin asignar)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='almacenes.almacen'),
+        ),
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='tipo',
+            field=models.CharField(choices=[('inicial', 'Stock inicial'), ('venta', 'Venta'), ('devolucion', 'Devolución'), ('entrada', 'Entrada de mercancía'), ('ajuste', 'Ajuste manual'), ('transferencia', 'Transferencia entre almacenes')], help_text='Origen del movimiento', max_length=20),
+        ),
+    ]
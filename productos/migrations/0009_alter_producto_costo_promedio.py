@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_producto_costo_promedio'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producto',
+            name='costo_promedio',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Costo de compra promedio ponderado por unidad (se captura como costo inicial; lo actualiza la recepción de órdenes de compra)', max_digits=12, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
@@ -4,15 +4,22 @@ Define la estructura de datos para los productos del sistema de inventario.
 
 Este modelo representa un producto en el inventario con todas sus características:
 - Información básica (nombre, descripción, precio)
+- Código de barras para el escáner del punto de venta
 - Control de stock (inicial, actual, mínimo)
 - Relaciones con categorías y proveedores
 - Imagen del producto
 - Estado activo/inactivo
 - Fechas de creación y actualización
+
+También define el kardex de inventario:
+- MovimientoStock: registro de solo inserción de cada cambio de stock
+- SnapshotStock: stock de cada producto en un corte, para consultar el
+  stock en una fecha sin recorrer todos los movimientos (ver inventario.py)
 """
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from categorias.models import Categoria
 from proveedores.models import Proveedor
 
@@ -23,7 +30,9 @@ class Producto(models.Model):
     Campos principales:
         - nombre: Nombre del producto
         - descripcion: Descripción detallada (opcional)
+        - codigo_barras: Código de barras o SKU (opcional, único)
         - precio: Precio de venta del producto
+        - costo_promedio: Costo de compra promedio ponderado por unidad
         - stock_inicial: Cantidad inicial en inventario
         - stock_actual: Cantidad actual disponible
         - stock_minimo: Nivel mínimo de stock para alertas
@@ -44,6 +53,13 @@ class Producto(models.Model):
         blank=True,
         help_text="Descripción detallada del producto (opcional)"
     )
+    codigo_barras = models.CharField(
+        max_length=50,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Código de barras o SKU (opcional, único; índice para el escáner del POS)"
+    )
     
     # Información de precios y stock
     precio = models.DecimalField(
@@ -52,6 +68,14 @@ class Producto(models.Model):
         validators=[MinValueValidator(0)],
         help_text="Precio de venta del producto (mínimo 0)"
     )
+    costo_promedio = models.DecimalField(
+        max_digits=12,
+        decimal_places=4,
+        default=0,
+        validators=[MinValueValidator(0)],
+        help_text="Costo de compra promedio ponderado por unidad (se captura como costo inicial; "
+                  "lo actualiza la recepción de órdenes de compra)"
+    )
     stock_inicial = models.IntegerField(
         validators=[MinValueValidator(0)],
         help_text="Cantidad inicial en inventario (mínimo 0)"
@@ -110,6 +134,57 @@ class Producto(models.Model):
         """
         return self.nombre
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        producto = super().from_db(db, field_names, values)
+        # Stock leído de la base, para detectar en save() un ajuste manual
+        producto._stock_leido = producto.__dict__.get('stock_actual')
+        return producto
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda el producto, registra los cambios de stock en el kardex y lo
+        quita de la caché del escáner (el código o los datos de venta pudieron cambiar)
+
+        Un stock distinto del leído se registra como ajuste (o como stock
+        inicial si el producto es nuevo). Si el stock no se modificó no se
+        escribe, para que guardar otros campos no pise lo que descontaron
+        las ventas desde que se leyó el producto.
+        """
+        # Un código vacío se guarda como NULL para no chocar con la restricción única
+        self.codigo_barras = (self.codigo_barras or '').strip() or None
+
+        nuevo = self._state.adding
+        campos = kwargs.get('update_fields')
+        guarda_stock = 'stock_actual' in self.__dict__ and (campos is None or 'stock_actual' in campos)
+        ajuste = guarda_stock and not nuevo and self.stock_actual != getattr(self, '_stock_leido', None)
+        if guarda_stock and not nuevo and not ajuste and campos is None and not self.get_deferred_fields():
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'stock_actual'
+            ]
+
+        with transaction.atomic():
+            anterior = None
+            if ajuste:
+                anterior = Producto.objects.select_for_update().values_list('stock_actual', flat=True).get(pk=self.pk)
+            super().save(*args, **kwargs)
+            if nuevo and self.stock_actual:
+                MovimientoStock.registrar({self.pk: self.stock_actual}, 'inicial')
+            elif anterior is not None and anterior != self.stock_actual:
+                MovimientoStock.registrar({self.pk: self.stock_actual - anterior}, 'ajuste', 'Edición del producto')
+        if 'stock_actual' in self.__dict__:
+            self._stock_leido = self.stock_actual
+
+        from .escaner import cache_codigos
+        cache_codigos.invalidar_productos([self.pk])
+
+    def delete(self, *args, **kwargs):
+        """Elimina el producto y lo quita de la caché del escáner"""
+        from .escaner import cache_codigos
+        cache_codigos.invalidar_productos([self.pk])
+        return super().delete(*args, **kwargs)
+
     @property
     def stock_bajo(self):
         """
@@ -129,3 +204,159 @@ class Producto(models.Model):
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['-fecha_creacion']  # Ordenar por fecha de creación (más recientes primero)
+        indexes = [
+            # Listados y API filtrados por estado y stock
+            models.Index(fields=['activo', 'stock_actual'], name='producto_activo_stock_idx'),
+            # Productos activos de una categoría
+            models.Index(fields=['categoria', 'activo'], name='producto_categoria_activo_idx'),
+            # Alertas de stock bajo: solo los productos en o bajo su mínimo
+            models.Index(
+                fields=['stock_actual'],
+                name='producto_stock_bajo_idx',
+                condition=models.Q(stock_actual__lte=models.F('stock_minimo')),
+            ),
+            # Versión y cambios del catálogo del POS (ventas/catalogo.py)
+            models.Index(fields=['fecha_actualizacion'], name='producto_actualizacion_idx'),
+        ]
+
+
+class MovimientoStock(models.Model):
+    """
+    Movimiento de stock de un producto (kardex)
+    Solo se insertan filas: el stock de un producto en cualquier momento es
+    la suma de sus movimientos hasta ese momento.
+
+    Campos principales:
+        - producto: Producto cuyo stock cambió
+        - tipo: Origen del movimiento (venta, ajuste, devolución, etc.)
+        - cantidad: Unidades que entran (positivo) o salen (negativo)
+        - fecha: Momento del movimiento
+        - referencia: Documento que lo originó, por ejemplo 'Venta #15' (opcional)
+        - almacen: Almacén donde ocurrió (vacío para el stock sin asignar)
+    """
+
+    TIPOS = [
+        ('inicial', 'Stock inicial'),
+        ('venta', 'Venta'),
+        ('devolucion', 'Devolución'),
+        ('entrada', 'Entrada de mercancía'),
+        ('ajuste', 'Ajuste manual'),
+        ('transferencia', 'Transferencia entre almacenes'),
+    ]
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='movimientos_stock',
+        help_text="Producto cuyo stock cambió"
+    )
+    tipo = models.CharField(
+        max_length=20,
+        choices=TIPOS,
+        help_text="Origen del movimiento"
+    )
+    cantidad = models.IntegerField(
+        help_text="Unidades que entran (positivo) o salen (negativo)"
+    )
+    fecha = models.DateTimeField(
+        default=timezone.now,
+        help_text="Fecha y hora del movimiento"
+    )
+    referencia = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Documento que originó el movimiento (opcional)"
+    )
+    almacen = models.ForeignKey(
+        'almacenes.Almacen',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_stock',
+        help_text="Almacén del movimiento (vacío para el stock sin asignar)"
+    )
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.cantidad:+d} ({self.tipo})"
+
+    @classmethod
+    def registrar(cls, cantidades, tipo, referencia='', fecha=None, almacen_id=None):
+        """
+        Inserta un movimiento por producto con un único bulk_create
+
+        Args:
+            cantidades: Diccionario {producto_id: unidades con signo}
+            tipo: Uno de TIPOS
+            referencia: Documento que originó los movimientos (opcional)
+            fecha: Momento de los movimientos (por defecto ahora)
+            almacen_id: Almacén de los movimientos (opcional)
+        """
+        fecha = fecha or timezone.now()
+        cls.insertar([
+            cls(
+                producto_id=producto_id, tipo=tipo, cantidad=cantidad, fecha=fecha,
+                referencia=referencia, almacen_id=almacen_id,
+            )
+            for producto_id, cantidad in cantidades.items()
+            if cantidad
+        ])
+
+    @classmethod
+    def insertar(cls, movimientos):
+        """
+        Inserta movimientos ya armados (de varios documentos) con un único bulk_create
+
+        Args:
+            movimientos: Lista de MovimientoStock sin guardar
+        """
+        cls.objects.bulk_create(movimientos)
+
+        # El stock de los reportes ya no es el mismo
+        from reportes.cache import invalidar_reportes
+        invalidar_reportes()
+
+    class Meta:
+        verbose_name = 'Movimiento de stock'
+        verbose_name_plural = 'Movimientos de stock'
+        ordering = ['-fecha']
+        indexes = [
+            # Stock en una fecha: movimientos de un producto desde su último snapshot
+            models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx'),
+        ]
+
+
+class SnapshotStock(models.Model):
+    """
+    Stock de un producto en un corte (incluye los movimientos hasta el corte)
+    Se generan periódicamente con el comando tomar_snapshots_stock.
+
+    Campos principales:
+        - producto: Producto
+        - corte: Momento del corte
+        - stock: Stock del producto en ese momento
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='snapshots_stock',
+        help_text="Producto"
+    )
+    corte = models.DateTimeField(
+        help_text="Momento del corte"
+    )
+    stock = models.IntegerField(
+        help_text="Stock del producto al momento del corte"
+    )
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.corte}: {self.stock}"
+
+    class Meta:
+        verbose_name = 'Snapshot de stock'
+        verbose_name_plural = 'Snapshots de stock'
+        ordering = ['-corte']
+        constraints = [
+            # También sirve de índice para buscar el último corte de un producto
+            models.UniqueConstraint(fields=['producto', 'corte'], name='snapshot_producto_corte_unico'),
+        ]
@@ -30,7 +30,7 @@ class ProductoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Producto
         fields = [
-            'id', 'nombre', 'descripcion', 'precio', 'stock_inicial', 'stock_actual', 
+            'id', 'nombre', 'descripcion', 'codigo_barras', 'precio', 'stock_inicial', 'stock_actual', 
             'stock_minimo', 'categoria', 'proveedor', 'imagen', 
             'activo', 'fecha_creacion', 'categoria_id', 'proveedor_id'
         ]
@@ -39,12 +39,12 @@ class ProductoSerializer(serializers.ModelSerializer):
 class ProductoListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listar productos"""
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
-    proveedor_nombre = serializers.CharField(source='proveedor.nombre', read_only=True)
+    proveedor_nombre = serializers.CharField(source='proveedor.nombre', read_only=True, default=None)
     
     class Meta:
         model = Producto
         fields = [
-            'id', 'nombre', 'precio', 'stock_actual', 'stock_minimo',
+            'id', 'nombre', 'codigo_barras', 'precio', 'stock_actual', 'stock_minimo',
             'categoria_nombre', 'proveedor_nombre', 'activo'
         ]
 
@@ -53,6 +53,6 @@ class ProductoCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Producto
         fields = [
-            'nombre', 'descripcion', 'precio', 'stock_inicial', 'stock_actual', 
+            'nombre', 'descripcion', 'codigo_barras', 'precio', 'stock_inicial', 'stock_actual', 
             'stock_minimo', 'categoria', 'proveedor', 'imagen'
         ] 
\ No newline at end of file
@@ -1,3 +1,413 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from categorias.models import Categoria
+from proveedores.models import Proveedor
+from ventas.checkout import registrar_venta
+from .busqueda import buscar_productos, indice_productos
+from .escaner import cache_codigos, linea_por_codigo
+from .importacion import escribir_csv, importar_productos, leer_filas
+from .inventario import inventario_promedio, reconstruir_kardex, stock_en_fecha, tomar_snapshots
+from .models import MovimientoStock, Producto
+
+
+class BusquedaProductosTests(TestCase):
+    """Índice de búsqueda en memoria y su uso en las vistas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cajero', 'cajero@example.com', 'clave')
+        cls.categoria = Categoria.objects.create(nombre='Abarrotes')
+        for nombre in ['Leche Entera 1L', 'Leche Deslactosada 1L', 'Pan de Leche', 'Lechuga Romana', 'Café Molido']:
+            cls.crear(nombre)
+
+    @classmethod
+    def crear(cls, nombre, **campos):
+        return Producto.objects.create(
+            nombre=nombre, precio=Decimal('10.00'), stock_inicial=10, stock_actual=10,
+            categoria=cls.categoria, **campos
+        )
+
+    def setUp(self):
+        # Cada prueba arma el índice con los datos de su transacción
+        indice_productos.reconstruir()
+
+    def nombres(self, consulta, limite=10):
+        return [producto.nombre for producto in buscar_productos(consulta, limite)]
+
+    def test_prefijo_y_orden_por_relevancia(self):
+        # Palabra exacta al inicio del nombre y después en otra posición
+        self.assertEqual(self.nombres('leche'), ['Leche Entera 1L', 'Leche Deslactosada 1L', 'Pan de Leche'])
+        # Como prefijo, los nombres que empiezan con él van primero (los más cortos antes)
+        self.assertEqual(
+            self.nombres('lech'),
+            ['Lechuga Romana', 'Leche Entera 1L', 'Leche Deslactosada 1L', 'Pan de Leche'],
+        )
+        self.assertEqual(self.nombres('lech ent'), ['Leche Entera 1L'])
+
+    def test_ignora_acentos_y_mayusculas(self):
+        self.assertEqual(self.nombres('CAFE'), ['Café Molido'])
+
+    def test_tolera_errores_de_tecleo(self):
+        self.assertIn('Café Molido', self.nombres('cafe mlido'))
+
+    def test_actualiza_productos_guardados(self):
+        self.assertEqual(self.nombres('yogurt'), [])
+        self.crear('Yogurt Natural')
+        self.assertEqual(self.nombres('yogurt'), ['Yogurt Natural'])
+
+        cafe = Producto.objects.get(nombre='Café Molido')
+        cafe.activo = False
+        cafe.save()
+        self.assertEqual(self.nombres('cafe'), [])
+
+    def test_descarta_productos_eliminados(self):
+        self.assertEqual(self.nombres('lechuga'), ['Lechuga Romana'])
+        Producto.objects.filter(nombre='Lechuga Romana').delete()
+        self.assertEqual(self.nombres('lechuga'), [])
+
+    def test_vista_buscar(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('productos:buscar'), {'q': 'leche', 'limite': 2})
+        resultados = respuesta.json()['resultados']
+        self.assertEqual([r['nombre'] for r in resultados], ['Leche Entera 1L', 'Leche Deslactosada 1L'])
+        self.assertEqual(resultados[0]['categoria'], 'Abarrotes')
+
+    def test_listado_filtra_con_el_indice(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('productos:lista_productos'), {'q': 'pan'})
+        self.assertEqual([p.nombre for p in respuesta.context['productos']], ['Pan de Leche'])
+
+
+class EscanerCodigosTests(TestCase):
+    """Búsqueda por código de barras del POS y su caché"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cajero', 'cajero@example.com', 'clave')
+        cls.categoria = Categoria.objects.create(nombre='Bebidas')
+        cls.refresco = Producto.objects.create(
+            nombre='Refresco Cola 600ml', codigo_barras='7501055300075', precio=Decimal('18.00'),
+            stock_inicial=20, stock_actual=20, categoria=cls.categoria,
+        )
+
+    def setUp(self):
+        cache_codigos.limpiar()
+        self.client.force_login(self.usuario)
+
+    def escanear(self, codigo):
+        return self.client.get(reverse('productos:escanear'), {'codigo': codigo})
+
+    def test_resuelve_codigo_con_una_consulta_y_luego_desde_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(linea_por_codigo(' 7501055300075\n')['id'], self.refresco.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(linea_por_codigo('7501055300075')['nombre'], 'Refresco Cola 600ml')
+
+        respuesta = self.escanear('7501055300075')
+        self.assertEqual(respuesta.json()['producto']['precio'], '18.00')
+        self.assertEqual(self.escanear('0000').status_code, 404)
+
+    def test_guardar_invalida_la_cache(self):
+        self.assertEqual(linea_por_codigo('7501055300075')['precio'], '18.00')
+        self.refresco.precio = Decimal('19.50')
+        self.refresco.save()
+        self.assertEqual(linea_por_codigo('7501055300075')['precio'], '19.50')
+
+        # Un código que no existía aparece al asignarlo a un producto
+        self.assertIsNone(linea_por_codigo('123'))
+        self.refresco.codigo_barras = '123'
+        self.refresco.save()
+        self.assertEqual(linea_por_codigo('123')['id'], self.refresco.id)
+        self.assertIsNone(linea_por_codigo('7501055300075'))
+
+    def test_cobro_invalida_el_stock_en_cache(self):
+        self.assertEqual(linea_por_codigo('7501055300075')['stock'], 20)
+        registrar_venta([(self.refresco.id, 2)])
+        self.assertEqual(linea_por_codigo('7501055300075')['stock'], 18)
+
+    def test_inactivos_no_se_escanean(self):
+        self.refresco.activo = False
+        self.refresco.save()
+        self.assertEqual(self.escanear('7501055300075').status_code, 404)
+
+    def test_codigo_vacio_se_guarda_como_nulo(self):
+        # Varios productos sin código no chocan con la restricción única
+        for nombre in ['Agua 1L', 'Agua 2L']:
+            producto = Producto.objects.create(
+                nombre=nombre, codigo_barras='', precio=1, stock_inicial=1, stock_actual=1,
+                categoria=self.categoria,
+            )
+            self.assertIsNone(producto.codigo_barras)
+
+    def test_codigo_en_la_busqueda(self):
+        indice_productos.reconstruir()
+        self.assertEqual([p.nombre for p in buscar_productos('7501055')], ['Refresco Cola 600ml'])
+
+
+class KardexTests(TestCase):
+    """Movimientos de stock, snapshots y stock en una fecha"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('admin', 'admin@example.com', 'clave', is_staff=True)
+        cls.categoria = Categoria.objects.create(nombre='Abarrotes')
+
+    def crear(self, stock=10):
+        return Producto.objects.create(
+            nombre='Azúcar 1kg', precio=Decimal('30.00'), stock_inicial=stock, stock_actual=stock,
+            categoria=self.categoria,
+        )
+
+    def movimientos(self, producto):
+        return list(producto.movimientos_stock.order_by('id').values_list('tipo', 'cantidad'))
+
+    def test_alta_venta_y_ajuste_quedan_en_el_kardex(self):
+        producto = self.crear()
+        registrar_venta([(producto.id, 3)])
+        producto.refresh_from_db()
+        producto.stock_actual = 12
+        producto.save()
+        self.assertEqual(self.movimientos(producto), [('inicial', 10), ('venta', -3), ('ajuste', 5)])
+        self.assertEqual(sum(cantidad for _, cantidad in self.movimientos(producto)), 12)
+
+    def test_guardar_otros_campos_no_pisa_el_stock(self):
+        producto = self.crear()
+        registrar_venta([(producto.id, 4)])  # Otra caja vende con el producto ya leído
+        producto.precio = Decimal('32.00')
+        producto.save()
+        producto.refresh_from_db()
+        self.assertEqual((producto.stock_actual, producto.precio), (6, Decimal('32.00')))
+        self.assertEqual(self.movimientos(producto), [('inicial', 10), ('venta', -4)])
+
+    def test_api_actualizar_stock_registra_ajuste(self):
+        producto = self.crear()
+        self.client.force_login(self.usuario)
+        url = reverse('api-producto-actualizar-stock', args=[producto.id])
+        self.assertEqual(self.client.post(url, {'cantidad': -1}).status_code, 400)
+        respuesta = self.client.post(url, {'cantidad': 7})
+        self.assertEqual(respuesta.json()['stock_actual'], 7)
+        self.assertEqual(self.movimientos(producto), [('inicial', 10), ('ajuste', -3)])
+
+    def test_stock_en_fecha_desde_snapshot(self):
+        producto = self.crear(stock=0)
+        ahora = timezone.now()
+        for dias, cantidad in [(10, 100), (5, -30), (2, -20)]:
+            MovimientoStock.objects.create(
+                producto=producto, tipo='venta' if cantidad < 0 else 'entrada', cantidad=cantidad,
+                fecha=ahora - timedelta(days=dias),
+            )
+        self.assertEqual(stock_en_fecha(ahora - timedelta(days=6), [producto.id]), {producto.id: 100})
+        self.assertEqual(stock_en_fecha(ahora, [producto.id]), {producto.id: 50})
+
+        tomar_snapshots(ahora - timedelta(days=4))
+        # Inicio (100), snapshot del día 4 (70) y fin (50)
+        promedio = inventario_promedio(ahora - timedelta(days=6), ahora, [producto.id])
+        self.assertAlmostEqual(promedio[producto.id], (100 + 70 + 50) / 3)
+
+        # Los movimientos anteriores al snapshot ya no se recorren
+        MovimientoStock.objects.filter(cantidad=100).update(cantidad=0)
+        self.assertEqual(stock_en_fecha(ahora, [producto.id]), {producto.id: 50})
+        self.assertEqual(stock_en_fecha(ahora - timedelta(days=3), [producto.id]), {producto.id: 70})
+
+    def test_reconstruir_solo_carga_productos_sin_movimientos(self):
+        con_kardex = self.crear()
+        registrar_venta([(con_kardex.id, 2)])
+        con_kardex.refresh_from_db()
+        con_kardex.stock_actual = 5
+        con_kardex.save()
+        # Producto insertado sin movimientos (base anterior al kardex) con una venta
+        sin_kardex = self.crear()
+        registrar_venta([(sin_kardex.id, 4)])
+        sin_kardex.movimientos_stock.all().delete()
+
+        self.assertEqual(reconstruir_kardex(), 2)
+        self.assertEqual(self.movimientos(con_kardex), [('inicial', 10), ('venta', -2), ('ajuste', -3)])
+        self.assertEqual(self.movimientos(sin_kardex), [('inicial', 10), ('venta', -4)])
+        self.assertEqual(reconstruir_kardex(), 0)
+
+        # Reemplazar reconstruye todo: el ajuste queda dentro del stock inicial
+        self.assertEqual(reconstruir_kardex(reemplazar=True), 4)
+        self.assertEqual(self.movimientos(con_kardex), [('inicial', 7), ('venta', -2)])
+
+
+class ImportacionProductosTests(TestCase):
+    """Importación y exportación masiva de productos"""
+
+    ENCABEZADO = 'codigo_barras,nombre,categoria,proveedor,precio,stock_actual,activo\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('admin', 'admin@example.com', 'clave', is_staff=True)
+        cls.categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.arroz = Producto.objects.create(
+            nombre='Arroz 1kg', codigo_barras='750100', precio=Decimal('25.00'), stock_inicial=10,
+            stock_actual=10, categoria=cls.categoria,
+        )
+
+    def importar(self, texto, **opciones):
+        reporte = io.StringIO()
+        archivo = io.BytesIO(texto.encode('utf-8'))
+        resultado = importar_productos(leer_filas(archivo, 'csv'), reporte, **opciones)
+        return resultado, list(csv.reader(io.StringIO(reporte.getvalue())))[1:]
+
+    def test_crea_y_actualiza_por_codigo(self):
+        resultado, errores = self.importar(
+            self.ENCABEZADO
+            + '750100,Arroz 1kg,abarrotes,,27.50,8,\n'
+            + '750200,Frijol 1kg,Abarrotes,,30,15,No\n'
+            + ',Sal 1kg,Abarrotes,,12,,\n'
+        )
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.errores), (2, 1, 0))
+        self.assertEqual(errores, [])
+
+        self.arroz.refresh_from_db()
+        self.assertEqual((self.arroz.precio, self.arroz.stock_actual, self.arroz.activo), (Decimal('27.50'), 8, True))
+        frijol = Producto.objects.get(codigo_barras='750200')
+        self.assertEqual((frijol.stock_inicial, frijol.stock_actual, frijol.activo), (15, 15, False))
+        self.assertEqual(Producto.objects.get(nombre='Sal 1kg').stock_actual, 0)
+        self.assertIsNone(Producto.objects.get(nombre='Sal 1kg').codigo_barras)
+
+        # El stock queda en el kardex: ajuste del existente y stock inicial del nuevo
+        self.assertEqual(list(self.arroz.movimientos_stock.order_by('id').values_list('tipo', 'cantidad')),
+                         [('inicial', 10), ('ajuste', -2)])
+        self.assertEqual(list(frijol.movimientos_stock.values_list('tipo', 'cantidad')), [('inicial', 15)])
+
+    def test_filas_invalidas_van_al_reporte(self):
+        resultado, errores = self.importar(
+            self.ENCABEZADO
+            + '750300,Aceite 1L,Abarrotes,,-5,3,\n'
+            + '750400,Café 500g,Bebidas,,80,3,\n'
+            + '750500,Azúcar 1kg,Abarrotes,Nadie,30,3,\n'
+            + '750600,Avena 1kg,Abarrotes,,20,3,\n'
+            + '750600,Avena 2kg,Abarrotes,,35,3,\n'
+        )
+        self.assertEqual((resultado.filas, resultado.creados, resultado.errores), (5, 1, 4))
+        self.assertEqual([fila[0] for fila in errores], ['6', '2', '3', '4'])
+        self.assertIn('repetido en el archivo (fila 5)', errores[0][1])
+        self.assertEqual(errores[2][1], 'categoria: La categoría "Bebidas" no existe')
+        self.assertEqual(list(Producto.objects.order_by('id').values_list('nombre', flat=True)),
+                         ['Arroz 1kg', 'Avena 1kg'])
+
+    def test_costo_inicial_por_importacion(self):
+        # Un costo vacío conserva el actual; en productos nuevos queda en 0
+        resultado, errores = self.importar(
+            'codigo_barras,nombre,categoria,precio,costo_promedio\n'
+            '750100,Arroz 1kg,Abarrotes,25,18.5\n'
+            '750200,Frijol 1kg,Abarrotes,30,\n'
+        )
+        self.assertEqual((resultado.creados, resultado.actualizados, errores), (1, 1, []))
+        self.arroz.refresh_from_db()
+        self.assertEqual(self.arroz.costo_promedio, Decimal('18.5000'))
+        self.assertEqual(Producto.objects.get(codigo_barras='750200').costo_promedio, 0)
+        resultado, _ = self.importar('codigo_barras,nombre,categoria,precio,costo_promedio\n750100,Arroz 1kg,Abarrotes,25,\n')
+        self.assertEqual(resultado.sin_cambios, 1)
+
+    def test_solo_validar_no_guarda(self):
+        resultado, _ = self.importar(self.ENCABEZADO + '750200,Frijol 1kg,Abarrotes,,30,15,\n', solo_validar=True)
+        self.assertEqual(resultado.creados, 1)
+        self.assertFalse(Producto.objects.filter(codigo_barras='750200').exists())
+
+    def test_exportacion_se_importa_sin_cambios(self):
+        # Sin código de barras el producto se reconoce por su id
+        sal = Producto.objects.create(
+            nombre='Sal 1kg', precio=Decimal('12.00'), stock_inicial=4, stock_actual=4, categoria=self.categoria,
+        )
+        exportado = io.StringIO(newline='')
+        escribir_csv(exportado)
+        resultado, errores = self.importar(exportado.getvalue().replace(',Sal 1kg,', ',Sal de mar 1kg,'))
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.sin_cambios), (0, 1, 1))
+        self.assertEqual(errores, [])
+        sal.refresh_from_db()
+        self.assertEqual(sal.nombre, 'Sal de mar 1kg')
+
+        resultado, errores = self.importar(f'id,nombre,categoria,precio,codigo_barras\n{sal.id},Sal,Abarrotes,12,750100\n')
+        self.assertIn(f'ya lo usa el producto #{self.arroz.id}', errores[0][1])
+
+        # Un código en blanco se guarda como NULL también en el UPDATE masivo
+        resultado, errores = self.importar(f'id,nombre,categoria,precio,codigo_barras\n{self.arroz.id},Arroz 1kg,Abarrotes,25, \n')
+        self.assertEqual((resultado.actualizados, errores), (1, []))
+        self.assertIsNone(Producto.objects.get(pk=self.arroz.pk).codigo_barras)
+
+    def test_vistas_importar_y_exportar(self):
+        self.client.force_login(self.usuario)
+        archivo = io.BytesIO((self.ENCABEZADO + '750200,Frijol 1kg,Abarrotes,,30,15,\n').encode('utf-8'))
+        archivo.name = 'catalogo.csv'
+        respuesta = self.client.post(reverse('productos:importar_productos'), {'archivo': archivo})
+        self.assertContains(respuesta, 'Productos creados: 1')
+        self.assertTrue(Producto.objects.filter(codigo_barras='750200').exists())
+
+        archivo = io.BytesIO(b'nombre\n')
+        archivo.name = 'catalogo.txt'
+        respuesta = self.client.post(reverse('productos:importar_productos'), {'archivo': archivo})
+        self.assertContains(respuesta, 'Formato no soportado')
+
+        respuesta = self.client.get(reverse('productos:exportar_productos'))
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        self.assertTrue(contenido.startswith('id,codigo_barras,nombre'))
+        self.assertIn('Frijol 1kg', contenido)
+
+
+class ProductoApiTests(TestCase):
+    """Listado de la API de productos: paginación, campos y consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('admin', 'admin@example.com', 'clave', is_staff=True)
+        cls.categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.crear_productos(range(60))
+
+    @classmethod
+    def crear_productos(cls, numeros):
+        proveedor = Proveedor.objects.create(nombre=f'Proveedor {numeros[0]}', telefono='555', email='p@example.com')
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {numero:03d}', precio=Decimal('10.00'), stock_inicial=10, stock_actual=10,
+                categoria=cls.categoria, proveedor=proveedor if numero % 2 else None,
+            )
+            for numero in numeros
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_consultas_constantes_y_cursor(self):
+        url = reverse('api-producto-list')
+        # Sesión, usuario y una consulta con categoría y proveedor
+        with self.assertNumQueries(3):
+            pagina = self.client.get(url).json()
+        self.crear_productos(range(60, 200))
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+        self.assertEqual(len(pagina['results']), 50)
+        self.assertEqual(pagina['results'][1]['categoria_nombre'], 'Abarrotes')
+        self.assertEqual(pagina['results'][0]['proveedor_nombre'], None)
+        # Renombrar un producto entre páginas no lo salta ni lo repite
+        Producto.objects.filter(nombre='Producto 060').update(nombre='AAA Producto 060')
+        siguiente = self.client.get(pagina['next']).json()
+        self.assertEqual(siguiente['results'][0]['nombre'], 'Producto 050')
+        self.assertEqual(siguiente['results'][10]['nombre'], 'AAA Producto 060')
+
+    def test_campos_dispersos(self):
+        url = reverse('api-producto-list')
+        # Sin los nombres de categoría y proveedor no hay select_related
+        with self.assertNumQueries(3):
+            datos = self.client.get(url, {'fields': 'id,nombre', 'tamano': 5}).json()
+        self.assertEqual([set(fila) for fila in datos['results']], [{'id', 'nombre'}] * 5)
+        self.assertEqual(self.client.get(url, {'fields': 'id,costo'}).status_code, 400)
+
+    def test_lista_rapida_igual_al_serializer(self):
+        url = reverse('api-producto-list')
+        for parametros in [{'tamano': 100}, {'tamano': 100, 'fields': 'id,precio,proveedor_nombre'}]:
+            rapida = self.client.get(url, parametros).json()
+            with override_settings(API_LISTA_RAPIDA=False):
+                serializer = self.client.get(url, parametros).json()
+            self.assertEqual(rapida, serializer)
@@ -39,4 +39,19 @@ urlpatterns = [
     # GET: Cambia el estado y redirige a la lista
     # pk: ID del producto cuyo estado se va a cambiar
     path('cambiar-estado/<int:pk>/', views.cambiar_estado_producto, name='cambiar_estado_producto'),
+    
+    # URL de búsqueda para el POS (JSON)
+    # GET: q (texto a buscar), limite (máximo de resultados)
+    path('buscar/', views.buscar, name='buscar'),
+    
+    # URL del escáner de códigos de barras del POS (JSON)
+    # GET: codigo (código leído); 404 si no existe un producto activo con ese código
+    path('escanear/', views.escanear, name='escanear'),
+    
+    # URLs de importación y exportación masiva (CSV o XLSX)
+    # importar: GET muestra el formulario; POST procesa el archivo por lotes
+    # exportar: GET con formato=csv (por defecto) o formato=xlsx
+    path('importar/', views.importar_productos, name='importar_productos'),
+    path('importar/errores/<str:nombre>/', views.descargar_errores_importacion, name='descargar_errores_importacion'),
+    path('exportar/', views.exportar_productos, name='exportar_productos'),
 ] 
\ No newline at end of file
@@ -5,6 +5,7 @@ Este módulo maneja todas las operaciones relacionadas con productos:
 - Creación de nuevos productos
 - Edición de productos existentes
 - Activación/desactivación de productos
+- Importación y exportación masiva en CSV o XLSX (ver importacion.py)
 
 Características:
 - Filtros avanzados (nombre, categoría, stock, estado)
@@ -14,13 +15,27 @@ Características:
 - Autenticación requerida para todas las operaciones
 """
 
+import csv
+import io
+import itertools
+import re
+import tempfile
+import uuid
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
+from django.core.files.base import File
+from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
 from django.urls import reverse
+from django.utils import timezone
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from .models import Producto
+from . import importacion
+from .busqueda import buscar_productos, filtrar_por_busqueda
+from .escaner import linea_por_codigo
 from categorias.models import Categoria
 from .forms import ProductoForm
 
@@ -58,12 +73,9 @@ def lista_productos(request):
     stock_filter = request.GET.get('stock')
     estado = request.GET.get('estado', 'activo')  # Por defecto mostrar activos
     
-    # Filtro 1: Búsqueda por texto (nombre o descripción)
+    # Filtro 1: Búsqueda por texto (nombre o descripción) con el índice en memoria
     if query:
-        productos_list = productos_list.filter(
-            Q(nombre__icontains=query) |  # Buscar en nombre (insensible a mayúsculas)
-            Q(descripcion__icontains=query)  # Buscar en descripción
-        )
+        productos_list = filtrar_por_busqueda(productos_list, query)
     
     # Filtro 2: Por categoría específica
     if categoria_id:
@@ -213,3 +225,143 @@ def cambiar_estado_producto(request, pk):
     
     # Redirigir a la lista de productos
     return redirect('productos:lista_productos')
+
+@login_required
+def buscar(request):
+    """
+    Búsqueda de productos activos para el POS mientras se escribe
+
+    Args:
+        request: Objeto HttpRequest con parámetros GET:
+            - q: Texto a buscar (nombre o descripción)
+            - limite: Cantidad máxima de resultados (por defecto 10, máximo 50)
+
+    Returns:
+        JsonResponse: {'resultados': [...]} ordenados por relevancia
+    """
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 1), 50)
+    except ValueError:
+        limite = 10
+
+    resultados = [
+        {
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'precio': str(producto.precio),
+            'stock': producto.stock_actual,
+            'categoria_id': producto.categoria_id,
+            'categoria': producto.categoria.nombre,
+            'imagen': producto.imagen.url if producto.imagen else None,
+        }
+        for producto in buscar_productos(request.GET.get('q', ''), limite)
+    ]
+    return JsonResponse({'resultados': resultados})
+
+@login_required
+def escanear(request):
+    """
+    Resuelve un código de barras leído en el POS a una línea del carrito
+
+    Args:
+        request: Objeto HttpRequest con parámetro GET:
+            - codigo: Código de barras o SKU
+
+    Returns:
+        JsonResponse: {'producto': {...}} o 404 con {'error': ...} si no hay
+            un producto activo con ese código
+    """
+    linea = linea_por_codigo(request.GET.get('codigo', ''))
+    if linea is None:
+        return JsonResponse({'error': 'Código no encontrado'}, status=404)
+    return JsonResponse({'producto': linea})
+
+@login_required
+def importar_productos(request):
+    """
+    Importa productos en lote desde un CSV o XLSX
+
+    Args:
+        request: Objeto HttpRequest. En POST:
+            - archivo: CSV o XLSX con las columnas de importacion.COLUMNAS
+            - solo_validar: Si está marcado, valida sin guardar
+
+    Returns:
+        HttpResponse: Formulario de importación con el resumen y, si hubo
+            filas rechazadas, el enlace al reporte de errores
+    """
+    context = {'columnas': importacion.COLUMNAS, 'requeridas': importacion.COLUMNAS_REQUERIDAS}
+    if request.method == 'POST' and request.FILES.get('archivo'):
+        archivo = request.FILES['archivo']
+        solo_validar = bool(request.POST.get('solo_validar'))
+        reporte = tempfile.TemporaryFile(mode='w+', encoding='utf-8', newline='')
+        try:
+            formato = importacion.formato_de(archivo.name)
+            resultado = importacion.importar_productos(
+                importacion.leer_filas(archivo, formato), reporte, solo_validar=solo_validar,
+            )
+        except importacion.ImportacionInvalida as e:
+            messages.error(request, str(e))
+            reporte.close()
+            return render(request, 'productos/importar_productos.html', context)
+
+        if resultado.errores:
+            # El reporte se guarda para descargarlo desde el resumen
+            nombre = f'importaciones/errores_{uuid.uuid4().hex}.csv'
+            reporte.seek(0)
+            context['reporte'] = default_storage.save(nombre, File(io.BytesIO(reporte.read().encode('utf-8-sig'))))
+        reporte.close()
+        context['resultado'] = resultado
+        context['solo_validar'] = solo_validar
+        if not solo_validar and (resultado.creados or resultado.actualizados):
+            messages.success(request, f'Importación terminada: {resultado}.')
+    return render(request, 'productos/importar_productos.html', context)
+
+@login_required
+def descargar_errores_importacion(request, nombre):
+    """
+    Descarga el reporte de errores de una importación
+
+    Args:
+        nombre: Nombre del archivo (errores_<hex>.csv)
+    """
+    if not re.fullmatch(r'errores_[0-9a-f]{32}\.csv', nombre):
+        raise Http404
+    ruta = f'importaciones/{nombre}'
+    if not default_storage.exists(ruta):
+        raise Http404
+    return FileResponse(default_storage.open(ruta, 'rb'), as_attachment=True, filename=nombre)
+
+class _Eco:
+    """Archivo ficticio: csv.writer devuelve cada línea en lugar de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+@login_required
+def exportar_productos(request):
+    """
+    Exporta el catálogo con las columnas de la importación
+
+    Args:
+        request: Objeto HttpRequest con parámetro GET opcional:
+            - formato: 'csv' (por defecto, se transmite por partes) o 'xlsx'
+
+    Returns:
+        StreamingHttpResponse o FileResponse: Descarga del archivo
+    """
+    fecha = timezone.localdate().strftime('%Y%m%d')
+    if request.GET.get('formato') == 'xlsx':
+        archivo = tempfile.TemporaryFile()
+        importacion.escribir_xlsx(archivo)
+        archivo.seek(0)
+        return FileResponse(archivo, as_attachment=True, filename=f'productos_{fecha}.xlsx')
+
+    escritor = csv.writer(_Eco())
+    lineas = itertools.chain(
+        ['\ufeff', escritor.writerow(importacion.COLUMNAS)],  # BOM para que Excel lea UTF-8
+        (escritor.writerow(fila) for fila in importacion.filas_exportacion()),
+    )
+    respuesta = StreamingHttpResponse(lineas, content_type='text/csv; charset=utf-8')
+    respuesta['Content-Disposition'] = f'attachment; filename="productos_{fecha}.csv"'
+    return respuesta
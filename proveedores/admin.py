@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Proveedor
+from django.contrib import admin, messages
+from .compras import CompraInvalida, recibir_orden_compra
+from .models import DetalleOrdenCompra, OrdenCompra, Proveedor
 
 @admin.register(Proveedor)
 class ProveedorAdmin(admin.ModelAdmin):
@@ -8,3 +9,34 @@ class ProveedorAdmin(admin.ModelAdmin):
     search_fields = ('nombre', 'contacto', 'email')
     list_editable = ('activo',)
     readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+
+class DetalleOrdenCompraInline(admin.TabularInline):
+    model = DetalleOrdenCompra
+    extra = 1
+    autocomplete_fields = ('producto',)
+    readonly_fields = ('subtotal',)
+
+@admin.register(OrdenCompra)
+class OrdenCompraAdmin(admin.ModelAdmin):
+    list_display = ('id', 'proveedor', 'fecha', 'referencia', 'estado', 'total')
+    list_filter = ('estado', 'proveedor')
+    search_fields = ('referencia', 'proveedor__nombre')
+    readonly_fields = ('estado', 'fecha_recepcion', 'total')
+    inlines = [DetalleOrdenCompraInline]
+    actions = ['recibir_ordenes']
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        orden = form.instance
+        orden.total = sum(detalle.subtotal for detalle in orden.detalles.all())
+        orden.save(update_fields=['total'])
+
+    @admin.action(description='Recibir las órdenes seleccionadas (suma stock y actualiza costos)')
+    def recibir_ordenes(self, request, queryset):
+        for orden in queryset:
+            try:
+                recibir_orden_compra(orden.id)
+            except CompraInvalida as e:
+                self.message_user(request, str(e), messages.WARNING)
+            else:
+                self.message_user(request, f'Orden de compra #{orden.id} recibida')
@@ -0,0 +1,158 @@
+"""
+Compras a proveedores y costo de los productos para TradeInventory
+
+- crear_orden_compra(): registra una orden pendiente con sus líneas
+  (producto, unidades y costo unitario de compra)
+- recibir_orden_compra(): suma las unidades al stock (MovimientoStock
+  'entrada', en el almacén de la orden si tiene uno) y recalcula el costo
+  promedio ponderado de cada producto:
+
+      costo nuevo = (stock × costo anterior + unidades × costo de compra)
+                    / (stock + unidades)
+
+- El costo inicial de los productos (las existencias anteriores a las
+  compras) se captura en el admin o en la importación del catálogo
+  (columna costo_promedio). Un producto sin costo toma el de su primera
+  compra en lugar de promediarlo con unidades a costo 0.
+- El cobro copia el costo promedio vigente a DetalleVenta.costo_unitario
+  (ventas/checkout.py), así que el costo y el margen de los reportes son
+  sumas de columnas guardadas y no cambian cuando después cambian los
+  precios o los costos.
+
+Se usa costo promedio y no capas PEPS: el stock se descuenta como un total
+por producto (y por almacén), sin rastrear de qué compra sale cada unidad.
+Las ventas anteriores a este modelo, o a capturar el costo del producto,
+quedan con costo 0.
+"""
+
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from productos.inventario import mover_stock
+from productos.models import Producto
+from .models import DetalleOrdenCompra, OrdenCompra
+
+# Decimales del costo promedio (Producto.costo_promedio)
+PRECISION_COSTO = Decimal('0.0001')
+
+
+class CompraInvalida(Exception):
+    """Error al registrar o recibir una orden de compra"""
+
+
+def costo_promedio(stock, costo_actual, unidades, costo_compra):
+    """
+    Costo promedio ponderado después de recibir unidades
+
+    Args:
+        stock: Unidades en existencia antes de recibir (las negativas cuentan como 0)
+        costo_actual: Costo promedio de esas unidades (0 si nunca se capturó:
+            esas unidades no se promedian)
+        unidades: Unidades recibidas
+        costo_compra: Costo unitario de las unidades recibidas
+
+    Returns:
+        Decimal: Costo promedio con PRECISION_COSTO decimales
+    """
+    stock = max(stock, 0)
+    if stock + unidades <= 0:
+        return Decimal(costo_actual)
+    if not costo_actual:
+        # Existencias sin costo conocido: promediarlas como 0 subestimaría el costo
+        return Decimal(costo_compra).quantize(PRECISION_COSTO)
+    total = stock * Decimal(costo_actual) + unidades * Decimal(costo_compra)
+    return (total / (stock + unidades)).quantize(PRECISION_COSTO)
+
+
+def crear_orden_compra(proveedor_id, lineas, referencia='', almacen_id=None):
+    """
+    Registra una orden de compra pendiente
+
+    Args:
+        proveedor_id: ID del proveedor
+        lineas: Iterable de tuplas (producto_id, cantidad, costo_unitario)
+        referencia: Factura o remisión del proveedor (opcional)
+        almacen_id: Almacén que recibirá la mercancía (opcional)
+
+    Returns:
+        OrdenCompra: La orden creada
+
+    Raises:
+        CompraInvalida: Si no hay líneas o alguna cantidad o costo no es válido
+    """
+    detalles = []
+    for producto_id, cantidad, costo_unitario in lineas:
+        costo_unitario = Decimal(costo_unitario)
+        if cantidad <= 0 or costo_unitario < 0:
+            raise CompraInvalida(f'Cantidad o costo no válido para el producto {producto_id}')
+        detalles.append(DetalleOrdenCompra(
+            producto_id=producto_id,
+            cantidad=cantidad,
+            costo_unitario=costo_unitario,
+            subtotal=cantidad * costo_unitario,
+        ))
+    if not detalles:
+        raise CompraInvalida('La orden de compra no tiene productos')
+
+    with transaction.atomic():
+        orden = OrdenCompra.objects.create(
+            proveedor_id=proveedor_id,
+            referencia=referencia,
+            almacen_id=almacen_id,
+            total=sum(detalle.subtotal for detalle in detalles),
+        )
+        for detalle in detalles:
+            detalle.orden = orden
+        DetalleOrdenCompra.objects.bulk_create(detalles)
+    return orden
+
+
+def recibir_orden_compra(orden_id):
+    """
+    Recibe una orden pendiente: suma su mercancía al stock y actualiza el
+    costo promedio de sus productos
+
+    Los productos se bloquean en orden de id, como en el cobro, para que
+    una venta no lea el costo a medio actualizar.
+
+    Args:
+        orden_id: ID de la OrdenCompra
+
+    Returns:
+        OrdenCompra: La orden recibida
+
+    Raises:
+        OrdenCompra.DoesNotExist: Si la orden no existe
+        CompraInvalida: Si la orden no está pendiente
+    """
+    with transaction.atomic():
+        orden = OrdenCompra.objects.select_for_update().get(pk=orden_id)
+        if orden.estado != 'pendiente':
+            raise CompraInvalida(f'La orden de compra #{orden.id} ya está {orden.get_estado_display().lower()}')
+
+        # Unidades y valor de compra por producto (una orden puede repetir productos)
+        recibidos = OrderedDict()
+        for producto_id, cantidad, costo_unitario in orden.detalles.values_list('producto_id', 'cantidad', 'costo_unitario'):
+            unidades, valor = recibidos.get(producto_id, (0, Decimal(0)))
+            recibidos[producto_id] = (unidades + cantidad, valor + cantidad * costo_unitario)
+
+        productos = list(Producto.objects.select_for_update().filter(id__in=recibidos.keys()).order_by('id'))
+        for producto in productos:
+            unidades, valor = recibidos[producto.id]
+            producto.costo_promedio = costo_promedio(
+                producto.stock_actual, producto.costo_promedio, unidades, valor / unidades,
+            )
+        Producto.objects.bulk_update(productos, ['costo_promedio'])
+
+        mover_stock(
+            {producto_id: unidades for producto_id, (unidades, _) in recibidos.items()},
+            'entrada', f'Orden de compra #{orden.id}', almacen_id=orden.almacen_id,
+        )
+
+        orden.estado = 'recibida'
+        orden.fecha_recepcion = timezone.now()
+        orden.save(update_fields=['estado', 'fecha_recepcion'])
+    return orden
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almacenes', '0003_remove_almacen_estado'),
+        ('productos', '0008_producto_costo_promedio'),
+        ('proveedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrdenCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('referencia', models.CharField(blank=True, help_text='Factura o remisión del proveedor (opcional)', max_length=100)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('recibida', 'Recibida'), ('cancelada', 'Cancelada')], default='pendiente', max_length=20)),
+                ('fecha_recepcion', models.DateTimeField(blank=True, null=True)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('almacen', models.ForeignKey(blank=True, help_text='Almacén que recibe la mercancía (vacío para el stock sin asignar)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordenes_compra', to='almacenes.almacen')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ordenes_compra', to='proveedores.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Orden de compra',
+                'verbose_name_plural': 'Órdenes de compra',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleOrdenCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('costo_unitario', models.DecimalField(decimal_places=4, max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='proveedores.ordencompra')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='compras', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Detalle de orden de compra',
+                'verbose_name_plural': 'Detalles de órdenes de compra',
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 # Create your models here.
 
@@ -19,3 +21,64 @@ class Proveedor(models.Model):
         verbose_name = 'Proveedor'
         verbose_name_plural = 'Proveedores'
         ordering = ['-fecha_creacion']
+
+
+class OrdenCompra(models.Model):
+    """
+    Orden de compra a un proveedor
+
+    Al recibirla (proveedores/compras.py) sus líneas entran al stock y
+    actualizan el costo promedio de cada producto.
+    """
+
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('recibida', 'Recibida'),
+        ('cancelada', 'Cancelada'),
+    ]
+
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.PROTECT, related_name='ordenes_compra')
+    fecha = models.DateTimeField(default=timezone.now)
+    referencia = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Factura o remisión del proveedor (opcional)"
+    )
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    fecha_recepcion = models.DateTimeField(null=True, blank=True)
+    almacen = models.ForeignKey(
+        'almacenes.Almacen',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ordenes_compra',
+        help_text="Almacén que recibe la mercancía (vacío para el stock sin asignar)"
+    )
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"Orden de compra #{self.id} - {self.proveedor}"
+
+    class Meta:
+        verbose_name = 'Orden de compra'
+        verbose_name_plural = 'Órdenes de compra'
+        ordering = ['-fecha']
+
+
+class DetalleOrdenCompra(models.Model):
+    orden = models.ForeignKey(OrdenCompra, on_delete=models.CASCADE, related_name='detalles')
+    producto = models.ForeignKey('productos.Producto', on_delete=models.PROTECT, related_name='compras')
+    cantidad = models.IntegerField(validators=[MinValueValidator(1)])
+    costo_unitario = models.DecimalField(max_digits=12, decimal_places=4, validators=[MinValueValidator(0)])
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f"Detalle de Orden #{self.orden_id} - {self.producto}"
+
+    def save(self, *args, **kwargs):
+        self.subtotal = self.cantidad * self.costo_unitario
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = 'Detalle de orden de compra'
+        verbose_name_plural = 'Detalles de órdenes de compra'
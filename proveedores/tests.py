@@ -1,3 +1,82 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+
+from categorias.models import Categoria
+from productos.models import MovimientoStock, Producto
+from reportes.models import VentaDiaria
+from reportes.resumen import reconstruir_resumen
+from reportes.views import datos_reporte_proveedores
+from ventas.checkout import registrar_venta
+from .compras import CompraInvalida, costo_promedio, crear_orden_compra, recibir_orden_compra
+from .models import Proveedor
+
+
+class ComprasTests(TestCase):
+    """Órdenes de compra, costo promedio y costo de lo vendido"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(
+            nombre='Granos del Norte', contacto='Ana', telefono='555', email='ana@example.com', direccion='Centro',
+        )
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.arroz = Producto.objects.create(
+            nombre='Arroz 1kg', precio=Decimal('20.00'), stock_inicial=10, stock_actual=10,
+            categoria=categoria, proveedor=cls.proveedor,
+        )
+        Producto.objects.filter(pk=cls.arroz.pk).update(costo_promedio=Decimal('5.00'))
+
+    def recibir(self, *lineas):
+        orden = crear_orden_compra(self.proveedor.id, lineas, referencia='F-100')
+        return recibir_orden_compra(orden.id)
+
+    def test_costo_promedio_ponderado(self):
+        self.assertEqual(costo_promedio(10, Decimal('5'), 10, Decimal('8')), Decimal('6.5000'))
+        # Sin existencias el costo es el de la compra
+        self.assertEqual(costo_promedio(-2, Decimal('5'), 4, Decimal('3')), Decimal('3.0000'))
+        # Existencias sin costo capturado: no se promedian como costo 0
+        self.assertEqual(costo_promedio(10, Decimal('0'), 5, Decimal('8')), Decimal('8.0000'))
+
+    def test_recibir_con_existencias_sin_costo(self):
+        Producto.objects.filter(pk=self.arroz.pk).update(costo_promedio=0)
+        self.recibir((self.arroz.id, 5, '8.00'))
+        self.arroz.refresh_from_db()
+        self.assertEqual((self.arroz.stock_actual, self.arroz.costo_promedio), (15, Decimal('8.0000')))
+        # Las ventas siguientes ya llevan el costo de la compra
+        self.assertEqual(registrar_venta([(self.arroz.id, 1)]).detalles.get().costo_unitario, Decimal('8.0000'))
+
+    def test_recibir_suma_stock_y_actualiza_costo(self):
+        # Dos líneas del mismo producto: 10 unidades a un costo promedio de 8
+        orden = self.recibir((self.arroz.id, 4, '7.00'), (self.arroz.id, 6, '8.6667'))
+        self.arroz.refresh_from_db()
+
+        self.assertEqual(self.arroz.stock_actual, 20)
+        self.assertEqual(self.arroz.costo_promedio, Decimal('6.5000'))
+        self.assertEqual(orden.total, Decimal('80.00'))
+        self.assertEqual(orden.estado, 'recibida')
+        movimiento = MovimientoStock.objects.get(producto=self.arroz, tipo='entrada')
+        self.assertEqual((movimiento.cantidad, movimiento.referencia), (10, f'Orden de compra #{orden.id}'))
+
+        with self.assertRaises(CompraInvalida):
+            recibir_orden_compra(orden.id)
+        with self.assertRaises(CompraInvalida):
+            crear_orden_compra(self.proveedor.id, [(self.arroz.id, 0, '1.00')])
+
+    def test_margen_con_el_costo_de_la_venta(self):
+        self.recibir((self.arroz.id, 10, '8.00'))
+        venta = registrar_venta([(self.arroz.id, 2)])
+        self.assertEqual(venta.detalles.get().costo_unitario, Decimal('6.5000'))
+
+        # Cambiar precio y costo después no cambia el costo de lo ya vendido
+        Producto.objects.filter(pk=self.arroz.pk).update(precio=Decimal('99.00'), costo_promedio=Decimal('50.00'))
+        reconstruir_resumen()
+        self.assertEqual(VentaDiaria.objects.get().costo, Decimal('13.00'))
 
-# Create your tests here.
+        hoy = timezone.now()
+        datos = datos_reporte_proveedores(hoy - timedelta(days=1), hoy)
+        proveedor = datos['proveedores_analisis'][0]
+        self.assertEqual((proveedor['total_ingresos'], proveedor['costo_total']), (Decimal('40.00'), Decimal('13.00')))
+        self.assertEqual(proveedor['margen_ganancia'], Decimal('27.00'))
@@ -1,3 +1,15 @@
 from django.contrib import admin
+from .models import ConfiguracionReporte, HistorialReporte
 
-# Register your models here.
+@admin.register(ConfiguracionReporte)
+class ConfiguracionReporteAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'tipo_reporte', 'periodo', 'usuario', 'activo', 'ultima_ejecucion')
+    list_filter = ('tipo_reporte', 'periodo', 'activo')
+    search_fields = ('nombre',)
+    readonly_fields = ('ultima_ejecucion', 'created_at', 'updated_at')
+
+@admin.register(HistorialReporte)
+class HistorialReporteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo_reporte', 'estado', 'usuario', 'fecha_generacion', 'fecha_finalizacion')
+    list_filter = ('estado', 'tipo_reporte')
+    readonly_fields = ('fecha_generacion', 'fecha_inicio_proceso', 'fecha_finalizacion', 'error')
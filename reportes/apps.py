@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ReportesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reportes'
+
+    def ready(self):
+        # Las ediciones de productos, clientes, ventas, etc. invalidan la caché de reportes
+        from .cache import conectar_invalidacion
+        conectar_invalidacion()
@@ -0,0 +1,185 @@
+"""
+Caché de resultados de reportes para TradeInventory
+
+Calcular un reporte agrupa miles de ventas y fiados, pero sus datos solo
+cambian cuando se registra una venta, un fiado o un abono, se mueve el
+stock o se editan los productos, clientes, categorías o proveedores. El
+resultado de cada reporte se guarda en la caché y lo comparten la vista
+web, la exportación a Excel y la cola de reportes: cambiar de la vista al
+Excel (o volver a abrir el reporte) no repite las consultas.
+
+Clave: 'reportes:<reporte>:<día inicio>:<día fin>:<filtros>:<versión>'
+- El rango se normaliza a días locales; obtener_rango_fechas() ya
+  devuelve días completos.
+- Los filtros vacíos se descartan y el resto se resume con un hash.
+- La versión de datos es un contador en la base (VersionReportes), el
+  mismo para todos los procesos aunque cada uno tenga su propia caché.
+- invalidar_reportes() incrementa la versión al confirmar cada escritura,
+  una vez por transacción; las entradas de versiones anteriores dejan de
+  leerse. Las rutas de ventas, fiados, saldos y stock lo llaman
+  directamente; las ediciones de los modelos de MODELOS_REPORTES (admin,
+  formularios y API) lo hacen con conectar_invalidacion().
+- La versión se lee de la misma base que el reporte: con la réplica
+  atrasada se lee la versión anterior, y un resultado calculado con datos
+  viejos no queda guardado con la versión nueva.
+
+Duración: un rango que incluye hoy dura DURACION_CACHE. Un rango que
+terminó antes de hoy no vence (DURACION_CACHE_CERRADO = None): solo la
+versión lo reemplaza, y las entradas de versiones viejas las descarta la
+caché cuando se llena.
+
+Qué se guarda de cada valor del resultado:
+- Consultas agrupadas (values/annotate), consultas ya evaluadas y listas:
+  las filas.
+- Listados de modelos sin evaluar (los que el Excel recorre con
+  iterator()): solo la consulta, que se vuelve a armar como QuerySet en
+  cada lectura. La caché no guarda miles de filas y el listado se lee de
+  la base al recorrerlo.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.query import ModelIterable, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import VersionReportes
+from .resumen import rango_fechas
+
+# Tiempo que se conserva un reporte cuyo rango incluye el día de hoy
+DURACION_CACHE = 5 * 60
+
+# Tiempo que se conserva un reporte de un rango ya cerrado (sin vencimiento)
+DURACION_CACHE_CERRADO = None
+
+# Modelos que leen los reportes y que se editan con save()/delete()
+MODELOS_REPORTES = (
+    'productos.Producto',
+    'categorias.Categoria',
+    'proveedores.Proveedor',
+    'clientes.Cliente',
+    'clientes.Fiado',
+    'clientes.DetalleFiado',
+    'ventas.Venta',
+    'ventas.DetalleVenta',
+)
+
+
+class _Consulta:
+    """Listado de modelos guardado como consulta; se arma de nuevo al leerlo"""
+
+    def __init__(self, queryset):
+        self.query = queryset.query
+
+    def queryset(self):
+        queryset = self.query.model._default_manager.all()
+        queryset.query = self.query
+        return queryset
+
+
+def _a_guardar(valor):
+    if isinstance(valor, QuerySet):
+        if valor._result_cache is None and valor._iterable_class is ModelIterable:
+            return _Consulta(valor)
+        return list(valor)
+    return valor
+
+
+def _leido(valor):
+    return valor.queryset() if isinstance(valor, _Consulta) else valor
+
+
+def version_datos():
+    """Versión actual de los datos de los reportes (leída de la base de los reportes)"""
+    return VersionReportes.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def _incrementar_version():
+    # UPDATE atómico: dos procesos que escriben a la vez suman los dos
+    if not VersionReportes.objects.filter(pk=1).update(version=F('version') + 1):
+        VersionReportes.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def invalidar_reportes():
+    """
+    Cambia la versión de datos de los reportes al confirmar la transacción
+    en curso (o en el acto si no hay una)
+
+    Se incrementa después del commit para que un reporte calculado en ese
+    intervalo no quede guardado con la versión nueva sin incluir la escritura.
+    Una venta invalida varias veces (kardex, resumen, saldo); la versión
+    cambia una sola vez por transacción.
+    """
+    conexion = transaction.get_connection()
+    if conexion.in_atomic_block:
+        # Ya registrado en este mismo bloque: se confirma o se revierte junto con este
+        savepoints = set(conexion.savepoint_ids)
+        if any(
+            funcion is _incrementar_version and ids == savepoints
+            for ids, funcion, _ in conexion.run_on_commit
+        ):
+            return
+    transaction.on_commit(_incrementar_version)
+
+
+def _invalidar_por_edicion(sender, **kwargs):
+    invalidar_reportes()
+
+
+def conectar_invalidacion():
+    """
+    Invalida los reportes al guardar o eliminar cualquiera de MODELOS_REPORTES
+    (se llama desde ReportesConfig.ready())
+
+    Las escrituras masivas (update(), bulk_create()) no envían señales; las
+    rutas que las usan llaman a invalidar_reportes() por su cuenta.
+    """
+    for modelo in MODELOS_REPORTES:
+        post_save.connect(_invalidar_por_edicion, sender=modelo, dispatch_uid=f'reportes:{modelo}:guardar')
+        post_delete.connect(_invalidar_por_edicion, sender=modelo, dispatch_uid=f'reportes:{modelo}:eliminar')
+
+
+def clave_reporte(nombre, fecha_inicio, fecha_fin, filtros):
+    """
+    Clave de la caché de un reporte
+
+    Args:
+        nombre: Clave del reporte ('ventas', 'fiados', ...)
+        fecha_inicio: datetime o date de inicio
+        fecha_fin: datetime o date de fin
+        filtros: Diccionario de filtros del reporte
+
+    Returns:
+        str: Clave con el rango en días, el hash de los filtros y la versión de datos
+    """
+    dia_inicio, dia_fin = rango_fechas(fecha_inicio, fecha_fin)
+    filtros = {campo: str(valor) for campo, valor in filtros.items() if valor not in (None, '')}
+    resumen_filtros = hashlib.md5(json.dumps(filtros, sort_keys=True).encode()).hexdigest()[:12]
+    return f'reportes:{nombre}:{dia_inicio.isoformat()}:{dia_fin.isoformat()}:{resumen_filtros}:{version_datos()}'
+
+
+def reporte_en_cache(nombre, fecha_inicio, fecha_fin, calcular, **filtros):
+    """
+    Resultado de un reporte desde la caché, o calculado y guardado si no está
+
+    Args:
+        nombre: Clave del reporte
+        fecha_inicio: Inicio del rango (de obtener_rango_fechas())
+        fecha_fin: Fin del rango (de obtener_rango_fechas())
+        calcular: Función sin argumentos que devuelve el diccionario del reporte
+        **filtros: Filtros que cambian el resultado (categoria_id, ...)
+
+    Returns:
+        dict: El resultado de calcular(); las consultas agrupadas llegan como listas
+    """
+    clave = clave_reporte(nombre, fecha_inicio, fecha_fin, filtros)
+    guardado = cache.get(clave)
+    if guardado is None:
+        guardado = {campo: _a_guardar(valor) for campo, valor in calcular().items()}
+        cerrado = rango_fechas(fecha_inicio, fecha_fin)[1] < timezone.localdate()
+        cache.set(clave, guardado, DURACION_CACHE_CERRADO if cerrado else DURACION_CACHE)
+    return {campo: _leido(valor) for campo, valor in guardado.items()}
@@ -0,0 +1,129 @@
+"""
+Comando para medir el efecto de los índices de Venta, Fiado, DetalleFiado y Producto
+
+Ejecuta las consultas más frecuentes de reportes, clientes y ventas con los
+índices declarados en Meta.indexes y, opcionalmente, sin ellos (se eliminan
+temporalmente y se vuelven a crear al terminar).
+
+Uso:
+    python manage.py medir_indices
+    python manage.py medir_indices --comparar --repeticiones 20
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from clientes.models import DetalleFiado, Fiado
+from productos.models import Producto
+from ventas.models import Venta
+
+MODELOS_CON_INDICES = [Venta, Fiado, DetalleFiado, Producto]
+
+
+def consultas_medidas():
+    """
+    Arma las consultas a medir con la forma que usan las vistas
+
+    Returns:
+        list: Pares (nombre, función sin argumentos que ejecuta la consulta)
+    """
+    ahora = timezone.now()
+    # Muestras representativas para las consultas por cliente, fiado y categoría
+    cliente_id = Venta.objects.filter(cliente__isnull=False).order_by().values_list('cliente_id', flat=True).first()
+    fiado_id = Fiado.objects.order_by().values_list('id', flat=True).first()
+    categoria_id = Producto.objects.order_by().values_list('categoria_id', flat=True).first()
+
+    return [
+        ('ventas del último mes', lambda: Venta.objects.filter(
+            fecha__range=(ahora - timedelta(days=30), ahora)
+        ).aggregate(cantidad=Count('id'), monto=Sum('total'))),
+        ('ventas recientes', lambda: list(Venta.objects.order_by('-fecha')[:50])),
+        ('deuda en ventas de un cliente', lambda: Venta.objects.filter(
+            cliente_id=cliente_id, es_fiado=True
+        ).aggregate(saldo=Sum(F('total') - F('monto_abonado')))),
+        ('último abono', lambda: Venta.objects.filter(
+            fecha_ultimo_abono__isnull=False
+        ).order_by('-fecha_ultimo_abono').values_list('fecha_ultimo_abono', flat=True).first()),
+        ('fiados pendientes', lambda: list(Fiado.objects.filter(pagado=False).order_by('fecha')[:100])),
+        ('fiados pendientes de un cliente', lambda: Fiado.objects.filter(
+            cliente_id=cliente_id, pagado=False
+        ).aggregate(saldo=Sum(F('monto') - F('monto_abonado')))),
+        ('último pago de un fiado', lambda: DetalleFiado.objects.filter(
+            fiado_id=fiado_id, fecha_pago__isnull=False
+        ).order_by('-fecha_pago').values_list('fecha_pago', flat=True).first()),
+        ('productos con stock bajo', lambda: list(Producto.objects.filter(
+            stock_actual__lte=F('stock_minimo')
+        ).order_by('stock_actual').values_list('id', flat=True))),
+        ('productos activos de una categoría', lambda: Producto.objects.filter(
+            categoria_id=categoria_id, activo=True
+        ).count()),
+        ('productos activos con poco stock', lambda: Producto.objects.filter(
+            activo=True, stock_actual__lte=5
+        ).count()),
+    ]
+
+
+def medir(consultas, repeticiones):
+    """
+    Mide la mediana de tiempo de cada consulta
+
+    Args:
+        consultas: Lista de pares (nombre, función)
+        repeticiones: Veces que se ejecuta cada consulta
+
+    Returns:
+        dict: {nombre: milisegundos}
+    """
+    resultados = {}
+    for nombre, consulta in consultas:
+        consulta()  # Calentar la caché de la base de datos
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            consulta()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        resultados[nombre] = tiempos[len(tiempos) // 2]
+    return resultados
+
+
+class Command(BaseCommand):
+    help = 'Mide las consultas de reportes, clientes y ventas con y sin los índices de los modelos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=10, help='Ejecuciones por consulta')
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help='Eliminar temporalmente los índices y medir también sin ellos'
+        )
+
+    def handle(self, *args, **options):
+        consultas = consultas_medidas()
+        self.stdout.write(f'Ventas: {Venta.objects.count()}  Fiados: {Fiado.objects.count()}  '
+                          f'Productos: {Producto.objects.count()}  ({connection.vendor})')
+
+        con_indices = medir(consultas, options['repeticiones'])
+        sin_indices = {}
+
+        if options['comparar']:
+            indices = [(modelo, indice) for modelo in MODELOS_CON_INDICES for indice in modelo._meta.indexes]
+            with connection.schema_editor() as editor:
+                for modelo, indice in indices:
+                    editor.remove_index(modelo, indice)
+            try:
+                sin_indices = medir(consultas, options['repeticiones'])
+            finally:
+                with connection.schema_editor() as editor:
+                    for modelo, indice in indices:
+                        editor.add_index(modelo, indice)
+
+        self.stdout.write(f'\n{"Consulta":<40}{"Con índices":>14}{"Sin índices":>14}')
+        for nombre, _ in consultas:
+            sin = f'{sin_indices[nombre]:.2f} ms' if nombre in sin_indices else '-'
+            self.stdout.write(f'{nombre:<40}{con_indices[nombre]:>11.2f} ms{sin:>14}')
@@ -0,0 +1,46 @@
+"""
+Worker de la cola de reportes en segundo plano
+
+Encola los reportes programados (ConfiguracionReporte) cuyo período venció,
+libera los trabajos abandonados por un worker caído y genera los Excel
+pendientes de HistorialReporte.
+
+Uso:
+    python manage.py procesar_reportes               # corre indefinidamente
+    python manage.py procesar_reportes --una-vez     # vacía la cola y termina (cron)
+    python manage.py procesar_reportes --intervalo 5
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from reportes import tareas
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes encolados y programados en segundo plano'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Procesa la cola una vez y termina')
+        parser.add_argument('--intervalo', type=int, default=10, help='Segundos de espera cuando la cola está vacía')
+
+    def handle(self, *args, **options):
+        while True:
+            programados = tareas.programar_reportes_periodicos()
+            if programados:
+                self.stdout.write(f'Reportes programados encolados: {len(programados)}')
+
+            liberados = tareas.liberar_reportes_abandonados()
+            if liberados:
+                self.stdout.write(self.style.WARNING(f'Reportes abandonados devueltos a la cola: {liberados}'))
+
+            for historial in tareas.procesar_pendientes():
+                if historial.estado == 'completado':
+                    self.stdout.write(self.style.SUCCESS(f'Reporte {historial.id} generado: {historial.archivo.name}'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'Reporte {historial.id} falló: {historial.error}'))
+
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
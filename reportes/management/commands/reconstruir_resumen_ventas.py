@@ -0,0 +1,32 @@
+"""
+Comando para reconstruir el resumen diario de ventas (VentaDiaria)
+
+Uso:
+    python manage.py reconstruir_resumen_ventas
+    python manage.py reconstruir_resumen_ventas --desde 2025-01-01 --hasta 2025-01-31
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes.resumen import reconstruir_resumen
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (use el formato YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de ventas a partir del detalle de ventas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Primer día a reconstruir (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=_fecha, help='Último día a reconstruir (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        total = reconstruir_resumen(options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f'Resumen de ventas reconstruido: {total} filas'))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def marcar_historial_existente(apps, schema_editor):
+    # Los reportes anteriores a la cola ya estaban generados
+    HistorialReporte = apps.get_model('reportes', 'HistorialReporte')
+    HistorialReporte.objects.update(estado='completado')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_ventadiaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracionreporte',
+            name='ultima_ejecucion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='fecha_finalizacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='fecha_inicio_proceso',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='parametros',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='historialreporte',
+            name='tipo_reporte',
+            field=models.CharField(choices=[('productos', 'Reporte de Productos'), ('ventas', 'Reporte de Ventas'), ('clientes', 'Reporte de Clientes'), ('proveedores', 'Reporte de Proveedores'), ('categorias', 'Reporte de Categorías'), ('fiados', 'Reporte de Fiados')], default='ventas', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='historialreporte',
+            name='configuracion',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='reportes.configuracionreporte'),
+        ),
+        migrations.AddIndex(
+            model_name='historialreporte',
+            index=models.Index(fields=['estado', 'fecha_generacion'], name='historial_estado_fecha_idx'),
+        ),
+        migrations.RunPython(marcar_historial_existente, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def crear_version(apps, schema_editor):
+    VersionReportes = apps.get_model('reportes', 'VersionReportes')
+    VersionReportes.objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0003_cola_reportes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionReportes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Versión de reportes',
+                'verbose_name_plural': 'Versión de reportes',
+            },
+        ),
+        migrations.RunPython(crear_version, migrations.RunPython.noop),
+    ]
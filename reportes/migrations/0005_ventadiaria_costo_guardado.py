@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:45
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def alinear_costo(apps, schema_editor):
+    """
+    Alinea VentaDiaria.costo con el costo guardado en las líneas de venta
+
+    Antes del costo promedio el resumen acumulaba cantidad × precio como
+    costo, mientras que las líneas anteriores quedaron con costo_unitario
+    0 (ventas 0009). El costo de cada día y producto pasa a ser la suma de
+    cantidad × costo_unitario de sus líneas, como al reconstruir el resumen.
+    """
+    VentaDiaria = apps.get_model('reportes', 'VentaDiaria')
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+
+    costos = defaultdict(Decimal)
+    for fila in DetalleVenta.objects.filter(costo_unitario__gt=0).annotate(
+        dia=TruncDate('venta__fecha', tzinfo=timezone.get_current_timezone())
+    ).values('dia', 'producto_id').annotate(
+        costo=Sum(ExpressionWrapper(F('cantidad') * F('costo_unitario'), output_field=DecimalField()))
+    ).order_by():
+        costos[(fila['dia'], fila['producto_id'])] += fila['costo']
+
+    VentaDiaria.objects.update(costo=0)
+    for (dia, producto_id), costo in costos.items():
+        # Un producto que cambió de categoría en el día tiene varias filas: el costo va a la primera
+        fila = VentaDiaria.objects.filter(fecha=dia, producto_id=producto_id).order_by('id').first()
+        if fila:
+            fila.costo = costo
+            fila.save(update_fields=['costo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0004_versionreportes'),
+        ('ventas', '0009_detalleventa_costo_unitario'),
+    ]
+
+    operations = [
+        migrations.RunPython(alinear_costo, migrations.RunPython.noop),
+    ]
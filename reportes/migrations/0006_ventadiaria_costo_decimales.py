@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0005_ventadiaria_costo_guardado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ventadiaria',
+            name='costo',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=16),
+        ),
+    ]
@@ -21,6 +21,7 @@ class ConfiguracionReporte(models.Model):
     periodo = models.CharField(max_length=20, choices=PERIODO_CHOICES)
     activo = models.BooleanField(default=True)
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    ultima_ejecucion = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -33,8 +34,37 @@ class ConfiguracionReporte(models.Model):
         return f"{self.get_tipo_reporte_display()} - {self.get_periodo_display()}"
 
 class HistorialReporte(models.Model):
-    configuracion = models.ForeignKey(ConfiguracionReporte, on_delete=models.CASCADE)
+    """
+    Reporte generado (o por generar) en segundo plano
+
+    Cada fila es un trabajo de la cola de reportes: se crea en estado
+    pendiente, el comando procesar_reportes lo toma, genera el Excel en
+    archivo y lo marca como completado o con error.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+
+    TIPO_REPORTE_CHOICES = [
+        ('productos', 'Reporte de Productos'),
+        ('ventas', 'Reporte de Ventas'),
+        ('clientes', 'Reporte de Clientes'),
+        ('proveedores', 'Reporte de Proveedores'),
+        ('categorias', 'Reporte de Categorías'),
+        ('fiados', 'Reporte de Fiados'),
+    ]
+
+    configuracion = models.ForeignKey(ConfiguracionReporte, on_delete=models.CASCADE, null=True, blank=True)
+    tipo_reporte = models.CharField(max_length=20, choices=TIPO_REPORTE_CHOICES, default='ventas')
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    error = models.TextField(blank=True)
     fecha_generacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio_proceso = models.DateTimeField(null=True, blank=True)
+    fecha_finalizacion = models.DateTimeField(null=True, blank=True)
     archivo = models.FileField(upload_to='reportes/', null=True, blank=True)
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     
@@ -42,6 +72,69 @@ class HistorialReporte(models.Model):
         verbose_name = 'Historial de Reporte'
         verbose_name_plural = 'Historial de Reportes'
         ordering = ['-fecha_generacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_generacion'], name='historial_estado_fecha_idx'),
+        ]
+
+    def __str__(self):
+        origen = self.configuracion or self.get_tipo_reporte_display()
+        return f"{origen} - {self.fecha_generacion.strftime('%Y-%m-%d %H:%M')}"
+
+class VentaDiaria(models.Model):
+    """
+    Resumen diario de ventas por producto (tabla de agregados)
+
+    Una fila por (fecha, producto, categoria, proveedor) con las unidades,
+    ingresos y costo vendidos ese día. El costo es la suma de cantidad ×
+    DetalleVenta.costo_unitario (el costo promedio al momento de vender) y
+    guarda los mismos 4 decimales del costo unitario, para que la suma
+    incremental no redondee en cada venta y coincida con la reconstrucción.
+    Se mantiene de forma incremental al registrar cada venta (ver
+    reportes.resumen) y se puede reconstruir con el comando
+    reconstruir_resumen_ventas.
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey('productos.Producto', on_delete=models.CASCADE, related_name='ventas_diarias')
+    categoria = models.ForeignKey('categorias.Categoria', on_delete=models.CASCADE, related_name='ventas_diarias')
+    proveedor = models.ForeignKey('proveedores.Proveedor', on_delete=models.SET_NULL, null=True, blank=True, related_name='ventas_diarias')
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    ventas_contado = models.PositiveIntegerField(default=0)
+    ventas_fiado = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Venta Diaria'
+        verbose_name_plural = 'Ventas Diarias'
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'producto', 'categoria', 'proveedor'],
+                name='venta_diaria_unica'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'categoria'], name='venta_diaria_fecha_cat_idx'),
+            models.Index(fields=['fecha', 'proveedor'], name='venta_diaria_fecha_prov_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto_id}: {self.unidades} u."
+
+
+class VersionReportes(models.Model):
+    """
+    Versión de los datos de los reportes (una sola fila, ver reportes/cache.py)
+
+    Vive en la base y no en la caché para que todos los procesos del
+    servidor lean el mismo número, y para que un reporte calculado desde
+    la réplica lea la versión que corresponde a los datos que ve.
+    """
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Versión de reportes'
+        verbose_name_plural = 'Versión de reportes'
 
     def __str__(self):
-        return f"{self.configuracion} - {self.fecha_generacion.strftime('%Y-%m-%d %H:%M')}"
+        return f"Versión {self.version}"
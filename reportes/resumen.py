@@ -0,0 +1,336 @@
+"""
+Mantenimiento del resumen diario de ventas (VentaDiaria)
+
+Los reportes de productos, ventas, categorías y proveedores leen de esta
+tabla en lugar de recorrer todos los DetalleVenta del período: un reporte
+de un año cuesta como máximo 365 × N_productos filas.
+
+- acumular_venta(): suma una venta recién registrada al resumen, dentro
+  de la misma transacción del checkout (acumular_ventas() para un lote)
+- restar_ventas() / sumar_ventas(): quitan y vuelven a sumar ventas ya
+  guardadas cuando se editan o eliminan (ResumenVentasViewSetMixin y
+  ResumenVentasAdminMixin para la API y el admin)
+- reconstruir_resumen(): recalcula el resumen desde DetalleVenta
+  (carga inicial o corrección de datos históricos)
+- rango_fechas(): convierte el rango de fechas de los reportes a días
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import VentaDiaria
+
+CAMPOS_ACUMULADOS = ['unidades', 'ingresos', 'costo', 'ventas_contado', 'ventas_fiado']
+
+
+def _a_fecha(valor):
+    """Convierte un datetime (con o sin zona horaria) o date a date local"""
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            return timezone.localdate(valor)
+        return valor.date()
+    return valor
+
+
+def rango_fechas(fecha_inicio, fecha_fin):
+    """
+    Convierte el rango de fechas de un reporte a un rango de días
+
+    Args:
+        fecha_inicio: datetime o date de inicio
+        fecha_fin: datetime o date de fin
+
+    Returns:
+        tuple: (date inicio, date fin), ambos incluidos
+    """
+    return _a_fecha(fecha_inicio), _a_fecha(fecha_fin)
+
+
+def acumular_venta(venta, detalles, productos):
+    """
+    Suma una venta al resumen diario
+
+    Debe llamarse dentro de la transacción que crea la venta y con las
+    filas de los productos ya bloqueadas (select_for_update), de modo que
+    dos cajas no puedan crear a la vez la fila del mismo producto y día.
+
+    Args:
+        venta: Venta recién creada
+        detalles: Lista de DetalleVenta de la venta
+        productos: Diccionario {producto_id: Producto}
+    """
+    acumular_ventas([(venta, detalles)], productos)
+
+
+def acumular_ventas(ventas, productos, signo=1):
+    """
+    Suma varias ventas al resumen diario con una lectura y una escritura
+    por tipo (bulk_update y bulk_create), con las mismas condiciones que
+    acumular_venta()
+
+    Args:
+        ventas: Lista de pares (Venta, lista de DetalleVenta)
+        productos: Diccionario {producto_id: Producto} con los productos
+            de todas las ventas
+        signo: 1 para sumar las ventas, -1 para quitarlas del resumen
+    """
+    # Agrupar las líneas por clave del resumen (día, producto, categoría, proveedor)
+    incrementos = OrderedDict()
+    for venta, detalles in ventas:
+        fecha = _a_fecha(venta.fecha)
+        claves_venta = set()
+        for detalle in detalles:
+            producto = productos[detalle.producto_id]
+            clave = (fecha, detalle.producto_id, producto.categoria_id, producto.proveedor_id)
+            fila = incrementos.setdefault(clave, {
+                'unidades': 0,
+                'ingresos': Decimal(0),
+                'costo': Decimal(0),
+                'ventas_contado': 0,
+                'ventas_fiado': 0,
+            })
+            fila['unidades'] += signo * detalle.cantidad
+            fila['ingresos'] += signo * detalle.subtotal
+            fila['costo'] += signo * detalle.cantidad * detalle.costo_unitario
+            # Una venta cuenta una vez por producto y día, como en reconstruir_resumen()
+            if clave not in claves_venta:
+                claves_venta.add(clave)
+                fila['ventas_fiado' if venta.es_fiado else 'ventas_contado'] += signo
+
+    existentes = {}
+    por_producto = {}
+    for fila in VentaDiaria.objects.select_for_update().filter(
+        fecha__in={clave[0] for clave in incrementos},
+        producto_id__in={clave[1] for clave in incrementos},
+    ).order_by('id'):
+        existentes[(fila.fecha, fila.producto_id, fila.categoria_id, fila.proveedor_id)] = fila
+        por_producto.setdefault((fila.fecha, fila.producto_id), fila)
+
+    actualizar = []
+    crear = []
+    for clave, valores in incrementos.items():
+        fila = existentes.get(clave)
+        if fila is None and signo < 0:
+            # El producto cambió de categoría o proveedor después de la venta:
+            # se resta de la fila del día en que quedó; sin fila no hay qué restar
+            fila = por_producto.get(clave[:2])
+            if fila is None:
+                continue
+        if fila is None:
+            fila = VentaDiaria(
+                fecha=clave[0],
+                producto_id=clave[1],
+                categoria_id=clave[2],
+                proveedor_id=clave[3],
+            )
+            crear.append(fila)
+        else:
+            actualizar.append(fila)
+        for campo in CAMPOS_ACUMULADOS:
+            setattr(fila, campo, getattr(fila, campo) + valores[campo])
+
+    # Las filas que quedan sin ventas se eliminan, como si no se hubieran acumulado
+    vacias = [fila.pk for fila in actualizar if fila.ventas_contado + fila.ventas_fiado <= 0]
+    actualizar = [fila for fila in actualizar if fila.pk not in vacias]
+    if vacias:
+        VentaDiaria.objects.filter(pk__in=vacias).delete()
+    if actualizar:
+        VentaDiaria.objects.bulk_update(actualizar, CAMPOS_ACUMULADOS)
+    if crear:
+        VentaDiaria.objects.bulk_create(crear)
+
+    from .cache import invalidar_reportes
+    invalidar_reportes()
+
+
+def _ventas_guardadas(venta_ids):
+    """
+    Lee ventas con sus líneas y productos tal como están en la base
+
+    Args:
+        venta_ids: Iterable de IDs de ventas
+
+    Returns:
+        tuple: (lista de pares (Venta, lista de DetalleVenta), {producto_id: Producto})
+    """
+    from ventas.models import Venta
+
+    ventas = Venta.objects.filter(pk__in=set(venta_ids) - {None}).prefetch_related('detalles__producto')
+    pares = [(venta, list(venta.detalles.all())) for venta in ventas]
+    productos = {detalle.producto_id: detalle.producto for _, detalles in pares for detalle in detalles}
+    return pares, productos
+
+
+def restar_ventas(venta_ids):
+    """
+    Quita ventas guardadas del resumen diario (antes de editarlas o eliminarlas)
+
+    Args:
+        venta_ids: Iterable de IDs de ventas
+    """
+    pares, productos = _ventas_guardadas(venta_ids)
+    if pares:
+        acumular_ventas(pares, productos, signo=-1)
+
+
+def sumar_ventas(venta_ids):
+    """
+    Vuelve a sumar ventas guardadas al resumen diario (después de editarlas)
+
+    Args:
+        venta_ids: Iterable de IDs de ventas (las eliminadas se ignoran)
+    """
+    pares, productos = _ventas_guardadas(venta_ids)
+    if pares:
+        acumular_ventas(pares, productos)
+
+
+@contextmanager
+def editando_ventas(venta_ids):
+    """
+    Quita las ventas del resumen, deja editarlas y las vuelve a sumar
+    Debe usarse dentro de una transacción.
+
+    Args:
+        venta_ids: IDs de las ventas que cambia la edición
+    """
+    venta_ids = set(venta_ids) - {None}
+    restar_ventas(venta_ids)
+    yield
+    sumar_ventas(venta_ids)
+
+
+def _ventas_de(instancia):
+    """IDs de las ventas de una Venta o DetalleVenta según la base"""
+    if hasattr(instancia, 'venta_id'):
+        # Una línea puede pasar a otra venta: cuentan la de la base y la nueva
+        guardada = type(instancia).objects.filter(pk=instancia.pk).values_list('venta_id', flat=True).first()
+        return {guardada, instancia.venta_id}
+    return {instancia.pk}
+
+
+class ResumenVentasViewSetMixin:
+    """
+    Para los ModelViewSet de Venta y DetalleVenta: crear líneas, editar y
+    eliminar quitan las ventas afectadas del resumen diario y las vuelven a
+    sumar en la misma transacción (las ventas nuevas ya las suma el checkout)
+    """
+
+    def perform_create(self, serializer):
+        venta = serializer.validated_data.get('venta')
+        if venta is None:
+            return super().perform_create(serializer)
+        with transaction.atomic(), editando_ventas([venta.pk]):
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        venta_ids = _ventas_de(serializer.instance)
+        if serializer.validated_data.get('venta') is not None:
+            venta_ids.add(serializer.validated_data['venta'].pk)
+        with transaction.atomic(), editando_ventas(venta_ids):
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(), editando_ventas(_ventas_de(instance)):
+            super().perform_destroy(instance)
+
+
+class ResumenVentasAdminMixin:
+    """
+    Para los ModelAdmin de Venta y DetalleVenta: la venta se quita del
+    resumen antes de guardarla y se vuelve a sumar después de guardar sus
+    líneas (inlines); eliminar (también en lote) la quita del resumen
+    """
+
+    def save_model(self, request, obj, form, change):
+        # El admin guarda el objeto y los inlines en una sola transacción
+        obj._ventas_resumen = _ventas_de(obj)
+        restar_ventas(obj._ventas_resumen)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        sumar_ventas(obj._ventas_resumen | _ventas_de(obj))
+
+    def delete_model(self, request, obj):
+        with transaction.atomic(), editando_ventas(_ventas_de(obj)):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        campo = 'venta_id' if hasattr(queryset.model, 'venta_id') else 'pk'
+        with transaction.atomic(), editando_ventas(queryset.values_list(campo, flat=True)):
+            super().delete_queryset(request, queryset)
+
+
+def reconstruir_resumen(desde=None, hasta=None):
+    """
+    Reconstruye el resumen diario a partir de DetalleVenta
+    Usa la categoría y el proveedor actuales de cada producto y el costo
+    guardado en cada línea de venta.
+
+    Args:
+        desde: date inicial a reconstruir (opcional, por defecto todo)
+        hasta: date final a reconstruir, incluida (opcional)
+
+    Returns:
+        int: Cantidad de filas generadas
+    """
+    from ventas.models import DetalleVenta
+
+    detalles = DetalleVenta.objects.annotate(
+        dia=TruncDate('venta__fecha', tzinfo=timezone.get_current_timezone())
+    )
+    existentes = VentaDiaria.objects.all()
+    if desde:
+        detalles = detalles.filter(dia__gte=desde)
+        existentes = existentes.filter(fecha__gte=desde)
+    if hasta:
+        detalles = detalles.filter(dia__lte=hasta)
+        existentes = existentes.filter(fecha__lte=hasta)
+
+    filas = detalles.values(
+        'dia',
+        'producto_id',
+        'producto__categoria_id',
+        'producto__proveedor_id',
+    ).annotate(
+        total_unidades=Sum('cantidad'),
+        total_ingresos=Sum('subtotal'),
+        total_costo=Sum(ExpressionWrapper(
+            F('cantidad') * F('costo_unitario'),
+            output_field=DecimalField()
+        )),
+        total_contado=Count('venta', distinct=True, filter=Q(venta__es_fiado=False)),
+        total_fiado=Count('venta', distinct=True, filter=Q(venta__es_fiado=True)),
+    ).order_by()
+
+    resumen = [
+        VentaDiaria(
+            fecha=fila['dia'],
+            producto_id=fila['producto_id'],
+            categoria_id=fila['producto__categoria_id'],
+            proveedor_id=fila['producto__proveedor_id'],
+            unidades=fila['total_unidades'] or 0,
+            ingresos=fila['total_ingresos'] or 0,
+            costo=fila['total_costo'] or 0,
+            ventas_contado=fila['total_contado'],
+            ventas_fiado=fila['total_fiado'],
+        )
+        for fila in filas.iterator()
+    ]
+
+    with transaction.atomic():
+        existentes.delete()
+        VentaDiaria.objects.bulk_create(resumen, batch_size=1000)
+
+    from .cache import invalidar_reportes
+    invalidar_reportes()
+    return len(resumen)
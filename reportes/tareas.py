@@ -0,0 +1,209 @@
+"""
+Cola de generación de reportes en segundo plano para TradeInventory
+
+Las exportaciones a Excel largas no se generan dentro de la petición web:
+se encolan como filas de HistorialReporte y el comando procesar_reportes
+las toma una por una, escribe el archivo en HistorialReporte.archivo y
+actualiza su estado (pendiente → procesando → completado / error).
+
+Funcionalidades:
+- encolar_reporte(): crea un trabajo pendiente
+- tomar_siguiente_reporte(): reclama el trabajo más antiguo sin que dos
+  workers tomen el mismo
+- procesar_reporte(): genera el Excel de un trabajo
+- programar_reportes_periodicos(): encola los ConfiguracionReporte activos
+  cuyo período (diario, semanal, mensual, anual) ya venció
+"""
+
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from tradeinventory.replicas import lecturas_en_replica
+from .models import ConfiguracionReporte, HistorialReporte
+
+# Días que cubre cada período de ConfiguracionReporte
+DIAS_POR_PERIODO = {
+    'diario': 1,
+    'semanal': 7,
+    'mensual': 30,
+    'anual': 365,
+}
+
+# Tipos de ConfiguracionReporte que se generan con otro exportador
+TIPOS_CONFIGURACION = {
+    'inventario': 'productos',
+}
+
+# Minutos tras los cuales un trabajo en proceso se considera abandonado
+MINUTOS_TRABAJO_ABANDONADO = 30
+
+
+def encolar_reporte(usuario, tipo_reporte, parametros=None, configuracion=None):
+    """
+    Crea un trabajo pendiente en la cola de reportes
+
+    Args:
+        usuario: Usuario que solicita el reporte
+        tipo_reporte: Clave de HistorialReporte.TIPO_REPORTE_CHOICES
+        parametros: Diccionario con fecha_inicio, fecha_fin (YYYY-MM-DD) y filtros
+        configuracion: ConfiguracionReporte que lo originó (opcional)
+
+    Returns:
+        HistorialReporte: El trabajo creado
+
+    Raises:
+        ValueError: Si el tipo de reporte no existe
+    """
+    if tipo_reporte not in dict(HistorialReporte.TIPO_REPORTE_CHOICES):
+        raise ValueError(f'Tipo de reporte no válido: {tipo_reporte}')
+
+    return HistorialReporte.objects.create(
+        usuario=usuario,
+        tipo_reporte=tipo_reporte,
+        parametros=parametros or {},
+        configuracion=configuracion,
+    )
+
+
+def tomar_siguiente_reporte():
+    """
+    Reclama el trabajo pendiente más antiguo
+
+    El cambio de estado se hace con un UPDATE condicionado al estado
+    pendiente, así que si dos workers compiten solo uno lo obtiene.
+
+    Returns:
+        HistorialReporte o None si no hay trabajos pendientes
+    """
+    while True:
+        candidato = HistorialReporte.objects.filter(
+            estado='pendiente'
+        ).order_by('fecha_generacion').values_list('id', flat=True).first()
+        if candidato is None:
+            return None
+
+        tomado = HistorialReporte.objects.filter(id=candidato, estado='pendiente').update(
+            estado='procesando',
+            fecha_inicio_proceso=timezone.now(),
+        )
+        if tomado:
+            return HistorialReporte.objects.select_related('usuario').get(id=candidato)
+
+
+def procesar_reporte(historial):
+    """
+    Genera el Excel de un trabajo y guarda el resultado
+
+    Args:
+        historial: HistorialReporte en estado procesando
+
+    Returns:
+        HistorialReporte: El trabajo actualizado (completado o error)
+    """
+    # Importación diferida: las vistas importan este módulo
+    from .views import generar_excel_reporte
+
+    try:
+        # Las consultas del reporte se leen de la réplica (si hay una)
+        with lecturas_en_replica():
+            archivo, filename = generar_excel_reporte(
+                historial.tipo_reporte,
+                historial.usuario,
+                historial.parametros,
+            )
+        with archivo:
+            historial.archivo.save(filename, File(archivo), save=False)
+        historial.estado = 'completado'
+        historial.error = ''
+    except Exception as e:
+        historial.estado = 'error'
+        historial.error = str(e)
+
+    historial.fecha_finalizacion = timezone.now()
+    historial.save(update_fields=['archivo', 'estado', 'error', 'fecha_finalizacion'])
+    return historial
+
+
+def procesar_pendientes(limite=None):
+    """
+    Procesa trabajos pendientes hasta vaciar la cola
+
+    Args:
+        limite: Máximo de trabajos a procesar (opcional)
+
+    Returns:
+        list: Trabajos procesados
+    """
+    procesados = []
+    while limite is None or len(procesados) < limite:
+        historial = tomar_siguiente_reporte()
+        if historial is None:
+            break
+        procesados.append(procesar_reporte(historial))
+    return procesados
+
+
+def liberar_reportes_abandonados(minutos=MINUTOS_TRABAJO_ABANDONADO):
+    """
+    Devuelve a pendiente los trabajos que quedaron en proceso (worker caído)
+
+    Args:
+        minutos: Antigüedad mínima del inicio de proceso
+
+    Returns:
+        int: Cantidad de trabajos liberados
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return HistorialReporte.objects.filter(
+        estado='procesando',
+        fecha_inicio_proceso__lt=limite,
+    ).update(estado='pendiente', fecha_inicio_proceso=None)
+
+
+def programar_reportes_periodicos(ahora=None):
+    """
+    Encola los reportes programados cuyo período ya venció
+
+    Cada ConfiguracionReporte activa genera un reporte que cubre los
+    últimos días de su período, terminando el día anterior.
+
+    Args:
+        ahora: Momento de referencia (por defecto timezone.now())
+
+    Returns:
+        list: Trabajos encolados
+    """
+    ahora = ahora or timezone.now()
+    hoy = timezone.localdate(ahora)
+    encolados = []
+
+    for configuracion in ConfiguracionReporte.objects.filter(activo=True).select_related('usuario'):
+        dias = DIAS_POR_PERIODO.get(configuracion.periodo)
+        if dias is None:
+            continue
+        if configuracion.ultima_ejecucion and configuracion.ultima_ejecucion + timedelta(days=dias) > ahora:
+            continue
+
+        with transaction.atomic():
+            # Marcar la ejecución solo si nadie más lo hizo en paralelo
+            actualizada = ConfiguracionReporte.objects.filter(
+                id=configuracion.id,
+                ultima_ejecucion=configuracion.ultima_ejecucion,
+            ).update(ultima_ejecucion=ahora)
+            if not actualizada:
+                continue
+
+            encolados.append(encolar_reporte(
+                configuracion.usuario,
+                TIPOS_CONFIGURACION.get(configuracion.tipo_reporte, configuracion.tipo_reporte),
+                {
+                    'fecha_inicio': (hoy - timedelta(days=dias)).strftime('%Y-%m-%d'),
+                    'fecha_fin': (hoy - timedelta(days=1)).strftime('%Y-%m-%d'),
+                },
+                configuracion=configuracion,
+            ))
+
+    return encolados
@@ -1,3 +1,415 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from categorias.models import Categoria
+from clientes.models import Cliente
+from productos.models import Producto
+from proveedores.models import Proveedor
+from ventas.checkout import registrar_venta
+from ventas.models import Venta
+from .cache import DURACION_CACHE, version_datos
+from . import tareas
+from .models import ConfiguracionReporte, HistorialReporte, VentaDiaria
+from .resumen import reconstruir_resumen
+from .views import (
+    datos_reporte, datos_reporte_categorias, datos_reporte_proveedores, datos_reporte_ventas, generar_excel_reporte,
+    obtener_rango_fechas,
+)
+
+
+class ReporteVentasExcelTests(TestCase):
+    """Consultas del reporte de ventas y su exportación a Excel"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('reportes', 'reportes@example.com', 'clave')
+        cls.inicio = timezone.make_aware(datetime(2024, 1, 1, 12, 0))
+        # Una venta de contado y una a fiado por día durante un año
+        Venta.objects.bulk_create([
+            Venta(fecha=cls.inicio + timedelta(days=dia), total=Decimal('10.00'), es_fiado=es_fiado)
+            for dia in range(366)
+            for es_fiado in (False, True)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def contar_consultas_exportacion(self, fecha_inicio, fecha_fin):
+        parametros = {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin}
+        with CaptureQueriesContext(connection) as consultas:
+            archivo, filename = generar_excel_reporte('ventas', self.usuario, parametros)
+            archivo.close()
+        return len(consultas)
+
+    def test_consultas_exportacion_no_dependen_del_rango(self):
+        una_semana = self.contar_consultas_exportacion('2024-01-01', '2024-01-07')
+        un_anio = self.contar_consultas_exportacion('2024-01-01', '2024-12-31')
+        self.assertEqual(una_semana, un_anio)
+
+    def test_ventas_por_dia_separa_contado_y_fiado(self):
+        datos = datos_reporte_ventas(self.inicio, self.inicio + timedelta(days=2, hours=1))
+        dias = list(datos['ventas_por_dia'])
+
+        self.assertEqual(len(dias), 3)
+        for dia in dias:
+            self.assertEqual(dia['total_ventas'], 2)
+            self.assertEqual(dia['ventas_contado'], 1)
+            self.assertEqual(dia['ventas_fiado'], 1)
+            self.assertEqual(dia['monto_total'], Decimal('20.00'))
+
+    def test_ventas_por_mes_agrupa_en_hora_local(self):
+        # 23:30 del 31 de enero en hora local ya es febrero en UTC
+        Venta.objects.create(
+            fecha=timezone.make_aware(datetime(2025, 1, 31, 23, 30)),
+            total=Decimal('0.10'),
+        )
+        Venta.objects.create(
+            fecha=timezone.make_aware(datetime(2025, 1, 15, 10, 0)),
+            total=Decimal('0.20'),
+        )
+        datos = datos_reporte_ventas(
+            timezone.make_aware(datetime(2025, 1, 1)),
+            timezone.make_aware(datetime(2025, 2, 28)),
+        )
+
+        self.assertEqual(len(datos['ventas_por_mes']), 1)
+        enero = datos['ventas_por_mes'][0]
+        self.assertEqual((enero['año'], enero['mes']), (2025, 1))
+        self.assertEqual(enero['total_ventas'], 2)
+        self.assertEqual(enero['monto_total'], Decimal('0.30'))
+
+    def test_rango_incluye_el_dia_final(self):
+        datos = datos_reporte_ventas(*obtener_rango_fechas({
+            'fecha_inicio': '2024-01-01',
+            'fecha_fin': '2024-01-07',
+        }))
+        self.assertEqual(len(datos['ventas_por_dia']), 7)
+
+
+class ResumenDiarioTests(TestCase):
+    """Resumen diario incremental frente a su reconstrucción"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.arroz = Producto.objects.create(
+            nombre='Arroz 1kg', precio=Decimal('20.00'), stock_inicial=50, stock_actual=50,
+            categoria=categoria, costo_promedio=Decimal('3.3333'),
+        )
+
+    def resumen(self):
+        return sorted(VentaDiaria.objects.values_list(
+            'fecha', 'producto_id', 'unidades', 'ingresos', 'costo', 'ventas_contado', 'ventas_fiado'
+        ))
+
+    def test_acumulado_igual_a_reconstruido(self):
+        # Tres ventas de una unidad a 3.3333: redondear cada suma a centavos daría 9.99
+        for cantidad in (1, 1, 1):
+            registrar_venta([(self.arroz.id, cantidad)])
+        registrar_venta([(self.arroz.id, 2)], es_fiado=True)
+        acumulado = self.resumen()
+        self.assertEqual(acumulado[0][4], Decimal('16.6665'))
+        reconstruir_resumen()
+        self.assertEqual(self.resumen(), acumulado)
+
+    def assertIgualAReconstruido(self):
+        acumulado = self.resumen()
+        reconstruir_resumen()
+        self.assertEqual(self.resumen(), acumulado)
+
+    def test_api_edita_y_elimina(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        contado = registrar_venta([(self.arroz.id, 2)])
+        fiado = registrar_venta([(self.arroz.id, 3)], es_fiado=True)
+
+        detalle = contado.detalles.get()
+        respuesta = self.client.patch(
+            reverse('api-detalle-venta-detail', args=[detalle.id]), {'cantidad': 5}, content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(VentaDiaria.objects.get().unidades, 8)
+        self.assertIgualAReconstruido()
+
+        self.client.patch(reverse('api-venta-detail', args=[fiado.id]), {'es_fiado': False}, content_type='application/json')
+        self.assertEqual(VentaDiaria.objects.values_list('ventas_contado', 'ventas_fiado').get(), (2, 0))
+        self.assertIgualAReconstruido()
+
+        self.client.delete(reverse('api-venta-detail', args=[fiado.id]))
+        self.assertEqual(VentaDiaria.objects.values_list('unidades', 'ventas_contado').get(), (5, 1))
+        self.client.delete(reverse('api-detalle-venta-detail', args=[detalle.id]))
+        self.assertFalse(VentaDiaria.objects.exists())
+
+    def test_pagar_una_venta_fiada_la_pasa_a_contado(self):
+        self.client.force_login(User.objects.create_user('cajero', 'cajero@example.com', 'clave'))
+        cliente = Cliente.objects.create(nombre='Ana', telefono='555')
+        venta = registrar_venta([(self.arroz.id, 2)], cliente_id=cliente.id, es_fiado=True)
+        self.client.post(reverse('clientes:productos_deuda', args=['venta', venta.id]), {'accion': 'cancelar'})
+        self.assertEqual(VentaDiaria.objects.values_list('ventas_contado', 'ventas_fiado').get(), (1, 0))
+        self.assertIgualAReconstruido()
+
+    def test_admin_con_lineas(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        venta = registrar_venta([(self.arroz.id, 2)])
+        detalle = venta.detalles.get()
+        respuesta = self.client.post(reverse('admin:ventas_venta_change', args=[venta.id]), {
+            'es_fiado': 'on', 'monto_abonado': '0.00',
+            'detalles-TOTAL_FORMS': 1, 'detalles-INITIAL_FORMS': 1,
+            'detalles-MIN_NUM_FORMS': 0, 'detalles-MAX_NUM_FORMS': 1000,
+            'detalles-0-id': detalle.id, 'detalles-0-venta': venta.id, 'detalles-0-producto': self.arroz.id,
+            'detalles-0-cantidad': 4, 'detalles-0-precio_unitario': '20.00', 'detalles-0-subtotal': '80.00',
+            'detalles-0-costo_unitario': '3.3333',
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(VentaDiaria.objects.values_list('unidades', 'ventas_fiado').get(), (4, 1))
+        self.assertIgualAReconstruido()
+
+        admin.site._registry[Venta].delete_queryset(None, Venta.objects.filter(pk=venta.pk))
+        self.assertFalse(VentaDiaria.objects.exists())
+
+
+class CacheReportesTests(TestCase):
+    """Resultados de reportes compartidos entre la vista web y el Excel"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cache', 'cache@example.com', 'clave')
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.arroz = Producto.objects.create(
+            nombre='Arroz 1kg', precio=Decimal('20.00'), stock_inicial=10, stock_actual=1,
+            stock_minimo=5, categoria=categoria,
+        )
+        inicio = timezone.make_aware(datetime(2024, 3, 1, 10, 0))
+        Venta.objects.bulk_create([
+            Venta(fecha=inicio + timedelta(days=dia), total=Decimal('10.00'))
+            for dia in range(20)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        self.parametros = {'fecha_inicio': '2024-03-01', 'fecha_fin': '2024-03-31'}
+
+    def contar_consultas(self, **extra):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('reportes:reporte_ventas'), {**self.parametros, **extra})
+            if extra:
+                b''.join(respuesta.streaming_content)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_excel_y_recarga_usan_el_calculo_de_la_vista(self):
+        primera = self.contar_consultas()
+        # Sesión, usuario y versión de datos: los agregados salen de la caché
+        self.assertEqual(self.contar_consultas(), 3)
+        self.assertLess(self.contar_consultas(), primera)
+        # El Excel solo lee el listado de ventas
+        self.assertEqual(self.contar_consultas(formato='excel'), 4)
+
+        respuesta = self.client.get(reverse('reportes:reporte_ventas'), self.parametros)
+        self.assertEqual(respuesta.context['total_ventas'], 20)
+        self.assertEqual(respuesta.context['monto_total'], Decimal('200.00'))
+
+    def test_listados_se_leen_de_la_base(self):
+        inicio, fin = obtener_rango_fechas(self.parametros)
+        datos_reporte('productos', inicio, fin)
+        Producto.objects.filter(pk=self.arroz.pk).update(stock_actual=0)
+
+        datos = datos_reporte('productos', inicio, fin)
+        self.assertIsInstance(datos['productos_bajo_stock'], QuerySet)
+        self.assertEqual([p.stock_actual for p in datos['productos_bajo_stock']], [0])
+
+    def test_venta_cambia_la_version_al_confirmar(self):
+        inicio, fin = obtener_rango_fechas({})
+        antes = datos_reporte('ventas', inicio, fin)
+        version = version_datos()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venta([(self.arroz.id, 1)])
+
+        self.assertNotEqual(version_datos(), version)
+        despues = datos_reporte('ventas', inicio, fin)
+        self.assertEqual(
+            sum(dia['total_ventas'] for dia in despues['ventas_por_dia']),
+            sum(dia['total_ventas'] for dia in antes['ventas_por_dia']) + 1,
+        )
+
+    def test_version_en_la_base_y_ediciones_de_catalogo(self):
+        version = version_datos()
+        # Vaciar la caché (otro proceso, reinicio) no cambia ni pierde la versión
+        cache.clear()
+        self.assertEqual(version_datos(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.arroz.precio = Decimal('25.00')
+            self.arroz.save()
+        self.assertGreater(version_datos(), version)
+
+        version = version_datos()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            categoria = self.arroz.categoria
+            categoria.nombre = 'Granos'
+            categoria.save()
+            categoria.descripcion = 'Arroz y frijol'
+            categoria.save()
+        # Una sola invalidación por transacción
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(version_datos(), version + 1)
+
+    def test_rango_cerrado_no_vence(self):
+        inicio, fin = obtener_rango_fechas(self.parametros)
+        with patch.object(cache, 'set', wraps=cache.set) as guardar:
+            datos_reporte('ventas', inicio, fin)
+            self.assertIsNone(guardar.call_args.args[2])
+            datos_reporte('ventas', inicio, timezone.now())
+            self.assertEqual(guardar.call_args.args[2], DURACION_CACHE)
+
+
+class ReporteProveedoresTests(TestCase):
+    """Reporte de proveedores con consultas agrupadas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.dia = datetime(2024, 5, 10).date()
+
+    def agregar_proveedor(self, numero, ingresos, costo):
+        proveedor = Proveedor.objects.create(
+            nombre=f'Proveedor {numero}', contacto='Ana', telefono='555', email='p@example.com', direccion='Centro',
+        )
+        productos = [
+            Producto.objects.create(
+                nombre=f'Producto {numero}-{stock}', precio=Decimal('2.00'), stock_inicial=stock, stock_actual=stock,
+                stock_minimo=5, categoria=self.categoria, proveedor=proveedor,
+            )
+            for stock in (0, 5, 9)
+        ]
+        VentaDiaria.objects.create(
+            fecha=self.dia, producto=productos[0], categoria=self.categoria, proveedor=proveedor,
+            unidades=4, ingresos=Decimal(ingresos), costo=Decimal(costo),
+        )
+        return proveedor
+
+    def contar_consultas(self):
+        inicio, fin = obtener_rango_fechas({'fecha_inicio': '2024-05-01', 'fecha_fin': '2024-05-31'})
+        with CaptureQueriesContext(connection) as consultas:
+            datos = datos_reporte_proveedores(inicio, fin)
+        return len(consultas), datos
+
+    def test_consultas_no_dependen_de_los_proveedores(self):
+        self.agregar_proveedor(1, '100.00', '80.00')
+        consultas, datos = self.contar_consultas()
+        for numero in range(2, 6):
+            self.agregar_proveedor(numero, '100.00', '50.00')
+        self.assertEqual(self.contar_consultas()[0], consultas)
+
+    def test_bajo_stock_y_margen(self):
+        bajo = self.agregar_proveedor(1, '100.00', '80.00')
+        alto = self.agregar_proveedor(2, '100.00', '50.00')
+        Producto.objects.filter(proveedor=bajo).update(costo_promedio=Decimal('1.50'))
+        datos = self.contar_consultas()[1]
+
+        inventario = {fila['proveedor__id']: fila for fila in datos['productos_por_proveedor']}
+        # Inventario a costo promedio (14 unidades a 1.50), no a precio de venta
+        self.assertEqual(inventario[bajo.id]['valor_inventario'], Decimal('21.00'))
+        self.assertEqual(inventario[bajo.id]['productos_bajo_stock'], 2)
+        self.assertEqual(inventario[bajo.id]['productos_sin_stock'], 1)
+        self.assertEqual(inventario[bajo.id]['ultima_venta'], self.dia)
+
+        self.assertEqual([fila['proveedor__id'] for fila in datos['proveedores_margen']], [alto.id, bajo.id])
+        self.assertEqual(datos['proveedores_margen'][0]['margen_promedio'], Decimal('50'))
+        self.assertEqual(datos['proveedores_margen'][1]['costos_totales'], Decimal('80.00'))
+
+    def test_categorias_valoran_el_inventario_a_costo(self):
+        proveedor = self.agregar_proveedor(1, '100.00', '80.00')
+        Producto.objects.filter(proveedor=proveedor).update(costo_promedio=Decimal('1.50'))
+        inicio, fin = obtener_rango_fechas({'fecha_inicio': '2024-05-01', 'fecha_fin': '2024-05-31'})
+        categoria = datos_reporte_categorias(inicio, fin)['categorias_analisis'][0]
+        # Solo el producto vendido (sin stock) entra al inventario de la categoría
+        self.assertEqual(categoria['valor_inventario'], Decimal('0'))
+        producto = Producto.objects.get(proveedor=proveedor, stock_actual=9)
+        VentaDiaria.objects.create(
+            fecha=self.dia, producto=producto, categoria=self.categoria, proveedor=proveedor,
+            unidades=1, ingresos=Decimal('2.00'), costo=Decimal('1.50'),
+        )
+        categoria = datos_reporte_categorias(inicio, fin)['categorias_analisis'][0]
+        self.assertEqual(categoria['valor_inventario'], Decimal('13.50'))
+
+
+class ColaReportesTests(TestCase):
+    """Cola de reportes en segundo plano (reportes/tareas.py y procesar_reportes)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cola', 'cola@example.com', 'clave')
+        cls.parametros = {'fecha_inicio': '2024-03-01', 'fecha_fin': '2024-03-31'}
+
+    def setUp(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        medios = override_settings(MEDIA_ROOT=carpeta)
+        medios.enable()
+        self.addCleanup(medios.disable)
+
+    def test_un_trabajo_no_se_toma_dos_veces(self):
+        primero = tareas.encolar_reporte(self.usuario, 'ventas', self.parametros)
+        segundo = tareas.encolar_reporte(self.usuario, 'productos', self.parametros)
+        self.assertEqual(tareas.tomar_siguiente_reporte().id, primero.id)
+        self.assertEqual(tareas.tomar_siguiente_reporte().id, segundo.id)
+        self.assertIsNone(tareas.tomar_siguiente_reporte())
+        self.assertEqual(set(HistorialReporte.objects.values_list('estado', flat=True)), {'procesando'})
+
+        # Otro worker lo tomó entre la lectura y el UPDATE: se pasa al siguiente
+        tercero = tareas.encolar_reporte(self.usuario, 'ventas', self.parametros)
+        cuarto = tareas.encolar_reporte(self.usuario, 'ventas', self.parametros)
+        actualizar = QuerySet.update
+
+        def competir(consulta, **valores):
+            if consulta.filter(id=tercero.id).exists():
+                actualizar(HistorialReporte.objects.filter(id=tercero.id), estado='procesando')
+            return actualizar(consulta, **valores)
+
+        with patch.object(QuerySet, 'update', competir):
+            self.assertEqual(tareas.tomar_siguiente_reporte().id, cuarto.id)
+
+    def test_fallo_queda_marcado_como_error(self):
+        tareas.encolar_reporte(self.usuario, 'ventas', self.parametros)
+        with patch('reportes.views.generar_excel_reporte', side_effect=ValueError('Sin conexión')):
+            fallido, = tareas.procesar_pendientes()
+        fallido.refresh_from_db()
+        self.assertEqual((fallido.estado, fallido.error), ('error', 'Sin conexión'))
+        self.assertIsNotNone(fallido.fecha_finalizacion)
+        # Un trabajo con error no vuelve a la cola
+        self.assertIsNone(tareas.tomar_siguiente_reporte())
+
+    def test_programar_no_encola_duplicados(self):
+        ConfiguracionReporte.objects.create(
+            nombre='Inventario diario', tipo_reporte='inventario', periodo='diario', usuario=self.usuario,
+        )
+        ahora = timezone.now()
+        encolados = tareas.programar_reportes_periodicos(ahora)
+        self.assertEqual([trabajo.tipo_reporte for trabajo in encolados], ['productos'])
+        self.assertEqual(tareas.programar_reportes_periodicos(ahora + timedelta(hours=12)), [])
+        self.assertEqual(len(tareas.programar_reportes_periodicos(ahora + timedelta(days=1))), 1)
+        self.assertEqual(HistorialReporte.objects.count(), 2)
+
+    def test_comando_una_vez(self):
+        tareas.encolar_reporte(self.usuario, 'ventas', self.parametros)
+        salida = io.StringIO()
+        call_command('procesar_reportes', '--una-vez', stdout=salida)
+        self.assertIn('generado', salida.getvalue())
+        self.assertFalse(HistorialReporte.objects.exclude(estado='completado').exists())
@@ -13,4 +13,8 @@ urlpatterns = [
     path('fiados/<int:fiado_id>/cambiar-estado/', views.cambiar_estado_fiado, name='cambiar_estado_fiado'),
     path('fiados/<int:fiado_id>/detalle/', views.detalle_fiado, name='detalle_fiado'),
     path('categorias/', views.reporte_categorias, name='reporte_categorias'),
+    path('historial/', views.historial_reportes, name='historial_reportes'),
+    path('historial/<int:historial_id>/', views.estado_reporte, name='estado_reporte'),
+    path('historial/<int:historial_id>/descargar/', views.descargar_reporte, name='descargar_reporte'),
+    path('<str:tipo_reporte>/encolar/', views.encolar_reporte, name='encolar_reporte'),
 ] 
\ No newline at end of file
@@ -14,6 +14,7 @@ Funcionalidades principales:
 Características:
 - Filtros por fecha personalizables
 - Exportación a Excel con formato profesional
+- Exportación en segundo plano con historial de reportes (ver tareas.py)
 - Métricas avanzadas y análisis de tendencias
 - Interfaz web responsive
 - Autenticación requerida para todos los reportes
@@ -22,19 +23,176 @@ Características:
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
 from django.db.models import Count, Sum, Avg, Max, Min, Q, F, ExpressionWrapper, DecimalField, IntegerField
+from django.db.models.functions import ExtractMonth, ExtractYear, TruncDate, TruncMonth
 from django.utils import timezone
-from datetime import datetime, timedelta
-import io
+from datetime import datetime, time, timedelta
+import tempfile
 import xlsxwriter
 from decimal import Decimal
 
+from productos.inventario import inventario_promedio
 from productos.models import Producto
 from ventas.models import Venta, DetalleVenta
 from clientes.models import Cliente, Fiado, DetalleFiado
 from proveedores.models import Proveedor
 from categorias.models import Categoria
+from .cache import reporte_en_cache
+from .models import HistorialReporte, VentaDiaria
+from .resumen import rango_fechas
+from . import tareas
+
+# Filas que se traen de la base de datos por lote al exportar a Excel
+TAMANO_LOTE_EXPORTACION = 2000
+
+CONTENT_TYPE_EXCEL = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def crear_libro_excel():
+    """
+    Crea un libro de Excel en modo de memoria constante
+    
+    El libro se escribe en un archivo temporal y cada hoja descarga sus
+    filas a disco a medida que avanza, por lo que la memoria no crece con
+    el tamaño del reporte. En este modo las filas de cada hoja deben
+    escribirse en orden ascendente.
+    
+    Returns:
+        tuple: (Workbook de xlsxwriter, archivo temporal de destino)
+    """
+    archivo = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(archivo, {'constant_memory': True, 'remove_timezone': True})
+    return workbook, archivo
+
+
+def cerrar_libro_excel(workbook, archivo, filename):
+    """
+    Cierra el libro y deja el archivo temporal listo para leerse
+    
+    Args:
+        workbook: Workbook creado con crear_libro_excel()
+        archivo: Archivo temporal asociado al libro
+        filename: Nombre sugerido para el archivo
+        
+    Returns:
+        tuple: (archivo temporal al inicio, nombre del archivo)
+    """
+    workbook.close()
+    archivo.seek(0)
+    return archivo, filename
+
+
+def respuesta_excel(archivo, filename):
+    """
+    Envía un Excel generado como descarga leyendo el archivo por partes
+    
+    Args:
+        archivo: Archivo devuelto por cerrar_libro_excel()
+        filename: Nombre del archivo para la descarga
+        
+    Returns:
+        FileResponse: Respuesta que transmite el archivo y lo cierra al terminar
+    """
+    return FileResponse(archivo, as_attachment=True, filename=filename, content_type=CONTENT_TYPE_EXCEL)
+
+
+def obtener_rango_fechas(parametros):
+    """
+    Obtiene el rango de fechas de un reporte
+    
+    Args:
+        parametros: QueryDict o diccionario con fecha_inicio y fecha_fin (YYYY-MM-DD)
+        
+    Returns:
+        tuple: (fecha_inicio, fecha_fin) con zona horaria local; la fecha de
+            fin incluye el día completo. Por defecto los últimos 30 días
+            (hasta hoy), también en días completos para que el mismo rango
+            use la misma entrada de la caché de reportes
+    """
+    fecha_inicio = parametros.get('fecha_inicio')
+    fecha_fin = parametros.get('fecha_fin')
+    
+    if fecha_inicio and fecha_fin:
+        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d')
+        fecha_fin = datetime.combine(datetime.strptime(fecha_fin, '%Y-%m-%d').date(), time.max)
+        return timezone.make_aware(fecha_inicio), timezone.make_aware(fecha_fin)
+    
+    hoy = timezone.localdate()
+    fecha_inicio = datetime.combine(hoy - timedelta(days=30), time.min)
+    fecha_fin = datetime.combine(hoy, time.max)
+    return timezone.make_aware(fecha_inicio), timezone.make_aware(fecha_fin)
+
+
+def generar_excel_reporte(tipo_reporte, usuario, parametros):
+    """
+    Genera el Excel de un reporte fuera de una petición web
+    Lo usa la cola de reportes (HistorialReporte) para exportar en segundo plano.
+    
+    Args:
+        tipo_reporte: Clave del reporte (ver HistorialReporte.TIPO_REPORTE_CHOICES)
+        usuario: Usuario que solicitó el reporte
+        parametros: Diccionario con fecha_inicio, fecha_fin y filtros opcionales
+        
+    Returns:
+        tuple: (archivo temporal, nombre del archivo)
+        
+    Raises:
+        ValueError: Si el tipo de reporte no existe
+    """
+    fecha_inicio, fecha_fin = obtener_rango_fechas(parametros)
+    if tipo_reporte == 'fiados':
+        # El reporte de fiados trabaja con fechas sin hora
+        fecha_inicio, fecha_fin = rango_fechas(fecha_inicio, fecha_fin)
+    
+    exportadores = {
+        'productos': exportar_reporte_productos_excel,
+        'ventas': exportar_reporte_ventas_excel,
+        'clientes': exportar_reporte_clientes_excel,
+        'proveedores': exportar_reporte_proveedores_excel,
+        'categorias': exportar_reporte_categorias_excel,
+        'fiados': exportar_reporte_fiados_excel,
+    }
+    if tipo_reporte not in exportadores:
+        raise ValueError(f'Tipo de reporte no válido: {tipo_reporte}')
+    
+    datos = datos_reporte(tipo_reporte, fecha_inicio, fecha_fin, parametros.get('categoria_id'))
+    return exportadores[tipo_reporte](usuario, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, **datos)
+
+def datos_reporte(tipo_reporte, fecha_inicio, fecha_fin, categoria_id=None):
+    """
+    Datos de un reporte desde la caché de reportes (ver cache.py)
+    La vista web, su exportación a Excel y la cola de reportes comparten
+    así el mismo cálculo para el mismo rango y filtros.
+    
+    Args:
+        tipo_reporte: Clave del reporte (productos, ventas, clientes, proveedores, categorias, fiados)
+        fecha_inicio: Inicio del rango (de obtener_rango_fechas(); date para fiados)
+        fecha_fin: Fin del rango (de obtener_rango_fechas(); date para fiados)
+        categoria_id: ID de categoría para el reporte de categorías (opcional)
+        
+    Returns:
+        dict: Los datos de datos_reporte_<tipo>(), con las consultas
+            agrupadas como listas
+    """
+    filtros = {}
+    if tipo_reporte == 'categorias':
+        calcular = lambda: datos_reporte_categorias(fecha_inicio, fecha_fin, categoria_id)
+        filtros['categoria_id'] = categoria_id
+    elif tipo_reporte == 'fiados':
+        calcular = lambda: datos_reporte_fiados(fecha_inicio, fecha_fin)
+        # La antigüedad de las deudas se cuenta hasta hoy
+        filtros['hoy'] = timezone.now().date()
+    else:
+        funcion = {
+            'productos': datos_reporte_productos,
+            'ventas': datos_reporte_ventas,
+            'clientes': datos_reporte_clientes,
+            'proveedores': datos_reporte_proveedores,
+        }[tipo_reporte]
+        calcular = lambda: funcion(fecha_inicio, fecha_fin)
+    return reporte_en_cache(tipo_reporte, fecha_inicio, fecha_fin, calcular, **filtros)
 
 @login_required
 def lista_reportes(request):
@@ -50,208 +208,303 @@ def lista_reportes(request):
     """
     return render(request, 'reportes/lista_reportes.html')
 
+def estado_historial(historial):
+    """
+    Representa un trabajo de la cola de reportes como diccionario JSON
+    
+    Args:
+        historial: HistorialReporte
+        
+    Returns:
+        dict: id, tipo, estado, fechas, error y URL de descarga si está listo
+    """
+    return {
+        'id': historial.id,
+        'tipo_reporte': historial.tipo_reporte,
+        'estado': historial.estado,
+        'parametros': historial.parametros,
+        'fecha_generacion': historial.fecha_generacion.isoformat(),
+        'fecha_finalizacion': historial.fecha_finalizacion.isoformat() if historial.fecha_finalizacion else None,
+        'error': historial.error,
+        'url_estado': reverse('reportes:estado_reporte', args=[historial.id]),
+        'url_descarga': reverse('reportes:descargar_reporte', args=[historial.id]) if historial.estado == 'completado' else None,
+    }
+
+def obtener_historial_usuario(request, historial_id):
+    """Obtiene un trabajo de la cola visible para el usuario (propio o cualquiera si es staff)"""
+    historiales = HistorialReporte.objects.all()
+    if not request.user.is_staff:
+        historiales = historiales.filter(usuario=request.user)
+    return get_object_or_404(historiales, id=historial_id)
+
 @login_required
-def reporte_productos(request):
+def encolar_reporte(request, tipo_reporte):
     """
-    Reporte completo de análisis de productos
-    Genera estadísticas detalladas sobre productos, stock y ventas
+    Encola la exportación a Excel de un reporte para generarla en segundo plano
+    El archivo lo genera el comando procesar_reportes.
     
     Args:
-        request: Objeto HttpRequest de Django con parámetros GET opcionales:
-            - fecha_inicio: Fecha de inicio para el análisis (formato YYYY-MM-DD)
-            - fecha_fin: Fecha de fin para el análisis (formato YYYY-MM-DD)
-            - formato: Si es 'excel', exporta a Excel en lugar de mostrar en web
-            
+        request: Objeto HttpRequest (POST) con fecha_inicio, fecha_fin y categoria_id opcionales
+        tipo_reporte: Clave del reporte (productos, ventas, clientes, proveedores, categorias, fiados)
+        
     Returns:
-        HttpResponse: Renderiza el reporte web o devuelve archivo Excel
+        JsonResponse: Estado del trabajo si la petición es AJAX
+        HttpResponse: Redirección al historial de reportes en otro caso
+    """
+    es_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    
+    if request.method != 'POST':
+        if es_ajax:
+            return JsonResponse({'error': 'Método no permitido'}, status=405)
+        return redirect('reportes:historial_reportes')
+    
+    parametros = {}
+    for campo in ('fecha_inicio', 'fecha_fin', 'categoria_id'):
+        valor = request.POST.get(campo)
+        if valor:
+            parametros[campo] = valor
+    
+    try:
+        # Validar el rango antes de encolar para no guardar trabajos que fallarán
+        obtener_rango_fechas(parametros)
+        historial = tareas.encolar_reporte(request.user, tipo_reporte, parametros)
+    except ValueError as e:
+        if es_ajax:
+            return JsonResponse({'error': str(e)}, status=400)
+        messages.error(request, f'No se pudo encolar el reporte: {str(e)}')
+        return redirect('reportes:historial_reportes')
+    
+    if es_ajax:
+        return JsonResponse(estado_historial(historial), status=202)
+    messages.success(request, f'Reporte de {historial.get_tipo_reporte_display()} en cola. Estará disponible aquí al terminar.')
+    return redirect('reportes:historial_reportes')
+
+@login_required
+def estado_reporte(request, historial_id):
+    """
+    Estado de un trabajo de la cola de reportes (para consultar periódicamente)
+    
+    Args:
+        request: Objeto HttpRequest de Django
+        historial_id: ID del HistorialReporte
         
-    Análisis incluidos:
-        - Productos con stock bajo (≤ stock mínimo)
-        - Productos más vendidos en el período
-        - Análisis de rotación de inventario
+    Returns:
+        JsonResponse: Estado del trabajo
     """
-    # Obtener parámetros de fecha del request
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    return JsonResponse(estado_historial(obtener_historial_usuario(request, historial_id)))
+
+@login_required
+def descargar_reporte(request, historial_id):
+    """
+    Descarga el Excel generado por un trabajo completado
     
-    # Procesar fechas: si no se proporcionan, usar últimos 30 días
-    if fecha_inicio and fecha_fin:
-        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d')
-    else:
-        fecha_fin = timezone.now()
-        fecha_inicio = fecha_fin - timedelta(days=30)
+    Args:
+        request: Objeto HttpRequest de Django
+        historial_id: ID del HistorialReporte
+        
+    Returns:
+        FileResponse: El archivo del reporte
+    """
+    historial = obtener_historial_usuario(request, historial_id)
+    if historial.estado != 'completado' or not historial.archivo:
+        raise Http404('El reporte todavía no está disponible')
+    
+    return respuesta_excel(historial.archivo.open('rb'), historial.archivo.name.rsplit('/', 1)[-1])
+
+@login_required
+def historial_reportes(request):
+    """
+    Lista los reportes encolados por el usuario y su estado
+    
+    Args:
+        request: Objeto HttpRequest de Django
+        
+    Returns:
+        HttpResponse: Renderiza el historial de reportes
+    """
+    historiales = HistorialReporte.objects.filter(usuario=request.user).select_related('configuracion')[:50]
+    
+    context = {
+        'historiales': historiales,
+        'hay_pendientes': any(h.estado in ('pendiente', 'procesando') for h in historiales),
+    }
+    return render(request, 'reportes/historial_reportes.html', context)
+
+def datos_reporte_productos(fecha_inicio, fecha_fin):
+    """
+    Calcula los datos del reporte de productos para un período
+    Los usan la vista web, la exportación a Excel y la cola de reportes.
     
+    Args:
+        fecha_inicio: Fecha de inicio del análisis
+        fecha_fin: Fecha de fin del análisis
+        
+    Returns:
+        dict: productos_bajo_stock, productos_mas_vendidos y productos_rotacion
+    """
     # Análisis 1: Productos con stock bajo
     # Filtra productos donde el stock actual es menor o igual al stock mínimo
     productos_bajo_stock = Producto.objects.filter(
         stock_actual__lte=F('stock_minimo')
     ).select_related('categoria', 'proveedor').order_by('stock_actual')
     
+    # Las ventas del período se leen del resumen diario (VentaDiaria)
+    dia_inicio, dia_fin = rango_fechas(fecha_inicio, fecha_fin)
+    resumen = VentaDiaria.objects.filter(fecha__range=(dia_inicio, dia_fin))
+    
     # Análisis 2: Productos más vendidos en el período
     # Calcula total vendido e ingresos por producto en el rango de fechas
-    productos_mas_vendidos = DetalleVenta.objects.filter(
-        venta__fecha__range=(fecha_inicio, fecha_fin)
-    ).values(
+    productos_mas_vendidos = resumen.values(
+        'producto__id',
         'producto__nombre',
         'producto__categoria__nombre',
         'producto__proveedor__nombre'
     ).annotate(
-        total_vendido=Sum('cantidad'),
-        total_ingresos=Sum(F('cantidad') * F('precio_unitario'))
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos')
     ).order_by('-total_vendido')[:10]  # Top 10 productos
     
     # Análisis 3: Rotación de inventario
-    # Calcula qué productos tienen mejor rotación (más ventas vs stock actual)
-    productos_rotacion = Producto.objects.filter(
-        detalleventa__venta__fecha__range=(fecha_inicio, fecha_fin)
-    ).values(
-        'nombre',
-        'categoria__nombre',
-        'stock_actual'
+    # Unidades vendidas en el período sobre el inventario promedio del
+    # período (kardex), no sobre el stock de hoy
+    productos_rotacion = list(resumen.values(
+        'producto__id',
+        nombre=F('producto__nombre'),
+        categoria__nombre=F('producto__categoria__nombre'),
+        stock_actual=F('producto__stock_actual')
     ).annotate(
-        unidades_vendidas=Sum('detalleventa__cantidad'),
-        valor_vendido=Sum(F('detalleventa__cantidad') * F('detalleventa__precio_unitario'))
-    ).order_by('-unidades_vendidas')[:10]  # Top 10 por rotación
-    
-    # Verificar si se solicita exportación a Excel
-    if request.GET.get('formato') == 'excel':
-        return exportar_reporte_productos_excel(
-            request,
-            productos_bajo_stock,
-            productos_mas_vendidos,
-            productos_rotacion,
-            fecha_inicio,
-            fecha_fin
+        unidades_vendidas=Sum('unidades'),
+        valor_vendido=Sum('ingresos')
+    ).order_by('-unidades_vendidas')[:10])  # Top 10 por ventas
+    promedios = inventario_promedio(fecha_inicio, fecha_fin, [p['producto__id'] for p in productos_rotacion])
+    for producto in productos_rotacion:
+        producto['inventario_promedio'] = promedios.get(producto['producto__id'], 0)
+        producto['indice_rotacion'] = (
+            producto['unidades_vendidas'] / producto['inventario_promedio']
+            if producto['inventario_promedio'] > 0 else 0
         )
     
-    # Preparar contexto para la plantilla web
-    context = {
+    return {
         'productos_bajo_stock': productos_bajo_stock,
         'productos_mas_vendidos': productos_mas_vendidos,
         'productos_rotacion': productos_rotacion,
-        'total_productos': Producto.objects.count(),  # Total real de productos
-        'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
-        'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
     }
-    return render(request, 'reportes/reporte_productos.html', context)
 
 @login_required
-def reporte_ventas(request):
+def reporte_productos(request):
     """
-    Reporte de análisis de ventas
-    Genera estadísticas detalladas sobre el comportamiento de ventas
+    Reporte completo de análisis de productos
+    Genera estadísticas detalladas sobre productos, stock y ventas
     
     Args:
         request: Objeto HttpRequest de Django con parámetros GET opcionales:
-            - fecha_inicio: Fecha de inicio para el análisis
-            - fecha_fin: Fecha de fin para el análisis
-            - formato: Si es 'excel', exporta a Excel
+            - fecha_inicio: Fecha de inicio para el análisis (formato YYYY-MM-DD)
+            - fecha_fin: Fecha de fin para el análisis (formato YYYY-MM-DD)
+            - formato: Si es 'excel', exporta a Excel en lugar de mostrar en web
             
     Returns:
         HttpResponse: Renderiza el reporte web o devuelve archivo Excel
         
     Análisis incluidos:
-        - Ventas por día (conteo, monto total, promedio)
-        - Ventas por mes (agregación mensual)
-        - Productos top (más vendidos en el período)
+        - Productos con stock bajo (≤ stock mínimo)
+        - Productos más vendidos en el período
+        - Análisis de rotación de inventario
     """
-    # Obtener y procesar parámetros de fecha
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    # Obtener y procesar parámetros de fecha (por defecto últimos 30 días)
+    fecha_inicio, fecha_fin = obtener_rango_fechas(request.GET)
+    datos = datos_reporte('productos', fecha_inicio, fecha_fin)
     
-    if fecha_inicio and fecha_fin:
-        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d')
-    else:
-        fecha_fin = timezone.now()
-        fecha_inicio = fecha_fin - timedelta(days=30)
+    # Verificar si se solicita exportación a Excel
+    if request.GET.get('formato') == 'excel':
+        return respuesta_excel(*exportar_reporte_productos_excel(
+            request.user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            **datos
+        ))
+    
+    # Preparar contexto para la plantilla web
+    context = {
+        **datos,
+        'total_productos': Producto.objects.count(),  # Total real de productos
+        'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
+        'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
+    }
+    return render(request, 'reportes/reporte_productos.html', context)
+
+def datos_reporte_ventas(fecha_inicio, fecha_fin):
+    """
+    Calcula los datos del reporte de ventas para un período
+    Los usan la vista web, la exportación a Excel y la cola de reportes.
     
+    Args:
+        fecha_inicio: Fecha de inicio del análisis
+        fecha_fin: Fecha de fin del análisis
+        
+    Returns:
+        dict: ventas_por_dia, ventas_por_mes y productos_top
+    """
     # Análisis 1: Ventas por día
-    # Agrupa ventas por fecha y calcula métricas diarias
+    # Una sola consulta agrupada por día (en la zona horaria local) que trae
+    # también el desglose contado/fiado de cada día
     ventas_por_dia = Venta.objects.filter(
         fecha__range=(fecha_inicio, fecha_fin)
-    ).values('fecha').annotate(
+    ).annotate(
+        dia=TruncDate('fecha', tzinfo=timezone.get_current_timezone())
+    ).values('dia').annotate(
         total_ventas=Count('id'),
         monto_total=Sum('total'),
-        promedio_venta=Avg('total')
-    ).order_by('fecha')
+        promedio_venta=Avg('total'),
+        ventas_contado=Count('id', filter=Q(es_fiado=False)),
+        ventas_fiado=Count('id', filter=Q(es_fiado=True))
+    ).order_by('dia')
     
     # Análisis 2: Ventas por mes
-    # Agrupa ventas por mes y año para análisis temporal
-    # Usamos una aproximación más simple y compatible
-    ventas_por_mes = []
-    ventas_totales = Venta.objects.filter(
-        fecha__range=(fecha_inicio, fecha_fin)
-    ).values('fecha', 'total')
-    
-    # Agrupar manualmente por mes y año
-    meses_data = {}
-    for venta in ventas_totales:
-        fecha = venta['fecha']
-        mes_key = f"{fecha.year}-{fecha.month:02d}"
-        
-        if mes_key not in meses_data:
-            meses_data[mes_key] = {
-                'mes': fecha.month,
-                'año': fecha.year,
-                'total_ventas': 0,
-                'monto_total': 0,
-                'ventas_list': []
-            }
-        
-        meses_data[mes_key]['total_ventas'] += 1
-        meses_data[mes_key]['monto_total'] += float(venta['total'])
-        meses_data[mes_key]['ventas_list'].append(venta['total'])
-    
-    # Calcular promedios y ordenar
-    for mes_key, data in meses_data.items():
-        data['promedio_venta'] = data['monto_total'] / data['total_ventas'] if data['total_ventas'] > 0 else 0
-        ventas_por_mes.append(data)
-    
-    # Ordenar por año y mes
-    ventas_por_mes.sort(key=lambda x: (x['año'], x['mes']))
+    # Agrupado en la base de datos por mes local: una fila por mes con
+    # totales Decimal exactos, sin traer cada venta a memoria
+    ventas_por_mes = [
+        {
+            'mes': fila['periodo'].month,
+            'año': fila['periodo'].year,
+            'total_ventas': fila['total_ventas'],
+            'monto_total': fila['monto_total'],
+            'promedio_venta': fila['promedio_venta'],
+        }
+        for fila in Venta.objects.filter(
+            fecha__range=(fecha_inicio, fecha_fin)
+        ).annotate(
+            periodo=TruncMonth('fecha', tzinfo=timezone.get_current_timezone())
+        ).values('periodo').annotate(
+            total_ventas=Count('id'),
+            monto_total=Sum('total'),
+            promedio_venta=Avg('total')
+        ).order_by('periodo')
+    ]
     
     # Análisis 3: Productos top en ventas
     # Identifica los productos más vendidos en el período
-    productos_top = DetalleVenta.objects.filter(
-        venta__fecha__range=(fecha_inicio, fecha_fin)
+    # Se lee del resumen diario en lugar de recorrer cada línea de venta
+    productos_top = VentaDiaria.objects.filter(
+        fecha__range=rango_fechas(fecha_inicio, fecha_fin)
     ).values(
         'producto__nombre',
         'producto__categoria__nombre'
     ).annotate(
-        total_vendido=Sum('cantidad'),
-        total_ingresos=Sum(F('cantidad') * F('precio_unitario'))
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos')
     ).order_by('-total_vendido')[:10]  # Top 10 productos
     
-    # Verificar exportación a Excel
-    if request.GET.get('formato') == 'excel':
-        return exportar_reporte_ventas_excel(
-            request,
-            ventas_por_dia,
-            ventas_por_mes,
-            productos_top,
-            fecha_inicio,
-            fecha_fin
-        )
-    
-    # Preparar contexto para la plantilla
-    context = {
+    return {
         'ventas_por_dia': ventas_por_dia,
         'ventas_por_mes': ventas_por_mes,
         'productos_top': productos_top,
-        'total_ventas': Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin)).count(),  # Total real de ventas
-        'monto_total': Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin)).aggregate(total=Sum('total'))['total'] or 0,  # Monto total
-        'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
-        'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
     }
-    return render(request, 'reportes/reporte_ventas.html', context)
 
 @login_required
-def reporte_clientes(request):
+def reporte_ventas(request):
     """
-    Reporte de análisis de clientes
-    Genera estadísticas sobre el comportamiento de compra de los clientes
+    Reporte de análisis de ventas
+    Genera estadísticas detalladas sobre el comportamiento de ventas
     
     Args:
         request: Objeto HttpRequest de Django con parámetros GET opcionales:
@@ -263,20 +516,47 @@ def reporte_clientes(request):
         HttpResponse: Renderiza el reporte web o devuelve archivo Excel
         
     Análisis incluidos:
-        - Clientes top por monto total de compras
-        - Métricas por cliente (frecuencia, promedio, última compra)
+        - Ventas por día (conteo, monto total, promedio)
+        - Ventas por mes (agregación mensual)
+        - Productos top (más vendidos en el período)
     """
-    # Obtener y procesar parámetros de fecha
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    # Obtener y procesar parámetros de fecha (por defecto últimos 30 días)
+    fecha_inicio, fecha_fin = obtener_rango_fechas(request.GET)
+    datos = datos_reporte('ventas', fecha_inicio, fecha_fin)
     
-    if fecha_inicio and fecha_fin:
-        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d')
-    else:
-        fecha_fin = timezone.now()
-        fecha_inicio = fecha_fin - timedelta(days=30)
+    # Verificar exportación a Excel
+    if request.GET.get('formato') == 'excel':
+        return respuesta_excel(*exportar_reporte_ventas_excel(
+            request.user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            **datos
+        ))
     
+    # Preparar contexto para la plantilla
+    context = {
+        **datos,
+        # Totales del período a partir de las ventas por día (ya en caché)
+        'total_ventas': sum(dia['total_ventas'] for dia in datos['ventas_por_dia']),
+        'monto_total': sum((dia['monto_total'] for dia in datos['ventas_por_dia']), Decimal(0)),
+        'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
+        'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
+    }
+    return render(request, 'reportes/reporte_ventas.html', context)
+
+def datos_reporte_clientes(fecha_inicio, fecha_fin):
+    """
+    Calcula los datos del reporte de clientes para un período
+    Los usan la vista web, la exportación a Excel y la cola de reportes.
+    
+    Args:
+        fecha_inicio: Fecha de inicio del análisis
+        fecha_fin: Fecha de fin del análisis
+        
+    Returns:
+        dict: clientes_top y resumen_compras (total_compras y monto_total
+            de todas las ventas con cliente del período)
+    """
     # Análisis: Clientes top por monto total de compras
     # Calcula métricas detalladas por cliente en el período
     clientes_top = Venta.objects.filter(
@@ -292,31 +572,25 @@ def reporte_clientes(request):
         ultima_compra=Max('fecha')
     ).order_by('-monto_total')[:10]  # Top 10 clientes
     
-    # Verificar exportación a Excel
-    if request.GET.get('formato') == 'excel':
-        return exportar_reporte_clientes_excel(
-            request,
-            clientes_top,
-            fecha_inicio,
-            fecha_fin
-        )
+    resumen_compras = Venta.objects.filter(
+        fecha__range=(fecha_inicio, fecha_fin),
+        cliente__isnull=False
+    ).aggregate(
+        total_compras=Count('id'),
+        monto_total=Sum('total')
+    )
+    resumen_compras['monto_total'] = resumen_compras['monto_total'] or 0
     
-    # Preparar contexto para la plantilla
-    context = {
+    return {
         'clientes_top': clientes_top,
-        'total_clientes': Cliente.objects.count(),  # Total real de clientes
-        'total_compras': Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin), cliente__isnull=False).count(),  # Total de compras
-        'monto_total_compras': Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin), cliente__isnull=False).aggregate(total=Sum('total'))['total'] or 0,  # Monto total
-        'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
-        'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
+        'resumen_compras': resumen_compras,
     }
-    return render(request, 'reportes/reporte_clientes.html', context)
 
 @login_required
-def reporte_proveedores(request):
+def reporte_clientes(request):
     """
-    Reporte de análisis de proveedores
-    Genera estadísticas sobre el rendimiento de los proveedores
+    Reporte de análisis de clientes
+    Genera estadísticas sobre el comportamiento de compra de los clientes
     
     Args:
         request: Objeto HttpRequest de Django con parámetros GET opcionales:
@@ -328,40 +602,68 @@ def reporte_proveedores(request):
         HttpResponse: Renderiza el reporte web o devuelve archivo Excel
         
     Análisis incluidos:
-        - Rendimiento por proveedor (productos vendidos, ingresos)
-        - Análisis de márgenes por proveedor
-        - Productos más vendidos por proveedor
+        - Clientes top por monto total de compras
+        - Métricas por cliente (frecuencia, promedio, última compra)
     """
-    # Obtener y procesar parámetros de fecha
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    # Obtener y procesar parámetros de fecha (por defecto últimos 30 días)
+    fecha_inicio, fecha_fin = obtener_rango_fechas(request.GET)
+    datos = datos_reporte('clientes', fecha_inicio, fecha_fin)
     
-    if fecha_inicio and fecha_fin:
-        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d')
-    else:
-        fecha_fin = timezone.now()
-        fecha_inicio = fecha_fin - timedelta(days=30)
+    # Verificar exportación a Excel
+    if request.GET.get('formato') == 'excel':
+        return respuesta_excel(*exportar_reporte_clientes_excel(
+            request.user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            **datos
+        ))
+    
+    # Preparar contexto para la plantilla
+    context = {
+        **datos,
+        'total_clientes': Cliente.objects.count(),  # Total real de clientes
+        'total_compras': datos['resumen_compras']['total_compras'],  # Total de compras
+        'monto_total_compras': datos['resumen_compras']['monto_total'],  # Monto total
+        'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
+        'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
+    }
+    return render(request, 'reportes/reporte_clientes.html', context)
+
+def datos_reporte_proveedores(fecha_inicio, fecha_fin):
+    """
+    Calcula los datos del reporte de proveedores para un período
+    Los usan la vista web, la exportación a Excel y la cola de reportes.
+    
+    Args:
+        fecha_inicio: Fecha de inicio del análisis
+        fecha_fin: Fecha de fin del análisis
+        
+    Returns:
+        dict: proveedores_analisis, productos_por_proveedor y proveedores_margen
+    """
+    # Las ventas del período se leen del resumen diario (VentaDiaria)
+    resumen = VentaDiaria.objects.filter(
+        fecha__range=rango_fechas(fecha_inicio, fecha_fin),
+        proveedor__isnull=False
+    )
     
     # Análisis de proveedores por productos vendidos con métricas mejoradas
-    proveedores_analisis = Producto.objects.filter(
-        proveedor__isnull=False,
-        detalleventa__venta__fecha__range=(fecha_inicio, fecha_fin)
-    ).values(
+    # Una sola pasada por las ventas del período; el ranking por margen
+    # se arma con las mismas filas
+    proveedores_analisis = list(resumen.values(
         'proveedor__nombre',
         'proveedor__id'
     ).annotate(
-        total_productos=Count('id', distinct=True),
-        total_vendido=Sum('detalleventa__cantidad'),
-        total_ingresos=Sum(F('detalleventa__cantidad') * F('detalleventa__precio_unitario')),
-        costo_total=Sum(F('detalleventa__cantidad') * F('precio')),
+        total_productos=Count('producto', distinct=True),
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos'),
+        costo_total=Sum('costo'),
         margen_ganancia=ExpressionWrapper(
-            Sum(F('detalleventa__cantidad') * F('detalleventa__precio_unitario')) - 
-            Sum(F('detalleventa__cantidad') * F('precio')),
+            Sum('ingresos') - Sum('costo'),
             output_field=DecimalField()
         ),
-        ultima_venta=Max('detalleventa__venta__fecha')
-    ).order_by('-total_ingresos')
+        ultima_venta=Max('fecha')
+    ).order_by('-total_ingresos'))
     
     # Calcular porcentaje de margen después de la consulta
     for proveedor in proveedores_analisis:
@@ -371,7 +673,9 @@ def reporte_proveedores(request):
             proveedor['porcentaje_margen'] = 0
     
     # Productos por proveedor con información de inventario mejorada
-    productos_por_proveedor = Producto.objects.filter(
+    # Los productos bajo stock se cuentan en la misma consulta agrupada; el
+    # inventario se valora a costo promedio, como el costo de los márgenes
+    productos_por_proveedor = list(Producto.objects.filter(
         proveedor__isnull=False
     ).values(
         'proveedor__nombre',
@@ -379,101 +683,106 @@ def reporte_proveedores(request):
     ).annotate(
         cantidad_productos=Count('id'),
         stock_total=Sum('stock_actual'),
-        valor_inventario=Sum(F('stock_actual') * F('precio')),
-        productos_sin_stock=Count('id', filter=Q(stock_actual=0)),
-        ultima_venta=Max('detalleventa__venta__fecha')
-    ).order_by('-cantidad_productos')
-    
-    # Calcular productos bajo stock después de la consulta para mayor precisión
+        valor_inventario=Sum(F('stock_actual') * F('costo_promedio')),
+        productos_bajo_stock=Count('id', filter=Q(stock_actual__lte=F('stock_minimo'))),
+        productos_sin_stock=Count('id', filter=Q(stock_actual=0))
+    ).order_by('-cantidad_productos'))
+    
+    # Última venta de cada proveedor (histórica) desde el resumen diario
+    ultimas_ventas = dict(
+        VentaDiaria.objects.filter(proveedor__isnull=False).values_list(
+            'proveedor_id'
+        ).annotate(ultima=Max('fecha')).order_by()
+    )
     for proveedor in productos_por_proveedor:
-        # Obtener todos los productos de este proveedor
-        productos_proveedor = Producto.objects.filter(
-            proveedor_id=proveedor['proveedor__id']
-        )
-        
-        bajo_stock_count = 0
-        for producto in productos_proveedor:
-            stock_minimo = producto.stock_minimo if producto.stock_minimo is not None else 5
-            if producto.stock_actual <= stock_minimo:
-                bajo_stock_count += 1
-        
-        proveedor['productos_bajo_stock'] = bajo_stock_count
-    
-    # Proveedores con mejor margen (solo los que tienen ventas)
-    proveedores_margen = Producto.objects.filter(
-        proveedor__isnull=False,
-        detalleventa__venta__fecha__range=(fecha_inicio, fecha_fin)
-    ).values(
-        'proveedor__nombre',
-        'proveedor__id'
-    ).annotate(
-        total_ventas=Sum('detalleventa__cantidad'),
-        ingresos_totales=Sum(F('detalleventa__cantidad') * F('detalleventa__precio_unitario')),
-        costos_totales=Sum(F('detalleventa__cantidad') * F('precio'))
-    ).filter(total_ventas__gt=0)
+        proveedor['ultima_venta'] = ultimas_ventas.get(proveedor['proveedor__id'])
+    
+    # Proveedores con mejor margen (solo los que tienen ventas), ordenados por margen promedio
+    proveedores_margen = sorted(
+        (
+            {
+                'proveedor__nombre': proveedor['proveedor__nombre'],
+                'proveedor__id': proveedor['proveedor__id'],
+                'total_ventas': proveedor['total_vendido'],
+                'ingresos_totales': proveedor['total_ingresos'],
+                'costos_totales': proveedor['costo_total'],
+                'margen_promedio': proveedor['porcentaje_margen'],
+            }
+            for proveedor in proveedores_analisis
+            if proveedor['total_vendido'] > 0
+        ),
+        key=lambda x: x['margen_promedio'],
+        reverse=True
+    )
     
-    # Calcular margen promedio después de la consulta
-    for proveedor in proveedores_margen:
-        if proveedor['ingresos_totales'] and proveedor['ingresos_totales'] > 0:
-            margen_absoluto = proveedor['ingresos_totales'] - proveedor['costos_totales']
-            proveedor['margen_promedio'] = (margen_absoluto / proveedor['ingresos_totales']) * 100
-        else:
-            proveedor['margen_promedio'] = 0
+    return {
+        'proveedores_analisis': proveedores_analisis,
+        'productos_por_proveedor': productos_por_proveedor,
+        'proveedores_margen': proveedores_margen,
+    }
+
+@login_required
+def reporte_proveedores(request):
+    """
+    Reporte de análisis de proveedores
+    Genera estadísticas sobre el rendimiento de los proveedores
     
-    # Ordenar por margen promedio
-    proveedores_margen = sorted(proveedores_margen, key=lambda x: x['margen_promedio'], reverse=True)
+    Args:
+        request: Objeto HttpRequest de Django con parámetros GET opcionales:
+            - fecha_inicio: Fecha de inicio para el análisis
+            - fecha_fin: Fecha de fin para el análisis
+            - formato: Si es 'excel', exporta a Excel
+            
+    Returns:
+        HttpResponse: Renderiza el reporte web o devuelve archivo Excel
+        
+    Análisis incluidos:
+        - Rendimiento por proveedor (productos vendidos, ingresos)
+        - Análisis de márgenes por proveedor
+        - Productos más vendidos por proveedor
+    """
+    # Obtener y procesar parámetros de fecha (por defecto últimos 30 días)
+    fecha_inicio, fecha_fin = obtener_rango_fechas(request.GET)
+    datos = datos_reporte('proveedores', fecha_inicio, fecha_fin)
     
+    # Verificar exportación a Excel
     if request.GET.get('formato') == 'excel':
-        return exportar_reporte_proveedores_excel(
-            request,
-            proveedores_analisis,
-            productos_por_proveedor,
-            proveedores_margen,
-            fecha_inicio,
-            fecha_fin
-        )
+        return respuesta_excel(*exportar_reporte_proveedores_excel(
+            request.user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            **datos
+        ))
     
     context = {
-        'proveedores_analisis': proveedores_analisis,
-        'productos_por_proveedor': productos_por_proveedor,
-        'proveedores_margen': proveedores_margen,
+        **datos,
         'total_proveedores': Proveedor.objects.count(),  # Total real de proveedores
         'total_productos_proveedores': Producto.objects.filter(proveedor__isnull=False).count(),  # Total de productos con proveedor
-        'monto_total_proveedores': sum(p['total_ingresos'] for p in proveedores_analisis) if proveedores_analisis else 0,  # Monto total
+        'monto_total_proveedores': sum(p['total_ingresos'] for p in datos['proveedores_analisis']) if datos['proveedores_analisis'] else 0,  # Monto total
         'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
         'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
     }
     return render(request, 'reportes/reporte_proveedores.html', context)
 
-@login_required
-def reporte_fiados(request):
-    """Reporte de fiados y deudas pendientes"""
-    from clientes.models import Cliente, Fiado, DetalleFiado
-    
-    # Obtener parámetros de fecha
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    
-    if fecha_inicio:
-        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-    else:
-        fecha_inicio = timezone.now().date() - timedelta(days=30)
-    
-    if fecha_fin:
-        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-    else:
-        fecha_fin = timezone.now().date()
+def datos_reporte_fiados(fecha_inicio, fecha_fin):
+    """
+    Calcula los datos del reporte de fiados para un período
+    Los usan la vista web, la exportación a Excel y la cola de reportes.
     
+    Args:
+        fecha_inicio: Fecha (date) de inicio del análisis
+        fecha_fin: Fecha (date) de fin del análisis
+        
+    Returns:
+        dict: fiados_pendientes, clientes_fiados, fiados_antiguedad,
+            productos_fiados y todos_detalles_fiados
+    """
     # Obtener fiados pendientes
     fiados_pendientes = Fiado.objects.filter(
         fecha__date__range=[fecha_inicio, fecha_fin],
         pagado=False
     ).select_related('cliente').order_by('-fecha')
     
-    # Calcular días vencidos para cada fiado
-    for fiado in fiados_pendientes:
-        fiado.dias_vencido = (timezone.now().date() - fiado.fecha.date()).days
-    
     # Estadísticas de clientes con fiados
     clientes_fiados = Cliente.objects.filter(
         fiados__pagado=False,
@@ -521,31 +830,57 @@ def reporte_fiados(request):
         fiado__fecha__date__range=[fecha_inicio, fecha_fin]
     ).select_related('fiado', 'fiado__cliente', 'producto').order_by('-fiado__fecha')
     
-    # Totales
-    total_fiado_pendiente = fiados_pendientes.aggregate(
-        total=Sum('monto')
-    )['total'] or 0
-    
-    total_clientes_fiados = clientes_fiados.count()
-    
-    context = {
+    return {
         'fiados_pendientes': fiados_pendientes,
         'clientes_fiados': clientes_fiados,
         'fiados_antiguedad': fiados_antiguedad,
         'productos_fiados': productos_fiados,
-        'total_fiado_pendiente': total_fiado_pendiente,
-        'total_clientes_fiados': total_clientes_fiados,
-        'total_fiados_pendientes': fiados_pendientes.count(),  # Total real de fiados pendientes
-        'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin,
+        'todos_detalles_fiados': todos_detalles_fiados,
     }
+
+@login_required
+def reporte_fiados(request):
+    """Reporte de fiados y deudas pendientes"""
+    # Obtener parámetros de fecha
+    fecha_inicio = request.GET.get('fecha_inicio')
+    fecha_fin = request.GET.get('fecha_fin')
+    
+    if fecha_inicio:
+        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+    else:
+        fecha_inicio = timezone.now().date() - timedelta(days=30)
+    
+    if fecha_fin:
+        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    else:
+        fecha_fin = timezone.now().date()
+    
+    datos = datos_reporte('fiados', fecha_inicio, fecha_fin)
     
     # Exportar a Excel si se solicita
     if request.GET.get('formato') == 'excel':
-        return exportar_reporte_fiados_excel(
-            request, fiados_pendientes, clientes_fiados, 
-            fiados_antiguedad, productos_fiados, todos_detalles_fiados, fecha_inicio, fecha_fin
-        )
+        return respuesta_excel(*exportar_reporte_fiados_excel(
+            request.user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            **datos
+        ))
+    
+    # Calcular días vencidos para cada fiado
+    fiados_pendientes = list(datos['fiados_pendientes'])
+    for fiado in fiados_pendientes:
+        fiado.dias_vencido = (timezone.now().date() - fiado.fecha.date()).days
+    
+    context = {
+        **datos,
+        'fiados_pendientes': fiados_pendientes,
+        # Totales
+        'total_fiado_pendiente': sum((fiado.monto for fiado in fiados_pendientes), Decimal(0)),
+        'total_clientes_fiados': len(datos['clientes_fiados']),
+        'total_fiados_pendientes': len(fiados_pendientes),  # Total real de fiados pendientes
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+    }
     
     return render(request, 'reportes/reporte_fiados.html', context)
 
@@ -553,6 +888,7 @@ def reporte_fiados(request):
 def cambiar_estado_fiado(request, fiado_id):
     """Cambiar el estado de un fiado (pagado/cancelado)"""
     from clientes.models import Fiado
+    from clientes.saldos import actualizar_saldo_cliente
     from django.utils import timezone
     from django.contrib import messages
     from django.shortcuts import redirect
@@ -565,11 +901,13 @@ def cambiar_estado_fiado(request, fiado_id):
             fiado.pagado = True
             fiado.fecha_pago = timezone.now()
             fiado.save()
+            actualizar_saldo_cliente(fiado.cliente_id)
             messages.success(request, f'Fiado de {fiado.cliente.nombre} marcado como PAGADO')
         elif accion == 'cancelar':
             fiado.pagado = True  # También marcamos como pagado para "cancelar"
             fiado.fecha_pago = timezone.now()
             fiado.save()
+            actualizar_saldo_cliente(fiado.cliente_id)
             messages.warning(request, f'Fiado de {fiado.cliente.nombre} marcado como CANCELADO')
         else:
             messages.error(request, 'Acción no válida')
@@ -602,9 +940,8 @@ def detalle_fiado(request, fiado_id):
         messages.error(request, 'Fiado no encontrado')
         return redirect('reportes:reporte_fiados')
 
-def exportar_reporte_proveedores_excel(request, proveedores_analisis, productos_por_proveedor, proveedores_margen, fecha_inicio, fecha_fin):
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'remove_timezone': True})
+def exportar_reporte_proveedores_excel(usuario, proveedores_analisis, productos_por_proveedor, proveedores_margen, fecha_inicio, fecha_fin):
+    workbook, archivo = crear_libro_excel()
     
     # Formato para títulos
     header_format = workbook.add_format({
@@ -665,7 +1002,7 @@ def exportar_reporte_proveedores_excel(request, proveedores_analisis, productos_
         if proveedor['ultima_venta']:
             # Convertir a datetime sin timezone
             ultima_venta = proveedor['ultima_venta']
-            if hasattr(ultima_venta, 'replace'):
+            if isinstance(ultima_venta, datetime):
                 ultima_venta = ultima_venta.replace(tzinfo=None)
             worksheet_analisis.write(row, 8, ultima_venta, date_format)
         else:
@@ -700,7 +1037,7 @@ def exportar_reporte_proveedores_excel(request, proveedores_analisis, productos_
         if proveedor['ultima_venta']:
             # Convertir a datetime sin timezone
             ultima_venta = proveedor['ultima_venta']
-            if hasattr(ultima_venta, 'replace'):
+            if isinstance(ultima_venta, datetime):
                 ultima_venta = ultima_venta.replace(tzinfo=None)
             worksheet_productos.write(row, 6, ultima_venta, date_format)
         else:
@@ -729,21 +1066,11 @@ def exportar_reporte_proveedores_excel(request, proveedores_analisis, productos_
         worksheet_margen.write(row, 3, float(proveedor['ingresos_totales']), number_format)
         row += 1
     
-    workbook.close()
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename=reporte_proveedores_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    
-    return response
+    return cerrar_libro_excel(workbook, archivo, f'reporte_proveedores_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx')
 
-def exportar_reporte_fiados_excel(request, fiados_pendientes, clientes_fiados, fiados_antiguedad, productos_fiados, todos_detalles_fiados, fecha_inicio, fecha_fin):
+def exportar_reporte_fiados_excel(usuario, fiados_pendientes, clientes_fiados, fiados_antiguedad, productos_fiados, todos_detalles_fiados, fecha_inicio, fecha_fin):
     """Exportar reporte de fiados a Excel"""
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'remove_timezone': True})
+    workbook, archivo = crear_libro_excel()
     
     # Formato para encabezados
     header_format = workbook.add_format({
@@ -774,7 +1101,7 @@ def exportar_reporte_fiados_excel(request, fiados_pendientes, clientes_fiados, f
     for col, header in enumerate(headers):
         worksheet1.write(3, col, header, header_format)
     
-    for row, fiado in enumerate(fiados_pendientes, 4):
+    for row, fiado in enumerate(fiados_pendientes.iterator(chunk_size=TAMANO_LOTE_EXPORTACION), 4):
         dias_vencido = (timezone.now().date() - fiado.fecha.date()).days
         worksheet1.write(row, 0, fiado.cliente.nombre)
         worksheet1.write(row, 1, fiado.fecha.strftime('%Y-%m-%d'))
@@ -832,8 +1159,11 @@ def exportar_reporte_fiados_excel(request, fiados_pendientes, clientes_fiados, f
     for col, header in enumerate(headers):
         worksheet4.write(4, col, header, header_format)
     
+    # Las estadísticas por estado (Hoja 5) se acumulan en la misma pasada
+    estados_stats = {}
+    
     row = 5
-    for detalle in todos_detalles_fiados:
+    for detalle in todos_detalles_fiados.iterator(chunk_size=TAMANO_LOTE_EXPORTACION):
         # Determinar formato según estado
         if detalle.estado == 'pendiente':
             estado_format = estado_pendiente_format
@@ -872,15 +1202,7 @@ def exportar_reporte_fiados_excel(request, fiados_pendientes, clientes_fiados, f
         
         worksheet4.write(row, 9, dias_vencido)
         row += 1
-    
-    # Hoja 5: Resumen por Estado
-    worksheet5 = workbook.add_worksheet('Resumen por Estado')
-    worksheet5.write(0, 0, 'RESUMEN POR ESTADO DE PRODUCTOS', header_format)
-    worksheet5.write(1, 0, f'Período: {fecha_inicio} a {fecha_fin}', header_format)
-    
-    # Calcular estadísticas por estado
-    estados_stats = {}
-    for detalle in todos_detalles_fiados:
+        
         estado = detalle.estado
         if estado not in estados_stats:
             estados_stats[estado] = {
@@ -893,7 +1215,12 @@ def exportar_reporte_fiados_excel(request, fiados_pendientes, clientes_fiados, f
         estados_stats[estado]['cantidad_productos'] += 1
         estados_stats[estado]['total_cantidad'] += detalle.cantidad
         estados_stats[estado]['total_valor'] += float(detalle.subtotal)
-        estados_stats[estado]['cantidad_fiados'].add(detalle.fiado.id)
+        estados_stats[estado]['cantidad_fiados'].add(detalle.fiado_id)
+    
+    # Hoja 5: Resumen por Estado
+    worksheet5 = workbook.add_worksheet('Resumen por Estado')
+    worksheet5.write(0, 0, 'RESUMEN POR ESTADO DE PRODUCTOS', header_format)
+    worksheet5.write(1, 0, f'Período: {fecha_inicio} a {fecha_fin}', header_format)
     
     headers = ['Estado', 'Cantidad Productos', 'Total Cantidad', 'Total Valor', 'Cantidad Fiados', 'Promedio por Producto']
     for col, header in enumerate(headers):
@@ -927,72 +1254,83 @@ def exportar_reporte_fiados_excel(request, fiados_pendientes, clientes_fiados, f
         worksheet5.write(row, 5, promedio, number_format)
         row += 1
     
-    workbook.close()
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename=reporte_fiados_completo_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    
-    return response
+    return cerrar_libro_excel(workbook, archivo, f'reporte_fiados_completo_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx')
 
-@login_required
-def reporte_categorias(request):
-    """Reporte profesional de rendimiento por categorías con métricas avanzadas"""
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    categoria_id = request.GET.get('categoria_id')
-    
-    if fecha_inicio and fecha_fin:
-        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d')
-    else:
-        fecha_fin = timezone.now()
-        fecha_inicio = fecha_fin - timedelta(days=30)
-    
-    # Obtener todas las categorías para el filtro
-    todas_categorias = Categoria.objects.filter(activo=True).order_by('nombre')
+def datos_reporte_categorias(fecha_inicio, fecha_fin, categoria_id=None):
+    """
+    Calcula los datos del reporte de categorías para un período
+    Los usan la vista web, la exportación a Excel y la cola de reportes.
     
-    # Filtro base para productos
-    productos_filter = Producto.objects.filter(
-        categoria__isnull=False,
-        detalleventa__venta__fecha__range=(fecha_inicio, fecha_fin)
-    )
+    Args:
+        fecha_inicio: Fecha de inicio del análisis
+        fecha_fin: Fecha de fin del análisis
+        categoria_id: ID de categoría para filtrar (opcional)
+        
+    Returns:
+        dict: categorias_analisis, productos_por_categoria, categorias_rendimiento,
+            categorias_rotacion y tendencias_mensuales
+    """
+    # Las ventas del período se leen del resumen diario (VentaDiaria)
+    resumen = VentaDiaria.objects.filter(fecha__range=rango_fechas(fecha_inicio, fecha_fin))
     
     # Aplicar filtro de categoría si se especifica
     if categoria_id and categoria_id != 'None':
-        productos_filter = productos_filter.filter(categoria_id=categoria_id)
+        resumen = resumen.filter(categoria_id=categoria_id)
     
-    # Análisis principal por categorías con métricas mejoradas
-    categorias_analisis = productos_filter.values(
+    # Análisis principal por categorías: métricas de venta del período
+    categorias_analisis = list(resumen.values(
         'categoria__nombre',
         'categoria__id',
         'categoria__descripcion'
     ).annotate(
-        total_productos=Count('id', distinct=True),
-        total_vendido=Sum('detalleventa__cantidad'),
-        total_ingresos=Sum(F('detalleventa__cantidad') * F('detalleventa__precio_unitario')),
-        costo_total=Sum(F('detalleventa__cantidad') * F('precio')),
+        total_productos=Count('producto', distinct=True),
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos'),
+        costo_total=Sum('costo'),
         margen_ganancia=ExpressionWrapper(
-            Sum(F('detalleventa__cantidad') * F('detalleventa__precio_unitario')) - 
-            Sum(F('detalleventa__cantidad') * F('precio')),
-            output_field=DecimalField()
-        ),
-        promedio_precio=Avg('precio'),
-        stock_total=Sum('stock_actual'),
-        valor_inventario=Sum(F('stock_actual') * F('precio')),
-        productos_bajo_stock=Count('id', filter=Q(stock_actual__lte=F('stock_minimo'))),
-        productos_sin_stock=Count('id', filter=Q(stock_actual=0)),
-        rotacion_inventario=ExpressionWrapper(
-            Sum('detalleventa__cantidad') * 365.0 / (Sum('stock_actual') + 1),
+            Sum('ingresos') - Sum('costo'),
             output_field=DecimalField()
         )
-    ).order_by('-total_ingresos')
+    ).order_by('-total_ingresos'))
+    
+    # Métricas de inventario de los productos vendidos en el período,
+    # agrupadas por categoría en una consulta aparte; el inventario se
+    # valora a costo promedio, como en el reporte de proveedores
+    inventario = {
+        fila.pop('categoria_id'): fila
+        for fila in Producto.objects.filter(
+            id__in=resumen.values('producto_id')
+        ).values('categoria_id').annotate(
+            promedio_precio=Avg('precio'),
+            stock_total=Sum('stock_actual'),
+            valor_inventario=Sum(F('stock_actual') * F('costo_promedio')),
+            productos_bajo_stock=Count('id', filter=Q(stock_actual__lte=F('stock_minimo'))),
+            productos_sin_stock=Count('id', filter=Q(stock_actual=0))
+        ).order_by()
+    }
+    
+    # Inventario promedio del período por categoría, de los mismos productos
+    ids_vendidos = resumen.values('producto_id')
+    categoria_de = dict(Producto.objects.filter(id__in=ids_vendidos).values_list('id', 'categoria_id'))
+    inventario_categoria = {}
+    for producto_id, promedio in inventario_promedio(fecha_inicio, fecha_fin, ids_vendidos).items():
+        categoria = categoria_de[producto_id]
+        inventario_categoria[categoria] = inventario_categoria.get(categoria, 0) + promedio
     
     # Calcular métricas adicionales
     for categoria in categorias_analisis:
+        categoria.update(inventario.get(categoria['categoria__id'], {
+            'promedio_precio': 0,
+            'stock_total': 0,
+            'valor_inventario': 0,
+            'productos_bajo_stock': 0,
+            'productos_sin_stock': 0,
+        }))
+        categoria['stock_total'] = categoria['stock_total'] or 0
+        categoria['inventario_promedio'] = inventario_categoria.get(categoria['categoria__id'], 0)
+        # Rotación anual sobre el inventario promedio del período (kardex)
+        categoria['rotacion_inventario'] = categoria['total_vendido'] * 365.0 / (categoria['inventario_promedio'] + 1)
+        
         if categoria['total_ingresos'] and categoria['total_ingresos'] > 0:
             categoria['porcentaje_margen'] = (categoria['margen_ganancia'] / categoria['total_ingresos']) * 100
         else:
@@ -1011,22 +1349,17 @@ def reporte_categorias(request):
             categoria['dias_inventario'] = 999
     
     # Productos más vendidos por categoría (top 5 por categoría)
-    productos_por_categoria = DetalleVenta.objects.filter(
-        venta__fecha__range=(fecha_inicio, fecha_fin),
-        producto__categoria__isnull=False
-    )
-    
-    if categoria_id and categoria_id != 'None':
-        productos_por_categoria = productos_por_categoria.filter(producto__categoria_id=categoria_id)
-    
-    productos_por_categoria = productos_por_categoria.values(
-        'producto__categoria__nombre',
+    productos_por_categoria = resumen.values(
         'producto__nombre',
-        'producto__categoria__id'
+        producto__categoria__nombre=F('categoria__nombre'),
+        producto__categoria__id=F('categoria__id')
     ).annotate(
-        total_vendido=Sum('cantidad'),
-        total_ingresos=Sum(F('cantidad') * F('precio_unitario')),
-        promedio_precio=Avg('precio_unitario')
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos'),
+        promedio_precio=ExpressionWrapper(
+            Sum('ingresos') / Sum('unidades'),
+            output_field=DecimalField()
+        )
     ).order_by('producto__categoria__nombre', '-total_vendido')
     
     # Categorías con mejor rendimiento por margen
@@ -1044,61 +1377,68 @@ def reporte_categorias(request):
     )
     
     # Análisis de tendencias por mes
-    tendencias_mensuales = DetalleVenta.objects.filter(
-        venta__fecha__range=(fecha_inicio, fecha_fin),
-        producto__categoria__isnull=False
-    ).values(
-        'producto__categoria__nombre'
+    tendencias_mensuales = resumen.values(
+        producto__categoria__nombre=F('categoria__nombre'),
+        año=ExtractYear('fecha'),
+        mes=ExtractMonth('fecha')
     ).annotate(
-        total_vendido=Sum('cantidad'),
-        total_ingresos=Sum(F('cantidad') * F('precio_unitario'))
-    ).order_by('producto__categoria__nombre')
-    
-    # Estadísticas generales
-    total_ingresos_general = sum(cat['total_ingresos'] for cat in categorias_analisis)
-    total_productos_general = sum(cat['total_productos'] for cat in categorias_analisis)
-    total_stock_general = sum(cat['stock_total'] for cat in categorias_analisis)
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos')
+    ).order_by('producto__categoria__nombre', 'año', 'mes')
     
     # Calcular porcentajes de participación
+    total_ingresos_general = sum(cat['total_ingresos'] for cat in categorias_analisis)
     for categoria in categorias_analisis:
         if total_ingresos_general > 0:
             categoria['porcentaje_participacion'] = (categoria['total_ingresos'] / total_ingresos_general) * 100
         else:
             categoria['porcentaje_participacion'] = 0
     
-    if request.GET.get('formato') == 'excel':
-        return exportar_reporte_categorias_excel(
-            request,
-            categorias_analisis,
-            productos_por_categoria,
-            categorias_rendimiento,
-            categorias_rotacion,
-            tendencias_mensuales,
-            fecha_inicio,
-            fecha_fin
-        )
-    
-    context = {
+    return {
         'categorias_analisis': categorias_analisis,
         'productos_por_categoria': productos_por_categoria,
         'categorias_rendimiento': categorias_rendimiento,
         'categorias_rotacion': categorias_rotacion,
         'tendencias_mensuales': tendencias_mensuales,
+    }
+
+@login_required
+def reporte_categorias(request):
+    """Reporte profesional de rendimiento por categorías con métricas avanzadas"""
+    fecha_inicio, fecha_fin = obtener_rango_fechas(request.GET)
+    categoria_id = request.GET.get('categoria_id')
+    
+    # Obtener todas las categorías para el filtro
+    todas_categorias = Categoria.objects.filter(activo=True).order_by('nombre')
+    
+    datos = datos_reporte('categorias', fecha_inicio, fecha_fin, categoria_id)
+    categorias_analisis = datos['categorias_analisis']
+    
+    if request.GET.get('formato') == 'excel':
+        return respuesta_excel(*exportar_reporte_categorias_excel(
+            request.user,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            **datos
+        ))
+    
+    context = {
+        **datos,
         'todas_categorias': todas_categorias,
         'categoria_seleccionada': categoria_id,
         'total_categorias': Categoria.objects.count(),  # Total real de categorías
         'fecha_inicio': fecha_inicio.strftime('%Y-%m-%d'),
         'fecha_fin': fecha_fin.strftime('%Y-%m-%d'),
-        'total_ingresos_general': total_ingresos_general,
-        'total_productos_general': total_productos_general,
-        'total_stock_general': total_stock_general,
+        # Estadísticas generales
+        'total_ingresos_general': sum(cat['total_ingresos'] for cat in categorias_analisis),
+        'total_productos_general': sum(cat['total_productos'] for cat in categorias_analisis),
+        'total_stock_general': sum(cat['stock_total'] for cat in categorias_analisis),
     }
     return render(request, 'reportes/reporte_categorias.html', context)
 
-def exportar_reporte_categorias_excel(request, categorias_analisis, productos_por_categoria, categorias_rendimiento, categorias_rotacion, tendencias_mensuales, fecha_inicio, fecha_fin):
+def exportar_reporte_categorias_excel(usuario, categorias_analisis, productos_por_categoria, categorias_rendimiento, categorias_rotacion, tendencias_mensuales, fecha_inicio, fecha_fin):
     """Exportar reporte de categorías a Excel"""
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'remove_timezone': True})
+    workbook, archivo = crear_libro_excel()
     
     # Formato para encabezados
     header_format = workbook.add_format({
@@ -1210,23 +1550,13 @@ def exportar_reporte_categorias_excel(request, categorias_analisis, productos_po
         worksheet5.write(row, 4, float(tendencia['total_ingresos']))
         worksheet5.write(row, 5, float(tendencia['total_ingresos'] / tendencia['total_vendido']))
     
-    workbook.close()
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename=reporte_categorias_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    
-    return response
+    return cerrar_libro_excel(workbook, archivo, f'reporte_categorias_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx')
 
-def exportar_reporte_productos_excel(request, productos_bajo_stock, productos_mas_vendidos, productos_rotacion, fecha_inicio, fecha_fin):
+def exportar_reporte_productos_excel(usuario, productos_bajo_stock, productos_mas_vendidos, productos_rotacion, fecha_inicio, fecha_fin):
     """Exportar reporte de productos a Excel con formato profesional y mejor organización"""
     
-    # Crear el archivo Excel en memoria
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output)
+    # Crear el archivo Excel en un archivo temporal (memoria constante)
+    workbook, archivo = crear_libro_excel()
     
     # Definir formatos mejorados
     header_format = workbook.add_format({
@@ -1325,41 +1655,39 @@ def exportar_reporte_productos_excel(request, productos_bajo_stock, productos_ma
     summary_sheet.write('B4', timezone.now().strftime("%d/%m/%Y %H:%M"), date_format)
     
     summary_sheet.write('A5', '👤 Generado por:', info_format)
-    summary_sheet.write('B5', request.user.get_full_name() or request.user.username, cell_format)
+    summary_sheet.write('B5', usuario.get_full_name() or usuario.username, cell_format)
     
     # Estadísticas generales
     total_productos = Producto.objects.count()
     productos_bajo_stock_count = productos_bajo_stock.count()
     productos_sin_stock = Producto.objects.filter(stock_actual=0).count()
-    valor_total_inventario = sum(p.stock_actual * p.precio for p in Producto.objects.all())
+    # Inventario valorado a costo promedio
+    valor_total_inventario = Producto.objects.aggregate(
+        total=Sum(F('stock_actual') * F('costo_promedio'))
+    )['total'] or 0
     productos_con_ventas = len(productos_mas_vendidos)
     
     # Sección de estadísticas
     summary_sheet.write('A7', '📈 ESTADÍSTICAS GENERALES DEL INVENTARIO', subtitle_format)
     
-    # Primera columna
+    # Dos columnas de indicadores (A-B y D-E), escritas fila por fila
     summary_sheet.write('A8', 'Total de Productos:', header_format)
     summary_sheet.write('B8', total_productos, number_format)
-    
-    summary_sheet.write('A9', 'Productos Bajo Stock:', header_format)
-    summary_sheet.write('B9', productos_bajo_stock_count, number_format)
-    
-    summary_sheet.write('A10', 'Productos Sin Stock:', header_format)
-    summary_sheet.write('B10', productos_sin_stock, number_format)
-    
-    summary_sheet.write('A11', 'Productos con Ventas:', header_format)
-    summary_sheet.write('B11', productos_con_ventas, number_format)
-    
-    # Segunda columna
     summary_sheet.write('D8', 'Valor Total Inventario:', header_format)
     summary_sheet.write('E8', valor_total_inventario, currency_format)
     
+    summary_sheet.write('A9', 'Productos Bajo Stock:', header_format)
+    summary_sheet.write('B9', productos_bajo_stock_count, number_format)
     summary_sheet.write('D9', '% Productos Bajo Stock:', header_format)
     summary_sheet.write('E9', productos_bajo_stock_count / total_productos if total_productos > 0 else 0, percent_format)
     
+    summary_sheet.write('A10', 'Productos Sin Stock:', header_format)
+    summary_sheet.write('B10', productos_sin_stock, number_format)
     summary_sheet.write('D10', '% Productos Sin Stock:', header_format)
     summary_sheet.write('E10', productos_sin_stock / total_productos if total_productos > 0 else 0, percent_format)
     
+    summary_sheet.write('A11', 'Productos con Ventas:', header_format)
+    summary_sheet.write('B11', productos_con_ventas, number_format)
     summary_sheet.write('D11', '% Productos Activos:', header_format)
     summary_sheet.write('E11', productos_con_ventas / total_productos if total_productos > 0 else 0, percent_format)
     
@@ -1394,7 +1722,7 @@ def exportar_reporte_productos_excel(request, productos_bajo_stock, productos_ma
     
     # Datos
     row = 3
-    for producto in productos_bajo_stock:
+    for producto in productos_bajo_stock.iterator(chunk_size=TAMANO_LOTE_EXPORTACION):
         stock_sheet.write(row, 0, producto.id, number_format)
         stock_sheet.write(row, 1, producto.nombre, cell_format)
         stock_sheet.write(row, 2, producto.categoria.nombre if producto.categoria else 'Sin categoría', cell_format)
@@ -1469,7 +1797,7 @@ def exportar_reporte_productos_excel(request, productos_bajo_stock, productos_ma
     rotacion_sheet.merge_range('A1:G1', 'ROTACIÓN DE INVENTARIO - ANÁLISIS DE MOVIMIENTO', title_format)
     
     # Encabezados
-    headers = ['Producto', 'Categoría', 'Stock Actual', 'Unidades Vendidas', 'Valor Vendido', 'Índice Rotación', 'Estado']
+    headers = ['Producto', 'Categoría', 'Inventario Promedio', 'Unidades Vendidas', 'Valor Vendido', 'Índice Rotación', 'Estado']
     for col, header in enumerate(headers):
         rotacion_sheet.write(2, col, header, header_format)
     
@@ -1478,12 +1806,12 @@ def exportar_reporte_productos_excel(request, productos_bajo_stock, productos_ma
     for producto in productos_rotacion:
         rotacion_sheet.write(row, 0, producto['nombre'], cell_format)
         rotacion_sheet.write(row, 1, producto['categoria__nombre'] or 'Sin categoría', cell_format)
-        rotacion_sheet.write(row, 2, producto['stock_actual'], number_format)
+        rotacion_sheet.write(row, 2, producto['inventario_promedio'], number_format)
         rotacion_sheet.write(row, 3, producto['unidades_vendidas'], number_format)
         rotacion_sheet.write(row, 4, producto['valor_vendido'], currency_format)
         
-        # Índice de rotación
-        indice_rotacion = producto['unidades_vendidas'] / producto['stock_actual'] if producto['stock_actual'] > 0 else 0
+        # Índice de rotación: ventas del período sobre el inventario promedio
+        indice_rotacion = producto['indice_rotacion']
         rotacion_sheet.write(row, 5, indice_rotacion, number_format)
         
         # Estado de rotación
@@ -1524,7 +1852,7 @@ def exportar_reporte_productos_excel(request, productos_bajo_stock, productos_ma
     
     # Datos
     row = 3
-    for producto in todos_productos:
+    for producto in todos_productos.iterator(chunk_size=TAMANO_LOTE_EXPORTACION):
         inventario_sheet.write(row, 0, producto.id, number_format)
         inventario_sheet.write(row, 1, producto.nombre, cell_format)
         inventario_sheet.write(row, 2, producto.categoria.nombre if producto.categoria else 'Sin categoría', cell_format)
@@ -1604,27 +1932,15 @@ def exportar_reporte_productos_excel(request, productos_bajo_stock, productos_ma
         
         chart_sheet.insert_chart('A25', chart2)
     
-    # Cerrar el workbook
-    workbook.close()
-    
-    # Preparar la respuesta HTTP
-    output.seek(0)
+    # Cerrar el workbook y preparar la respuesta HTTP
     filename = f'Reporte_Productos_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    return cerrar_libro_excel(workbook, archivo, filename)
 
-def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, productos_top, fecha_inicio, fecha_fin):
+def exportar_reporte_ventas_excel(usuario, ventas_por_dia, ventas_por_mes, productos_top, fecha_inicio, fecha_fin):
     """Exportar reporte de ventas a Excel con formato profesional y mejor organización"""
     
-    # Crear el archivo Excel en memoria
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output)
+    # Crear el archivo Excel en un archivo temporal (memoria constante)
+    workbook, archivo = crear_libro_excel()
     
     # Definir formatos mejorados
     header_format = workbook.add_format({
@@ -1730,61 +2046,58 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
     summary_sheet.write('B4', convert_to_naive_datetime(timezone.now()).strftime("%d/%m/%Y %H:%M"), date_format)
     
     summary_sheet.write('A5', '👤 Generado por:', info_format)
-    summary_sheet.write('B5', request.user.get_full_name() or request.user.username, cell_format)
+    summary_sheet.write('B5', usuario.get_full_name() or usuario.username, cell_format)
+    
+    # Matriz día × tipo de venta: una sola consulta, O(días) en memoria.
+    # Todas las hojas se calculan a partir de ella.
+    dias = list(ventas_por_dia)
     
     # Estadísticas generales
-    total_ventas = Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin)).count()
-    monto_total_ventas = Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin)).aggregate(total=Sum('total'))['total'] or 0
+    total_ventas = sum(d['total_ventas'] for d in dias)
+    monto_total_ventas = sum((d['monto_total'] for d in dias), Decimal(0))
     promedio_venta = monto_total_ventas / total_ventas if total_ventas > 0 else 0
-    ventas_fiado = Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin), es_fiado=True).count()
+    ventas_fiado = sum(d['ventas_fiado'] for d in dias)
     ventas_contado = total_ventas - ventas_fiado
     
     # Calcular días con ventas
-    dias_con_ventas = len(set(v['fecha'].date() for v in ventas_por_dia))
+    dias_con_ventas = len(dias)
     dias_periodo = (fecha_fin - fecha_inicio).days + 1
     
     # Sección de estadísticas
     summary_sheet.write('A7', '📈 ESTADÍSTICAS GENERALES DE VENTAS', subtitle_format)
     
-    # Primera columna
+    # Tres columnas de indicadores (A-B, D-E y G-H), escritas fila por fila
     summary_sheet.write('A8', 'Total de Ventas:', header_format)
     summary_sheet.write('B8', total_ventas, number_format)
-    
-    summary_sheet.write('A9', 'Monto Total Ventas:', header_format)
-    summary_sheet.write('B9', monto_total_ventas, currency_format)
-    
-    summary_sheet.write('A10', 'Promedio por Venta:', header_format)
-    summary_sheet.write('B10', promedio_venta, currency_format)
-    
-    summary_sheet.write('A11', 'Ventas al Contado:', header_format)
-    summary_sheet.write('B11', ventas_contado, number_format)
-    
-    # Segunda columna
     summary_sheet.write('D8', 'Ventas a Fiado:', header_format)
     summary_sheet.write('E8', ventas_fiado, number_format)
+    summary_sheet.write('G8', '% Ventas Contado:', header_format)
+    summary_sheet.write('H8', ventas_contado / total_ventas if total_ventas > 0 else 0, percent_format)
     
+    summary_sheet.write('A9', 'Monto Total Ventas:', header_format)
+    summary_sheet.write('B9', monto_total_ventas, currency_format)
     summary_sheet.write('D9', 'Días con Ventas:', header_format)
     summary_sheet.write('E9', dias_con_ventas, number_format)
+    summary_sheet.write('G9', '% Ventas Fiado:', header_format)
+    summary_sheet.write('H9', ventas_fiado / total_ventas if total_ventas > 0 else 0, percent_format)
     
+    summary_sheet.write('A10', 'Promedio por Venta:', header_format)
+    summary_sheet.write('B10', promedio_venta, currency_format)
     summary_sheet.write('D10', 'Promedio Diario:', header_format)
     summary_sheet.write('E10', monto_total_ventas / dias_con_ventas if dias_con_ventas > 0 else 0, currency_format)
     
+    summary_sheet.write('A11', 'Ventas al Contado:', header_format)
+    summary_sheet.write('B11', ventas_contado, number_format)
     summary_sheet.write('D11', 'Eficiencia de Días:', header_format)
     summary_sheet.write('E11', dias_con_ventas / dias_periodo if dias_periodo > 0 else 0, percent_format)
     
-    # Porcentajes
-    summary_sheet.write('G8', '% Ventas Contado:', header_format)
-    summary_sheet.write('H8', ventas_contado / total_ventas if total_ventas > 0 else 0, percent_format)
-    
-    summary_sheet.write('G9', '% Ventas Fiado:', header_format)
-    summary_sheet.write('H9', ventas_fiado / total_ventas if total_ventas > 0 else 0, percent_format)
-    
     # Análisis de tendencias
-    if len(ventas_por_dia) > 1:
-        # Calcular tendencia
-        ventas_list = list(ventas_por_dia)
-        primera_semana = sum(v['monto_total'] for v in ventas_list[:7]) if len(ventas_list) >= 7 else sum(v['monto_total'] for v in ventas_list)
-        ultima_semana = sum(v['monto_total'] for v in ventas_list[-7:]) if len(ventas_list) >= 7 else sum(v['monto_total'] for v in ventas_list)
+    total_dias = len(dias)
+    if total_dias > 1:
+        # Calcular tendencia comparando los primeros y últimos días con ventas
+        muestra = 7 if total_dias >= 7 else total_dias
+        primera_semana = sum(v['monto_total'] for v in dias[:muestra])
+        ultima_semana = sum(v['monto_total'] for v in dias[-muestra:])
         
         tendencia = ((ultima_semana - primera_semana) / primera_semana * 100) if primera_semana > 0 else 0
         
@@ -1812,26 +2125,13 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
     
     # Datos
     row = 3
-    for venta_dia in ventas_por_dia:
-        # Convertir fecha a datetime sin timezone
-        fecha_naive = convert_to_naive_datetime(venta_dia['fecha'])
-        daily_sheet.write(row, 0, fecha_naive, date_format)
+    for venta_dia in dias:
+        daily_sheet.write(row, 0, venta_dia['dia'], date_format)
         daily_sheet.write(row, 1, venta_dia['total_ventas'], number_format)
         daily_sheet.write(row, 2, venta_dia['monto_total'], currency_format)
         daily_sheet.write(row, 3, venta_dia['promedio_venta'], currency_format)
-        
-        # Obtener ventas contado y fiado para este día
-        ventas_contado_dia = Venta.objects.filter(
-            fecha__date=venta_dia['fecha'].date(),
-            es_fiado=False
-        ).count()
-        ventas_fiado_dia = Venta.objects.filter(
-            fecha__date=venta_dia['fecha'].date(),
-            es_fiado=True
-        ).count()
-        
-        daily_sheet.write(row, 4, ventas_contado_dia, number_format)
-        daily_sheet.write(row, 5, ventas_fiado_dia, number_format)
+        daily_sheet.write(row, 4, venta_dia['ventas_contado'], number_format)
+        daily_sheet.write(row, 5, venta_dia['ventas_fiado'], number_format)
         row += 1
     
     # Ajustar ancho de columnas
@@ -1851,6 +2151,12 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
     for col, header in enumerate(headers):
         monthly_sheet.write(2, col, header, header_format)
     
+    # Días con ventas de cada mes, contados sobre la matriz diaria
+    dias_por_mes = {}
+    for venta_dia in dias:
+        clave = (venta_dia['dia'].year, venta_dia['dia'].month)
+        dias_por_mes[clave] = dias_por_mes.get(clave, 0) + 1
+    
     # Datos
     row = 3
     for venta_mes in ventas_por_mes:
@@ -1866,11 +2172,7 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
         monthly_sheet.write(row, 2, venta_mes['monto_total'], currency_format)
         monthly_sheet.write(row, 3, venta_mes['promedio_venta'], currency_format)
         
-        # Calcular días con ventas para este mes
-        dias_mes = Venta.objects.filter(
-            fecha__year=venta_mes['año'],
-            fecha__month=venta_mes['mes']
-        ).values('fecha__date').distinct().count()
+        dias_mes = dias_por_mes.get((venta_mes['año'], venta_mes['mes']), 0)
         
         monthly_sheet.write(row, 4, dias_mes, number_format)
         
@@ -1943,7 +2245,7 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
     
     # Datos
     row = 3
-    for venta in todas_ventas:
+    for venta in todas_ventas.iterator(chunk_size=TAMANO_LOTE_EXPORTACION):
         detail_sheet.write(row, 0, venta.id, number_format)
         # Convertir fecha a datetime sin timezone
         fecha_naive = convert_to_naive_datetime(venta.fecha)
@@ -1986,7 +2288,7 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
     detail_sheet.set_column('H:H', 12)  # Estado
     
     # ===== HOJA 6: GRÁFICOS Y ANÁLISIS =====
-    if ventas_por_dia and productos_top:
+    if total_dias and productos_top:
         chart_sheet = workbook.add_worksheet('📊 GRÁFICOS')
         
         # Título
@@ -2002,8 +2304,8 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
         # Agregar datos al gráfico
         chart.add_series({
             'name': 'Monto Total',
-            'categories': f'=📅 VENTAS DIARIAS!$A$3:$A${2 + len(ventas_por_dia)}',
-            'values': f'=📅 VENTAS DIARIAS!$C$3:$C${2 + len(ventas_por_dia)}',
+            'categories': f'=📅 VENTAS DIARIAS!$A$3:$A${2 + total_dias}',
+            'values': f'=📅 VENTAS DIARIAS!$C$3:$C${2 + total_dias}',
             'line': {'color': '#4472C4', 'width': 3},
             'marker': {'type': 'circle', 'size': 6}
         })
@@ -2053,27 +2355,15 @@ def exportar_reporte_ventas_excel(request, ventas_por_dia, ventas_por_mes, produ
         
         chart_sheet.insert_chart('A50', chart3)
     
-    # Cerrar el workbook
-    workbook.close()
-    
-    # Preparar la respuesta HTTP
-    output.seek(0)
+    # Cerrar el workbook y preparar la respuesta HTTP
     filename = f'Reporte_Ventas_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response 
+    return cerrar_libro_excel(workbook, archivo, filename) 
 
-def exportar_reporte_clientes_excel(request, clientes_top, fecha_inicio, fecha_fin):
+def exportar_reporte_clientes_excel(usuario, clientes_top, resumen_compras, fecha_inicio, fecha_fin):
     """Exportar reporte de clientes a Excel con formato profesional"""
     
-    # Crear el archivo Excel en memoria
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output)
+    # Crear el archivo Excel en un archivo temporal (memoria constante)
+    workbook, archivo = crear_libro_excel()
     
     # Definir formatos mejorados
     header_format = workbook.add_format({
@@ -2164,48 +2454,44 @@ def exportar_reporte_clientes_excel(request, clientes_top, fecha_inicio, fecha_f
     summary_sheet.write('B4', timezone.now().strftime("%d/%m/%Y %H:%M"), date_format)
     
     summary_sheet.write('A5', '👤 Generado por:', info_format)
-    summary_sheet.write('B5', request.user.get_full_name() or request.user.username, cell_format)
+    summary_sheet.write('B5', usuario.get_full_name() or usuario.username, cell_format)
     
     # Estadísticas generales
     total_clientes = Cliente.objects.count()
-    total_compras = Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin), cliente__isnull=False).count()
-    total_monto = Venta.objects.filter(fecha__range=(fecha_inicio, fecha_fin), cliente__isnull=False).aggregate(total=Sum('total'))['total'] or 0
+    total_compras = resumen_compras['total_compras']
+    total_monto = resumen_compras['monto_total']
     promedio_compra = total_monto / total_compras if total_compras > 0 else 0
     clientes_activos = len(clientes_top)
     
     # Sección de estadísticas
     summary_sheet.write('A7', '📈 ESTADÍSTICAS GENERALES DE CLIENTES', subtitle_format)
     
-    # Primera columna
+    mejor_cliente = clientes_top[0] if clientes_top else None
+    
+    # Dos columnas de indicadores (A-B y D-E), escritas fila por fila
     summary_sheet.write('A8', 'Total de Clientes:', header_format)
     summary_sheet.write('B8', total_clientes, number_format)
-    
-    summary_sheet.write('A9', 'Clientes Activos:', header_format)
-    summary_sheet.write('B9', clientes_activos, number_format)
-    
-    summary_sheet.write('A10', 'Total de Compras:', header_format)
-    summary_sheet.write('B10', total_compras, number_format)
-    
-    summary_sheet.write('A11', 'Monto Total:', header_format)
-    summary_sheet.write('B11', total_monto, currency_format)
-    
-    # Segunda columna
     summary_sheet.write('D8', 'Promedio por Compra:', header_format)
     summary_sheet.write('E8', promedio_compra, currency_format)
     
+    summary_sheet.write('A9', 'Clientes Activos:', header_format)
+    summary_sheet.write('B9', clientes_activos, number_format)
     summary_sheet.write('D9', '% Clientes Activos:', header_format)
     summary_sheet.write('E9', clientes_activos / total_clientes if total_clientes > 0 else 0, percent_format)
     
+    summary_sheet.write('A10', 'Total de Compras:', header_format)
+    summary_sheet.write('B10', total_compras, number_format)
     summary_sheet.write('D10', 'Mejor Cliente:', header_format)
-    if clientes_top:
-        mejor_cliente = clientes_top[0]
+    if mejor_cliente:
         summary_sheet.write('E10', mejor_cliente['cliente__nombre'], cell_format)
     else:
         summary_sheet.write('E10', 'N/A', cell_format)
     
+    summary_sheet.write('A11', 'Monto Total:', header_format)
+    summary_sheet.write('B11', total_monto, currency_format)
     summary_sheet.write('D11', 'Valor Mejor Cliente:', header_format)
-    if clientes_top:
-        summary_sheet.write('E11', clientes_top[0]['monto_total'], currency_format)
+    if mejor_cliente:
+        summary_sheet.write('E11', mejor_cliente['monto_total'], currency_format)
     else:
         summary_sheet.write('E11', '$0.00', currency_format)
     
@@ -2292,17 +2578,6 @@ def exportar_reporte_clientes_excel(request, clientes_top, fecha_inicio, fecha_f
     segmentacion_sheet.set_column('C:D', 18)  # Montos
     segmentacion_sheet.set_column('E:E', 15)  # Participación
     
-    # Cerrar el workbook
-    workbook.close()
-    
-    # Preparar la respuesta HTTP
-    output.seek(0)
+    # Cerrar el workbook y preparar la respuesta HTTP
     filename = f'Reporte_Clientes_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}.xlsx'
-    
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
\ No newline at end of file
+    return cerrar_libro_excel(workbook, archivo, filename)
\ No newline at end of file
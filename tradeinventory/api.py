@@ -0,0 +1,235 @@
+"""
+Piezas comunes de las APIs REST de TradeInventory
+
+- PaginacionCursor: paginación por cursor para todos los listados. Cada
+  página se obtiene con un filtro sobre la columna de orden (WHERE fecha <
+  cursor LIMIT n) en lugar de un OFFSET, así que pedir la página 1000 cuesta
+  lo mismo que la primera y las filas nuevas no desplazan las páginas.
+- CamposDispersosMixin: ?fields=id,nombre,... devuelve solo esos campos en
+  las respuestas de lectura, y permite a cada ViewSet omitir las
+  relaciones que nadie pidió (ver campo_solicitado).
+- ListaRapidaMixin: los listados se arman desde .values() con un
+  PlanLectura precompilado en lugar de instanciar un modelo y recorrer el
+  serializer por fila; la respuesta es idéntica a la del serializer.
+"""
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class PaginacionCursor(CursorPagination):
+    """
+    Paginación por cursor con el orden declarado en cada ViewSet
+
+    El ViewSet indica su orden en `orden_cursor`, por ejemplo ('-fecha', '-id').
+    La primera columna debe ser (casi) única e inmutable: el cursor guarda su
+    valor y las filas empatadas se saltan con un desplazamiento.
+
+    Parámetros GET:
+        - cursor: Posición devuelta en next/previous
+        - tamano: Resultados por página (máximo max_page_size)
+    """
+    page_size_query_param = 'tamano'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, 'orden_cursor', ('-id',)))
+
+
+class CamposDispersosMixin:
+    """
+    Mixin de ViewSet para respuestas con un subconjunto de campos
+
+    GET ?fields=id,nombre,precio quita del serializer los demás campos. Un
+    campo desconocido responde 400 con la lista de campos disponibles. Las
+    escrituras siempre devuelven el serializer completo.
+    """
+    parametro_campos = 'fields'
+
+    def campos_solicitados(self):
+        """
+        Returns:
+            set: Campos pedidos en ?fields=, o None si se piden todos
+        """
+        if self.request is None or self.request.method != 'GET':
+            return None
+        valor = self.request.query_params.get(self.parametro_campos)
+        if not valor:
+            return None
+        return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+    def campo_solicitado(self, campo):
+        """True si la respuesta incluye el campo (para omitir select_related/prefetch)"""
+        campos = self.campos_solicitados()
+        return campos is None or campo in campos
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        campos = self.campos_solicitados()
+        if campos is not None:
+            destino = getattr(serializer, 'child', serializer)
+            desconocidos = campos - set(destino.fields)
+            if desconocidos:
+                raise ValidationError({
+                    self.parametro_campos: f'Campos desconocidos: {", ".join(sorted(desconocidos))}. '
+                                           f'Disponibles: {", ".join(destino.fields)}'
+                })
+            for campo in set(destino.fields) - campos:
+                destino.fields.pop(campo)
+        return serializer
+
+
+# Campos de DRF cuyo to_representation() devuelve sin cambios el valor de
+# una columna de estos tipos de campo del modelo
+_SIN_CONVERSION = {
+    serializers.IntegerField: (models.IntegerField,),
+    serializers.BooleanField: (models.BooleanField,),
+    serializers.CharField: (models.CharField, models.TextField),
+}
+
+
+def _fecha_iso(zona):
+    """DateTimeField.to_representation() en ISO 8601 con la zona ya resuelta"""
+    def convertir(valor):
+        texto = valor.astimezone(zona).isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    return convertir
+
+
+class PlanLectura:
+    """
+    Plan precompilado para serializar filas de .values() como un serializer
+
+    Por cada campo del serializer guarda la columna de values() (la fuente
+    'categoria.nombre' se lee como 'categoria__nombre') y la conversión del
+    campo de DRF, así que serializar una fila es solo un diccionario por
+    comprensión. Las fechas en ISO 8601 se convierten con la zona horaria
+    resuelta una vez por lista en lugar de una vez por valor. Los campos que no son columnas (propiedades del modelo) se
+    calculan en la consulta con las expresiones de `calculados`.
+
+    Args:
+        serializer: Instancia del serializer (con los campos ya filtrados
+            por ?fields=)
+        calculados: Diccionario {campo: expresión para annotate()}
+
+    Raises:
+        ValueError: Si un campo no es una columna ni está en `calculados`
+    """
+
+    def __init__(self, serializer, calculados=None):
+        calculados = calculados or {}
+        modelo = serializer.Meta.model
+        self.anotaciones = {}
+        self.columnas = []
+        self.fechas = set()
+        for nombre, campo in serializer.fields.items():
+            if campo.write_only:
+                continue
+            if nombre in calculados:
+                columna = f'_plan_{nombre}'
+                self.anotaciones[columna] = calculados[nombre]
+                self.columnas.append((nombre, columna, campo.to_representation))
+            else:
+                columna, campo_modelo = self._columna(modelo, campo.source, nombre)
+                self.columnas.append((nombre, columna, self._conversion(nombre, campo, campo_modelo)))
+                if self._fecha_iso(campo, campo_modelo):
+                    self.fechas.add(columna)
+
+    @staticmethod
+    def _columna(modelo, fuente, nombre):
+        """Columna de values() y campo del modelo de una fuente como 'categoria.nombre'"""
+        partes = fuente.split('.')
+        for numero, parte in enumerate(partes):
+            try:
+                campo_modelo = modelo._meta.get_field(parte)
+            except FieldDoesNotExist:
+                raise ValueError(f'El campo "{nombre}" ({fuente}) no es una columna: declárelo en campos_calculados')
+            if numero < len(partes) - 1:
+                modelo = campo_modelo.related_model
+        return '__'.join(partes), campo_modelo
+
+    @staticmethod
+    def _conversion(nombre, campo, campo_modelo):
+        """Función que convierte el valor de la columna, o None si se usa tal cual"""
+        if isinstance(campo, serializers.PrimaryKeyRelatedField) and campo.pk_field is None:
+            return None  # values() ya devuelve la llave foránea
+        if isinstance(campo, (serializers.BaseSerializer, serializers.RelatedField)):
+            raise ValueError(f'El campo "{nombre}" es una relación anidada: no se puede leer de values()')
+        if isinstance(campo_modelo, _SIN_CONVERSION.get(type(campo), ())):
+            return None
+        return campo.to_representation
+
+    @staticmethod
+    def _fecha_iso(campo, campo_modelo):
+        """True si el campo es un DateTimeField aware en ISO 8601 con la zona actual"""
+        formato = getattr(campo, 'format', api_settings.DATETIME_FORMAT)
+        return (
+            type(campo) is serializers.DateTimeField and isinstance(campo_modelo, models.DateTimeField)
+            and isinstance(formato, str) and formato.lower() == ISO_8601
+            and not hasattr(campo, 'timezone') and settings.USE_TZ
+        )
+
+    def consulta(self, queryset, extra=()):
+        """values() con las columnas del plan (y las de `extra`, p. ej. las del cursor)"""
+        if self.anotaciones:
+            queryset = queryset.annotate(**self.anotaciones)
+        columnas = dict.fromkeys([columna for _, columna, _ in self.columnas] + list(extra))
+        return queryset.values(*columnas)
+
+    def filas(self, valores):
+        """Lista de diccionarios con la salida del serializer para cada fila de consulta()"""
+        columnas = self.columnas
+        if self.fechas:
+            fecha = _fecha_iso(timezone.get_current_timezone())
+            columnas = [
+                (nombre, columna, fecha if columna in self.fechas else convertir)
+                for nombre, columna, convertir in columnas
+            ]
+        return [
+            {
+                nombre: valor if convertir is None or valor is None else convertir(valor)
+                for nombre, columna, convertir in columnas
+                for valor in (fila[columna],)
+            }
+            for fila in valores
+        ]
+
+
+class ListaRapidaMixin:
+    """
+    Mixin de ViewSet: la acción list se arma con un PlanLectura
+
+    Para ViewSets cuyo serializer de listado es de solo lectura y sus campos
+    son columnas, relaciones por llave foránea o expresiones declaradas en
+    `campos_calculados`. Respeta ?fields= (CamposDispersosMixin) y la
+    paginación por cursor, que también acepta filas de values(). Con
+    API_LISTA_RAPIDA = False se usa el serializer.
+    """
+    campos_calculados = {}
+    _planes = {}
+
+    def plan_lectura(self):
+        serializer = self.get_serializer()
+        llave = (type(serializer), tuple(serializer.fields))
+        plan = self._planes.get(llave)
+        if plan is None:
+            plan = self._planes[llave] = PlanLectura(serializer, self.campos_calculados)
+        return plan
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'API_LISTA_RAPIDA', True):
+            return super().list(request, *args, **kwargs)
+        plan = self.plan_lectura()
+        orden = [campo.lstrip('-') for campo in getattr(self, 'orden_cursor', ())]
+        valores = plan.consulta(self.filter_queryset(self.get_queryset()), extra=orden)
+        pagina = self.paginate_queryset(valores)
+        if pagina is not None:
+            return self.get_paginated_response(plan.filas(pagina))
+        return Response(plan.filas(valores))
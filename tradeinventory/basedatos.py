@@ -0,0 +1,168 @@
+"""
+Perfil de base de datos de TradeInventory según variables de entorno
+
+DB_PERFIL elige el motor y su ajuste:
+
+- 'sqlite' (predeterminado): para instalaciones de una sola tienda. Cada
+  conexión activa el modo WAL (los lectores no esperan al escritor),
+  synchronous=NORMAL (un fsync por checkpoint en lugar de uno por
+  transacción, seguro con WAL) y una espera por bloqueo de DB_ESPERA
+  segundos. Las transacciones empiezan con BEGIN IMMEDIATE: el cobro toma
+  el bloqueo de escritura al inicio y espera su turno en lugar de fallar
+  con "database is locked" al pasar de lectura a escritura.
+- 'sqlite-simple': SQLite con los valores de Django, como antes de este
+  módulo (sirve de referencia en medir_concurrencia)
+- 'mysql': MySQL/MariaDB con mysqlclient
+- 'postgresql': PostgreSQL con psycopg 3 y el pool de conexiones de Django
+  (psycopg[pool]); DB_POOL = 0 lo desactiva
+
+Conexiones: salvo con el pool de PostgreSQL, cada hilo conserva su conexión
+DB_CONN_MAX_AGE segundos (60 por defecto, 0 = una conexión por petición) y
+Django comprueba que siga viva antes de reutilizarla (CONN_HEALTH_CHECKS).
+Django no tiene pool para MySQL: las conexiones persistentes por hilo
+cumplen esa función.
+
+Réplica de lectura (opcional, ver tradeinventory/replicas.py): con
+DB_REPLICA_HOST o DB_REPLICA_NOMBRE se agrega el alias 'replica' con la
+misma configuración y los valores DB_REPLICA_* en lugar de los DB_*.
+
+Variables (todas opcionales):
+    DB_PERFIL, DB_NOMBRE, DB_USUARIO, DB_CLAVE, DB_HOST, DB_PUERTO,
+    DB_CONN_MAX_AGE, DB_ESPERA, DB_POOL, DB_POOL_MINIMO, DB_POOL_MAXIMO,
+    DB_REPLICA_NOMBRE, DB_REPLICA_HOST, DB_REPLICA_PUERTO, DB_REPLICA_USUARIO,
+    DB_REPLICA_CLAVE
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PERFILES = ('sqlite', 'sqlite-simple', 'mysql', 'postgresql')
+
+# Variantes de conexión que compara medir_concurrencia, por motor
+VARIANTES = {
+    'sqlite': {
+        'sqlite-simple': {'DB_PERFIL': 'sqlite-simple'},
+        'sqlite': {'DB_PERFIL': 'sqlite'},
+    },
+    'mysql': {
+        'mysql-por-peticion': {'DB_PERFIL': 'mysql', 'DB_CONN_MAX_AGE': '0'},
+        'mysql': {'DB_PERFIL': 'mysql'},
+    },
+    'postgresql': {
+        'postgresql-por-peticion': {'DB_PERFIL': 'postgresql', 'DB_POOL': '0', 'DB_CONN_MAX_AGE': '0'},
+        'postgresql-persistente': {'DB_PERFIL': 'postgresql', 'DB_POOL': '0'},
+        'postgresql': {'DB_PERFIL': 'postgresql'},
+    },
+}
+
+
+def _entero(entorno, variable, predeterminado):
+    valor = entorno.get(variable, '')
+    if valor == '':
+        return predeterminado
+    try:
+        return int(valor)
+    except ValueError:
+        raise ImproperlyConfigured(f'{variable} debe ser un número entero: {valor!r}')
+
+
+def configuracion_base_datos(base_dir, entorno=None):
+    """
+    Arma DATABASES['default'] a partir de las variables de entorno
+
+    Args:
+        base_dir: Carpeta del proyecto (para el archivo de SQLite)
+        entorno: Diccionario de variables (por defecto os.environ)
+
+    Returns:
+        dict: Configuración de la base de datos para settings.DATABASES
+
+    Raises:
+        ImproperlyConfigured: Si DB_PERFIL o un número no son válidos
+    """
+    entorno = os.environ if entorno is None else entorno
+    perfil = entorno.get('DB_PERFIL', 'sqlite')
+    if perfil not in PERFILES:
+        raise ImproperlyConfigured(f'DB_PERFIL desconocido: {perfil!r} (opciones: {", ".join(PERFILES)})')
+
+    if perfil == 'sqlite-simple':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': entorno.get('DB_NOMBRE') or base_dir / 'db.sqlite3',
+        }
+
+    configuracion = {
+        'CONN_MAX_AGE': _entero(entorno, 'DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if perfil == 'sqlite':
+        configuracion.update({
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': entorno.get('DB_NOMBRE') or base_dir / 'db.sqlite3',
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+                'timeout': _entero(entorno, 'DB_ESPERA', 20),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        })
+        return configuracion
+
+    configuracion.update({
+        'NAME': entorno.get('DB_NOMBRE', 'tradeinventory'),
+        'USER': entorno.get('DB_USUARIO', ''),
+        'PASSWORD': entorno.get('DB_CLAVE', ''),
+        'HOST': entorno.get('DB_HOST', 'localhost'),
+        'PORT': entorno.get('DB_PUERTO', ''),
+    })
+    if perfil == 'mysql':
+        configuracion.update({
+            'ENGINE': 'django.db.backends.mysql',
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'connect_timeout': _entero(entorno, 'DB_ESPERA', 20),
+            },
+        })
+    else:
+        configuracion.update({
+            'ENGINE': 'django.db.backends.postgresql',
+            'OPTIONS': {'connect_timeout': _entero(entorno, 'DB_ESPERA', 20)},
+        })
+        if entorno.get('DB_POOL', '1') == '1':
+            # El pool reemplaza a las conexiones persistentes: Django exige CONN_MAX_AGE = 0
+            configuracion['CONN_MAX_AGE'] = 0
+            configuracion['OPTIONS']['pool'] = {
+                'min_size': _entero(entorno, 'DB_POOL_MINIMO', 2),
+                'max_size': _entero(entorno, 'DB_POOL_MAXIMO', 10),
+                'timeout': _entero(entorno, 'DB_ESPERA', 20),
+            }
+    return configuracion
+
+
+def configuracion_replica(base_dir, entorno=None):
+    """
+    Arma DATABASES['replica'] con la configuración de la primaria y los
+    valores de las variables DB_REPLICA_*
+
+    En las pruebas la réplica apunta a la base de prueba de la primaria
+    (TEST MIRROR).
+
+    Args:
+        base_dir: Carpeta del proyecto
+        entorno: Diccionario de variables (por defecto os.environ)
+
+    Returns:
+        dict: Configuración de la réplica, o None si no hay réplica
+    """
+    entorno = os.environ if entorno is None else entorno
+    if not (entorno.get('DB_REPLICA_HOST') or entorno.get('DB_REPLICA_NOMBRE')):
+        return None
+    propias = {
+        'DB_' + variable[len('DB_REPLICA_'):]: valor
+        for variable, valor in entorno.items()
+        if variable.startswith('DB_REPLICA_') and valor
+    }
+    configuracion = configuracion_base_datos(base_dir, {**entorno, **propias})
+    configuracion['TEST'] = {'MIRROR': 'default'}
+    return configuracion
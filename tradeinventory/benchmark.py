@@ -0,0 +1,314 @@
+"""
+Suite de mediciones de TradeInventory
+
+Recorre las vistas de ventas, clientes, productos, reportes y las rutas
+de la API REST con el cliente de pruebas de Django y registra, por vista,
+el estado HTTP, la cantidad de consultas SQL, la mediana y el percentil 95
+del tiempo de respuesta y el tamaño de la respuesta.
+
+Solo se miden vistas GET que no modifican datos, más el cobro (POST de
+nueva_venta) porque es la ruta de escritura más frecuente. El cobro, el
+stock que necesita y el usuario de medición solo se crean en las bases de
+prueba del comando benchmark; la base configurada (--base-actual) se mide
+sin escrituras y dentro de una transacción que se revierte.
+
+Los resultados se guardan como JSON para comparar una ejecución con otra
+(ver comparar_resultados()).
+"""
+
+import json
+import logging
+import platform
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente, DetalleFiado, Fiado
+from productos.inventario import mover_stock
+from productos.models import Producto
+from ventas.models import DetalleVenta, Venta
+
+
+def rutas_medidas(escrituras=True):
+    """
+    Arma la lista de rutas a medir con ids de muestra de la base actual
+
+    Args:
+        escrituras: Incluir el cobro (solo en bases de prueba)
+
+    Returns:
+        list: Diccionarios con nombre, metodo, url y datos (cuerpo JSON para POST)
+    """
+    # Muestras: el cliente con más ventas, una venta a fiado y un fiado con detalles
+    cliente = Cliente.objects.annotate(num_ventas=Count('venta')).order_by('-num_ventas').first()
+    venta = Venta.objects.filter(es_fiado=True).order_by('-fecha').first() or Venta.objects.order_by('-fecha').first()
+    detalle_venta = DetalleVenta.objects.filter(venta=venta).first() if venta else None
+    fiado = Fiado.objects.filter(detalles__isnull=False).order_by('-fecha').first()
+    detalle_fiado = DetalleFiado.objects.filter(fiado=fiado).first() if fiado else None
+    producto = Producto.objects.filter(activo=True).first()
+    carrito = list(Producto.objects.filter(activo=True, stock_actual__gte=1000).values_list('id', flat=True)[:3])
+
+    rutas = [
+        ('inicio', 'home', []),
+        # Ventas
+        ('ventas:lista_ventas', 'ventas:lista_ventas', []),
+        ('ventas:nueva_venta', 'ventas:nueva_venta', []),
+        ('ventas:historial_ventas', 'ventas:historial_ventas', []),
+        # Productos
+        ('productos:lista_productos', 'productos:lista_productos', []),
+        ('productos:crear_producto', 'productos:crear_producto', []),
+        # Clientes
+        ('clientes:lista_clientes', 'clientes:lista_clientes', []),
+        ('clientes:crear_cliente', 'clientes:crear_cliente', []),
+        ('clientes:crear_fiado', 'clientes:crear_fiado', []),
+        # Reportes
+        ('reportes:lista_reportes', 'reportes:lista_reportes', []),
+        ('reportes:historial_reportes', 'reportes:historial_reportes', []),
+    ]
+    for reporte in ('productos', 'ventas', 'clientes', 'proveedores', 'fiados', 'categorias'):
+        rutas.append((f'reportes:reporte_{reporte}', f'reportes:reporte_{reporte}', []))
+        rutas.append((f'reportes:reporte_{reporte} (excel)', f'reportes:reporte_{reporte}', [], {'formato': 'excel'}))
+
+    if venta:
+        rutas.append(('ventas:detalle_venta', 'ventas:detalle_venta', [venta.id]))
+    if producto:
+        rutas.append(('productos:editar_producto', 'productos:editar_producto', [producto.id]))
+    if cliente:
+        rutas += [
+            ('clientes:editar_cliente', 'clientes:editar_cliente', [cliente.id]),
+            ('clientes:historial_deudas', 'clientes:historial_deudas', [cliente.id]),
+            ('clientes:historial_abonos', 'clientes:historial_abonos', [cliente.id]),
+            ('clientes:deudas_simples', 'clientes:deudas_simples', [cliente.id]),
+            ('clientes:lista_productos_deudas', 'clientes:lista_productos_deudas', [cliente.id]),
+        ]
+    if venta:
+        rutas.append(('clientes:productos_deuda (venta)', 'clientes:productos_deuda', ['venta', venta.id]))
+    if detalle_venta:
+        rutas.append(('clientes:abonar_venta_simple', 'clientes:abonar_venta_simple', [detalle_venta.id]))
+    if fiado:
+        rutas += [
+            ('clientes:productos_deuda (fiado)', 'clientes:productos_deuda', ['fiado', fiado.id]),
+            ('clientes:detalle_fiado_cliente', 'clientes:detalle_fiado_cliente', [fiado.id]),
+            ('reportes:detalle_fiado', 'reportes:detalle_fiado', [fiado.id]),
+        ]
+    if detalle_fiado:
+        rutas.append(('clientes:abonar_deuda_simple', 'clientes:abonar_deuda_simple', [detalle_fiado.id]))
+
+    # API REST
+    rutas += [
+        ('api:productos', 'api-producto-list', []),
+        ('api:productos stock_bajo', 'api-producto-stock-bajo', []),
+        ('api:clientes', 'api-cliente-list', []),
+        ('api:fiados', 'api-fiado-list', []),
+        ('api:ventas', 'api-venta-list', []),
+        ('api:ventas ventas_hoy', 'api-venta-ventas-hoy', []),
+        ('api:ventas estadisticas', 'api-venta-estadisticas', []),
+        ('api:detalles-venta', 'api-detalle-venta-list', []),
+    ]
+    if producto:
+        rutas.append(('api:producto', 'api-producto-detail', [producto.id]))
+    if cliente:
+        rutas += [
+            ('api:cliente', 'api-cliente-detail', [cliente.id]),
+            ('api:cliente fiados', 'api-cliente-fiados', [cliente.id]),
+        ]
+    if venta:
+        rutas.append(('api:venta', 'api-venta-detail', [venta.id]))
+
+    medidas = []
+    for ruta in rutas:
+        nombre, url_nombre, argumentos = ruta[:3]
+        parametros = ruta[3] if len(ruta) > 3 else None
+        medidas.append({
+            'nombre': nombre,
+            'metodo': 'GET',
+            'url': reverse(url_nombre, args=argumentos),
+            'datos': parametros,
+        })
+
+    # Cobro de una venta de contado con los productos de mayor stock
+    if escrituras and carrito:
+        medidas.append({
+            'nombre': 'ventas:nueva_venta (cobro)',
+            'metodo': 'POST',
+            'url': reverse('ventas:nueva_venta'),
+            'datos': {'es_fiado': False, 'productos': [{'id': pid, 'cantidad': 1} for pid in carrito]},
+        })
+    return medidas
+
+
+def preparar_stock_para_cobros():
+    """Deja stock suficiente en algunos productos para medir cobros repetidos"""
+    ids = list(Producto.objects.filter(activo=True).order_by('id').values_list('id', flat=True)[:3])
+    mover_stock({producto_id: 100000 for producto_id in ids}, 'entrada', 'Benchmark')
+
+
+def usuario_medicion():
+    """Superusuario de la base de prueba con el que se hacen las peticiones"""
+    usuario, creado = User.objects.get_or_create(
+        username='benchmark',
+        defaults={'is_staff': True, 'is_superuser': True},
+    )
+    if creado:
+        usuario.set_unusable_password()
+        usuario.save()
+    return usuario
+
+
+class ContadorConsultas:
+    """
+    Cuenta las consultas SQL ejecutadas mientras está activo
+
+    Usa connection.execute_wrapper, por lo que no depende de DEBUG ni del
+    límite de consultas que Django guarda en connection.queries.
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def _percentil(valores, fraccion):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fraccion))]
+
+
+def medir_ruta(cliente, ruta, repeticiones):
+    """
+    Ejecuta una ruta varias veces y mide tiempo y consultas
+
+    Args:
+        cliente: django.test.Client con sesión iniciada
+        ruta: Diccionario devuelto por rutas_medidas()
+        repeticiones: Cantidad de ejecuciones medidas (más una de calentamiento)
+
+    Returns:
+        dict: Resultado de la ruta
+    """
+    def ejecutar():
+        if ruta['metodo'] == 'POST':
+            return cliente.post(ruta['url'], data=json.dumps(ruta['datos']), content_type='application/json')
+        return cliente.get(ruta['url'], ruta['datos'] or {})
+
+    def contenido(respuesta):
+        if respuesta.streaming:
+            return b''.join(respuesta.streaming_content)
+        return respuesta.content
+
+    contenido(ejecutar())  # Calentamiento (plantillas, cachés)
+
+    tiempos = []
+    consultas = 0
+    estado = None
+    tamano = 0
+    for _ in range(repeticiones):
+        contador = ContadorConsultas()
+        with connection.execute_wrapper(contador):
+            inicio = time.perf_counter()
+            respuesta = ejecutar()
+            cuerpo = contenido(respuesta)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas = contador.total
+        estado = respuesta.status_code
+        tamano = len(cuerpo)
+
+    return {
+        'nombre': ruta['nombre'],
+        'metodo': ruta['metodo'],
+        'url': ruta['url'],
+        'estado': estado,
+        'consultas': consultas,
+        'ms_mediana': round(_percentil(tiempos, 0.5), 3),
+        'ms_p95': round(_percentil(tiempos, 0.95), 3),
+        'bytes': tamano,
+    }
+
+
+def ejecutar_mediciones(repeticiones=5, filtro=None, progreso=None, usuario=None):
+    """
+    Mide todas las rutas contra la base de datos actual
+
+    Args:
+        repeticiones: Ejecuciones medidas por ruta
+        filtro: Texto que debe contener el nombre de la ruta (opcional)
+        progreso: Función que recibe cada resultado al terminarlo (opcional)
+        usuario: Usuario existente con el que medir. Sin usuario la base es
+            de prueba: se crea el usuario de medición, se prepara stock y
+            se mide también el cobro
+
+    Returns:
+        list: Resultados por ruta
+    """
+    escrituras = usuario is None
+    if escrituras:
+        preparar_stock_para_cobros()
+        usuario = usuario_medicion()
+    # Los errores se registran como respuestas 500 en lugar de detener la suite
+    cliente = Client(raise_request_exception=False)
+    cliente.force_login(usuario)
+
+    # Las trazas de los errores 500 ya quedan en el resultado de cada ruta
+    registro_peticiones = logging.getLogger('django.request')
+    nivel_anterior = registro_peticiones.level
+    registro_peticiones.setLevel(logging.CRITICAL)
+    try:
+        resultados = []
+        for ruta in rutas_medidas(escrituras):
+            if filtro and filtro not in ruta['nombre']:
+                continue
+            resultado = medir_ruta(cliente, ruta, repeticiones)
+            resultados.append(resultado)
+            if progreso:
+                progreso(resultado)
+    finally:
+        registro_peticiones.setLevel(nivel_anterior)
+    return resultados
+
+
+def entorno():
+    """Datos del entorno de la medición, para interpretar comparaciones"""
+    return {
+        'fecha': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base_de_datos': connection.vendor,
+        'maquina': platform.node(),
+    }
+
+
+def comparar_resultados(anterior, actual):
+    """
+    Compara dos ejecuciones de la suite escala por escala y ruta por ruta
+
+    Args:
+        anterior: Diccionario JSON de una ejecución previa
+        actual: Diccionario JSON de la ejecución actual
+
+    Returns:
+        list: Diferencias con escala, nombre, consultas y ms antes/después
+    """
+    diferencias = []
+    for escala, datos in actual['escalas'].items():
+        previos = {r['nombre']: r for r in anterior.get('escalas', {}).get(escala, {}).get('vistas', [])}
+        for resultado in datos['vistas']:
+            previo = previos.get(resultado['nombre'])
+            if previo is None:
+                continue
+            diferencias.append({
+                'escala': escala,
+                'nombre': resultado['nombre'],
+                'consultas_antes': previo['consultas'],
+                'consultas_despues': resultado['consultas'],
+                'ms_antes': previo['ms_mediana'],
+                'ms_despues': resultado['ms_mediana'],
+            })
+    return diferencias
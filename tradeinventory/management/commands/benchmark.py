@@ -0,0 +1,129 @@
+"""
+Comando para medir las vistas y la API a varias escalas de datos
+
+Por cada escala crea una base de datos de prueba, la puebla con
+GeneradorTienda, mide todas las rutas (ver tradeinventory/benchmark.py)
+y la elimina. Los resultados se guardan en JSON.
+
+Con --base-actual se mide la base configurada sin modificarla: solo las
+rutas de lectura (sin el cobro ni el stock que prepara), con un usuario
+existente y dentro de una transacción que se revierte al terminar (el
+inicio de sesión del cliente de pruebas también escribe).
+
+Uso:
+    python manage.py benchmark
+    python manage.py benchmark --escalas pequena,mediana --repeticiones 10 --salida resultados.json
+    python manage.py benchmark --comparar resultados_anteriores.json
+    python manage.py benchmark --base-actual          # mide la base configurada sin poblarla
+    python manage.py benchmark --base-actual --usuario admin
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from tradeinventory import benchmark
+from tradeinventory.sintetico import ESCALAS, GeneradorTienda, contar_filas
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y consultas SQL de las vistas y la API a varias escalas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escalas', default='pequena,mediana', help='Escalas separadas por coma')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones medidas por ruta')
+        parser.add_argument('--filtro', help='Medir solo las rutas cuyo nombre contenga este texto')
+        parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto benchmark_<fecha>.json)')
+        parser.add_argument('--comparar', help='Archivo JSON de una ejecución anterior para comparar')
+        parser.add_argument('--base-actual', action='store_true', help='Medir la base configurada sin crear datos')
+        parser.add_argument('--usuario', help='Usuario existente para --base-actual (por defecto el primer superusuario activo)')
+
+    def handle(self, *args, **options):
+        escalas = [escala.strip() for escala in options['escalas'].split(',') if escala.strip()]
+        for escala in escalas:
+            if escala not in ESCALAS:
+                raise CommandError(f'Escala desconocida: {escala} (opciones: {", ".join(sorted(ESCALAS))})')
+
+        resultados = {'entorno': benchmark.entorno(), 'escalas': {}}
+
+        setup_test_environment()
+        try:
+            if options['base_actual']:
+                resultados['escalas']['actual'] = self.medir_base_actual(options)
+            else:
+                for escala in escalas:
+                    resultados['escalas'][escala] = self.medir_escala(escala, options)
+        finally:
+            teardown_test_environment()
+
+        salida = options['salida'] or f'benchmark_{timezone.localtime().strftime("%Y%m%d_%H%M%S")}.json'
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {salida}'))
+
+        if options['comparar']:
+            self.mostrar_comparacion(options['comparar'], resultados)
+
+    def medir_escala(self, escala, options):
+        """Crea una base de prueba, la puebla con la escala indicada y la mide"""
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nEscala {escala}'))
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            GeneradorTienda(**ESCALAS[escala]).generar()
+            return self.medir(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def medir_base_actual(self, options):
+        """Mide la base configurada solo con lecturas y revierte lo que escriba la sesión"""
+        usuarios = User.objects.filter(is_active=True)
+        if options['usuario']:
+            usuario = usuarios.filter(username=options['usuario']).first()
+        else:
+            usuario = usuarios.filter(is_superuser=True).order_by('id').first()
+        if usuario is None:
+            raise CommandError('No hay un usuario activo para medir; indíquelo con --usuario')
+
+        with transaction.atomic():
+            resultado = self.medir(options, usuario)
+            transaction.set_rollback(True)
+        return resultado
+
+    def medir(self, options, usuario=None):
+        datos = contar_filas()
+        self.stdout.write(', '.join(f'{modelo}: {cantidad}' for modelo, cantidad in datos.items()))
+        self.stdout.write(f'{"Ruta":<45}{"Estado":>7}{"Consultas":>10}{"Mediana":>12}{"p95":>12}')
+
+        def progreso(resultado):
+            estilo = self.style.ERROR if resultado['estado'] >= 500 else (lambda texto: texto)
+            self.stdout.write(estilo(
+                f'{resultado["nombre"]:<45}{resultado["estado"]:>7}{resultado["consultas"]:>10}'
+                f'{resultado["ms_mediana"]:>9.1f} ms{resultado["ms_p95"]:>9.1f} ms'
+            ))
+
+        vistas = benchmark.ejecutar_mediciones(options['repeticiones'], options['filtro'], progreso, usuario)
+        return {'datos': datos, 'vistas': vistas}
+
+    def mostrar_comparacion(self, ruta_anterior, resultados):
+        try:
+            with open(ruta_anterior, encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer {ruta_anterior}: {e}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nComparación con {ruta_anterior}'))
+        self.stdout.write(f'{"Escala":<10}{"Ruta":<45}{"Consultas":>16}{"Mediana (ms)":>22}')
+        for fila in benchmark.comparar_resultados(anterior, resultados):
+            texto = (
+                f'{fila["escala"]:<10}{fila["nombre"]:<45}'
+                f'{fila["consultas_antes"]:>7} → {fila["consultas_despues"]:<6}'
+                f'{fila["ms_antes"]:>9.1f} → {fila["ms_despues"]:<9.1f}'
+            )
+            if fila['consultas_despues'] > fila['consultas_antes'] or fila['ms_despues'] > fila['ms_antes'] * 1.2:
+                texto = self.style.WARNING(texto)
+            self.stdout.write(texto)
@@ -0,0 +1,69 @@
+"""
+Comando para comparar los listados de la API con serializer y con values()
+
+Por cada tamaño arma la misma lista de productos y de ventas de dos formas:
+con ProductoListSerializer/VentaListSerializer sobre instancias del modelo
+(lo que hace la acción list con API_LISTA_RAPIDA = False) y con el
+PlanLectura de ListaRapidaMixin sobre filas de values(). Mide filas por
+segundo incluyendo la consulta y comprueba que la salida sea idéntica.
+
+Uso:
+    python manage.py medir_api_listas
+    python manage.py medir_api_listas --filas 10000,100000 --repeticiones 3
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from productos.models import Producto
+from productos.serializers import ProductoListSerializer
+from tradeinventory.api import PlanLectura
+from ventas.models import Venta
+from ventas.serializers import VentaListSerializer
+
+LISTADOS = [
+    ('productos', ProductoListSerializer, lambda: Producto.objects.select_related('categoria', 'proveedor').order_by('nombre', 'id'), {}),
+    ('ventas', VentaListSerializer, lambda: Venta.objects.select_related('cliente').order_by('-fecha', '-id'), {'estado': Venta.expresion_estado()}),
+]
+
+
+def _mejor_tiempo(funcion, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultado
+
+
+class Command(BaseCommand):
+    help = 'Compara filas por segundo de los listados de la API con serializer y con values()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', default='10000,100000', help='Tamaños de lista separados por coma')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones por medición (se toma la mejor)')
+
+    def handle(self, *args, **options):
+        tamanos = [int(tamano) for tamano in options['filas'].split(',') if tamano.strip()]
+        for nombre, serializer_class, consulta, calculados in LISTADOS:
+            plan = PlanLectura(serializer_class(), calculados)
+            for tamano in tamanos:
+                def con_serializer():
+                    return serializer_class(list(consulta()[:tamano]), many=True).data
+
+                def con_plan():
+                    return plan.filas(plan.consulta(consulta())[:tamano])
+
+                lento, esperado = _mejor_tiempo(con_serializer, options['repeticiones'])
+                rapido, obtenido = _mejor_tiempo(con_plan, options['repeticiones'])
+                filas = len(obtenido)
+                if filas < tamano:
+                    self.stdout.write(self.style.WARNING(f'{nombre}: solo hay {filas} filas de {tamano}'))
+                identica = [dict(fila) for fila in esperado] == obtenido
+                self.stdout.write(
+                    f'{nombre:<10} {filas:>8} filas  serializer {filas / lento:>10,.0f} filas/s  '
+                    f'values() {filas / rapido:>10,.0f} filas/s  x{lento / rapido:.1f}  '
+                    f'{"idéntica" if identica else "DIFERENTE"}'
+                )
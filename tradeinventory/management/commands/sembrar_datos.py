@@ -0,0 +1,45 @@
+"""
+Comando para poblar la base de datos con una tienda sintética
+
+Uso:
+    python manage.py sembrar_datos --escala pequena
+    python manage.py sembrar_datos --escala mediana --ventas 50000 --semilla 7
+"""
+
+from django.core.management.base import BaseCommand
+
+from tradeinventory.sintetico import ESCALAS, GeneradorTienda
+
+
+class Command(BaseCommand):
+    help = 'Crea categorías, proveedores, productos, clientes, ventas, fiados y abonos sintéticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', choices=sorted(ESCALAS), default='pequena', help='Tamaño base de la tienda')
+        for campo in ('categorias', 'proveedores', 'productos', 'clientes', 'ventas', 'fiados'):
+            parser.add_argument(f'--{campo}', type=int, help=f'Cantidad de {campo} (reemplaza la escala)')
+        parser.add_argument('--lineas-por-venta', type=int, default=3, help='Promedio de líneas por venta')
+        parser.add_argument('--dias', type=int, default=365, help='Días hacia atrás que cubren las ventas')
+        parser.add_argument('--proporcion-fiado', type=float, default=0.2, help='Fracción de ventas a fiado')
+        parser.add_argument('--proporcion-abonos', type=float, default=0.4, help='Fracción de deudas con abonos')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla para datos reproducibles')
+
+    def handle(self, *args, **options):
+        cantidades = dict(ESCALAS[options['escala']])
+        for campo in cantidades:
+            if options.get(campo) is not None:
+                cantidades[campo] = options[campo]
+
+        generador = GeneradorTienda(
+            lineas_por_venta=options['lineas_por_venta'],
+            dias=options['dias'],
+            proporcion_fiado=options['proporcion_fiado'],
+            proporcion_abonos=options['proporcion_abonos'],
+            semilla=options['semilla'],
+            **cantidades
+        )
+        creadas = generador.generar()
+
+        for modelo, cantidad in creadas.items():
+            self.stdout.write(f'{modelo:<16}{cantidad:>10}')
+        self.stdout.write(self.style.SUCCESS('Datos sintéticos creados'))
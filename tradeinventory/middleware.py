@@ -0,0 +1,214 @@
+"""
+Medición de peticiones para TradeInventory
+
+MetricasPeticionesMiddleware registra, por nombre de ruta (por ejemplo
+'clientes:lista_clientes'), el tiempo total de la petición, la cantidad
+de consultas SQL, el tiempo total en SQL y la consulta más lenta.
+
+Las consultas se interceptan con connection.execute_wrapper, así que la
+medición funciona con DEBUG = False y no guarda el texto de todas las
+consultas, solo el de la más lenta de cada ruta.
+
+Los acumulados viven en memoria de cada proceso (cada worker de gunicorn
+tiene los suyos) y se consultan en /metricas/ (solo staff). Si se define
+METRICAS_PETICIONES_ARCHIVO, se vuelcan a ese archivo en JSON cada
+METRICAS_PETICIONES_VOLCADO peticiones.
+
+Configuración (settings.py):
+- METRICAS_PETICIONES_ACTIVAS: Activa la medición (por defecto True)
+- METRICAS_PETICIONES_ARCHIVO: Ruta del archivo de volcado (opcional)
+- METRICAS_PETICIONES_VOLCADO: Peticiones entre volcados (por defecto 500)
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Límites superiores (incluidos) de cada cubeta de los histogramas
+LIMITES_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+LIMITES_CONSULTAS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+# Largo máximo del texto guardado de la consulta más lenta
+LARGO_MAXIMO_SQL = 2000
+
+
+def _cubeta(limites, valor):
+    """Índice de la cubeta del histograma que corresponde a un valor"""
+    for indice, limite in enumerate(limites):
+        if valor <= limite:
+            return indice
+    return len(limites)
+
+
+def _histograma(limites, cuentas):
+    """Histograma legible: {'<=5': n, ..., '>5000': n}"""
+    etiquetas = [f'<={limite}' for limite in limites] + [f'>{limites[-1]}']
+    return dict(zip(etiquetas, cuentas))
+
+
+class RegistroConsultas:
+    """
+    Envoltorio de connection.execute_wrapper para una sola petición
+    Cuenta las consultas, suma su duración y recuerda la más lenta.
+    """
+
+    def __init__(self):
+        self.cantidad = 0
+        self.tiempo_ms = 0.0
+        self.mas_lenta_ms = 0.0
+        self.mas_lenta_sql = ''
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = (time.perf_counter() - inicio) * 1000
+            self.cantidad += 1
+            self.tiempo_ms += duracion
+            if duracion > self.mas_lenta_ms:
+                self.mas_lenta_ms = duracion
+                self.mas_lenta_sql = sql
+
+
+class MetricasRuta:
+    """Acumulados de todas las peticiones de una ruta"""
+
+    def __init__(self):
+        self.peticiones = 0
+        self.errores = 0
+        self.tiempo_total_ms = 0.0
+        self.tiempo_maximo_ms = 0.0
+        self.consultas_total = 0
+        self.consultas_maximo = 0
+        self.sql_total_ms = 0.0
+        self.histograma_ms = [0] * (len(LIMITES_MS) + 1)
+        self.histograma_consultas = [0] * (len(LIMITES_CONSULTAS) + 1)
+        self.mas_lenta_ms = 0.0
+        self.mas_lenta_sql = ''
+
+    def agregar(self, tiempo_ms, estado, registro):
+        self.peticiones += 1
+        if estado >= 500:
+            self.errores += 1
+        self.tiempo_total_ms += tiempo_ms
+        self.tiempo_maximo_ms = max(self.tiempo_maximo_ms, tiempo_ms)
+        self.consultas_total += registro.cantidad
+        self.consultas_maximo = max(self.consultas_maximo, registro.cantidad)
+        self.sql_total_ms += registro.tiempo_ms
+        self.histograma_ms[_cubeta(LIMITES_MS, tiempo_ms)] += 1
+        self.histograma_consultas[_cubeta(LIMITES_CONSULTAS, registro.cantidad)] += 1
+        if registro.mas_lenta_ms > self.mas_lenta_ms:
+            self.mas_lenta_ms = registro.mas_lenta_ms
+            self.mas_lenta_sql = registro.mas_lenta_sql[:LARGO_MAXIMO_SQL]
+
+    def como_dict(self):
+        peticiones = self.peticiones or 1
+        return {
+            'peticiones': self.peticiones,
+            'errores': self.errores,
+            'ms_promedio': round(self.tiempo_total_ms / peticiones, 3),
+            'ms_maximo': round(self.tiempo_maximo_ms, 3),
+            'consultas_promedio': round(self.consultas_total / peticiones, 2),
+            'consultas_maximo': self.consultas_maximo,
+            'sql_ms_promedio': round(self.sql_total_ms / peticiones, 3),
+            'histograma_ms': _histograma(LIMITES_MS, self.histograma_ms),
+            'histograma_consultas': _histograma(LIMITES_CONSULTAS, self.histograma_consultas),
+            'consulta_mas_lenta': {
+                'ms': round(self.mas_lenta_ms, 3),
+                'sql': self.mas_lenta_sql,
+            },
+        }
+
+
+class RegistroMetricas:
+    """Acumulados de todas las rutas del proceso, seguros entre hilos"""
+
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._bloqueo:
+            self._rutas = {}
+            self._desde = timezone.now()
+            self._peticiones = 0
+
+    def agregar(self, ruta, tiempo_ms, estado, registro):
+        """
+        Suma una petición a los acumulados de su ruta
+
+        Returns:
+            int: Total de peticiones registradas desde el último reinicio
+        """
+        with self._bloqueo:
+            metricas = self._rutas.get(ruta)
+            if metricas is None:
+                metricas = self._rutas[ruta] = MetricasRuta()
+            metricas.agregar(tiempo_ms, estado, registro)
+            self._peticiones += 1
+            return self._peticiones
+
+    def resumen(self):
+        """Acumulados por ruta, de la más costosa a la menos costosa en tiempo total"""
+        with self._bloqueo:
+            rutas = sorted(self._rutas.items(), key=lambda item: item[1].tiempo_total_ms, reverse=True)
+            return {
+                'proceso': os.getpid(),
+                'desde': self._desde.isoformat(),
+                'hasta': timezone.now().isoformat(),
+                'peticiones': self._peticiones,
+                'rutas': {ruta: metricas.como_dict() for ruta, metricas in rutas},
+            }
+
+    def volcar(self, ruta_archivo):
+        """Escribe el resumen en un archivo JSON (reemplazo atómico)"""
+        temporal = f'{ruta_archivo}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(self.resumen(), archivo, indent=2, ensure_ascii=False)
+        os.replace(temporal, ruta_archivo)
+
+
+# Acumulados del proceso actual
+metricas_peticiones = RegistroMetricas()
+
+
+class MetricasPeticionesMiddleware:
+    """
+    Mide cada petición y la acumula bajo el nombre de su ruta
+    Debe ir al principio de MIDDLEWARE para incluir el tiempo del resto.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.activo = getattr(settings, 'METRICAS_PETICIONES_ACTIVAS', True)
+        self.archivo = getattr(settings, 'METRICAS_PETICIONES_ARCHIVO', None)
+        self.volcado = getattr(settings, 'METRICAS_PETICIONES_VOLCADO', 500)
+
+    def __call__(self, request):
+        if not self.activo:
+            return self.get_response(request)
+
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as envolturas:
+            # El mismo registro en todas las conexiones configuradas
+            for alias in connections:
+                envolturas.enter_context(connections[alias].execute_wrapper(registro))
+            response = self.get_response(request)
+        tiempo_ms = (time.perf_counter() - inicio) * 1000
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        ruta = coincidencia.view_name if coincidencia else '<sin ruta>'
+        total = metricas_peticiones.agregar(ruta, tiempo_ms, response.status_code, registro)
+
+        if self.archivo and total % self.volcado == 0:
+            metricas_peticiones.volcar(self.archivo)
+        return response
+
@@ -0,0 +1,125 @@
+"""
+Lecturas en una réplica de la base de datos para TradeInventory
+
+Los reportes y los listados de la API leen mucho y toleran unos segundos
+de retraso; el cobro y los abonos no. Con una réplica configurada
+(DB_REPLICA_HOST o DB_REPLICA_NOMBRE, ver tradeinventory/basedatos.py):
+
+- LecturaReplicaMiddleware marca las peticiones GET/HEAD/OPTIONS a las
+  vistas de reportes y a /api/ para leer de la réplica. Las demás
+  peticiones (el cobro, los abonos, todo POST) usan solo la primaria.
+- RouterReplicas envía a la réplica las lecturas de las peticiones
+  marcadas y todas las escrituras a la primaria. Dentro de una
+  transacción y después de la primera escritura de la petición se lee de
+  la primaria, para que la petición vea lo que acaba de escribir.
+- Lectura de lo propio escrito: tras una petición que escribe, el
+  navegador recibe la cookie COOKIE_ESCRITURA y durante
+  REPLICA_RETRASO_MAXIMO segundos sus lecturas van a la primaria, así que
+  el reporte que abre justo después de una venta ya la incluye.
+- Sesiones y usuarios se leen siempre de la primaria (un login recién
+  hecho puede no haber llegado a la réplica).
+
+lecturas_en_replica() marca un bloque de código fuera de una petición,
+como la generación de reportes de la cola (reportes/tareas.py).
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Cookie con el momento de la última escritura del navegador
+COOKIE_ESCRITURA = 'ultima_escritura'
+
+# Métodos que no escriben (los únicos que pueden leer de la réplica)
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+# Aplicaciones cuyas tablas se leen siempre de la primaria
+APPS_PRIMARIA = {'auth', 'sessions'}
+
+_leer_de_replica = ContextVar('leer_de_replica', default=False)
+
+
+def alias_replica():
+    """Alias de la réplica en DATABASES, o None si no hay réplica"""
+    return getattr(settings, 'DB_ALIAS_REPLICA', None)
+
+
+@contextmanager
+def lecturas_en_replica():
+    """Envía a la réplica las lecturas del bloque (hasta la primera escritura)"""
+    marca = _leer_de_replica.set(True)
+    try:
+        yield
+    finally:
+        _leer_de_replica.reset(marca)
+
+
+class RouterReplicas:
+    """Router de DATABASE_ROUTERS: lecturas marcadas a la réplica, escrituras a la primaria"""
+
+    def db_for_read(self, model, **hints):
+        alias = alias_replica()
+        if (
+            alias and _leer_de_replica.get()
+            and model._meta.app_label not in APPS_PRIMARIA
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Después de escribir, el resto del bloque lee de la primaria
+        _leer_de_replica.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica es una copia de la primaria: sus filas se relacionan entre sí
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por la replicación
+        return db != alias_replica()
+
+
+class LecturaReplicaMiddleware:
+    """
+    Marca las lecturas de reportes y de la API para la réplica y recuerda
+    en una cookie cuándo escribió cada navegador
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        marca = _leer_de_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _leer_de_replica.reset(marca)
+
+        if alias_replica() and request.method not in METODOS_LECTURA:
+            response.set_cookie(
+                COOKIE_ESCRITURA, str(time.time()),
+                max_age=getattr(settings, 'REPLICA_RETRASO_MAXIMO', 5), httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.usa_replica(request):
+            _leer_de_replica.set(True)
+        return None
+
+    def usa_replica(self, request):
+        """True si la petición es una lectura de reportes o de la API de un navegador que no escribió hace poco"""
+        if not alias_replica() or request.method not in METODOS_LECTURA:
+            return False
+        if request.resolver_match.app_name != 'reportes' and not request.path_info.startswith('/api/'):
+            return False
+        try:
+            ultima_escritura = float(request.COOKIES.get(COOKIE_ESCRITURA, 0))
+        except ValueError:
+            ultima_escritura = 0
+        return time.time() - ultima_escritura > getattr(settings, 'REPLICA_RETRASO_MAXIMO', 5)
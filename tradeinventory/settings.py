@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from tradeinventory.basedatos import configuracion_base_datos, configuracion_replica
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,6 +42,8 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.humanize',
     'rest_framework',
+    # Proyecto (comandos de datos sintéticos y mediciones)
+    'tradeinventory',
     # Las aplicaciones
     'productos',
     'categorias',
@@ -53,6 +57,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir el tiempo de todo el resto de la cadena
+    'tradeinventory.middleware.MetricasPeticionesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,6 +66,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Lecturas de reportes y de la API en la réplica (si hay una)
+    'tradeinventory.replicas.LecturaReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'tradeinventory.urls'
@@ -86,13 +94,22 @@ WSGI_APPLICATION = 'tradeinventory.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Motor, conexiones persistentes y pool según DB_PERFIL y las demás
+# variables DB_* (ver tradeinventory/basedatos.py); por defecto SQLite con WAL
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_base_datos(BASE_DIR),
 }
 
+# Réplica de lectura opcional para los reportes y los GET de la API
+# (ver tradeinventory/replicas.py)
+_replica = configuracion_replica(BASE_DIR)
+if _replica:
+    DATABASES['replica'] = _replica
+DB_ALIAS_REPLICA = 'replica' if _replica else None
+DATABASE_ROUTERS = ['tradeinventory.replicas.RouterReplicas']
+# Segundos que un navegador lee de la primaria después de escribir
+REPLICA_RETRASO_MAXIMO = int(os.environ.get('REPLICA_RETRASO_MAXIMO', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -145,4 +162,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Configuración de autenticación
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'login' 
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'login' 
+
+# Métricas por ruta (consultas SQL y tiempo de respuesta), visibles en /metricas/
+METRICAS_PETICIONES_ACTIVAS = os.environ.get('METRICAS_PETICIONES_ACTIVAS', '1') == '1'
+METRICAS_PETICIONES_ARCHIVO = os.environ.get('METRICAS_PETICIONES_ARCHIVO') or None
+METRICAS_PETICIONES_VOLCADO = 500
+
+# Descuento de stock en el cobro (ventas/checkout.py):
+# 'bloqueo' bloquea los productos durante toda la venta (select_for_update);
+# 'optimista' usa UPDATE condicionales y repite la venta ante conflictos
+VENTAS_MODO_STOCK = os.environ.get('VENTAS_MODO_STOCK', 'bloqueo')
+VENTAS_REINTENTOS_STOCK = 3
+
+# APIs REST: todos los listados se paginan por cursor (tradeinventory/api.py)
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'tradeinventory.api.PaginacionCursor',
+    'PAGE_SIZE': 50,
+}
+# Listados de productos y ventas armados desde values() en lugar del serializer
+API_LISTA_RAPIDA = os.environ.get('API_LISTA_RAPIDA', '1') == '1'
@@ -0,0 +1,355 @@
+"""
+Generador de datos sintéticos para TradeInventory
+
+Crea una tienda de prueba con categorías, proveedores, productos, clientes,
+ventas con sus líneas, fiados con sus detalles y abonos. Los datos
+reproducen la forma de una tienda real para que las mediciones sean
+representativas:
+
+- Popularidad de productos con distribución de Zipf (pocos productos
+  concentran la mayoría de las ventas)
+- Clientes con distribución de Pareto (pocos clientes compran mucho y la
+  mayoría de las ventas son sin cliente)
+- Ventas concentradas en horario comercial y en fines de semana
+- Una parte de las ventas a fiado, con abonos parciales o cancelación total
+
+Todo se inserta con bulk_create por lotes y con ids asignados, de modo que
+funciona igual en SQLite, PostgreSQL y MySQL. Al terminar se reconstruyen
+el resumen diario de ventas y los saldos de clientes.
+"""
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from categorias.models import Categoria
+from clientes.models import Cliente, DetalleFiado, Fiado
+from productos.models import Producto
+from proveedores.models import Proveedor
+from ventas.models import DetalleVenta, Venta
+
+# Tamaños predefinidos de tienda para las mediciones
+ESCALAS = {
+    'pequena': {
+        'categorias': 8, 'proveedores': 10, 'productos': 150,
+        'clientes': 100, 'ventas': 2000, 'fiados': 200,
+    },
+    'mediana': {
+        'categorias': 20, 'proveedores': 40, 'productos': 1500,
+        'clientes': 1000, 'ventas': 20000, 'fiados': 2000,
+    },
+    'grande': {
+        'categorias': 50, 'proveedores': 150, 'productos': 8000,
+        'clientes': 8000, 'ventas': 200000, 'fiados': 20000,
+    },
+}
+
+# Peso relativo de cada hora del día (índice = hora local) y día de la semana (lunes = 0)
+PESO_HORAS = [0, 0, 0, 0, 0, 0, 1, 2, 4, 6, 7, 8, 9, 8, 7, 6, 7, 9, 10, 9, 6, 3, 1, 0]
+PESO_DIAS_SEMANA = [8, 8, 9, 9, 11, 14, 12]
+
+# Costo de compra de cada producto como proporción de su precio de venta
+PROPORCION_COSTO = Decimal('0.70')
+
+TAMANO_LOTE = 5000
+
+
+def pesos_zipf(cantidad, exponente=1.1):
+    """Pesos acumulados de una distribución de Zipf para `cantidad` elementos"""
+    acumulado = 0
+    pesos = []
+    for rango in range(1, cantidad + 1):
+        acumulado += 1 / rango ** exponente
+        pesos.append(acumulado)
+    return pesos
+
+
+def _siguiente_id(modelo):
+    return (modelo.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+
+
+def _insertar(modelo, objetos):
+    """Inserta objetos con ids ya asignados, por lotes"""
+    modelo.objects.bulk_create(objetos, batch_size=TAMANO_LOTE)
+
+
+def _reiniciar_secuencias(modelos):
+    """Ajusta las secuencias de ids después de insertar con ids explícitos"""
+    sentencias = connection.ops.sequence_reset_sql(no_style(), modelos)
+    if sentencias:
+        with connection.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(sentencia)
+
+
+class GeneradorTienda:
+    """
+    Genera una tienda sintética con una semilla reproducible
+
+    Args:
+        categorias, proveedores, productos, clientes, ventas, fiados: Cantidades a crear
+        lineas_por_venta: Promedio de líneas por venta o fiado
+        dias: Días hacia atrás que cubren las ventas
+        proporcion_fiado: Fracción de ventas a fiado
+        proporcion_abonos: Fracción de deudas que reciben abonos
+        semilla: Semilla del generador aleatorio
+    """
+
+    def __init__(self, categorias=10, proveedores=15, productos=200, clientes=300,
+                 ventas=5000, fiados=500, lineas_por_venta=3, dias=365,
+                 proporcion_fiado=0.2, proporcion_abonos=0.4, semilla=1):
+        self.cantidades = {
+            'categorias': categorias,
+            'proveedores': proveedores,
+            'productos': productos,
+            'clientes': clientes,
+            'ventas': ventas,
+            'fiados': fiados,
+        }
+        self.lineas_por_venta = max(1, lineas_por_venta)
+        self.dias = max(1, dias)
+        self.proporcion_fiado = proporcion_fiado
+        self.proporcion_abonos = proporcion_abonos
+        self.azar = random.Random(semilla)
+        self.ahora = timezone.now()
+
+    # ----- Utilidades de muestreo -----
+
+    def _fecha(self):
+        """Fecha aleatoria dentro del período con el perfil de horas y días de la semana"""
+        while True:
+            dia = self.azar.randrange(self.dias)
+            fecha = timezone.localtime(self.ahora) - timedelta(days=dia)
+            if self.azar.random() * max(PESO_DIAS_SEMANA) <= PESO_DIAS_SEMANA[fecha.weekday()]:
+                break
+        hora = self.azar.choices(range(24), weights=PESO_HORAS)[0]
+        fecha = fecha.replace(hour=hora, minute=self.azar.randrange(60), second=self.azar.randrange(60))
+        return min(fecha, self.ahora)
+
+    def _cantidad(self):
+        """Unidades por línea: casi siempre 1 o 2, ocasionalmente más"""
+        return min(1 + int(self.azar.expovariate(1.2)), 12)
+
+    def _lineas(self):
+        """Productos distintos de una venta según su popularidad"""
+        numero = min(1 + int(self.azar.expovariate(1 / self.lineas_por_venta)), len(self.productos))
+        elegidos = set(self.azar.choices(self.productos, cum_weights=self.pesos_productos, k=numero))
+        return [(producto, self._cantidad()) for producto in elegidos]
+
+    def _cliente(self, obligatorio=False):
+        """Cliente de la venta; la mayoría de las ventas de contado no tienen cliente"""
+        if not self.clientes or (not obligatorio and self.azar.random() < 0.6):
+            return None
+        return self.azar.choices(self.clientes, cum_weights=self.pesos_clientes)[0]
+
+    # ----- Catálogo -----
+
+    def _crear_catalogo(self):
+        siguiente = _siguiente_id(Categoria)
+        categorias = [
+            Categoria(id=siguiente + i, nombre=f'Categoría {siguiente + i}')
+            for i in range(self.cantidades['categorias'])
+        ]
+        _insertar(Categoria, categorias)
+
+        siguiente = _siguiente_id(Proveedor)
+        proveedores = [
+            Proveedor(
+                id=siguiente + i,
+                nombre=f'Proveedor {siguiente + i}',
+                contacto=f'Contacto {siguiente + i}',
+                telefono=f'55{siguiente + i:08d}',
+                email=f'proveedor{siguiente + i}@ejemplo.com',
+                direccion='Dirección de prueba',
+            )
+            for i in range(self.cantidades['proveedores'])
+        ]
+        _insertar(Proveedor, proveedores)
+
+        siguiente = _siguiente_id(Producto)
+        self.productos = []
+        for i in range(self.cantidades['productos']):
+            stock = self.azar.randint(0, 500)
+            precio = Decimal(self.azar.randint(500, 50000)) / 100
+            self.productos.append(Producto(
+                id=siguiente + i,
+                nombre=f'Producto {siguiente + i}',
+                precio=precio,
+                costo_promedio=(precio * PROPORCION_COSTO).quantize(Decimal('0.0001')),
+                stock_inicial=stock,
+                stock_actual=stock,
+                stock_minimo=self.azar.choice([0, 5, 5, 10, 20]),
+                categoria=self.azar.choice(categorias),
+                proveedor=self.azar.choice(proveedores) if proveedores and self.azar.random() < 0.9 else None,
+                activo=self.azar.random() < 0.95,
+            ))
+        _insertar(Producto, self.productos)
+        self.pesos_productos = pesos_zipf(len(self.productos))
+
+        siguiente = _siguiente_id(Cliente)
+        self.clientes = [
+            Cliente(
+                id=siguiente + i,
+                nombre=f'Cliente {siguiente + i}',
+                documento=str(10000000 + siguiente + i),
+                telefono=f'33{siguiente + i:08d}',
+                activo=self.azar.random() < 0.97,
+            )
+            for i in range(self.cantidades['clientes'])
+        ]
+        _insertar(Cliente, self.clientes)
+        # Pareto: pesos 1/rango^0.8 sobre un orden aleatorio de clientes
+        self.azar.shuffle(self.clientes)
+        self.pesos_clientes = pesos_zipf(len(self.clientes), exponente=0.8)
+
+    # ----- Ventas y abonos -----
+
+    def _abonar(self, registro, total, fecha, campo_cancelacion=None):
+        """Aplica un abono parcial o una cancelación total a una deuda"""
+        if self.azar.random() >= self.proporcion_abonos:
+            return
+        fecha_abono = min(fecha + timedelta(days=self.azar.randint(1, 60)), self.ahora)
+        if self.azar.random() < 0.3:
+            registro.monto_abonado = total
+            if campo_cancelacion:
+                setattr(registro, campo_cancelacion, fecha_abono)
+        else:
+            registro.monto_abonado = (total * Decimal(self.azar.randint(10, 90)) / 100).quantize(Decimal('0.01'))
+        return fecha_abono
+
+    def _crear_ventas(self):
+        siguiente_venta = _siguiente_id(Venta)
+        siguiente_detalle = _siguiente_id(DetalleVenta)
+        ventas, detalles = [], []
+
+        for i in range(self.cantidades['ventas']):
+            es_fiado = self.azar.random() < self.proporcion_fiado
+            cliente = self._cliente(obligatorio=es_fiado)
+            es_fiado = es_fiado and cliente is not None
+            fecha = self._fecha()
+            venta = Venta(id=siguiente_venta + i, cliente=cliente, fecha=fecha, es_fiado=es_fiado)
+
+            total = Decimal(0)
+            for producto, cantidad in self._lineas():
+                subtotal = producto.precio * cantidad
+                total += subtotal
+                detalles.append(DetalleVenta(
+                    id=siguiente_detalle + len(detalles),
+                    venta_id=venta.id,
+                    producto_id=producto.id,
+                    cantidad=cantidad,
+                    precio_unitario=producto.precio,
+                    subtotal=subtotal,
+                    costo_unitario=producto.costo_promedio,
+                ))
+            venta.total = total
+
+            if es_fiado:
+                fecha_abono = self._abonar(venta, total, fecha, 'fecha_cancelacion')
+                if fecha_abono:
+                    venta.fecha_ultimo_abono = fecha_abono
+                    # Igual que abonar_venta_simple: pagada por completo pasa a contado
+                    if venta.fecha_cancelacion:
+                        venta.es_fiado = False
+            ventas.append(venta)
+
+            if len(ventas) >= TAMANO_LOTE:
+                _insertar(Venta, ventas)
+                _insertar(DetalleVenta, detalles)
+                ventas, detalles = [], []
+                siguiente_detalle = _siguiente_id(DetalleVenta)
+
+        _insertar(Venta, ventas)
+        _insertar(DetalleVenta, detalles)
+
+    def _crear_fiados(self):
+        if not self.clientes:
+            return
+        siguiente_fiado = _siguiente_id(Fiado)
+        siguiente_detalle = _siguiente_id(DetalleFiado)
+        fiados, detalles = [], []
+
+        for i in range(self.cantidades['fiados']):
+            fecha = self._fecha()
+            fiado = Fiado(id=siguiente_fiado + i, cliente=self._cliente(obligatorio=True), fecha=fecha, monto=0)
+            lineas = []
+            for producto, cantidad in self._lineas():
+                lineas.append(DetalleFiado(
+                    id=siguiente_detalle + len(detalles) + len(lineas),
+                    fiado_id=fiado.id,
+                    producto_id=producto.id,
+                    cantidad=cantidad,
+                    precio_unitario=producto.precio,
+                    subtotal=producto.precio * cantidad,
+                ))
+            fiado.monto = sum((linea.subtotal for linea in lineas), Decimal(0))
+
+            fecha_abono = self._abonar(fiado, fiado.monto, fecha)
+            if fecha_abono and fiado.monto_abonado == fiado.monto:
+                fiado.pagado = True
+                fiado.fecha_pago = fecha_abono
+                for linea in lineas:
+                    linea.pagado = True
+                    linea.estado = 'pagado'
+                    linea.fecha_pago = fecha_abono
+            elif fecha_abono:
+                lineas[0].estado = 'abonado'
+                lineas[0].fecha_pago = fecha_abono
+
+            fiados.append(fiado)
+            detalles.extend(lineas)
+
+            if len(fiados) >= TAMANO_LOTE:
+                _insertar(Fiado, fiados)
+                _insertar(DetalleFiado, detalles)
+                fiados, detalles = [], []
+                siguiente_detalle = _siguiente_id(DetalleFiado)
+
+        _insertar(Fiado, fiados)
+        _insertar(DetalleFiado, detalles)
+
+    def generar(self):
+        """
+        Crea todos los datos y reconstruye los resúmenes derivados
+
+        Returns:
+            dict: Cantidad de filas creadas por modelo
+        """
+        from clientes.saldos import reconstruir_saldos
+        from productos.inventario import reconstruir_kardex
+        from reportes.resumen import reconstruir_resumen
+
+        antes = contar_filas()
+        with transaction.atomic():
+            self._crear_catalogo()
+            self._crear_ventas()
+            self._crear_fiados()
+            _reiniciar_secuencias([Categoria, Proveedor, Producto, Cliente, Venta, DetalleVenta, Fiado, DetalleFiado])
+
+        reconstruir_resumen()
+        reconstruir_saldos()
+        # Solo carga el kardex de los productos sin movimientos (los creados
+        # aquí); el de los productos que ya existían no se toca
+        reconstruir_kardex()
+
+        despues = contar_filas()
+        return {modelo: despues[modelo] - antes[modelo] for modelo in despues}
+
+
+def contar_filas():
+    """Cantidad de filas de cada modelo de la tienda"""
+    return {
+        'categorias': Categoria.objects.count(),
+        'proveedores': Proveedor.objects.count(),
+        'productos': Producto.objects.count(),
+        'clientes': Cliente.objects.count(),
+        'ventas': Venta.objects.count(),
+        'detalles_venta': DetalleVenta.objects.count(),
+        'fiados': Fiado.objects.count(),
+        'detalles_fiado': DetalleFiado.objects.count(),
+    }
@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from productos.models import Producto
+from .basedatos import configuracion_base_datos, configuracion_replica
+from .middleware import metricas_peticiones
+from .replicas import COOKIE_ESCRITURA, LecturaReplicaMiddleware, RouterReplicas, lecturas_en_replica
+
+
+class PerfilBaseDatosTests(SimpleTestCase):
+    """Configuración de la base de datos según las variables DB_*"""
+
+    base_dir = Path('/srv/tienda')
+
+    def test_sqlite_ajustado_por_defecto(self):
+        configuracion = configuracion_base_datos(self.base_dir, {})
+        self.assertEqual(configuracion['NAME'], self.base_dir / 'db.sqlite3')
+        self.assertEqual((configuracion['CONN_MAX_AGE'], configuracion['CONN_HEALTH_CHECKS']), (60, True))
+        self.assertEqual(configuracion['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertNotIn('OPTIONS', configuracion_base_datos(self.base_dir, {'DB_PERFIL': 'sqlite-simple'}))
+
+    def test_sqlite_ajustado_activa_wal(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        configuracion = configuracion_base_datos(self.base_dir, {'DB_NOMBRE': os.path.join(carpeta, 'tienda.sqlite3')})
+        conexion = DatabaseWrapper({**configuracion, 'TIME_ZONE': None, 'AUTOCOMMIT': True}, alias='perfil')
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        finally:
+            conexion.close()
+
+    def test_servidores_con_conexiones_persistentes_o_pool(self):
+        entorno = {'DB_PERFIL': 'postgresql', 'DB_USUARIO': 'tienda', 'DB_POOL_MAXIMO': '20'}
+        configuracion = configuracion_base_datos(self.base_dir, entorno)
+        self.assertEqual(configuracion['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((configuracion['CONN_MAX_AGE'], configuracion['OPTIONS']['pool']['max_size']), (0, 20))
+
+        configuracion = configuracion_base_datos(self.base_dir, {**entorno, 'DB_POOL': '0', 'DB_CONN_MAX_AGE': '300'})
+        self.assertEqual((configuracion['CONN_MAX_AGE'], 'pool' in configuracion['OPTIONS']), (300, False))
+
+        configuracion = configuracion_base_datos(self.base_dir, {'DB_PERFIL': 'mysql', 'DB_CONN_MAX_AGE': '0'})
+        self.assertEqual((configuracion['ENGINE'], configuracion['CONN_MAX_AGE']), ('django.db.backends.mysql', 0))
+
+    def test_valores_invalidos(self):
+        with self.assertRaises(ImproperlyConfigured):
+            configuracion_base_datos(self.base_dir, {'DB_PERFIL': 'oracle'})
+        with self.assertRaises(ImproperlyConfigured):
+            configuracion_base_datos(self.base_dir, {'DB_CONN_MAX_AGE': 'siempre'})
+
+
+@override_settings(DB_ALIAS_REPLICA='replica', REPLICA_RETRASO_MAXIMO=5)
+class RouterReplicasTests(SimpleTestCase):
+    """Lecturas de reportes y de la API en la réplica; escrituras y cobro en la primaria"""
+
+    router = RouterReplicas()
+
+    def leer(self, metodo, ruta, cookies=None, escribir=False):
+        """Alias de las lecturas de productos y usuarios durante una petición"""
+        request = getattr(RequestFactory(), metodo)(ruta)
+        request.resolver_match = resolve(ruta)
+        request.COOKIES.update(cookies or {})
+        leidos = []
+
+        def vista(request):
+            middleware.process_view(request, vista, (), {})
+            if escribir:
+                self.router.db_for_write(Producto)
+            leidos.extend([self.router.db_for_read(Producto), self.router.db_for_read(User)])
+            return HttpResponse()
+
+        middleware = LecturaReplicaMiddleware(vista)
+        respuesta = middleware(request)
+        return leidos, respuesta
+
+    def test_reportes_y_api_leen_de_la_replica(self):
+        self.assertEqual(self.leer('get', reverse('reportes:reporte_ventas'))[0], ['replica', None])
+        self.assertEqual(self.leer('get', reverse('api-producto-list'))[0], ['replica', None])
+        # El cobro y las demás vistas, y cualquier POST, quedan en la primaria
+        self.assertEqual(self.leer('get', reverse('ventas:nueva_venta'))[0], [None, None])
+        self.assertEqual(self.leer('post', reverse('api-venta-list'))[0], [None, None])
+        # Fuera de una petición marcada no hay réplica
+        self.assertIsNone(self.router.db_for_read(Producto))
+
+    def test_primaria_despues_de_escribir(self):
+        leidos, respuesta = self.leer('post', reverse('api-venta-bulk'))
+        cookie = respuesta.cookies[COOKIE_ESCRITURA]
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertEqual(self.leer('get', reverse('api-producto-list'), {COOKIE_ESCRITURA: cookie.value})[0], [None, None])
+        antigua = str(time.time() - 10)
+        self.assertEqual(self.leer('get', reverse('api-producto-list'), {COOKIE_ESCRITURA: antigua})[0], ['replica', None])
+        # Dentro de la misma petición, lo que sigue a una escritura se lee de la primaria
+        self.assertEqual(self.leer('get', reverse('api-producto-list'), escribir=True)[0], [None, None])
+        self.assertEqual(self.router.db_for_write(Producto), 'default')
+
+    def test_bloque_en_replica_y_migraciones(self):
+        with lecturas_en_replica():
+            self.assertEqual(self.router.db_for_read(Producto), 'replica')
+        self.assertIsNone(self.router.db_for_read(Producto))
+        self.assertFalse(self.router.allow_migrate('replica', 'productos'))
+        self.assertTrue(self.router.allow_migrate('default', 'productos'))
+
+    def test_configuracion_de_la_replica(self):
+        self.assertIsNone(configuracion_replica(Path('/srv'), {}))
+        configuracion = configuracion_replica(Path('/srv'), {
+            'DB_PERFIL': 'mysql', 'DB_HOST': 'primaria', 'DB_USUARIO': 'tienda', 'DB_REPLICA_HOST': 'replica',
+        })
+        self.assertEqual((configuracion['HOST'], configuracion['USER']), ('replica', 'tienda'))
+        self.assertEqual(configuracion['TEST'], {'MIRROR': 'default'})
+
+
+class MetricasPeticionesTests(TestCase):
+    """Medición de peticiones por ruta (MetricasPeticionesMiddleware)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('admin', 'admin@example.com', 'clave', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        metricas_peticiones.reiniciar()
+        self.addCleanup(metricas_peticiones.reiniciar)
+
+    def test_registra_tiempo_y_consultas_por_ruta(self):
+        for _ in range(2):
+            self.client.get(reverse('productos:lista_productos'))
+        self.client.get('/no-existe/')
+
+        resumen = metricas_peticiones.resumen()
+        self.assertEqual(resumen['peticiones'], 3)
+        ruta = resumen['rutas']['productos:lista_productos']
+        self.assertEqual((ruta['peticiones'], ruta['errores']), (2, 0))
+        self.assertGreater(ruta['consultas_maximo'], 0)
+        self.assertEqual(sum(ruta['histograma_consultas'].values()), 2)
+        self.assertIn('SELECT', ruta['consulta_mas_lenta']['sql'])
+        self.assertEqual(resumen['rutas']['<sin ruta>']['peticiones'], 1)
+
+    def test_vuelca_a_archivo(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        archivo = os.path.join(carpeta, 'metricas.json')
+        with self.settings(METRICAS_PETICIONES_ARCHIVO=archivo, METRICAS_PETICIONES_VOLCADO=2):
+            self.client.get(reverse('productos:lista_productos'))
+            self.assertFalse(os.path.exists(archivo))
+            self.client.get(reverse('productos:lista_productos'))
+        with open(archivo, encoding='utf-8') as volcado:
+            self.assertEqual(json.load(volcado)['rutas']['productos:lista_productos']['peticiones'], 2)
+
+    @override_settings(METRICAS_PETICIONES_ACTIVAS=False)
+    def test_desactivado_no_registra(self):
+        self.client.get(reverse('productos:lista_productos'))
+        self.assertEqual(metricas_peticiones.resumen()['peticiones'], 0)
+        self.assertEqual(self.client.get(reverse('metricas_peticiones')).json()['rutas'], {})
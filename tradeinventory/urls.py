@@ -11,7 +11,7 @@ from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
-from .views import inicio, registro, perfil_usuario
+from .views import inicio, registro, perfil_usuario, metricas
 
 def redirect_to_login(request):
     """
@@ -52,6 +52,9 @@ urlpatterns = [
     path('ventas/', include('ventas.urls')),            # Gestión de ventas
     path('reportes/', include('reportes.urls')),        # Sistema de reportes
     
+    # Métricas de consultas y tiempos por ruta (solo staff)
+    path('metricas/', metricas, name='metricas_peticiones'),
+    
     # URLs de las APIs REST
     path('api/', include('tradeinventory.api_urls')),   # APIs REST
     
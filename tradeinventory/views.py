@@ -3,8 +3,11 @@ from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.contrib.auth import update_session_auth_hash
 from .forms import RegistroUsuarioForm, CambioPasswordForm
+from .middleware import metricas_peticiones
 from productos.models import Producto
 from ventas.models import Venta
 from clientes.models import Cliente
@@ -65,4 +68,20 @@ def perfil_usuario(request):
     else:
         form = CambioPasswordForm(request.user)
     
-    return render(request, 'registration/perfil.html', {'form': form}) 
\ No newline at end of file
+    return render(request, 'registration/perfil.html', {'form': form}) 
+
+@staff_member_required
+def metricas(request):
+    """
+    Acumulados de consultas SQL y tiempos por ruta del proceso actual
+    GET devuelve el resumen en JSON; POST lo reinicia.
+
+    Args:
+        request: Objeto HttpRequest de Django
+
+    Returns:
+        JsonResponse: Resumen de MetricasPeticionesMiddleware
+    """
+    if request.method == 'POST':
+        metricas_peticiones.reiniciar()
+    return JsonResponse(metricas_peticiones.resumen(), json_dumps_params={'ensure_ascii': False})
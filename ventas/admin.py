@@ -1,4 +1,6 @@
 from django.contrib import admin
+from clientes.saldos import SaldoClienteAdminMixin
+from reportes.resumen import ResumenVentasAdminMixin
 from .models import Venta, DetalleVenta
 
 class DetalleVentaInline(admin.TabularInline):
@@ -6,7 +8,7 @@ class DetalleVentaInline(admin.TabularInline):
     extra = 1
 
 @admin.register(Venta)
-class VentaAdmin(admin.ModelAdmin):
+class VentaAdmin(SaldoClienteAdminMixin, ResumenVentasAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'fecha', 'cliente', 'total', 'es_fiado')
     list_filter = ('es_fiado', 'fecha', 'cliente')
     search_fields = ('cliente__nombre', 'id')
@@ -14,7 +16,7 @@ class VentaAdmin(admin.ModelAdmin):
     inlines = [DetalleVentaInline]
 
 @admin.register(DetalleVenta)
-class DetalleVentaAdmin(admin.ModelAdmin):
+class DetalleVentaAdmin(ResumenVentasAdminMixin, admin.ModelAdmin):
     list_display = ('venta', 'producto', 'cantidad', 'precio_unitario', 'subtotal')
     list_filter = ('venta__fecha', 'producto')
     search_fields = ('venta__id', 'producto__nombre')
@@ -7,22 +7,35 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum
+from django.db.models import F, Prefetch, Q, Sum
 from django.utils import timezone
+from clientes.saldos import SaldoClienteViewSetMixin, actualizar_saldo_cliente
+from reportes.resumen import ResumenVentasViewSetMixin
+from tradeinventory.api import CamposDispersosMixin, ListaRapidaMixin
+from .lote import MAXIMO_VENTAS, registrar_ventas_lote
 from .models import Venta, DetalleVenta
 from .serializers import (
     VentaSerializer, 
     VentaListSerializer, 
     VentaCreateSerializer,
+    VentaLoteSerializer,
     DetalleVentaSerializer
 )
 
-class VentaViewSet(viewsets.ModelViewSet):
+class VentaViewSet(
+    SaldoClienteViewSetMixin, ResumenVentasViewSetMixin, ListaRapidaMixin, CamposDispersosMixin, viewsets.ModelViewSet
+):
     """
     ViewSet para el modelo Venta
-    Proporciona operaciones CRUD completas
+    Proporciona operaciones CRUD completas; cada escritura recalcula el
+    saldo del cliente (SaldoClienteViewSetMixin) y las ediciones se
+    reflejan en el resumen diario (ResumenVentasViewSetMixin)
+    Los listados se paginan por cursor (fecha), aceptan ?fields= y se arman
+    desde values() (ListaRapidaMixin)
     """
     queryset = Venta.objects.all()
+    orden_cursor = ('-fecha', '-id')
+    campos_calculados = {'estado': Venta.expresion_estado()}
     # permission_classes = [IsAuthenticated]  # Comentado temporalmente para pruebas
     
     def get_serializer_class(self):
@@ -36,6 +49,14 @@ class VentaViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filtra el queryset según parámetros de consulta"""
         queryset = Venta.objects.all()
+
+        # Relaciones que usa el serializer de la acción, solo si se piden
+        if self.campo_solicitado('cliente') or self.campo_solicitado('cliente_nombre'):
+            queryset = queryset.select_related('cliente')
+        if self.action != 'list' and self.campo_solicitado('detalles'):
+            queryset = queryset.prefetch_related(
+                Prefetch('detalles', queryset=DetalleVenta.objects.select_related('producto').order_by('id'))
+            )
         
         # Filtro por cliente
         cliente_id = self.request.query_params.get('cliente', None)
@@ -48,17 +69,23 @@ class VentaViewSet(viewsets.ModelViewSet):
             es_fiado = es_fiado.lower() == 'true'
             queryset = queryset.filter(es_fiado=es_fiado)
         
-        # Filtro por estado
+        # Filtro por estado (ver Venta.estado)
         estado = self.request.query_params.get('estado', None)
-        if estado:
-            queryset = queryset.filter(estado=estado)
+        if estado == 'cancelado':
+            queryset = queryset.filter(fecha_cancelacion__isnull=False)
+        elif estado == 'pendiente':
+            queryset = queryset.filter(fecha_cancelacion__isnull=True, es_fiado=True, monto_abonado__lt=F('total'))
+        elif estado == 'pagado':
+            queryset = queryset.filter(fecha_cancelacion__isnull=True).exclude(
+                es_fiado=True, monto_abonado__lt=F('total')
+            )
         
         # Filtro por fecha
         fecha = self.request.query_params.get('fecha', None)
         if fecha:
             queryset = queryset.filter(fecha__date=fecha)
         
-        return queryset.order_by('-fecha')
+        return queryset.order_by('-fecha', '-id')
     
     @action(detail=False, methods=['get'])
     def ventas_hoy(self, request):
@@ -98,6 +125,65 @@ class VentaViewSet(viewsets.ModelViewSet):
             'total_general': total_ventas
         })
     
+    @action(detail=False, methods=['post'], url_path='bulk', permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        Endpoint para registrar un lote de ventas de una caja sin conexión
+
+        Recibe {"ventas": [{"clave", "detalles", "cliente_id", "almacen_id",
+        "es_fiado", "fecha"}, ...]} y responde un resultado por venta, en el
+        mismo orden. Reenviar el lote es seguro: las claves ya registradas
+        se responden como 'duplicada' sin volver a descontar stock.
+        """
+        ventas = request.data.get('ventas') if isinstance(request.data, dict) else None
+        if not isinstance(ventas, list) or not ventas:
+            return Response(
+                {'error': 'El campo ventas debe ser una lista no vacía'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ventas) > MAXIMO_VENTAS:
+            return Response(
+                {'error': f'Se aceptan como máximo {MAXIMO_VENTAS} ventas por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultados = [None] * len(ventas)
+        validas = []
+        for indice, datos in enumerate(ventas):
+            serializer = VentaLoteSerializer(data=datos)
+            if serializer.is_valid():
+                validas.append((indice, serializer.validated_data))
+            else:
+                resultados[indice] = {
+                    'clave': datos.get('clave') if isinstance(datos, dict) else None,
+                    'estado': 'rechazada',
+                    'venta_id': None,
+                    'total': None,
+                    'errores': serializer.errors,
+                }
+
+        registradas = registrar_ventas_lote([
+            {
+                'clave': datos['clave'],
+                'lineas': [(detalle['producto_id'], detalle['cantidad']) for detalle in datos['detalles']],
+                'cliente_id': datos.get('cliente_id'),
+                'almacen_id': datos.get('almacen_id'),
+                'es_fiado': datos['es_fiado'],
+                'fecha': datos.get('fecha'),
+            }
+            for _, datos in validas
+        ])
+        for (indice, _), resultado in zip(validas, registradas):
+            resultados[indice] = resultado
+
+        estados = [resultado['estado'] for resultado in resultados]
+        return Response({
+            'resultados': resultados,
+            'creadas': estados.count('creada'),
+            'duplicadas': estados.count('duplicada'),
+            'rechazadas': estados.count('rechazada'),
+        })
+
     @action(detail=True, methods=['post'])
     def abonar(self, request, pk=None):
         """Endpoint para abonar a una venta a fiado"""
@@ -121,6 +207,7 @@ class VentaViewSet(viewsets.ModelViewSet):
             venta.monto_abonado += monto
             venta.fecha_ultimo_abono = timezone.now()
             venta.save()
+            actualizar_saldo_cliente(venta.cliente_id)
             serializer = self.get_serializer(venta)
             return Response(serializer.data)
         except ValueError:
@@ -129,18 +216,23 @@ class VentaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class DetalleVentaViewSet(viewsets.ModelViewSet):
+class DetalleVentaViewSet(ResumenVentasViewSetMixin, CamposDispersosMixin, viewsets.ModelViewSet):
     """
     ViewSet para el modelo DetalleVenta
-    Proporciona operaciones CRUD completas
+    Proporciona operaciones CRUD completas; las escrituras se reflejan en
+    el resumen diario (ResumenVentasViewSetMixin)
+    Los listados se paginan por cursor (id) y aceptan ?fields=
     """
     queryset = DetalleVenta.objects.all()
     serializer_class = DetalleVentaSerializer
     permission_classes = [IsAuthenticated]
+    orden_cursor = ('-id',)
     
     def get_queryset(self):
         """Filtra el queryset según parámetros de consulta"""
         queryset = DetalleVenta.objects.all()
+        if self.campo_solicitado('producto'):
+            queryset = queryset.select_related('producto')
         
         # Filtro por venta
         venta_id = self.request.query_params.get('venta', None)
@@ -0,0 +1,199 @@
+"""
+Catálogo del punto de venta (POS) para TradeInventory
+Sirve los productos activos como JSON compacto y versionado para que la
+pantalla de ventas cargue el catálogo una vez y luego pida solo cambios.
+
+Versión del catálogo:
+- Se arma con el último fecha_actualizacion de productos y categorías y la
+  cantidad de productos activos. Cualquier cambio de producto o de stock
+  (el cobro actualiza fecha_actualizacion al descontar) produce otra versión.
+- La versión se usa como ETag: si el navegador ya la tiene, la respuesta
+  es un 304 sin cuerpo.
+- El catálogo completo de cada versión se guarda serializado en la caché,
+  así que solo la primera petición de una versión recorre los productos.
+
+Cambios (delta):
+- Con ?desde=<versión> se devuelven solo los productos actualizados desde
+  esa versión (con un margen por transacciones que confirmaron tarde) y
+  los ids de los que se desactivaron.
+- 'total' permite al navegador comprobar que su copia quedó completa; si
+  no coincide (por ejemplo, se eliminó un producto) pide el catálogo completo.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Q
+
+from categorias.models import Categoria
+from clientes.models import Cliente
+from productos.models import Producto
+
+# Orden de los valores de cada producto en 'productos'
+CAMPOS_PRODUCTO = ['id', 'nombre', 'precio', 'stock', 'categoria_id', 'imagen']
+
+# Cambios que se vuelven a enviar por si una transacción confirmó después
+# de que el navegador leyó su versión
+MARGEN_DELTA = timedelta(seconds=5)
+
+# Con más cambios que estos conviene enviar el catálogo completo
+MAXIMO_CAMBIOS_DELTA = 2000
+
+# Tiempo que se conserva en caché el catálogo completo de una versión
+DURACION_CACHE = 60 * 60
+
+
+def _microsegundos(fecha):
+    """Marca de tiempo en microsegundos (0 si no hay fecha)"""
+    if fecha is None:
+        return 0
+    return int(fecha.timestamp() * 1_000_000)
+
+
+def version_catalogo():
+    """
+    Calcula la versión actual del catálogo con dos consultas de agregación
+
+    Returns:
+        str: '<último cambio de productos>-<último cambio de categorías>-<productos activos>'
+    """
+    productos = Producto.objects.aggregate(
+        ultimo=Max('fecha_actualizacion'),
+        activos=Count('id', filter=Q(activo=True)),
+    )
+    categorias = Categoria.objects.aggregate(ultimo=Max('fecha_actualizacion'))
+    return '{}-{}-{}'.format(
+        _microsegundos(productos['ultimo']),
+        _microsegundos(categorias['ultimo']),
+        productos['activos'],
+    )
+
+
+def _fecha_de_version(version):
+    """
+    Extrae la fecha del último cambio de productos de una versión
+
+    Returns:
+        datetime: Fecha en UTC, o None si la versión no es válida
+    """
+    try:
+        microsegundos = int(version.split('-')[0])
+    except (AttributeError, ValueError):
+        return None
+    if microsegundos <= 0:
+        return None
+    return datetime.fromtimestamp(microsegundos / 1_000_000, tz=dt_timezone.utc)
+
+
+def _filas_productos(productos):
+    """Convierte productos (values) en listas en el orden de CAMPOS_PRODUCTO"""
+    return [
+        [
+            producto['id'],
+            producto['nombre'],
+            str(producto['precio']),
+            producto['stock_actual'],
+            producto['categoria_id'],
+            default_storage.url(producto['imagen']) if producto['imagen'] else None,
+        ]
+        for producto in productos
+    ]
+
+
+def _categorias():
+    return [list(fila) for fila in Categoria.objects.order_by('nombre').values_list('id', 'nombre')]
+
+
+def _valores_producto(queryset, *extra):
+    return queryset.values('id', 'nombre', 'precio', 'stock_actual', 'categoria_id', 'imagen', *extra)
+
+
+def catalogo_completo(version):
+    """
+    Catálogo completo de productos activos, serializado y en caché por versión
+
+    Args:
+        version: Versión actual (de version_catalogo())
+
+    Returns:
+        str: JSON del catálogo
+    """
+    clave = f'ventas:catalogo:{version}'
+    contenido = cache.get(clave)
+    if contenido is None:
+        productos = _valores_producto(Producto.objects.filter(activo=True).order_by('nombre'))
+        filas = _filas_productos(productos)
+        contenido = json.dumps({
+            'version': version,
+            'completo': True,
+            'total': len(filas),
+            'campos': CAMPOS_PRODUCTO,
+            'productos': filas,
+            'eliminados': [],
+            'categorias': _categorias(),
+        }, separators=(',', ':'), ensure_ascii=False)
+        cache.set(clave, contenido, DURACION_CACHE)
+    return contenido
+
+
+def cambios_catalogo(version, desde):
+    """
+    Cambios del catálogo desde una versión anterior
+
+    Args:
+        version: Versión actual (de version_catalogo())
+        desde: Versión que tiene el navegador
+
+    Returns:
+        str: JSON con los cambios, o el catálogo completo si la versión
+            anterior no es válida o hay demasiados cambios
+    """
+    fecha = _fecha_de_version(desde)
+    if fecha is None:
+        return catalogo_completo(version)
+
+    # Incluye los desactivados para que el navegador los quite de su copia
+    cambiados = list(_valores_producto(
+        Producto.objects.filter(fecha_actualizacion__gte=fecha - MARGEN_DELTA).order_by(),
+        'activo',
+    )[:MAXIMO_CAMBIOS_DELTA + 1])
+    if len(cambiados) > MAXIMO_CAMBIOS_DELTA:
+        return catalogo_completo(version)
+
+    activos = [producto for producto in cambiados if producto['activo']]
+    return json.dumps({
+        'version': version,
+        'completo': False,
+        'total': int(version.rsplit('-', 1)[1]),
+        'campos': CAMPOS_PRODUCTO,
+        'productos': _filas_productos(activos),
+        'eliminados': [producto['id'] for producto in cambiados if not producto['activo']],
+        'categorias': _categorias(),
+    }, separators=(',', ':'), ensure_ascii=False)
+
+
+def version_clientes():
+    """Versión de la lista de clientes: '<último cambio>-<cantidad>'"""
+    clientes = Cliente.objects.aggregate(ultimo=Max('fecha_actualizacion'), total=Count('id'))
+    return f"{_microsegundos(clientes['ultimo'])}-{clientes['total']}"
+
+
+def lista_clientes(version):
+    """
+    Clientes para el selector del POS, serializados y en caché por versión
+
+    Returns:
+        str: JSON {'version', 'clientes': [[id, nombre], ...]}
+    """
+    clave = f'ventas:clientes:{version}'
+    contenido = cache.get(clave)
+    if contenido is None:
+        clientes = Cliente.objects.order_by('nombre').values_list('id', 'nombre')
+        contenido = json.dumps({
+            'version': version,
+            'clientes': [list(fila) for fila in clientes],
+        }, separators=(',', ':'), ensure_ascii=False)
+        cache.set(clave, contenido, DURACION_CACHE)
+    return contenido
@@ -0,0 +1,474 @@
+"""
+Motor de cobro (checkout) para TradeInventory
+Registra una venta completa con el mínimo de viajes a la base de datos.
+
+Flujo de una venta (modo 'bloqueo', el predeterminado):
+- Bloquea todos los productos del carrito en una sola consulta
+  select_for_update ordenada por id (evita interbloqueos entre cajas)
+- Valida el stock sin asignar en memoria y reporta los fallos por línea
+- Crea los DetalleVenta con un único bulk_create
+- Descuenta el stock con un único UPDATE condicional
+  (UPDATE ... WHERE stock sin asignar >= cantidad)
+- Registra la salida de cada producto en el kardex (MovimientoStock)
+- Suma la venta al resumen diario de reportes (VentaDiaria)
+- Quita los productos vendidos de la caché del escáner (su stock cambió)
+
+Modo 'optimista' (VENTAS_MODO_STOCK = 'optimista'):
+- Lee los productos sin bloquearlos y fuera de la transacción
+- Crea la venta y descuenta el stock con un UPDATE condicional por
+  producto, en orden de id, comprobando las filas afectadas: las filas
+  quedan bloqueadas solo desde su UPDATE hasta el final de la transacción,
+  en lugar de durante toda la venta
+- Si la base rechaza la transacción por un conflicto (fallo de
+  serialización, interbloqueo o base bloqueada en SQLite) la venta se
+  repite hasta VENTAS_REINTENTOS_STOCK veces
+
+Venta sin almacén: se vende solo el stock sin asignar (el total menos
+las unidades que están en almacenes, ver almacenes/stock.py). Las unidades
+de un almacén solo las vende una caja de ese almacén.
+
+Venta desde un almacén (almacen_id, el almacén de la caja):
+- El stock se valida y se descuenta sobre las filas StockAlmacen de ese
+  almacén en lugar de Producto.stock_actual, con las mismas consultas
+  de cada modo. En modo 'bloqueo' se bloquean solo esas filas; los
+  productos se leen sin bloqueo
+- El total del producto se resta con un único UPDATE al final de la
+  transacción, de modo que las cajas de almacenes distintos no compiten
+  por la validación del mismo producto
+
+Lo usan tanto la vista nueva_venta como VentaCreateSerializer. Las ventas
+en lote de las cajas sin conexión usan las mismas piezas (ventas/lote.py).
+"""
+
+import random
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from almacenes.models import Almacen
+from almacenes.stock import (
+    descontar_de_almacen, descontar_de_almacen_en_orden, expresion_sin_asignar, stock_en_almacen,
+    sumar_al_total,
+)
+from clientes.saldos import actualizar_saldo_cliente
+from productos.escaner import cache_codigos
+from productos.models import MovimientoStock, Producto
+from reportes.resumen import acumular_venta
+from .models import Venta, DetalleVenta
+
+# Modos de descuento de stock (settings.VENTAS_MODO_STOCK)
+MODOS_STOCK = ('bloqueo', 'optimista')
+
+# Segundos base de espera entre reintentos del modo optimista
+ESPERA_REINTENTO = 0.01
+
+
+class VentaInvalida(Exception):
+    """
+    Error al registrar una venta
+    Incluye la lista de fallos por línea del carrito, cada uno con:
+        - producto_id: ID del producto
+        - nombre: Nombre del producto (si existe)
+        - solicitado: Cantidad pedida
+        - disponible: Stock disponible al momento de validar
+        - error: Descripción del problema
+    """
+
+    def __init__(self, mensaje, fallos=None):
+        super().__init__(mensaje)
+        self.fallos = fallos or []
+
+
+def agrupar_lineas(lineas):
+    """
+    Normaliza las líneas del carrito y suma cantidades de productos repetidos
+
+    Args:
+        lineas: Iterable de pares (producto_id, cantidad)
+
+    Returns:
+        OrderedDict: {producto_id: cantidad} ordenado por producto_id
+
+    Raises:
+        VentaInvalida: Si alguna línea tiene un id o cantidad inválidos
+    """
+    cantidades = {}
+    fallos = []
+    for producto_id, cantidad in lineas:
+        try:
+            producto_id = int(producto_id)
+            cantidad = int(cantidad)
+        except (TypeError, ValueError):
+            fallos.append({
+                'producto_id': producto_id,
+                'solicitado': cantidad,
+                'error': 'Producto o cantidad inválidos',
+            })
+            continue
+        if cantidad <= 0:
+            fallos.append({
+                'producto_id': producto_id,
+                'solicitado': cantidad,
+                'error': 'La cantidad debe ser mayor a 0',
+            })
+            continue
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+
+    if fallos:
+        raise VentaInvalida('Hay líneas inválidas en la venta', fallos)
+    if not cantidades:
+        raise VentaInvalida('No hay productos en la venta')
+
+    return OrderedDict(sorted(cantidades.items()))
+
+
+def validar_stock(productos, cantidades, disponibles=None):
+    """
+    Verifica en memoria que todos los productos existan y tengan stock
+
+    Args:
+        productos: Diccionario {producto_id: Producto}
+        cantidades: Diccionario {producto_id: cantidad}
+        disponibles: Diccionario {producto_id: stock que se puede vender}
+            (el del almacén de la venta o el sin asignar; por defecto se
+            valida contra stock_actual)
+
+    Returns:
+        list: Fallos por línea (vacía si todo está correcto)
+    """
+    fallos = []
+    for producto_id, cantidad in cantidades.items():
+        producto = productos.get(producto_id)
+        if producto is None:
+            fallos.append({
+                'producto_id': producto_id,
+                'solicitado': cantidad,
+                'error': 'Producto no encontrado',
+            })
+            continue
+        disponible = producto.stock_actual if disponibles is None else disponibles.get(producto_id, 0)
+        if disponible < cantidad:
+            fallos.append({
+                'producto_id': producto_id,
+                'nombre': producto.nombre,
+                'solicitado': cantidad,
+                'disponible': disponible,
+                'error': f'Stock insuficiente para {producto.nombre}',
+            })
+    return fallos
+
+
+def sin_asignar(productos):
+    """
+    Stock sin asignar de productos leídos con annotate(sin_asignar=expresion_sin_asignar())
+
+    Returns:
+        dict: {producto_id: unidades que no están en ningún almacén}
+    """
+    return {producto_id: producto.sin_asignar for producto_id, producto in productos.items()}
+
+
+def descontar_stock(cantidades):
+    """
+    Descuenta el stock sin asignar de todos los productos con un único UPDATE condicional
+
+    Cada producto solo se actualiza si su stock sin asignar sigue
+    alcanzando, de modo que el número de filas afectadas confirma que no
+    hubo sobreventa ni se vendieron unidades de un almacén.
+
+    Args:
+        cantidades: Diccionario {producto_id: cantidad}
+
+    Returns:
+        bool: True si se actualizaron todas las filas
+    """
+    condicion = Q()
+    casos = []
+    for producto_id, cantidad in cantidades.items():
+        condicion |= Q(id=producto_id, sin_asignar__gte=cantidad)
+        casos.append(When(id=producto_id, then=F('stock_actual') - cantidad))
+
+    actualizados = Producto.objects.alias(sin_asignar=expresion_sin_asignar()).filter(condicion).update(
+        stock_actual=Case(*casos, default=F('stock_actual')),
+        fecha_actualizacion=timezone.now(),
+    )
+    return actualizados == len(cantidades)
+
+
+def descontar_stock_en_orden(cantidades):
+    """
+    Descuenta el stock producto por producto, en orden de id, con UPDATE condicionales
+
+    Cada UPDATE ... SET stock_actual = stock_actual - cantidad WHERE
+    stock sin asignar >= cantidad bloquea solo su fila hasta el final de la
+    transacción. Como todas las cajas toman las filas en el mismo orden,
+    dos ventas con productos en común no pueden interbloquearse.
+
+    Args:
+        cantidades: Diccionario {producto_id: cantidad}
+
+    Returns:
+        int: ID del primer producto sin stock suficiente, o None si se
+            descontaron todos
+    """
+    ahora = timezone.now()
+    productos = Producto.objects.alias(sin_asignar=expresion_sin_asignar())
+    for producto_id in sorted(cantidades):
+        cantidad = cantidades[producto_id]
+        actualizados = productos.filter(id=producto_id, sin_asignar__gte=cantidad).update(
+            stock_actual=F('stock_actual') - cantidad,
+            fecha_actualizacion=ahora,
+        )
+        if not actualizados:
+            return producto_id
+    return None
+
+
+def es_conflicto_concurrencia(error):
+    """
+    Indica si un OperationalError es un conflicto entre transacciones que
+    se resuelve repitiendo la venta (y no un error de conexión o de SQL)
+
+    Args:
+        error: django.db.OperationalError
+
+    Returns:
+        bool: True para fallos de serialización e interbloqueos
+    """
+    causa = error.__cause__
+    # PostgreSQL: serialization_failure y deadlock_detected (psycopg 2 y 3)
+    if (getattr(causa, 'pgcode', None) or getattr(causa, 'sqlstate', None)) in ('40001', '40P01'):
+        return True
+    # MySQL: lock wait timeout y deadlock
+    argumentos = getattr(causa, 'args', ())
+    if argumentos and argumentos[0] in (1205, 1213):
+        return True
+    # SQLite: otra conexión tiene la base bloqueada para escritura
+    return 'database is locked' in str(error)
+
+
+def con_reintentos(funcion, reintentos=None):
+    """
+    Ejecuta una transacción y la repite si falla por un conflicto de concurrencia
+
+    Dentro de una transacción ya abierta no se reintenta: el error invalida
+    la transacción externa y solo quien la abrió puede repetirla.
+
+    Args:
+        funcion: Función sin argumentos que abre su propia transacción
+        reintentos: Intentos adicionales (por defecto VENTAS_REINTENTOS_STOCK)
+
+    Returns:
+        El valor devuelto por funcion
+    """
+    if reintentos is None:
+        reintentos = getattr(settings, 'VENTAS_REINTENTOS_STOCK', 3)
+    for intento in range(reintentos + 1):
+        try:
+            return funcion()
+        except OperationalError as error:
+            if (
+                intento == reintentos
+                or not es_conflicto_concurrencia(error)
+                or transaction.get_connection().in_atomic_block
+            ):
+                raise
+            # Espera aleatoria creciente para que las cajas no choquen otra vez
+            time.sleep(random.uniform(0, ESPERA_REINTENTO * 2 ** intento))
+
+
+def armar_detalles(productos, cantidades):
+    """
+    Arma los DetalleVenta (sin guardar) con los precios de los productos leídos
+    y su costo promedio vigente (el costo de lo vendido queda en la venta)
+
+    Returns:
+        tuple: (lista de DetalleVenta, total de la venta)
+    """
+    detalles = []
+    total_venta = 0
+    for producto_id, cantidad in cantidades.items():
+        precio = productos[producto_id].precio
+        subtotal = precio * cantidad
+        total_venta += subtotal
+        detalles.append(DetalleVenta(
+            producto_id=producto_id,
+            cantidad=cantidad,
+            precio_unitario=precio,
+            subtotal=subtotal,
+            costo_unitario=productos[producto_id].costo_promedio,
+        ))
+    return detalles, total_venta
+
+
+def _crear_venta(productos, cantidades, cliente_id, es_fiado, almacen_id):
+    """
+    Inserta la venta y sus detalles con los precios de los productos leídos
+
+    Returns:
+        tuple: (Venta, lista de DetalleVenta)
+    """
+    # Calcular el total antes de crear la venta para insertarla una sola vez
+    detalles, total_venta = armar_detalles(productos, cantidades)
+
+    venta = Venta.objects.create(
+        cliente_id=cliente_id or None,
+        es_fiado=es_fiado,
+        total=total_venta,
+        almacen_id=almacen_id,
+    )
+    for detalle in detalles:
+        detalle.venta = venta
+    DetalleVenta.objects.bulk_create(detalles)
+    return venta, detalles
+
+
+def _registrar_salidas(venta, cantidades):
+    """Registra en el kardex las unidades que salieron con la venta"""
+    MovimientoStock.registrar(
+        {producto_id: -cantidad for producto_id, cantidad in cantidades.items()},
+        'venta', f'Venta #{venta.id}', fecha=venta.fecha, almacen_id=venta.almacen_id,
+    )
+
+
+def _registrar_con_bloqueo(cantidades, cliente_id, es_fiado, almacen_id):
+    """
+    Modo 'bloqueo': bloquea al inicio de la transacción las filas de las que
+    sale el stock (los productos, o sus filas del almacén de la venta)
+    """
+    with transaction.atomic():
+        if almacen_id is None:
+            # Una sola consulta bloquea todas las filas, siempre en el mismo orden
+            productos = {
+                producto.id: producto
+                for producto in Producto.objects.select_for_update().filter(
+                    id__in=cantidades.keys()
+                ).annotate(sin_asignar=expresion_sin_asignar()).order_by('id')
+            }
+            disponibles = sin_asignar(productos)
+        else:
+            # Solo se bloquean las filas del almacén; la del producto se
+            # bloquea con sumar_al_total() al final de la venta
+            productos = Producto.objects.filter(id__in=cantidades.keys()).order_by().in_bulk()
+            disponibles = stock_en_almacen(almacen_id, cantidades.keys(), bloquear=True)
+
+        fallos = validar_stock(productos, cantidades, disponibles)
+        if fallos:
+            raise VentaInvalida('Stock insuficiente', fallos)
+
+        venta, detalles = _crear_venta(productos, cantidades, cliente_id, es_fiado, almacen_id)
+
+        if almacen_id is None:
+            descontado = descontar_stock(cantidades)
+        else:
+            descontado = descontar_de_almacen(almacen_id, cantidades)
+        if not descontado:
+            # Solo ocurre si otro proceso modificó el stock sin bloquear la fila
+            raise VentaInvalida('El stock cambió durante la venta, intente de nuevo')
+        _registrar_salidas(venta, cantidades)
+        if almacen_id is not None:
+            sumar_al_total({producto_id: -cantidad for producto_id, cantidad in cantidades.items()})
+
+        # Mantener al día el resumen diario de reportes y el saldo del cliente
+        acumular_venta(venta, detalles, productos)
+        actualizar_saldo_cliente(venta.cliente_id)
+
+    return venta
+
+
+def _registrar_optimista(cantidades, cliente_id, es_fiado, almacen_id):
+    """
+    Modo 'optimista': lee los productos sin bloquear y deja que los UPDATE
+    condicionales decidan si alcanza el stock
+    """
+    # Lectura sin bloqueo y fuera de la transacción: la validación previa
+    # solo evita escribir una venta que ya se sabe que no alcanza
+    productos = Producto.objects.only(
+        'id', 'nombre', 'precio', 'costo_promedio', 'stock_actual', 'categoria_id', 'proveedor_id'
+    ).order_by()
+    if almacen_id is None:
+        productos = productos.annotate(sin_asignar=expresion_sin_asignar()).in_bulk(list(cantidades))
+        disponibles = sin_asignar(productos)
+    else:
+        productos = productos.in_bulk(list(cantidades))
+        disponibles = stock_en_almacen(almacen_id, cantidades.keys())
+    fallos = validar_stock(productos, cantidades, disponibles)
+    if fallos:
+        raise VentaInvalida('Stock insuficiente', fallos)
+
+    with transaction.atomic():
+        venta, detalles = _crear_venta(productos, cantidades, cliente_id, es_fiado, almacen_id)
+
+        if almacen_id is None:
+            sin_stock = descontar_stock_en_orden(cantidades)
+        else:
+            sin_stock = descontar_de_almacen_en_orden(almacen_id, cantidades)
+        if sin_stock is not None:
+            # Otra caja vendió antes: informar el stock que quedó
+            actual = Producto.objects.only('id', 'nombre', 'stock_actual').annotate(
+                sin_asignar=expresion_sin_asignar(),
+            ).in_bulk([sin_stock])
+            if almacen_id is None:
+                disponibles = sin_asignar(actual)
+            else:
+                disponibles = stock_en_almacen(almacen_id, [sin_stock])
+            raise VentaInvalida(
+                'Stock insuficiente', validar_stock(actual, {sin_stock: cantidades[sin_stock]}, disponibles)
+            )
+        _registrar_salidas(venta, cantidades)
+        if almacen_id is not None:
+            # El total se resta al final: la fila del producto queda bloqueada
+            # solo durante lo que resta de la transacción
+            sumar_al_total({producto_id: -cantidad for producto_id, cantidad in cantidades.items()})
+
+        # Los UPDATE dejaron bloqueadas las filas de los productos hasta el
+        # final de la transacción, como necesita acumular_venta()
+        acumular_venta(venta, detalles, productos)
+        actualizar_saldo_cliente(venta.cliente_id)
+
+    return venta
+
+
+def registrar_venta(lineas, cliente_id=None, es_fiado=False, modo=None, almacen_id=None):
+    """
+    Registra una venta completa de forma atómica
+
+    Args:
+        lineas: Iterable de pares (producto_id, cantidad)
+        cliente_id: ID del cliente (opcional)
+        es_fiado: Boolean indicando si es venta a fiado
+        modo: 'bloqueo' u 'optimista' (por defecto settings.VENTAS_MODO_STOCK)
+        almacen_id: Almacén de la caja (opcional); sin almacén se vende del
+            stock sin asignar del producto
+
+    Returns:
+        Venta: La venta creada con su total calculado
+
+    Raises:
+        VentaInvalida: Si hay líneas inválidas o stock insuficiente.
+            La transacción se revierte por completo.
+    """
+    cantidades = agrupar_lineas(lineas)
+    if almacen_id is not None:
+        try:
+            almacen_id = int(almacen_id)
+        except (TypeError, ValueError):
+            raise VentaInvalida('Almacén inválido')
+        if not Almacen.objects.filter(pk=almacen_id, activo=True).exists():
+            raise VentaInvalida('El almacén no existe o está inactivo')
+
+    modo = modo or getattr(settings, 'VENTAS_MODO_STOCK', 'bloqueo')
+    if modo == 'bloqueo':
+        venta = _registrar_con_bloqueo(cantidades, cliente_id, es_fiado, almacen_id)
+    elif modo == 'optimista':
+        venta = con_reintentos(lambda: _registrar_optimista(cantidades, cliente_id, es_fiado, almacen_id))
+    else:
+        raise ImproperlyConfigured(f'VENTAS_MODO_STOCK desconocido: {modo!r} (opciones: {", ".join(MODOS_STOCK)})')
+
+    cache_codigos.invalidar_productos(cantidades.keys())
+    return venta
@@ -0,0 +1,109 @@
+"""
+Prueba de contención del cobro con varias cajas en paralelo
+
+Cada caja es un proceso propio con su conexión a la base de datos que
+registra ventas de un grupo pequeño de productos muy vendidos, de modo que
+todas las cajas compiten por las mismas filas. Lo usa el comando
+medir_concurrencia para comparar los modos de VENTAS_MODO_STOCK y los
+perfiles de base de datos (tradeinventory/basedatos.py). Después de cada
+venta la caja cierra las conexiones vencidas como al final de una
+petición, así que con DB_CONN_MAX_AGE = 0 cada venta abre su conexión.
+
+Este módulo no importa modelos al cargarse: los procesos hijos se crean
+con 'spawn' y configuran Django antes de usarlos.
+"""
+
+import os
+import random
+import time
+
+
+def cajero(nombre_base, modo, ventas, semilla, producto_ids, barrera, cola, entorno=None):
+    """
+    Proceso de una caja: registra 'ventas' ventas y envía sus medidas a la cola
+
+    Args:
+        nombre_base: Nombre de la base de datos de prueba
+        modo: Modo de descuento de stock ('bloqueo' u 'optimista')
+        ventas: Cantidad de ventas a registrar
+        semilla: Semilla para elegir los carritos
+        producto_ids: IDs de los productos que se venden
+        barrera: multiprocessing.Barrier para que todas las cajas empiecen a la vez
+        cola: multiprocessing.Queue donde se envía el resultado
+        entorno: Variables DB_* del perfil de base de datos a medir (opcional)
+    """
+    # El perfil se lee al cargar settings: aplicar las variables antes
+    os.environ.update(entorno or {})
+    import django
+    django.setup()
+
+    from django.db import DatabaseError, close_old_connections, connection
+    from .checkout import VentaInvalida, registrar_venta
+
+    connection.settings_dict['NAME'] = nombre_base
+    azar = random.Random(semilla)
+    resultado = {'registradas': 0, 'rechazadas': 0, 'errores': 0, 'latencias': [], 'error': ''}
+
+    barrera.wait()
+    resultado['inicio'] = time.time()
+    for _ in range(ventas):
+        carrito = [(producto_id, azar.randint(1, 3)) for producto_id in azar.sample(producto_ids, azar.randint(1, 3))]
+        comienzo = time.perf_counter()
+        try:
+            registrar_venta(carrito, modo=modo)
+            resultado['registradas'] += 1
+        except VentaInvalida:
+            resultado['rechazadas'] += 1
+        except DatabaseError as error:
+            resultado['errores'] += 1
+            resultado['error'] = str(error)
+        # Fin de la "petición": cierra la conexión si no es persistente
+        close_old_connections()
+        resultado['latencias'].append((time.perf_counter() - comienzo) * 1000)
+    resultado['fin'] = time.time()
+
+    connection.close()
+    cola.put(resultado)
+
+
+def ejecutar_cajas(nombre_base, modo, cajas, ventas, producto_ids, semilla=1, entorno=None):
+    """
+    Ejecuta 'cajas' procesos en paralelo y junta sus medidas
+
+    Args:
+        entorno: Variables DB_* del perfil de base de datos de las cajas
+
+    Returns:
+        dict: registradas, rechazadas, errores, ventas_por_segundo,
+            ms_mediana, ms_p95 y el último error visto
+    """
+    import multiprocessing
+
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(cajas)
+    cola = contexto.Queue()
+    procesos = [
+        contexto.Process(
+            target=cajero,
+            args=(nombre_base, modo, ventas, semilla * 1000 + numero, producto_ids, barrera, cola, entorno),
+        )
+        for numero in range(cajas)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    resultados = [cola.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+
+    latencias = sorted(latencia for resultado in resultados for latencia in resultado['latencias'])
+    duracion = max(r['fin'] for r in resultados) - min(r['inicio'] for r in resultados)
+    registradas = sum(r['registradas'] for r in resultados)
+    return {
+        'registradas': registradas,
+        'rechazadas': sum(r['rechazadas'] for r in resultados),
+        'errores': sum(r['errores'] for r in resultados),
+        'ventas_por_segundo': registradas / duracion if duracion else 0,
+        'ms_mediana': latencias[len(latencias) // 2] if latencias else 0,
+        'ms_p95': latencias[int(len(latencias) * 0.95)] if latencias else 0,
+        'error': next((r['error'] for r in resultados if r['error']), ''),
+    }
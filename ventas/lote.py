@@ -0,0 +1,263 @@
+"""
+Registro de ventas en lote para cajas que trabajaron sin conexión
+
+Una caja sin conexión guarda cada venta con una clave única generada por
+ella (Venta.clave_idempotencia) y las envía juntas al reconectarse
+(POST /api/ventas/bulk/). registrar_ventas_lote():
+
+- Procesa las ventas en bloques de TAMANO_BLOQUE, cada bloque en su propia
+  transacción: un bloque rechazado por la base no deshace los anteriores
+- Por bloque, una consulta encuentra las claves ya registradas, otra
+  bloquea todos los productos (en orden de id, como el checkout) y otra por
+  almacén bloquea sus filas de stock
+- Valida las ventas en orden contra el stock que van dejando las
+  anteriores del bloque (el del almacén de la venta o, sin almacén, el
+  stock sin asignar): una venta sin stock se rechaza con sus fallos por
+  línea y las demás se registran
+- Inserta las ventas, sus detalles y el kardex con un bulk_create cada uno,
+  descuenta el stock con un UPDATE condicional por destino (total o
+  almacén) y suma el bloque al resumen diario de una vez
+- Una clave ya registrada (lote reenviado tras perder la respuesta)
+  devuelve la venta existente sin volver a descontar stock
+
+La fecha de la venta es la que envía la caja (cuando se cobró); el kardex
+registra la salida cuando realmente se descuenta el stock.
+"""
+
+from collections import OrderedDict
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from almacenes.models import Almacen
+from almacenes.stock import descontar_de_almacen, expresion_sin_asignar, stock_en_almacen, sumar_al_total
+from clientes.models import Cliente
+from clientes.saldos import actualizar_saldo_cliente
+from productos.escaner import cache_codigos
+from productos.models import MovimientoStock, Producto
+from reportes.resumen import acumular_ventas
+from .checkout import (
+    VentaInvalida, agrupar_lineas, armar_detalles, con_reintentos, descontar_stock, sin_asignar, validar_stock,
+)
+from .models import Venta, DetalleVenta
+
+# Ventas por transacción
+TAMANO_BLOQUE = 50
+
+# Ventas por solicitud a /api/ventas/bulk/
+MAXIMO_VENTAS = 500
+
+
+def _resultado(clave, estado, venta_id=None, total=None, errores=None):
+    return {
+        'clave': clave,
+        'estado': estado,
+        'venta_id': venta_id,
+        'total': None if total is None else str(total),
+        'errores': errores or [],
+    }
+
+
+def _rechazada(clave, error):
+    """Resultado de una venta rechazada por un VentaInvalida"""
+    return _resultado(clave, 'rechazada', errores=error.fallos or [str(error)])
+
+
+def registrar_ventas_lote(ventas, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Registra un lote de ventas de una caja sin conexión
+
+    Args:
+        ventas: Lista de diccionarios con:
+            - clave: Clave de idempotencia generada por la caja
+            - lineas: Iterable de pares (producto_id, cantidad)
+            - cliente_id: ID del cliente (opcional)
+            - es_fiado: Boolean indicando si es venta a fiado
+            - almacen_id: Almacén de la caja (opcional)
+            - fecha: Momento en que se cobró (opcional, por defecto ahora)
+        tamano_bloque: Ventas por transacción
+
+    Returns:
+        list: Un resultado por venta, en el mismo orden, con clave, estado
+            ('creada', 'duplicada' o 'rechazada'), venta_id, total y errores
+    """
+    resultados = [None] * len(ventas)
+    primeras = {}
+    repetidas = []
+    bloque = []
+    for indice, venta in enumerate(ventas):
+        clave = venta['clave']
+        if clave in primeras:
+            # La misma clave dos veces en el lote: se resuelve como la primera
+            repetidas.append((indice, primeras[clave]))
+            continue
+        primeras[clave] = indice
+        try:
+            cantidades = agrupar_lineas(venta['lineas'])
+        except VentaInvalida as e:
+            resultados[indice] = _rechazada(clave, e)
+            continue
+        bloque.append((indice, venta, cantidades))
+        if len(bloque) == tamano_bloque:
+            _procesar_bloque(bloque, resultados)
+            bloque = []
+    if bloque:
+        _procesar_bloque(bloque, resultados)
+
+    for indice, primera in repetidas:
+        resultado = dict(resultados[primera])
+        if resultado['estado'] == 'creada':
+            resultado['estado'] = 'duplicada'
+        resultados[indice] = resultado
+    return resultados
+
+
+def _procesar_bloque(bloque, resultados):
+    """Registra un bloque y copia sus resultados a la lista del lote"""
+    try:
+        try:
+            obtenidos = con_reintentos(lambda: _registrar_bloque(bloque))
+        except IntegrityError:
+            # Otra solicitud registró una de las claves al mismo tiempo: al
+            # repetir el bloque esa venta se reporta como duplicada
+            obtenidos = con_reintentos(lambda: _registrar_bloque(bloque))
+    except VentaInvalida as e:
+        obtenidos = {indice: _rechazada(venta['clave'], e) for indice, venta, _ in bloque}
+    for indice, resultado in obtenidos.items():
+        resultados[indice] = resultado
+
+
+def _registrar_bloque(bloque):
+    """
+    Registra un bloque de ventas en una sola transacción
+
+    Args:
+        bloque: Lista de tuplas (índice en el lote, venta, {producto_id: cantidad})
+
+    Returns:
+        dict: {índice en el lote: resultado}
+    """
+    ahora = timezone.now()
+    resultados = {}
+    with transaction.atomic():
+        existentes = {
+            clave: (venta_id, total)
+            for clave, venta_id, total in Venta.objects.filter(
+                clave_idempotencia__in=[venta['clave'] for _, venta, _ in bloque]
+            ).values_list('clave_idempotencia', 'id', 'total')
+        }
+        pendientes = []
+        for indice, venta, cantidades in bloque:
+            if venta['clave'] in existentes:
+                venta_id, total = existentes[venta['clave']]
+                resultados[indice] = _resultado(venta['clave'], 'duplicada', venta_id, total)
+            else:
+                pendientes.append((indice, venta, cantidades))
+        if not pendientes:
+            return resultados
+
+        producto_ids = sorted({producto_id for _, _, cantidades in pendientes for producto_id in cantidades})
+        almacen_ids = {venta.get('almacen_id') for _, venta, _ in pendientes} - {None}
+        cliente_ids = {venta.get('cliente_id') for _, venta, _ in pendientes} - {None}
+        activos = set(
+            Almacen.objects.filter(pk__in=almacen_ids, activo=True).values_list('id', flat=True)
+        ) if almacen_ids else set()
+        clientes = set(Cliente.objects.filter(pk__in=cliente_ids).values_list('id', flat=True)) if cliente_ids else set()
+
+        # Una sola consulta bloquea todas las filas, siempre en el mismo orden
+        productos = {
+            producto.id: producto
+            for producto in Producto.objects.select_for_update().filter(id__in=producto_ids).annotate(
+                sin_asignar=expresion_sin_asignar(),
+            ).order_by('id')
+        }
+        stock_libre = sin_asignar(productos)
+        stock_almacenes = {
+            almacen_id: stock_en_almacen(almacen_id, producto_ids, bloquear=True)
+            for almacen_id in sorted(activos)
+        }
+
+        # Validar en orden: cada venta aceptada reduce el stock de las siguientes
+        aceptadas = []
+        for indice, venta, cantidades in pendientes:
+            almacen_id = venta.get('almacen_id')
+            cliente_id = venta.get('cliente_id')
+            if almacen_id is not None and almacen_id not in activos:
+                resultados[indice] = _resultado(venta['clave'], 'rechazada', errores=['El almacén no existe o está inactivo'])
+                continue
+            if cliente_id is not None and cliente_id not in clientes:
+                resultados[indice] = _resultado(venta['clave'], 'rechazada', errores=['El cliente no existe'])
+                continue
+            disponibles = stock_libre if almacen_id is None else stock_almacenes[almacen_id]
+            fallos = validar_stock(productos, cantidades, disponibles)
+            if fallos:
+                resultados[indice] = _resultado(venta['clave'], 'rechazada', errores=fallos)
+                continue
+            for producto_id, cantidad in cantidades.items():
+                disponibles[producto_id] -= cantidad
+            aceptadas.append((indice, venta, cantidades))
+        if not aceptadas:
+            return resultados
+
+        # Insertar las ventas y luego todos sus detalles
+        creadas = []
+        for indice, venta, cantidades in aceptadas:
+            detalles, total = armar_detalles(productos, cantidades)
+            creadas.append((indice, Venta(
+                cliente_id=venta.get('cliente_id'),
+                es_fiado=venta.get('es_fiado', False),
+                total=total,
+                almacen_id=venta.get('almacen_id'),
+                clave_idempotencia=venta['clave'],
+                fecha=min(venta.get('fecha') or ahora, ahora),
+            ), detalles, cantidades))
+        if connection.features.can_return_rows_from_bulk_insert:
+            Venta.objects.bulk_create([venta for _, venta, _, _ in creadas])
+        else:
+            for _, venta, _, _ in creadas:
+                venta.save()
+        for _, venta, detalles, _ in creadas:
+            for detalle in detalles:
+                detalle.venta = venta
+        DetalleVenta.objects.bulk_create([detalle for _, _, detalles, _ in creadas for detalle in detalles])
+
+        # Descontar el stock sumado por destino: un UPDATE para el total y
+        # uno por almacén, más el total de lo vendido desde almacenes
+        por_destino = {}
+        for _, venta, _, cantidades in creadas:
+            destino = por_destino.setdefault(venta.almacen_id, OrderedDict())
+            for producto_id, cantidad in cantidades.items():
+                destino[producto_id] = destino.get(producto_id, 0) + cantidad
+        desde_almacenes = {}
+        for almacen_id, cantidades in sorted(por_destino.items(), key=lambda item: item[0] or 0):
+            if almacen_id is None:
+                descontado = descontar_stock(cantidades)
+            else:
+                descontado = descontar_de_almacen(almacen_id, cantidades)
+                for producto_id, cantidad in cantidades.items():
+                    desde_almacenes[producto_id] = desde_almacenes.get(producto_id, 0) - cantidad
+            if not descontado:
+                # Solo ocurre si otro proceso modificó el stock sin bloquear la fila
+                raise VentaInvalida('El stock cambió durante el lote, intente de nuevo')
+        if desde_almacenes:
+            sumar_al_total(desde_almacenes)
+
+        MovimientoStock.insertar([
+            MovimientoStock(
+                producto_id=producto_id, tipo='venta', cantidad=-cantidad, fecha=ahora,
+                referencia=f'Venta #{venta.id}', almacen_id=venta.almacen_id,
+            )
+            for _, venta, _, cantidades in creadas
+            for producto_id, cantidad in cantidades.items()
+        ])
+
+        # Mantener al día el resumen diario de reportes y los saldos de los clientes
+        acumular_ventas([(venta, detalles) for _, venta, detalles, _ in creadas], productos)
+        for cliente_id in sorted({venta.cliente_id for _, venta, _, _ in creadas} - {None}):
+            actualizar_saldo_cliente(cliente_id)
+
+        for indice, venta, _, _ in creadas:
+            resultados[indice] = _resultado(venta.clave_idempotencia, 'creada', venta.id, venta.total)
+
+    cache_codigos.invalidar_productos(producto_ids)
+    return resultados
@@ -0,0 +1,139 @@
+"""
+Comando para medir el cobro con varias cajas vendiendo los mismos productos
+
+Por cada perfil de base de datos (tradeinventory/basedatos.py) crea una
+base de prueba con unos pocos productos muy vendidos y, por cada modo de
+descuento de stock y cantidad de cajas, lanza un proceso por caja que
+registra ventas en paralelo (ver ventas/concurrencia.py). Al final
+comprueba que el stock descontado coincida con lo vendido.
+
+Por defecto compara las variantes del motor configurado: SQLite simple
+contra SQLite con WAL, o conexión por petición contra conexiones
+persistentes (y el pool en PostgreSQL).
+
+Uso:
+    python manage.py medir_concurrencia
+    python manage.py medir_concurrencia --cajas 1,2,4,8 --ventas 200 --modos bloqueo,optimista
+    DB_PERFIL=postgresql python manage.py medir_concurrencia --perfiles postgresql-por-peticion,postgresql
+"""
+
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from categorias.models import Categoria
+from productos.models import Producto
+from tradeinventory.basedatos import VARIANTES, configuracion_base_datos
+from ventas.checkout import MODOS_STOCK
+from ventas.concurrencia import ejecutar_cajas
+from ventas.models import DetalleVenta
+
+# Stock inicial de cada producto: suficiente para que no se agote durante la medición
+STOCK_INICIAL = 10 ** 9
+
+
+class Command(BaseCommand):
+    help = 'Mide ventas por segundo del cobro con N cajas concurrentes en cada modo de stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cajas', default='1,2,4,8', help='Cantidades de cajas separadas por coma')
+        parser.add_argument('--ventas', type=int, default=100, help='Ventas por caja')
+        parser.add_argument('--productos', type=int, default=5, help='Productos en disputa')
+        parser.add_argument('--modos', default=','.join(MODOS_STOCK), help='Modos de stock separados por coma')
+        parser.add_argument('--perfiles', help='Variantes de base de datos separadas por coma (por defecto las del motor actual)')
+
+    def handle(self, *args, **options):
+        try:
+            cajas = [int(valor) for valor in options['cajas'].split(',')]
+        except ValueError:
+            raise CommandError('--cajas debe ser una lista de números separados por coma')
+        modos = [modo.strip() for modo in options['modos'].split(',') if modo.strip()]
+        for modo in modos:
+            if modo not in MODOS_STOCK:
+                raise CommandError(f'Modo desconocido: {modo} (opciones: {", ".join(MODOS_STOCK)})')
+        variantes = VARIANTES.get(connection.vendor, {})
+        perfiles = [perfil.strip() for perfil in (options['perfiles'] or ','.join(variantes)).split(',') if perfil.strip()]
+        for perfil in perfiles:
+            if perfil not in variantes:
+                raise CommandError(
+                    f'Perfil desconocido para {connection.vendor}: {perfil} (opciones: {", ".join(variantes)})'
+                )
+
+        self.stdout.write(f'{connection.vendor}: {options["productos"]} productos, {options["ventas"]} ventas por caja')
+        self.stdout.write(
+            f'{"Perfil":<26}{"Modo":<12}{"Cajas":>6}{"Ventas/s":>10}{"Mediana":>12}{"p95":>12}'
+            f'{"Registradas":>13}{"Rechazadas":>12}{"Errores":>9}'
+        )
+        for perfil in perfiles or [None]:
+            self.medir_perfil(perfil, variantes.get(perfil), modos, cajas, options)
+
+    def medir_perfil(self, perfil, entorno, modos, cajas, options):
+        """Crea la base de prueba con el perfil indicado y mide todos los modos y cajas"""
+        if entorno is not None:
+            # Las opciones de conexión del perfil también al crear la base
+            # (en SQLite el modo WAL queda guardado en el archivo)
+            configuracion = configuracion_base_datos(settings.BASE_DIR, {**os.environ, **entorno})
+            connection.close()
+            for clave in ('OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS'):
+                connection.settings_dict[clave] = configuracion.get(clave, {} if clave == 'OPTIONS' else 0)
+
+        # Las cajas son procesos aparte: SQLite necesita una base en archivo, no en memoria
+        carpeta = None
+        if connection.vendor == 'sqlite':
+            carpeta = tempfile.mkdtemp()
+            connection.settings_dict['TEST']['NAME'] = os.path.join(carpeta, 'concurrencia.sqlite3')
+        nombre_original = connection.settings_dict['NAME']
+        nombre_base = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            producto_ids = self.crear_productos(options['productos'])
+            for modo in modos:
+                for cantidad in cajas:
+                    resultado = ejecutar_cajas(
+                        nombre_base, modo, cantidad, options['ventas'], producto_ids, entorno=entorno,
+                    )
+                    linea = (
+                        f'{perfil or connection.vendor:<26}{modo:<12}{cantidad:>6}{resultado["ventas_por_segundo"]:>10.1f}'
+                        f'{resultado["ms_mediana"]:>9.1f} ms{resultado["ms_p95"]:>9.1f} ms'
+                        f'{resultado["registradas"]:>13}{resultado["rechazadas"]:>12}{resultado["errores"]:>9}'
+                    )
+                    self.stdout.write(self.style.ERROR(linea) if resultado['errores'] else linea)
+                    if resultado['error']:
+                        self.stdout.write(f'    último error: {resultado["error"]}')
+            self.comprobar_stock(producto_ids)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            if carpeta:
+                shutil.rmtree(carpeta, ignore_errors=True)
+
+    def crear_productos(self, cantidad):
+        categoria = Categoria.objects.create(nombre='Más vendidos')
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {numero}', precio=Decimal('10.00'), stock_inicial=STOCK_INICIAL,
+                stock_actual=STOCK_INICIAL, categoria=categoria,
+            )
+            for numero in range(cantidad)
+        ])
+        # bulk_create no devuelve ids en todas las bases
+        return list(Producto.objects.filter(categoria=categoria).order_by('id').values_list('id', flat=True))
+
+    def comprobar_stock(self, producto_ids):
+        """Verifica que no hubo sobreventa ni stock perdido"""
+        vendidos = dict(
+            DetalleVenta.objects.filter(producto_id__in=producto_ids)
+            .values_list('producto_id').annotate(total=Sum('cantidad'))
+        )
+        errores = [
+            producto.nombre for producto in Producto.objects.filter(id__in=producto_ids)
+            if producto.stock_inicial - producto.stock_actual != vendidos.get(producto.id, 0)
+        ]
+        if errores:
+            self.stdout.write(self.style.ERROR(f'Stock inconsistente en: {", ".join(errores)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Stock consistente con las unidades vendidas'))
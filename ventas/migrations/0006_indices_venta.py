@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0007_indices_fiado'),
+        ('ventas', '0005_venta_fecha_cancelacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha'], name='venta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['cliente', 'es_fiado'], name='venta_cliente_fiado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(condition=models.Q(('fecha_ultimo_abono__isnull', False)), fields=['fecha_ultimo_abono'], name='venta_ultimo_abono_idx'),
+        ),
+    ]
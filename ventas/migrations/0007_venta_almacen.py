@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('almacenes', '0004_stockalmacen'),
+        ('ventas', '0006_indices_venta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='almacen',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas', to='almacenes.almacen'),
+        ),
+    ]
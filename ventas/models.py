@@ -12,6 +12,10 @@ class Venta(models.Model):
     monto_abonado = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     fecha_ultimo_abono = models.DateTimeField(null=True, blank=True)
     fecha_cancelacion = models.DateTimeField(null=True, blank=True)
+    almacen = models.ForeignKey('almacenes.Almacen', on_delete=models.SET_NULL, null=True, blank=True, related_name='ventas')
+    # Clave generada por la caja para las ventas enviadas en lote (ventas/lote.py):
+    # una venta reenviada con la misma clave no se registra dos veces
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
 
     def __str__(self):
         return f"Venta #{self.id} - {self.fecha}"
@@ -20,10 +24,41 @@ class Venta(models.Model):
     def saldo_pendiente(self):
         return self.total - self.monto_abonado
 
+    @property
+    def estado(self):
+        """'cancelado', 'pendiente' (fiado con saldo) o 'pagado'"""
+        if self.fecha_cancelacion:
+            return 'cancelado'
+        if self.es_fiado and self.saldo_pendiente > 0:
+            return 'pendiente'
+        return 'pagado'
+
+    @staticmethod
+    def expresion_estado():
+        """Expresión SQL equivalente a la propiedad estado, para annotate()"""
+        return models.Case(
+            models.When(fecha_cancelacion__isnull=False, then=models.Value('cancelado')),
+            models.When(es_fiado=True, monto_abonado__lt=models.F('total'), then=models.Value('pendiente')),
+            default=models.Value('pagado'),
+            output_field=models.CharField(),
+        )
+
     class Meta:
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
         ordering = ['-fecha']
+        indexes = [
+            # Reportes por rango de fechas y listados ordenados por fecha
+            models.Index(fields=['fecha'], name='venta_fecha_idx'),
+            # Deuda y ventas a fiado de un cliente
+            models.Index(fields=['cliente', 'es_fiado'], name='venta_cliente_fiado_idx'),
+            # Último abono: solo las ventas que recibieron alguno
+            models.Index(
+                fields=['fecha_ultimo_abono'],
+                name='venta_ultimo_abono_idx',
+                condition=models.Q(fecha_ultimo_abono__isnull=False),
+            ),
+        ]
 
 class DetalleVenta(models.Model):
     venta = models.ForeignKey(Venta, on_delete=models.CASCADE, related_name='detalles')
@@ -31,6 +66,9 @@ class DetalleVenta(models.Model):
     cantidad = models.IntegerField(validators=[MinValueValidator(1)])
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    # Costo promedio del producto al momento de la venta: el margen de los
+    # reportes se calcula con este valor, no con el precio actual del producto
+    costo_unitario = models.DecimalField(max_digits=12, decimal_places=4, default=0)
 
     def __str__(self):
         return f"Detalle de Venta #{self.venta.id} - {self.producto.nombre}"
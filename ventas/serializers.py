@@ -3,8 +3,12 @@ Serializers para la aplicación de ventas
 Convierte los modelos de Django a JSON y viceversa
 """
 
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Venta, DetalleVenta
+from .checkout import registrar_venta, VentaInvalida
 from productos.models import Producto
 from clientes.models import Cliente
 
@@ -18,7 +22,7 @@ class ClienteSerializer(serializers.ModelSerializer):
     """Serializer simplificado para clientes en ventas"""
     class Meta:
         model = Cliente
-        fields = ['id', 'nombre', 'apellido']
+        fields = ['id', 'nombre', 'documento']
 
 class DetalleVentaSerializer(serializers.ModelSerializer):
     """Serializer para el modelo DetalleVenta"""
@@ -38,6 +42,7 @@ class VentaSerializer(serializers.ModelSerializer):
     detalles = DetalleVentaSerializer(many=True, read_only=True)
     cliente = ClienteSerializer(read_only=True)
     cliente_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
+    estado = serializers.CharField(read_only=True)
     
     class Meta:
         model = Venta
@@ -49,7 +54,8 @@ class VentaSerializer(serializers.ModelSerializer):
 
 class VentaListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listar ventas"""
-    cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
+    cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True, default=None)
+    estado = serializers.CharField(read_only=True)
     
     class Meta:
         model = Venta
@@ -58,40 +64,53 @@ class VentaListSerializer(serializers.ModelSerializer):
             'es_fiado', 'monto_abonado', 'estado'
         ]
 
+class DetalleVentaCreateSerializer(serializers.ModelSerializer):
+    """Serializer para las líneas de una venta nueva"""
+    producto_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = DetalleVenta
+        fields = ['producto_id', 'cantidad']
+
 class VentaCreateSerializer(serializers.ModelSerializer):
     """Serializer para crear ventas"""
-    detalles = DetalleVentaSerializer(many=True)
+    detalles = DetalleVentaCreateSerializer(many=True)
+    cliente_id = serializers.IntegerField(required=False, allow_null=True)
+    almacen_id = serializers.IntegerField(required=False, allow_null=True)
     
     class Meta:
         model = Venta
-        fields = ['cliente_id', 'es_fiado', 'detalles']
+        fields = ['id', 'cliente_id', 'almacen_id', 'es_fiado', 'total', 'detalles']
+        read_only_fields = ['id', 'total']
     
     def create(self, validated_data):
+        """Registra la venta con el motor de cobro (bloqueo y stock por lotes)"""
         detalles_data = validated_data.pop('detalles')
-        venta = Venta.objects.create(**validated_data)
-        
-        total_venta = 0
-        for detalle_data in detalles_data:
-            producto = Producto.objects.get(id=detalle_data['producto_id'])
-            cantidad = detalle_data['cantidad']
-            precio = producto.precio
-            subtotal = precio * cantidad
-            
-            DetalleVenta.objects.create(
-                venta=venta,
-                producto=producto,
-                cantidad=cantidad,
-                precio_unitario=precio,
-                subtotal=subtotal
+        try:
+            return registrar_venta(
+                ((detalle['producto_id'], detalle['cantidad']) for detalle in detalles_data),
+                cliente_id=validated_data.get('cliente_id'),
+                es_fiado=validated_data.get('es_fiado', False),
+                almacen_id=validated_data.get('almacen_id'),
             )
-            
-            # Actualizar stock
-            producto.stock_actual -= cantidad
-            producto.save()
-            
-            total_venta += subtotal
-        
-        venta.total = total_venta
-        venta.save()
-        
-        return venta 
\ No newline at end of file
+        except VentaInvalida as e:
+            raise serializers.ValidationError({'detalles': e.fallos or [str(e)]})
+
+class VentaLoteSerializer(serializers.Serializer):
+    """Serializer para cada venta de un lote enviado por una caja sin conexión"""
+    # Diferencia de reloj tolerada entre la caja y el servidor
+    TOLERANCIA_FECHA = timedelta(minutes=5)
+
+    clave = serializers.CharField(max_length=64)
+    detalles = DetalleVentaCreateSerializer(many=True)
+    cliente_id = serializers.IntegerField(required=False, allow_null=True)
+    almacen_id = serializers.IntegerField(required=False, allow_null=True)
+    es_fiado = serializers.BooleanField(default=False)
+    fecha = serializers.DateTimeField(required=False)
+
+    def validate_fecha(self, value):
+        """No acepta ventas con fecha futura (reloj de la caja adelantado)"""
+        if value > timezone.now() + self.TOLERANCIA_FECHA:
+            raise serializers.ValidationError('La fecha de la venta no puede ser futura')
+        return value
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+
+from almacenes.models import Almacen
+from almacenes.stock import stock_en_almacen, transferir_stock
+from categorias.models import Categoria
+from clientes.models import Cliente, SaldoCliente
+from productos.models import MovimientoStock, Producto
+from reportes.cache import version_datos
+from reportes.models import VentaDiaria
+from reportes.resumen import reconstruir_resumen
+from .checkout import VentaInvalida, con_reintentos, descontar_stock_en_orden, registrar_venta
+from .models import DetalleVenta, Venta
+
+
+class CatalogoPosTests(TestCase):
+    """Catálogo versionado de la pantalla de ventas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cajero', 'cajero@example.com', 'clave')
+        cls.categoria = Categoria.objects.create(nombre='Abarrotes')
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {numero:03d}', precio=Decimal('12.50'), stock_inicial=50,
+                stock_actual=50, categoria=cls.categoria,
+            )
+            for numero in range(120)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def pedir(self, **parametros):
+        return self.client.get(reverse('ventas:catalogo_pos'), parametros)
+
+    def test_pagina_no_depende_del_tamano_del_catalogo(self):
+        # Sesión, usuario, total del día y almacenes para el selector de la caja
+        with self.assertNumQueries(4):
+            self.client.get(reverse('ventas:lista_ventas'))
+        Producto.objects.bulk_create([
+            Producto(nombre=f'Extra {numero}', precio=1, stock_inicial=1, stock_actual=1, categoria=self.categoria)
+            for numero in range(200)
+        ])
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(reverse('ventas:lista_ventas'))
+        self.assertNotContains(respuesta, 'Extra 1')
+
+    def test_catalogo_completo_y_etag(self):
+        respuesta = self.pedir()
+        datos = json.loads(respuesta.content)
+        self.assertTrue(datos['completo'])
+        self.assertEqual(datos['total'], 120)
+        self.assertEqual(len(datos['productos']), 120)
+        self.assertEqual(datos['categorias'], [[self.categoria.id, 'Abarrotes']])
+
+        sin_cambios = self.client.get(reverse('ventas:catalogo_pos'), HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(sin_cambios.status_code, 304)
+
+    def test_cambios_desde_una_version(self):
+        version = json.loads(self.pedir().content)['version']
+        vendido = Producto.objects.order_by('id').first()
+        desactivado = Producto.objects.order_by('id').last()
+
+        registrar_venta([(vendido.id, 3)])
+        desactivado.activo = False
+        desactivado.save()
+
+        datos = json.loads(self.pedir(desde=version).content)
+        self.assertFalse(datos['completo'])
+        self.assertNotEqual(datos['version'], version)
+        self.assertEqual(datos['total'], 119)
+        self.assertEqual(datos['eliminados'], [desactivado.id])
+        filas = {fila[0]: dict(zip(datos['campos'], fila)) for fila in datos['productos']}
+        self.assertEqual(filas[vendido.id]['stock'], 47)
+
+    def test_version_invalida_devuelve_catalogo_completo(self):
+        datos = json.loads(self.pedir(desde='basura').content)
+        self.assertTrue(datos['completo'])
+        self.assertEqual(len(datos['productos']), 120)
+
+
+class ModoStockTests(TestCase):
+    """Cobro con descuento de stock optimista (VENTAS_MODO_STOCK = 'optimista')"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.arroz, cls.frijol = [
+            Producto.objects.create(
+                nombre=nombre, precio=Decimal('20.00'), stock_inicial=10, stock_actual=10, categoria=categoria,
+            )
+            for nombre in ('Arroz 1kg', 'Frijol 1kg')
+        ]
+
+    def test_venta_optimista_descuenta_stock(self):
+        venta = registrar_venta([(self.frijol.id, 2), (self.arroz.id, 3), (self.frijol.id, 1)], modo='optimista')
+        self.assertEqual(venta.total, Decimal('120.00'))
+        self.arroz.refresh_from_db()
+        self.frijol.refresh_from_db()
+        self.assertEqual((self.arroz.stock_actual, self.frijol.stock_actual), (7, 7))
+
+    def test_stock_insuficiente_no_deja_venta(self):
+        with self.assertRaises(VentaInvalida) as contexto:
+            registrar_venta([(self.arroz.id, 1), (self.frijol.id, 11)], modo='optimista')
+        self.assertEqual(contexto.exception.fallos[0]['disponible'], 10)
+        self.assertFalse(Venta.objects.exists())
+        self.arroz.refresh_from_db()
+        self.assertEqual(self.arroz.stock_actual, 10)
+
+    @override_settings(VENTAS_MODO_STOCK='optimista')
+    def test_modo_desde_settings(self):
+        # Lectura sin bloqueo, venta, detalles, un UPDATE por producto, kardex y resumen diario (2)
+        with self.assertNumQueries(10):
+            registrar_venta([(self.arroz.id, 1), (self.frijol.id, 1)])
+
+    def test_descuento_en_orden_informa_el_primer_faltante(self):
+        self.assertEqual(descontar_stock_en_orden({self.arroz.id: 5, self.frijol.id: 50}), self.frijol.id)
+        self.assertIsNone(descontar_stock_en_orden({self.frijol.id: 10}))
+
+
+class ModoBloqueoTests(TestCase):
+    """Cobro con bloqueo de filas (VENTAS_MODO_STOCK = 'bloqueo', el predeterminado)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'Producto {numero}', precio=Decimal('10.00'), stock_inicial=10, stock_actual=10,
+                categoria=categoria,
+            )
+            for numero in range(6)
+        ]
+
+    def test_consultas_no_dependen_de_las_lineas(self):
+        # Savepoint (2), lectura con bloqueo, venta, detalles, UPDATE en lote,
+        # kardex y resumen diario (lectura y filas nuevas)
+        for lineas in (self.productos[:1], self.productos[1:]):
+            with self.subTest(lineas=len(lineas)), self.assertNumQueries(9):
+                registrar_venta([(producto.id, 1) for producto in lineas], modo='bloqueo')
+
+    def test_informa_todas_las_lineas_sin_stock(self):
+        primero, segundo, tercero = self.productos[:3]
+        with self.assertRaises(VentaInvalida) as contexto:
+            registrar_venta([(tercero.id, 20), (primero.id, 11), (segundo.id, 1), (999999, 1)], modo='bloqueo')
+        self.assertEqual(
+            [(fallo['producto_id'], fallo.get('disponible')) for fallo in contexto.exception.fallos],
+            [(primero.id, 10), (tercero.id, 10), (999999, None)],
+        )
+
+    def test_fallo_parcial_no_escribe_nada(self):
+        version = version_datos()
+        with self.assertRaises(VentaInvalida):
+            registrar_venta([(self.productos[0].id, 5), (self.productos[1].id, 11)], modo='bloqueo')
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(DetalleVenta.objects.exists())
+        self.assertFalse(MovimientoStock.objects.filter(tipo='venta').exists())
+        self.assertFalse(VentaDiaria.objects.exists())
+        self.assertEqual(version_datos(), version)
+        self.assertEqual(set(Producto.objects.values_list('stock_actual', flat=True)), {10})
+
+
+class ReintentosTests(SimpleTestCase):
+    """Reintentos del modo optimista ante conflictos entre transacciones"""
+
+    def test_reintenta_conflictos(self):
+        intentos = []
+
+        def venta():
+            intentos.append(1)
+            if len(intentos) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        self.assertEqual(con_reintentos(venta, reintentos=3), 'ok')
+        self.assertEqual(len(intentos), 3)
+
+    def test_no_reintenta_otros_errores_ni_sin_intentos(self):
+        def falla(mensaje):
+            def funcion():
+                intentos.append(1)
+                raise OperationalError(mensaje)
+            return funcion
+
+        intentos = []
+        with self.assertRaises(OperationalError):
+            con_reintentos(falla('no such table: ventas_venta'), reintentos=3)
+        self.assertEqual(len(intentos), 1)
+
+        intentos = []
+        with self.assertRaises(OperationalError):
+            con_reintentos(falla('database is locked'), reintentos=2)
+        self.assertEqual(len(intentos), 3)
+
+
+class VentaApiTests(TestCase):
+    """Listados de la API de ventas: paginación, campos, estado y consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('admin', 'admin@example.com', 'clave', is_staff=True)
+        cls.cliente = Cliente.objects.create(nombre='Ana', telefono='555')
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'Producto {numero}', precio=Decimal('10.00'), stock_inicial=1000, stock_actual=1000,
+                categoria=categoria,
+            )
+            for numero in range(3)
+        ]
+        cls.vender(20)
+
+    @classmethod
+    def vender(cls, cantidad):
+        lineas = [(producto.id, 1) for producto in cls.productos]
+        for numero in range(cantidad):
+            if numero % 2:
+                registrar_venta(lineas, cliente_id=cls.cliente.id, es_fiado=True)
+            else:
+                registrar_venta(lineas)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_ventas_consultas_constantes(self):
+        url = reverse('api-venta-list')
+        with self.assertNumQueries(3):
+            datos = self.client.get(url, {'tamano': 10}).json()
+        self.vender(20)
+        with self.assertNumQueries(3):
+            self.client.get(url, {'tamano': 10})
+
+        self.assertEqual(len(datos['results']), 10)
+        self.assertEqual({venta['cliente_nombre'] for venta in datos['results']}, {'Ana', None})
+        self.assertEqual({venta['estado'] for venta in datos['results']}, {'pagado', 'pendiente'})
+        self.assertEqual(len(self.client.get(url, {'estado': 'pendiente', 'tamano': 100}).json()['results']), 20)
+
+    def test_detalle_de_venta_con_una_consulta_por_relacion(self):
+        venta = Venta.objects.filter(es_fiado=True).first()
+        url = reverse('api-venta-detail', args=[venta.id])
+        # Sesión, usuario, venta con su cliente y detalles con sus productos
+        with self.assertNumQueries(4):
+            datos = self.client.get(url).json()
+        self.assertEqual(datos['cliente']['nombre'], 'Ana')
+        self.assertEqual([detalle['producto']['nombre'] for detalle in datos['detalles']],
+                         ['Producto 0', 'Producto 1', 'Producto 2'])
+
+        with self.assertNumQueries(3):
+            datos = self.client.get(url, {'fields': 'id,total,estado'}).json()
+        self.assertEqual(datos, {'id': venta.id, 'total': '30.00', 'estado': 'pendiente'})
+
+    def test_detalles_venta_consultas_constantes(self):
+        url = reverse('api-detalle-venta-list')
+        with self.assertNumQueries(3):
+            datos = self.client.get(url).json()
+        self.vender(20)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        self.assertEqual(len(datos['results']), 50)
+        ids = [detalle['id'] for detalle in datos['results']]
+        ids += [detalle['id'] for detalle in self.client.get(datos['next']).json()['results']]
+        self.assertEqual(ids, list(DetalleVenta.objects.filter(id__lte=ids[0]).order_by('-id').values_list('id', flat=True)[:60]))
+
+    def test_lista_rapida_igual_al_serializer(self):
+        Venta.objects.filter(pk=Venta.objects.order_by('id').first().pk).update(fecha_cancelacion=timezone.now())
+        url = reverse('api-venta-list')
+        rapida = self.client.get(url, {'tamano': 15}).json()
+        with override_settings(API_LISTA_RAPIDA=False):
+            serializer = self.client.get(url, {'tamano': 15}).json()
+        self.assertEqual(rapida, serializer)
+        self.assertEqual(self.client.get(rapida['next']).json()['results'][-1]['estado'], 'cancelado')
+
+
+class VentaLoteApiTests(TestCase):
+    """Ventas en lote de cajas sin conexión: idempotencia, stock por venta y consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('admin', 'admin@example.com', 'clave', is_staff=True)
+        cls.cliente = Cliente.objects.create(nombre='Ana', telefono='555')
+        cls.almacen = Almacen.objects.create(nombre='Bodega', direccion='Centro')
+        categoria = Categoria.objects.create(nombre='Abarrotes')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'Producto {numero}', precio=Decimal('10.00'), stock_inicial=20, stock_actual=20,
+                categoria=categoria,
+            )
+            for numero in range(3)
+        ]
+        transferir_stock(None, cls.almacen.id, [(cls.productos[2].id, 5)])
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse('api-venta-bulk')
+
+    def enviar(self, ventas):
+        return self.client.post(self.url, {'ventas': ventas}, content_type='application/json')
+
+    def venta(self, clave, cantidad=1, **extra):
+        return dict({'clave': clave, 'detalles': [
+            {'producto_id': self.productos[0].id, 'cantidad': cantidad},
+            {'producto_id': self.productos[1].id, 'cantidad': 1},
+        ]}, **extra)
+
+    def test_lote_reenviado_no_duplica_ventas(self):
+        ayer = timezone.now() - timedelta(days=1)
+        ventas = [
+            self.venta('caja1-1'),
+            self.venta('caja1-2', cantidad=3, cliente_id=self.cliente.id, es_fiado=True, fecha=ayer.isoformat()),
+            {'clave': 'caja1-3', 'almacen_id': self.almacen.id,
+             'detalles': [{'producto_id': self.productos[2].id, 'cantidad': 2}]},
+        ]
+        datos = self.enviar(ventas).json()
+        self.assertEqual((datos['creadas'], datos['duplicadas'], datos['rechazadas']), (3, 0, 0))
+        self.assertEqual([resultado['total'] for resultado in datos['resultados']], ['20.00', '40.00', '20.00'])
+
+        reenvio = self.enviar(ventas).json()
+        self.assertEqual((reenvio['creadas'], reenvio['duplicadas']), (0, 3))
+        self.assertEqual(
+            [resultado['venta_id'] for resultado in reenvio['resultados']],
+            [resultado['venta_id'] for resultado in datos['resultados']],
+        )
+        self.assertEqual(Venta.objects.count(), 3)
+        self.assertEqual(
+            list(Producto.objects.order_by('id').values_list('stock_actual', flat=True)), [16, 18, 18]
+        )
+        self.assertEqual(stock_en_almacen(self.almacen.id, [self.productos[2].id]), {self.productos[2].id: 3})
+        self.assertEqual(MovimientoStock.objects.filter(tipo='venta').count(), 5)
+        self.assertEqual(Venta.objects.get(clave_idempotencia='caja1-2').fecha, ayer)
+        self.assertEqual(SaldoCliente.objects.get(cliente=self.cliente).saldo_pendiente, Decimal('40.00'))
+
+        # El resumen acumulado por lote es igual al reconstruido desde los detalles
+        acumulado = sorted(VentaDiaria.objects.values_list(
+            'fecha', 'producto_id', 'unidades', 'ingresos', 'ventas_contado', 'ventas_fiado'
+        ))
+        reconstruir_resumen()
+        self.assertEqual(acumulado, sorted(VentaDiaria.objects.values_list(
+            'fecha', 'producto_id', 'unidades', 'ingresos', 'ventas_contado', 'ventas_fiado'
+        )))
+
+    def test_venta_sin_stock_no_afecta_al_resto(self):
+        datos = self.enviar([
+            self.venta('a', cantidad=15),
+            self.venta('b', cantidad=10),
+            self.venta('c', cantidad=5),
+            self.venta('a', cantidad=15),
+            {'clave': 'd', 'detalles': []},
+        ]).json()
+        self.assertEqual(
+            [resultado['estado'] for resultado in datos['resultados']],
+            ['creada', 'rechazada', 'creada', 'duplicada', 'rechazada'],
+        )
+        self.assertEqual(datos['resultados'][1]['errores'][0]['disponible'], 5)
+        self.assertEqual(datos['resultados'][3]['venta_id'], datos['resultados'][0]['venta_id'])
+        self.assertEqual(Producto.objects.get(pk=self.productos[0].id).stock_actual, 0)
+
+    def test_venta_sin_almacen_valida_el_stock_sin_asignar(self):
+        # Producto 2: 20 en total, 5 en la bodega y 15 sin asignar
+        def venta(clave, cantidad, **extra):
+            return dict({'clave': clave, 'detalles': [{'producto_id': self.productos[2].id, 'cantidad': cantidad}]}, **extra)
+
+        version = version_datos()
+        with self.captureOnCommitCallbacks(execute=True):
+            datos = self.enviar([
+                venta('s-1', 16),
+                venta('s-2', 5, almacen_id=self.almacen.id),
+                venta('s-3', 15),
+            ]).json()
+        self.assertEqual(
+            [resultado['estado'] for resultado in datos['resultados']], ['rechazada', 'creada', 'creada']
+        )
+        self.assertEqual(datos['resultados'][0]['errores'][0]['disponible'], 15)
+        self.assertEqual(Producto.objects.get(pk=self.productos[2].id).stock_actual, 0)
+        self.assertEqual(stock_en_almacen(self.almacen.id, [self.productos[2].id]), {self.productos[2].id: 0})
+        # El kardex del lote invalida los reportes como el de una venta suelta
+        self.assertNotEqual(version_datos(), version)
+
+    def test_consultas_por_bloque(self):
+        # Sesión y usuario; claves existentes, productos bloqueados, ventas,
+        # detalles, UPDATE del stock, kardex, lectura e inserción del resumen
+        # y el savepoint de la transacción del bloque con su liberación
+        with self.assertNumQueries(12):
+            datos = self.enviar([self.venta(f'x-{numero}') for numero in range(10)]).json()
+        self.assertEqual(datos['creadas'], 10)
+
+    def test_fecha_futura_rechazada(self):
+        fecha = (timezone.now() + timedelta(hours=1)).isoformat()
+        datos = self.enviar([self.venta('futura', fecha=fecha)]).json()
+        self.assertEqual(datos['resultados'][0]['estado'], 'rechazada')
+        self.assertIn('fecha', datos['resultados'][0]['errores'])
+        self.assertEqual(self.enviar([]).status_code, 400)
@@ -8,4 +8,7 @@ urlpatterns = [
     path('nueva/', views.nueva_venta, name='nueva_venta'),
     path('detalle/<int:pk>/', views.detalle_venta, name='detalle_venta'),
     path('historial/', views.historial_ventas, name='historial_ventas'),
+    path('catalogo/', views.catalogo_pos, name='catalogo_pos'),
+    path('catalogo/clientes/', views.clientes_pos, name='clientes_pos'),
+    path('catalogo/almacen/<int:pk>/', views.stock_almacen_pos, name='stock_almacen_pos'),
 ] 
\ No newline at end of file
@@ -22,15 +22,16 @@ Características:
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.db.models import Q, Sum
 from django.utils import timezone
-from django.db import transaction
-from datetime import datetime
+from datetime import datetime, timedelta
 from .models import Venta, DetalleVenta
-from productos.models import Producto
-from clientes.models import Cliente, Fiado, DetalleFiado
-from categorias.models import Categoria
+from .checkout import registrar_venta, VentaInvalida
+from . import catalogo
+from almacenes.models import Almacen
+from almacenes.stock import stock_en_almacen
+from clientes.models import Fiado, DetalleFiado
 import json
 
 @login_required
@@ -48,31 +49,90 @@ def lista_ventas(request):
     Funcionalidades:
         - Muestra ventas del día actual
         - Calcula total de ventas del día
-        - Proporciona datos para nueva venta (productos, categorías, clientes)
+        - El catálogo y los clientes se cargan por AJAX (catalogo_pos, clientes_pos)
+        - Selector del almacén de la caja (si hay almacenes activos)
         - Interfaz para iniciar nueva venta
     """
-    # Obtener ventas del día actual
-    hoy = timezone.now().date()
-    ventas_dia = Venta.objects.filter(fecha__date=hoy)
+    # Obtener ventas del día actual (rango del día local, usa el índice de fecha)
+    inicio_dia = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    ventas_dia = Venta.objects.filter(fecha__gte=inicio_dia, fecha__lt=inicio_dia + timedelta(days=1))
     
     # Calcular total de ventas del día
     total_ventas_dia = ventas_dia.aggregate(total=Sum('total'))['total'] or 0
 
-    # Obtener datos necesarios para la vista de venta
-    productos = Producto.objects.all()
-    categorias = Categoria.objects.all()
-    clientes = Cliente.objects.all()
-
-    # Preparar contexto para la plantilla
+    # Productos, categorías y clientes se cargan desde catalogo_pos y
+    # clientes_pos, así que la página no crece con el catálogo
     context = {
         'ventas_dia': ventas_dia,
         'total_ventas_dia': total_ventas_dia,
-        'productos': productos,
-        'categorias': categorias,
-        'clientes': clientes,
+        'almacenes': Almacen.objects.filter(activo=True).order_by('nombre').values('id', 'nombre'),
     }
     return render(request, 'ventas/lista_ventas.html', context)
 
+def _respuesta_versionada(request, version, construir):
+    """
+    Respuesta JSON con ETag que se revalida en cada petición
+
+    Args:
+        request: Objeto HttpRequest
+        version: Versión del contenido (se usa como ETag)
+        construir: Función sin argumentos que devuelve el JSON
+
+    Returns:
+        HttpResponse: 304 si el navegador ya tiene la versión, o el JSON
+    """
+    etag = f'"{version}"'
+    if request.headers.get('If-None-Match') == etag:
+        respuesta = HttpResponseNotModified()
+    else:
+        respuesta = HttpResponse(construir(), content_type='application/json')
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+@login_required
+def catalogo_pos(request):
+    """
+    Catálogo de productos activos para la pantalla de ventas
+
+    Args:
+        request: Objeto HttpRequest. ?desde=<versión> pide solo los cambios
+
+    Returns:
+        HttpResponse: JSON de ventas.catalogo (completo o cambios)
+    """
+    version = catalogo.version_catalogo()
+    desde = request.GET.get('desde')
+    if desde:
+        return _respuesta_versionada(
+            request, f'{version}:{desde}', lambda: catalogo.cambios_catalogo(version, desde)
+        )
+    return _respuesta_versionada(request, version, lambda: catalogo.catalogo_completo(version))
+
+@login_required
+def clientes_pos(request):
+    """
+    Clientes para el selector de la pantalla de ventas
+
+    Returns:
+        HttpResponse: JSON {'version', 'clientes': [[id, nombre], ...]}
+    """
+    version = catalogo.version_clientes()
+    return _respuesta_versionada(request, version, lambda: catalogo.lista_clientes(version))
+
+@login_required
+def stock_almacen_pos(request, pk):
+    """
+    Stock de un almacén para validar el carrito de la caja
+
+    Una sola consulta por el índice único (almacen, producto) de StockAlmacen.
+
+    Returns:
+        JsonResponse: {'almacen': id, 'stock': [[producto_id, cantidad], ...]}
+    """
+    stock = stock_en_almacen(pk)
+    return JsonResponse({'almacen': pk, 'stock': list(stock.items())})
+
 @login_required
 def nueva_venta(request):
     """
@@ -83,18 +143,19 @@ def nueva_venta(request):
         request: Objeto HttpRequest con datos JSON en el body:
             - cliente_id: ID del cliente (opcional)
             - es_fiado: Boolean indicando si es venta a fiado
+            - almacen_id: Almacén de la caja (opcional)
             - productos: Lista de productos con cantidad
             
     Returns:
         JsonResponse: Resultado de la operación (éxito/error)
         
     Funcionalidades:
-        - Validación de stock en tiempo real
+        - Validación de stock en tiempo real con errores por línea
         - Transacciones atómicas para consistencia
-        - Actualización automática de stock
+        - Actualización automática de stock en un solo UPDATE
         - Cálculo automático de totales
         - Soporte para ventas a fiado
-        - Bloqueo de registros durante actualización
+        - Bloqueo de todos los productos en una sola consulta
     """
     if request.method == 'POST':
         try:
@@ -108,53 +169,21 @@ def nueva_venta(request):
             if not productos_data:
                 return JsonResponse({'success': False, 'error': 'No hay productos en la venta'})
 
-            # Usar transacción para asegurar consistencia de datos
-            # Si algo falla, se revierten todos los cambios
-            with transaction.atomic():
-                # Crear la venta inicial con total 0
-                venta = Venta.objects.create(
-                    cliente_id=cliente_id if cliente_id else None,
-                    es_fiado=es_fiado,
-                    total=0  # Se actualizará después de procesar productos
-                )
-
-                total_venta = 0
-                # Procesar cada producto en la venta
-                for producto_data in productos_data:
-                    # Usar select_for_update para bloquear el registro durante la actualización
-                    # Esto evita problemas de concurrencia
-                    producto = Producto.objects.select_for_update().get(id=producto_data['id'])
-                    cantidad = producto_data['cantidad']
-                    precio = producto.precio
-                    subtotal = precio * cantidad
-
-                    # Verificar que hay suficiente stock
-                    if producto.stock_actual < cantidad:
-                        raise Exception(f'Stock insuficiente para {producto.nombre}')
-
-                    # Crear detalle de venta
-                    DetalleVenta.objects.create(
-                        venta=venta,
-                        producto=producto,
-                        cantidad=cantidad,
-                        precio_unitario=precio,
-                        subtotal=subtotal
-                    )
-
-                    # Actualizar stock del producto
-                    producto.stock_actual -= cantidad
-                    producto.save()
-
-                    # Acumular total de la venta
-                    total_venta += subtotal
-
-                # Actualizar total de la venta
-                venta.total = total_venta
-                venta.save()
-
-                # Retornar éxito con ID de la venta creada
-                return JsonResponse({'success': True, 'venta_id': venta.id})
-
+            # El motor de cobro bloquea, valida y descuenta todo el carrito
+            # en una sola transacción con un número fijo de consultas
+            venta = registrar_venta(
+                ((item.get('id'), item.get('cantidad')) for item in productos_data),
+                cliente_id=cliente_id,
+                es_fiado=es_fiado,
+                almacen_id=data.get('almacen_id') or None,
+            )
+
+            # Retornar éxito con ID de la venta creada
+            return JsonResponse({'success': True, 'venta_id': venta.id})
+
+        except VentaInvalida as e:
+            # Retornar el error con el detalle de cada línea rechazada
+            return JsonResponse({'success': False, 'error': str(e), 'errores': e.fallos})
         except Exception as e:
             # Retornar error si algo falla
             return JsonResponse({'success': False, 'error': str(e)})